@@ -0,0 +1,38 @@
+"""resolve_runs_input_set_label"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c1e7a9b3d42"
+down_revision = "d7a1f3c5e820"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GET /runs の input_set_label 絞込みを列の等値比較にするため、summary 側の
+    # ラベル（_input_set_label → input_set_label）を列へ書き戻す。
+    op.execute("""
+        UPDATE runs SET input_set_label = COALESCE(
+            NULLIF(TRIM(input_set_label), ''),
+            CASE WHEN json_valid(summary) AND json_type(summary) = 'object' THEN
+                NULLIF(TRIM(COALESCE(
+                    NULLIF(json_extract(summary, '$._input_set_label'), ''),
+                    json_extract(summary, '$.input_set_label')
+                )), '')
+            END
+        )
+        """)
+    # 「input_set_label = ? ORDER BY started_at, run_id」とキーセットページング用
+    op.create_index(
+        "ix_runs_input_set_label_started",
+        "runs",
+        ["input_set_label", "started_at", "run_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_runs_input_set_label_started", table_name="runs")
@@ -0,0 +1,29 @@
+"""add_runs_payload_format"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3c5e19b7d42"
+down_revision = "7f8e8f1dd0f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # results/daily_profit_loss/cost_trace の保存形式（json/zjson/columnar）。
+    # NULL は旧来の JSON TEXT（未バックフィル）を表す。
+    op.add_column("runs", sa.Column("payload_format", sa.String(16), nullable=True))
+    op.create_index(
+        op.f("ix_runs_payload_format"), "runs", ["payload_format"], unique=False
+    )
+
+
+def downgrade() -> None:
+    # blob 化済みの行は旧コードで読めないため、事前に
+    # scripts/backfill_run_payloads.py --codec json --all で TEXT に戻しておくこと。
+    op.drop_index(op.f("ix_runs_payload_format"), table_name="runs")
+    op.drop_column("runs", "payload_format")
@@ -0,0 +1,32 @@
+"""add_runs_listing_indexes"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b9d2f4a61c07"
+down_revision = "a3c5e19b7d42"
+branch_labels = None
+depends_on = None
+
+# GET /runs の「フィルタ列 = ? ORDER BY started_at, run_id」とキーセットページング用
+_INDEXES = {
+    "ix_runs_started_at_run_id": ["started_at", "run_id"],
+    "ix_runs_scenario_started": ["scenario_id", "started_at", "run_id"],
+    "ix_runs_config_started": ["config_id", "started_at", "run_id"],
+    "ix_runs_config_version_started": ["config_version_id", "started_at", "run_id"],
+    "ix_runs_plan_version_started": ["plan_version_id", "started_at", "run_id"],
+    "ix_runs_schema_started": ["schema_version", "started_at", "run_id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in _INDEXES.items():
+        op.create_index(name, "runs", columns, unique=False)
+
+
+def downgrade() -> None:
+    for name in reversed(list(_INDEXES)):
+        op.drop_index(name, table_name="runs")
@@ -0,0 +1,25 @@
+"""add_plan_series_content_hash"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c4e8a2d9f310"
+down_revision = "b9d2f4a61c07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 自然キー以外の列のハッシュ。replace_plan_series_level が変更行だけを書き換えるために使う。
+    # NULL（既存行）は次回の置き換えで変更ありとして更新される。
+    op.add_column(
+        "plan_series", sa.Column("content_hash", sa.String(32), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("plan_series") as batch:
+        batch.drop_column("content_hash")
@@ -0,0 +1,41 @@
+"""add_plan_series_search_text"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d7a1f3c5e820"
+down_revision = "c4e8a2d9f310"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GET /plans/{version_id}/psi の q 検索用に、品目・期間・family/period を小文字で連結した列。
+    # (version_id, level, search_text) の索引だけを走査して件数を数えられるようにする。
+    op.add_column("plan_series", sa.Column("search_text", sa.Text(), nullable=True))
+    op.execute("""
+        UPDATE plan_series SET search_text = lower(
+            item_key || ' ' || time_bucket_key || ' ' || coalesce(item_name, '')
+            || ' ' || coalesce(CASE WHEN json_valid(extra_json)
+                AND json_type(extra_json) = 'object'
+                THEN json_extract(extra_json, '$.family') END, '')
+            || ' ' || coalesce(CASE WHEN json_valid(extra_json)
+                AND json_type(extra_json) = 'object'
+                THEN json_extract(extra_json, '$.period') END, '')
+        )
+        """)
+    op.create_index(
+        "idx_plan_series_version_level_search",
+        "plan_series",
+        ["version_id", "level", "search_text"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_plan_series_version_level_search", table_name="plan_series")
+    with op.batch_alter_table("plan_series") as batch:
+        batch.drop_column("search_text")
@@ -4,11 +4,18 @@ import sqlite3
 import time
 import logging
 import threading
+import weakref
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from app.metrics import PLAN_ARTIFACT_WRITE_ERROR_TOTAL
-
+from app.metrics import (
+    DB_POOL_ACQUIRE_TOTAL,
+    DB_POOL_CONNECTIONS_CLOSED_TOTAL,
+    DB_POOL_CONNECTIONS_OPENED_TOTAL,
+    DB_POOL_IDLE,
+    DB_POOL_IN_USE,
+    PLAN_ARTIFACT_WRITE_ERROR_TOTAL,
+)
 
 _BASE_DIR = Path(__file__).resolve().parents[1]
 _DEFAULT_DB = _BASE_DIR / "data" / "scpln.db"
@@ -24,6 +31,7 @@ Path(_DEFAULT_DB).parent.mkdir(parents=True, exist_ok=True)
 def set_db_path(path: str) -> None:
     global _current_db_path
     _current_db_path = path
+    close_idle_connections()
 
 
 def _db_path() -> str:
@@ -36,13 +44,193 @@ def _db_path() -> str:
     return path
 
 
-def _conn() -> sqlite3.Connection:
-    db_path_to_use = _db_path()
-    conn = sqlite3.connect(db_path_to_use)
+# ---------------------------------------------------------------------------
+# 接続プール
+#
+# _conn() はスレッドごとのアイドル接続を再利用する。返すのは sqlite3.Connection の
+# プロキシで、close() するか参照がなくなった時点で（未コミットならロールバックして）
+# プールへ戻る。同一スレッド内で入れ子に _conn() しても別の接続が渡るため、
+# トランザクションの独立性は従来（呼び出しごとに connect）と変わらない。
+# SCPLN_DB_POOL=0 で従来どおり毎回 connect する（PRAGMA 調整は共通）。
+# ---------------------------------------------------------------------------
+
+_BUSY_TIMEOUT_MS = int(os.getenv("SCPLN_SQLITE_BUSY_TIMEOUT_MS", "5000") or 5000)
+_JOURNAL_MODE = (os.getenv("SCPLN_SQLITE_JOURNAL_MODE", "WAL") or "WAL").upper()
+_SYNCHRONOUS = (os.getenv("SCPLN_SQLITE_SYNCHRONOUS", "NORMAL") or "NORMAL").upper()
+_MMAP_SIZE = int(os.getenv("SCPLN_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)) or 0)
+_STATEMENT_CACHE = int(os.getenv("SCPLN_SQLITE_STATEMENT_CACHE", "256") or 256)
+_POOL_MAX_IDLE = int(os.getenv("SCPLN_DB_POOL_MAX_IDLE", "4") or 4)
+
+_JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"}
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _pool_enabled() -> bool:
+    return os.getenv("SCPLN_DB_POOL", "1") != "0"
+
+
+def _file_identity(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=_BUSY_TIMEOUT_MS / 1000.0,
+        cached_statements=_STATEMENT_CACHE,
+    )
     conn.row_factory = sqlite3.Row
+    try:
+        if _JOURNAL_MODE in _JOURNAL_MODES:
+            # WAL はDBファイルに永続化される（既に WAL なら何もしない）
+            conn.execute(f"PRAGMA journal_mode={_JOURNAL_MODE}")
+        if _SYNCHRONOUS in _SYNCHRONOUS_MODES:
+            conn.execute(f"PRAGMA synchronous={_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout={int(_BUSY_TIMEOUT_MS)}")
+        if _MMAP_SIZE > 0:
+            conn.execute(f"PRAGMA mmap_size={int(_MMAP_SIZE)}")
+    except sqlite3.OperationalError as exc:
+        # ロック競合などで切替できなくても接続自体は使える
+        _logger.debug("sqlite pragma setup skipped: %s", exc)
     return conn
 
 
+class _IdleConnections:
+    """1スレッド分のアイドル接続（DBパスごと）。スレッド終了時に解放される。"""
+
+    def __init__(self) -> None:
+        self.by_path: Dict[str, List[tuple]] = {}
+
+    def close_all(self, keep_path: str | None = None) -> None:
+        for path in list(self.by_path):
+            if path == keep_path:
+                continue
+            for raw, _ident in self.by_path.pop(path):
+                _close_physical(raw)
+                DB_POOL_IDLE.dec()
+
+    def __del__(self) -> None:
+        try:
+            for conns in self.by_path.values():
+                for raw, _ident in conns:
+                    _close_physical(raw, check_thread=False)
+                    DB_POOL_IDLE.dec()
+        except Exception:
+            pass
+
+
+class _PoolLocal(threading.local):
+    def __init__(self) -> None:
+        self.idle = _IdleConnections()
+
+
+_pool_local = _PoolLocal()
+# close() 済みプロキシの参照先（以後の操作は ProgrammingError になる）
+_CLOSED_CONNECTION = sqlite3.connect(":memory:", check_same_thread=False)
+_CLOSED_CONNECTION.close()
+
+
+def _close_physical(raw: sqlite3.Connection, check_thread: bool = True) -> None:
+    try:
+        raw.close()
+    except sqlite3.ProgrammingError:
+        if check_thread:
+            raise
+    DB_POOL_CONNECTIONS_CLOSED_TOTAL.inc()
+
+
+def _release(raw: sqlite3.Connection, path: str, ident, owner: int) -> None:
+    DB_POOL_IN_USE.dec()
+    if threading.get_ident() != owner:
+        # 別スレッドで参照が切れた場合は再利用しない（GC がクローズする）
+        return
+    try:
+        if raw.in_transaction:
+            raw.rollback()
+        raw.row_factory = sqlite3.Row
+        raw.isolation_level = ""
+        raw.text_factory = str
+    except sqlite3.Error:
+        _close_physical(raw, check_thread=False)
+        return
+    idle = _pool_local.idle.by_path.setdefault(path, [])
+    if len(idle) >= _POOL_MAX_IDLE:
+        _close_physical(raw)
+        return
+    idle.append((raw, ident))
+    DB_POOL_IDLE.inc()
+
+
+class PooledConnection:
+    """プールから貸し出した sqlite3.Connection のプロキシ。"""
+
+    __slots__ = ("_raw", "_finalizer", "__weakref__")
+
+    def __init__(self, raw: sqlite3.Connection, path: str, ident) -> None:
+        object.__setattr__(self, "_raw", raw)
+        finalizer = weakref.finalize(
+            self, _release, raw, path, ident, threading.get_ident()
+        )
+        finalizer.atexit = False
+        object.__setattr__(self, "_finalizer", finalizer)
+
+    def __getattr__(self, name: str):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._raw, name, value)
+
+    def __enter__(self) -> "PooledConnection":
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    def close(self) -> None:
+        object.__setattr__(self, "_raw", _CLOSED_CONNECTION)
+        self._finalizer()
+
+
+def _conn() -> sqlite3.Connection:
+    db_path_to_use = _db_path()
+    if not _pool_enabled():
+        return _open_connection(db_path_to_use)
+    idle = _pool_local.idle
+    if len(idle.by_path) > 1 or (idle.by_path and db_path_to_use not in idle.by_path):
+        # DBパスが切り替わった（テスト・set_db_path）ら古いアイドル接続を捨てる
+        idle.close_all(keep_path=db_path_to_use)
+    ident = _file_identity(db_path_to_use)
+    conns = idle.by_path.get(db_path_to_use)
+    raw = None
+    while conns:
+        candidate, cand_ident = conns.pop()
+        DB_POOL_IDLE.dec()
+        if cand_ident == ident and ident is not None:
+            raw = candidate
+            break
+        # ファイルが置き換え/削除されていれば旧接続は使わない
+        _close_physical(candidate)
+    if raw is None:
+        raw = _open_connection(db_path_to_use)
+        DB_POOL_CONNECTIONS_OPENED_TOTAL.inc()
+        DB_POOL_ACQUIRE_TOTAL.labels(result="miss").inc()
+        ident = _file_identity(db_path_to_use)
+    else:
+        DB_POOL_ACQUIRE_TOTAL.labels(result="hit").inc()
+    DB_POOL_IN_USE.inc()
+    return PooledConnection(raw, db_path_to_use, ident)  # type: ignore[return-value]
+
+
+def close_idle_connections() -> None:
+    """呼び出しスレッドのアイドル接続をすべて閉じる（DB差し替え・リストア前など）。"""
+    _pool_local.idle.close_all()
+
+
 def init_db(force: bool = False) -> None:
     """Alembicマイグレーションを適用し、SQLiteスキーマを最新化する。"""
     _logger.info(
@@ -6,14 +6,18 @@ import json
 from uuid import uuid4
 from typing import Any, Dict, Optional, Tuple
 import os
-import sys
 import logging
 from pathlib import Path
 
 from domain.models import SimulationInput
-from engine.simulator import SupplyChainSimulator
+from engine.simulator import SupplyChainSimulator, validate_detail_level
+from engine.compiled import create_simulator
+from engine.montecarlo import bands_to_rows, run_montecarlo
+from engine.sweep import variant_rows
+from engine.columnar import as_nested
+from engine.cost_trace import CostTrace, trace_records
 from engine.simulation_stub import run_stub as run_stub_simulation
-from app.run_registry import REGISTRY, record_canonical_run
+from app.run_registry import REGISTRY, record_canonical_run, record_sweep_runs
 from app import db
 from prometheus_client import Counter as _Counter, Histogram as _Histogram
 from app.metrics import (
@@ -24,9 +28,15 @@ from app.metrics import (
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 from engine.aggregation import aggregate_by_time, rollup_axis
-from core.config import CanonicalConfig, PlanningDataBundle, build_planning_inputs
+from core.config import (
+    CanonicalConfig,
+    PlanningDataBundle,
+    build_planning_inputs,
+    build_simulation_input,
+)
 from core.config.storage import (
     CanonicalConfigNotFoundError,
     load_canonical_config_from_db,
@@ -41,6 +51,7 @@ from core.plan_repository_builders import (
     build_plan_series_from_mrp,
 )
 from app.plan_artifact_utils import apply_plan_final_receipts
+from scripts.pipeline_runner import PlanningPipeline
 
 
 _STORAGE_CHOICES = {"db", "files", "both"}
@@ -83,16 +94,6 @@ def _should_use_files(mode: str) -> bool:
     return mode in {"files", "both"}
 
 
-def _load_json(path: Path) -> Dict[str, Any] | None:
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        logging.exception("planning_load_json_failed", extra={"path": str(path)})
-        return None
-
-
 class JobManager:
     def __init__(self, workers: int = 1, db_path: str | None = None):
         self.workers = max(1, workers)
@@ -182,6 +183,10 @@ class JobManager:
                 self._run_aggregate(job_id)
             elif jtype == "planning":
                 self._run_planning(job_id)
+            elif jtype == "montecarlo":
+                self._run_montecarlo(job_id)
+            elif jtype == "sweep":
+                self._run_sweep(job_id)
             else:
                 # unknown type: mark failed
                 db.update_job_status(
@@ -205,6 +210,9 @@ class JobManager:
             # extract optional config/scenario context
             config_id = payload.pop("config_id", None)
             scenario_id = payload.pop("scenario_id", None)
+            engine = payload.pop("engine", None)
+            result_format = payload.pop("result_format", None) or "nested"
+            detail_level = validate_detail_level(payload.pop("detail_level", None))
             cfg_json = None
             try:
                 if payload:
@@ -218,7 +226,7 @@ class JobManager:
             summary: Dict[str, Any] = {}
             results: list[Dict[str, Any]] = []
             daily_pl: list[Dict[str, Any]] = []
-            cost_trace: list[Dict[str, Any]] = []
+            cost_trace: CostTrace | list[Dict[str, Any]] = []
             if skip_simulation:
                 (
                     summary,
@@ -226,14 +234,26 @@ class JobManager:
                     daily_pl,
                     cost_trace,
                 ) = run_stub_simulation(sim_input, include_trace=True)
+                if detail_level != "full":
+                    results, cost_trace = [], []
+                if detail_level == "summary":
+                    daily_pl = []
                 duration_ms = int((time.monotonic() - t0) * 1000)
             else:
-                sim = SupplyChainSimulator(sim_input)
+                sim = create_simulator(
+                    sim_input,
+                    engine=engine,
+                    result_format=result_format,
+                    detail_level=detail_level,
+                )
                 results, daily_pl = sim.run()
+                if sim.columnar_results is not None:
+                    results = sim.columnar_results.to_dict()
                 try:
                     summary = sim.compute_summary()
                 except Exception:
                     summary = {}
+                # RunRegistry へは型付きバッファのまま渡す
                 cost_trace = getattr(sim, "cost_trace", [])
                 duration_ms = int((time.monotonic() - t0) * 1000)
             run_id = uuid4().hex
@@ -337,9 +357,9 @@ class JobManager:
             if dataset in ("pl", "daily_profit_loss"):
                 rows = run.get("daily_profit_loss") or []
             elif dataset == "trace":
-                rows = run.get("cost_trace") or []
+                rows = trace_records(run.get("cost_trace"))
             elif dataset == "results":
-                rows = run.get("results") or []
+                rows = list(as_nested(run.get("results") or []))
             else:
                 raise RuntimeError("unknown dataset")
             if not isinstance(rows, list):
@@ -404,6 +424,126 @@ class JobManager:
             except Exception:
                 pass
 
+    def submit_montecarlo(self, payload: Dict[str, Any]) -> str:
+        self._ensure_db_ready()
+        if not self._threads:
+            self.start()
+        job_id = uuid4().hex
+        now = int(time.time() * 1000)
+        db.create_job(
+            job_id, "montecarlo", "queued", now, json.dumps(payload, ensure_ascii=False)
+        )
+        self.q.put({"job_id": job_id, "type": "montecarlo"})
+        try:
+            JOBS_ENQUEUED.labels(type="montecarlo").inc()
+        except Exception:
+            pass
+        return job_id
+
+    def _run_montecarlo(self, job_id: str):
+        started = int(time.time() * 1000)
+        db.update_job_status(job_id, status="running", started_at=started)
+        t0 = time.monotonic()
+        try:
+            rec = db.get_job(job_id)
+            payload = json.loads(rec.get("params_json") or "{}") if rec else {}
+            replications = int(payload.pop("replications", 100) or 100)
+            base_seed = payload.pop("base_seed", None)
+            workers = payload.pop("workers", None)
+            engine = payload.pop("engine", None)
+            sim_input = SimulationInput(**payload)
+            result = run_montecarlo(
+                sim_input,
+                replications,
+                base_seed=base_seed,
+                workers=workers,
+                engine=engine,
+            )
+            # result.json / result.csv で扱えるよう指標ごとの行に展開して保存
+            db.set_job_result(
+                job_id, json.dumps(bands_to_rows(result), ensure_ascii=False)
+            )
+            finished = int(time.time() * 1000)
+            db.update_job_status(job_id, status="succeeded", finished_at=finished)
+            try:
+                JOBS_COMPLETED.labels(type="montecarlo").inc()
+                JOBS_DURATION.labels(type="montecarlo").observe(time.monotonic() - t0)
+            except Exception:
+                pass
+        except Exception as e:
+            finished = int(time.time() * 1000)
+            db.update_job_status(
+                job_id, status="failed", finished_at=finished, error=str(e)
+            )
+            try:
+                JOBS_FAILED.labels(type="montecarlo").inc()
+            except Exception:
+                pass
+
+    def submit_sweep(self, payload: Dict[str, Any]) -> str:
+        self._ensure_db_ready()
+        if not self._threads:
+            self.start()
+        job_id = uuid4().hex
+        now = int(time.time() * 1000)
+        db.create_job(
+            job_id, "sweep", "queued", now, json.dumps(payload, ensure_ascii=False)
+        )
+        self.q.put({"job_id": job_id, "type": "sweep"})
+        try:
+            JOBS_ENQUEUED.labels(type="sweep").inc()
+        except Exception:
+            pass
+        return job_id
+
+    def _run_sweep(self, job_id: str):
+        started = int(time.time() * 1000)
+        db.update_job_status(job_id, status="running", started_at=started)
+        t0 = time.monotonic()
+        try:
+            rec = db.get_job(job_id)
+            payload = json.loads(rec.get("params_json") or "{}") if rec else {}
+            version_id = int(payload["config_version_id"])
+            canonical_config, validation = load_canonical_config_from_db(
+                version_id, validate=True
+            )
+            if validation and validation.has_errors:
+                raise ValueError("canonical config validation failed")
+            result = record_sweep_runs(
+                build_simulation_input(canonical_config),
+                config_version_id=version_id,
+                grid=payload.get("grid"),
+                variants=payload.get("variants"),
+                scenario_id=payload.get("scenario_id"),
+                workers=payload.get("workers"),
+                engine=payload.get("engine"),
+                detail_level=validate_detail_level(
+                    payload.get("detail_level") or "summary"
+                ),
+            )
+            # result.json / result.csv で扱えるようバリアントごとの行に展開して保存
+            rows = [
+                {"scenario_id": result["scenario_id"], **row}
+                for row in variant_rows(result["variants"])
+            ]
+            db.set_job_result(job_id, json.dumps(rows, ensure_ascii=False))
+            finished = int(time.time() * 1000)
+            db.update_job_status(job_id, status="succeeded", finished_at=finished)
+            try:
+                JOBS_COMPLETED.labels(type="sweep").inc()
+                JOBS_DURATION.labels(type="sweep").observe(time.monotonic() - t0)
+            except Exception:
+                pass
+        except Exception as e:
+            finished = int(time.time() * 1000)
+            db.update_job_status(
+                job_id, status="failed", finished_at=finished, error=str(e)
+            )
+            try:
+                JOBS_FAILED.labels(type="sweep").inc()
+            except Exception:
+                pass
+
     def submit_planning(self, params: Dict[str, Any]) -> str:
         self._ensure_db_ready()
         if not self._threads:
@@ -433,10 +573,9 @@ class JobManager:
             PLAN_DB_LAST_SUCCESS_TIMESTAMP,
             PLAN_DB_CAPACITY_TRIM_TOTAL,
             PLAN_DB_LAST_TRIM_TIMESTAMP,
+            PLAN_DB_WRITE_ROWS_PER_SECOND,
         )
         try:
-            import subprocess
-
             rec = db.get_job(job_id)
             cfg = json.loads(rec.get("params_json") or "{}") if rec else {}
             base = Path(__file__).resolve().parents[1]
@@ -490,16 +629,12 @@ class JobManager:
             apply_adjusted_flag = bool(cfg.get("apply_adjusted") or False)
             if lightweight:
                 apply_adjusted_flag = False
-            env = os.environ.copy()
-            env.setdefault("PYTHONPATH", str(base))
-
             canonical_snapshot_path = artifact_paths.get("canonical_snapshot.json")
             planning_inputs_path = artifact_paths.get("planning_inputs.json")
 
-            def runpy(args: list[str]):
-                subprocess.run(
-                    [sys.executable, *args], cwd=str(base), env=env, check=True
-                )
+            # 各ステージは同一プロセス内で実行し、出力は pipeline.store で受け渡す
+            pipeline = PlanningPipeline()
+            runpy = pipeline.run_script
 
             def with_storage(
                 args: list[str], *, allow_version: bool = True
@@ -650,10 +785,10 @@ class JobManager:
                     )
 
             try:
-                aggregate_obj = _load_json(out_dir / "aggregate.json")
-                detail_obj = _load_json(out_dir / "sku_week.json")
-                mrp_obj = _load_json(out_dir / "mrp.json")
-                plan_final_obj = _load_json(out_dir / "plan_final.json")
+                aggregate_obj = pipeline.load_json(out_dir / "aggregate.json")
+                detail_obj = pipeline.load_json(out_dir / "sku_week.json")
+                mrp_obj = pipeline.load_json(out_dir / "mrp.json")
+                plan_final_obj = pipeline.load_json(out_dir / "plan_final.json")
                 if plan_final_obj:
                     detail_obj, aggregate_obj = apply_plan_final_receipts(
                         detail_obj, aggregate_obj, plan_final_obj
@@ -150,6 +150,52 @@ def post_job_aggregate(request: Request, body: Dict[str, Any] = Body(...)):
     return {"job_id": job_id}
 
 
+@app.post("/jobs/montecarlo")
+def post_job_montecarlo(request: Request, body: Dict[str, Any] = Body(...)):
+    import os
+
+    if os.getenv("RBAC_ENABLED", "0") == "1":
+        role = request.headers.get("X-Role") if request else None
+        org = request.headers.get("X-Org-ID") if request else None
+        tenant = request.headers.get("X-Tenant-ID") if request else None
+        allowed = {
+            x.strip()
+            for x in (os.getenv("RBAC_MUTATE_ROLES", "planner,admin").split(","))
+            if x.strip()
+        }
+        if not role or role not in allowed:
+            raise HTTPException(status_code=403, detail="forbidden: role not allowed")
+        if not org or not tenant:
+            raise HTTPException(status_code=400, detail="missing org/tenant headers")
+    # body: SimulationInput + {replications, base_seed, workers, engine}
+    job_id = JOB_MANAGER.submit_montecarlo(body or {})
+    return {"job_id": job_id}
+
+
+@app.post("/jobs/sweep")
+def post_job_sweep(request: Request, body: Dict[str, Any] = Body(...)):
+    import os
+
+    if os.getenv("RBAC_ENABLED", "0") == "1":
+        role = request.headers.get("X-Role") if request else None
+        org = request.headers.get("X-Org-ID") if request else None
+        tenant = request.headers.get("X-Tenant-ID") if request else None
+        allowed = {
+            x.strip()
+            for x in (os.getenv("RBAC_MUTATE_ROLES", "planner,admin").split(","))
+            if x.strip()
+        }
+        if not role or role not in allowed:
+            raise HTTPException(status_code=403, detail="forbidden: role not allowed")
+        if not org or not tenant:
+            raise HTTPException(status_code=400, detail="missing org/tenant headers")
+    # body: {config_version_id, grid|variants, scenario_id, workers, engine, detail_level}
+    if not (body or {}).get("config_version_id"):
+        raise HTTPException(status_code=400, detail="config_version_id is required")
+    job_id = JOB_MANAGER.submit_sweep(body)
+    return {"job_id": job_id}
+
+
 @app.get("/jobs/{job_id}/result.json")
 def get_job_result_json(job_id: str):
     row = db.get_job(job_id)
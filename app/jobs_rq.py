@@ -6,7 +6,9 @@ from typing import Any, Dict
 from app import db
 from app.run_registry import REGISTRY
 from domain.models import SimulationInput
-from engine.simulator import SupplyChainSimulator
+from engine.compiled import create_simulator
+from engine.columnar import as_nested
+from engine.cost_trace import trace_records
 from engine.aggregation import aggregate_by_time, rollup_axis
 import logging
 
@@ -45,6 +47,9 @@ def run_simulation_task(job_id: str, payload: Dict[str, Any]):
     t0 = time.monotonic()
     try:
         config_id = payload.pop("config_id", None)
+        engine = payload.pop("engine", None)
+        result_format = payload.pop("result_format", None) or "nested"
+        detail_level = payload.pop("detail_level", None) or "full"
         cfg_json = None
         try:
             if payload:
@@ -52,8 +57,15 @@ def run_simulation_task(job_id: str, payload: Dict[str, Any]):
         except Exception:
             cfg_json = None
         sim_input = SimulationInput(**payload)
-        sim = SupplyChainSimulator(sim_input)
+        sim = create_simulator(
+            sim_input,
+            engine=engine,
+            result_format=result_format,
+            detail_level=detail_level,
+        )
         results, daily_pl = sim.run()
+        if sim.columnar_results is not None:
+            results = sim.columnar_results.to_dict()
         try:
             summary = sim.compute_summary()
         except Exception:
@@ -135,9 +147,9 @@ def run_aggregate_task(job_id: str, cfg: Dict[str, Any]):
         if dataset in ("pl", "daily_profit_loss"):
             rows = run.get("daily_profit_loss") or []
         elif dataset == "trace":
-            rows = run.get("cost_trace") or []
+            rows = trace_records(run.get("cost_trace"))
         elif dataset == "results":
-            rows = run.get("results") or []
+            rows = list(as_nested(run.get("results") or []))
         else:
             raise RuntimeError("unknown dataset")
         if not isinstance(rows, list):
@@ -120,6 +120,12 @@ PLAN_DB_WRITE_LATENCY = Histogram(
     buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, float("inf")),
 )
 
+PLAN_DB_WRITE_ROWS_PER_SECOND = Gauge(
+    "plan_db_write_rows_per_second",
+    "plan_series rows written per second in the latest PlanRepository write",
+    labelnames=("storage_mode",),
+)
+
 PLAN_SERIES_ROWS_TOTAL = Gauge(
     "plan_series_rows_total",
     "Number of plan_series rows written in the latest transaction",
@@ -141,6 +147,21 @@ PLAN_DB_LAST_TRIM_TIMESTAMP = Gauge(
     "UNIX timestamp of the latest PlanRepository capacity trim",
 )
 
+# ---------------------------------------------------------------------------
+# Planning pipeline stage cache (scripts.pipeline_cache)
+# ---------------------------------------------------------------------------
+
+PLANNING_STAGE_CACHE_TOTAL = Counter(
+    "scpln_planning_stage_cache_total",
+    "Planning stage cache lookups (hit=stage output reused, miss=stage executed)",
+    labelnames=("stage", "result"),
+)
+
+PLANNING_STAGE_CACHE_EVICTIONS_TOTAL = Counter(
+    "scpln_planning_stage_cache_evictions_total",
+    "Planning stage cache entries removed by the LRU size/count limits",
+)
+
 # ---------------------------------------------------------------------------
 # InputSet / legacy mode metrics
 # ---------------------------------------------------------------------------
@@ -170,6 +191,36 @@ INPUT_SET_DIFF_CACHE_STALE_TOTAL = Counter(
     "Input set diff cache misses due to TTL expiry or errors",
 )
 
+# ---------------------------------------------------------------------------
+# SQLite connection pool (app.db)
+# ---------------------------------------------------------------------------
+
+DB_POOL_ACQUIRE_TOTAL = Counter(
+    "scpln_db_pool_acquire_total",
+    "SQLite connections handed out by app.db._conn (hit=reused idle connection)",
+    labelnames=("result",),
+)
+
+DB_POOL_CONNECTIONS_OPENED_TOTAL = Counter(
+    "scpln_db_pool_connections_opened_total",
+    "Physical SQLite connections opened by the pool",
+)
+
+DB_POOL_CONNECTIONS_CLOSED_TOTAL = Counter(
+    "scpln_db_pool_connections_closed_total",
+    "Physical SQLite connections closed by the pool (overflow, stale path, reset)",
+)
+
+DB_POOL_IN_USE = Gauge(
+    "scpln_db_pool_in_use",
+    "SQLite connections currently checked out of the pool",
+)
+
+DB_POOL_IDLE = Gauge(
+    "scpln_db_pool_idle",
+    "Idle pooled SQLite connections across all threads",
+)
+
 
 # ---------------------------------------------------------------------------
 # Metrics endpoint helpers
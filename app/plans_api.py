@@ -10,7 +10,7 @@ import tempfile
 import shutil
 from pathlib import Path
 from collections import defaultdict
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from fastapi import Body, Query, Request, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
@@ -33,6 +33,7 @@ from app.metrics import (
     PLAN_SERIES_ROWS_TOTAL,
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 from core.config.storage import (
     CanonicalConfigNotFoundError,
@@ -51,13 +52,14 @@ from core.plan_repository_builders import (
 )
 from core.plan_repository_views import (
     build_plan_summaries,
-    fetch_aggregate_rows as repo_fetch_aggregate_rows,
-    fetch_detail_rows as repo_fetch_detail_rows,
     fetch_override_events as repo_fetch_override_events,
     fetch_overrides_by_level as repo_fetch_overrides,
+    fetch_psi_page as repo_fetch_psi_page,
     summarize_audit_events,
     latest_state_from_events,
 )
+from scripts.pipeline_runner import PlanningPipeline
+from scripts.mrp import merge_net_change, net_change_demand_items
 import subprocess
 
 
@@ -69,6 +71,7 @@ _PLAN_REPOSITORY = PlanRepository(
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 _STORAGE_CHOICES = {"db", "files", "both"}
 _DEFAULT_PLAN_INCLUDES = {"summary"}
@@ -88,21 +91,15 @@ def _get_param(body: Dict[str, Any], key: str, default: Any = None) -> Any:
     return val
 
 
-def _run_py(args: list[str]) -> None:
-    env = os.environ.copy()
-    env.setdefault("PYTHONPATH", str(BASE_DIR))
+def _run_py(args: list[str], pipeline: Optional[PlanningPipeline] = None) -> Any:
+    """Planningステージを実行する（既定は同一プロセス内。pipeline で出力を受け渡す）。"""
+    if pipeline is None:
+        pipeline = PlanningPipeline()
     try:
-        subprocess.run(
-            [sys.executable, *args],
-            cwd=str(BASE_DIR),
-            env=env,
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        return pipeline.run_script(args)
     except Exception as e:
         logging.error(
-            "Subprocess failed with exception",
+            "Planning stage failed with exception",
             extra={
                 "script": args[0],
                 "script_args": " ".join(args),
@@ -115,16 +112,6 @@ def _run_py(args: list[str]) -> None:
         raise
 
 
-def _load_json(path: Path) -> Dict[str, Any] | None:
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        logging.exception("plans_api_load_json_failed", extra={"path": str(path)})
-        return None
-
-
 def _storage_mode(value: Optional[str] = None) -> str:
     if value:
         mode = str(value).lower()
@@ -207,67 +194,6 @@ def _request_actor(req: Request | None = None) -> str:
     return "psi_api"
 
 
-def _save_overlay(
-    version_id: str, data: Dict[str, Any], *, actor: str, note: str | None = None
-) -> None:
-    overrides: list[Dict[str, Any]] = []
-    events: list[Dict[str, Any]] = []
-    for level, entries in (
-        ("aggregate", list(data.get("aggregate") or [])),
-        ("det", list(data.get("det") or [])),
-    ):
-        existing = {
-            row.get("key_hash"): row
-            for row in repo_fetch_overrides(_PLAN_REPOSITORY, version_id, level)
-        }
-        for entry in entries:
-            if level == "aggregate":
-                key_hash = _psi_overlay_key_agg(
-                    entry.get("period"), entry.get("family")
-                )
-            else:
-                key_hash = _psi_overlay_key_det(entry.get("week"), entry.get("sku"))
-            prior = existing.get(key_hash) or {}
-            payload_text = json.dumps(entry, ensure_ascii=False)
-            overrides.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "payload_json": payload_text,
-                    "lock_flag": bool(prior.get("lock_flag")),
-                    "locked_by": prior.get("locked_by"),
-                    "weight": prior.get("weight"),
-                    "author": prior.get("author"),
-                    "source": prior.get("source") or "psi",
-                }
-            )
-            events.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "event_type": "edit",
-                    "payload_json": payload_text,
-                    "actor": actor,
-                    "notes": note,
-                }
-            )
-    if overrides:
-        try:
-            _PLAN_REPOSITORY.upsert_overrides(
-                version_id, overrides=overrides, events=events
-            )
-        except PlanRepositoryError:
-            logging.exception(
-                "plans_api_plan_repository_override_failed",
-                extra={"version_id": version_id},
-            )
-    db.upsert_plan_artifact(
-        version_id, "psi_overrides.json", json.dumps(data, ensure_ascii=False)
-    )
-
-
 def _get_locks(version_id: str) -> set[str]:
     repo_rows = repo_fetch_overrides(_PLAN_REPOSITORY, version_id, "aggregate")
     repo_rows += repo_fetch_overrides(_PLAN_REPOSITORY, version_id, "det")
@@ -279,90 +205,6 @@ def _get_locks(version_id: str) -> set[str]:
     return set(obj.get("locks") or [])
 
 
-def _save_locks(
-    version_id: str, locks: set[str], *, actor: str, note: str | None = None
-) -> None:
-    overrides: list[Dict[str, Any]] = []
-    events: list[Dict[str, Any]] = []
-    lock_keys = set(locks)
-    handled_new: set[str] = set()
-    for level in ("aggregate", "det"):
-        existing_rows = repo_fetch_overrides(_PLAN_REPOSITORY, version_id, level)
-        existing = {row.get("key_hash"): row for row in existing_rows}
-        for key_hash, row in existing.items():
-            is_locked = key_hash in lock_keys
-            payload = row.get("payload") or {}
-            payload_text = json.dumps(payload, ensure_ascii=False)
-            overrides.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "payload_json": payload_text,
-                    "lock_flag": is_locked,
-                    "locked_by": row.get("locked_by") if is_locked else None,
-                    "weight": row.get("weight"),
-                    "author": row.get("author"),
-                    "source": row.get("source") or "psi",
-                }
-            )
-            events.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "event_type": "lock" if is_locked else "unlock",
-                    "payload_json": json.dumps({"lock": is_locked}, ensure_ascii=False),
-                    "actor": actor,
-                    "notes": note,
-                }
-            )
-            handled_new.add(key_hash)
-        for key_hash in lock_keys:
-            if key_hash in handled_new:
-                continue
-            if _overlay_level_from_key(key_hash) != level:
-                continue
-            overrides.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "payload_json": "{}",
-                    "lock_flag": True,
-                    "locked_by": None,
-                    "source": "psi",
-                }
-            )
-            events.append(
-                {
-                    "version_id": version_id,
-                    "level": level,
-                    "key_hash": key_hash,
-                    "event_type": "lock",
-                    "payload_json": json.dumps({"lock": True}, ensure_ascii=False),
-                    "actor": actor,
-                    "notes": note,
-                }
-            )
-            handled_new.add(key_hash)
-    if overrides:
-        try:
-            _PLAN_REPOSITORY.upsert_overrides(
-                version_id, overrides=overrides, events=events
-            )
-        except PlanRepositoryError:
-            logging.exception(
-                "plans_api_plan_repository_lock_failed",
-                extra={"version_id": version_id},
-            )
-    db.upsert_plan_artifact(
-        version_id,
-        "psi_locks.json",
-        json.dumps({"locks": sorted(list(locks))}, ensure_ascii=False),
-    )
-
-
 def _record_audit_event(
     version_id: str,
     event_type: str,
@@ -468,6 +310,220 @@ def _save_weights(
             )
 
 
+class _PsiOverlayStore:
+    """1リクエスト分の PSI オーバレイ/ロック/重み（key_hash で索引）。
+
+    plan_overrides は必要になったキーだけを読み（ロック行は最初にまとめて読む）、
+    変更したキーだけを flush でまとめて書き込む。PlanRepository に行が無い旧版は
+    psi_overrides.json / psi_locks.json から読み、最初の flush で全件を移す。
+    """
+
+    def __init__(self, version_id: str) -> None:
+        self.version_id = version_id
+        self._rows: Dict[str, Dict[str, Dict[str, Any]]] = {
+            "aggregate": {},
+            "det": {},
+        }
+        # level ごとに読込み済みのキー（None は全件読込み済み）
+        self._loaded: Dict[str, Optional[set[str]]] = {"aggregate": set(), "det": set()}
+        self._dirty: set[tuple[str, str]] = set()
+        self._events: list[Dict[str, Any]] = []
+        self.overlay_changed = False
+        self.locks_changed = False
+        if _PLAN_REPOSITORY.has_plan_overrides(version_id, ("aggregate", "det")):
+            for level in ("aggregate", "det"):
+                self._merge(
+                    level,
+                    repo_fetch_overrides(
+                        _PLAN_REPOSITORY, version_id, level, locked=True
+                    ),
+                )
+            return
+        self._loaded = {"aggregate": None, "det": None}
+        obj = db.get_plan_artifact(version_id, "psi_overrides.json") or {}
+        for level in ("aggregate", "det"):
+            for entry in list(obj.get(level) or []):
+                key_hash = _overlay_entry_key(level, entry)
+                self._rows[level][key_hash] = {"payload": dict(entry)}
+                self._dirty.add((level, key_hash))
+        obj = db.get_plan_artifact(version_id, "psi_locks.json") or {}
+        for key_hash in obj.get("locks") or []:
+            level = _overlay_level_from_key(str(key_hash))
+            if level in self._rows:
+                row = self._rows[level].setdefault(str(key_hash), {"payload": {}})
+                row["lock_flag"] = True
+                self._dirty.add((level, str(key_hash)))
+
+    def _merge(self, level: str, rows: list[Dict[str, Any]]) -> None:
+        for row in rows:
+            key_hash = row.get("key_hash")
+            # このリクエストで変更済みのキーは読み直した値で上書きしない
+            if key_hash and str(key_hash) not in self._rows[level]:
+                self._rows[level][str(key_hash)] = dict(row)
+
+    def load(self, level: str, key_hashes: Optional[Iterable[str]] = None) -> None:
+        """level のオーバーライドを読む（key_hashes 指定時はそのキーだけ）。"""
+        loaded = self._loaded[level]
+        if loaded is None:
+            return
+        if key_hashes is None:
+            self._merge(
+                level, repo_fetch_overrides(_PLAN_REPOSITORY, self.version_id, level)
+            )
+            self._loaded[level] = None
+            return
+        missing = [k for k in dict.fromkeys(key_hashes) if k not in loaded]
+        if missing:
+            self._merge(
+                level,
+                repo_fetch_overrides(
+                    _PLAN_REPOSITORY, self.version_id, level, key_hashes=missing
+                ),
+            )
+            loaded.update(missing)
+
+    def payloads(
+        self, level: str, key_hashes: Optional[Iterable[str]] = None
+    ) -> list[Dict[str, Any]]:
+        """level のオーバレイ（ロック・重みだけの行は除く）。
+
+        key_hashes を渡すとそのキーの分だけを読んで返す。
+        """
+        if key_hashes is not None:
+            keys = list(key_hashes)
+            self.load(level, keys)
+            rows = [self._rows[level].get(k) or {} for k in dict.fromkeys(keys)]
+        else:
+            self.load(level)
+            rows = list(self._rows[level].values())
+        return [dict(row["payload"]) for row in rows if row.get("payload")]
+
+    def payload(self, level: str, key_hash: str) -> Dict[str, Any]:
+        self.load(level, [key_hash])
+        row = self._rows[level].get(key_hash) or {}
+        return dict(row.get("payload") or {})
+
+    def set_payload(self, level: str, key_hash: str, payload: Dict[str, Any]) -> None:
+        self.load(level, [key_hash])
+        row = self._rows[level].setdefault(key_hash, {"payload": {}})
+        if row.get("payload") == payload:
+            return
+        row["payload"] = dict(payload)
+        self._mark(level, key_hash, "edit", payload)
+        self.overlay_changed = True
+
+    def locks(self) -> set[str]:
+        return {
+            key_hash
+            for rows in self._rows.values()
+            for key_hash, row in rows.items()
+            if row.get("lock_flag")
+        }
+
+    def set_locked(self, key_hash: str, locked: bool) -> None:
+        level = _overlay_level_from_key(key_hash)
+        if level not in self._rows:
+            return
+        self.load(level, [key_hash])
+        row = self._rows[level].get(key_hash)
+        if row is None:
+            if not locked:
+                return
+            row = self._rows[level][key_hash] = {"payload": {}}
+        if bool(row.get("lock_flag")) == locked:
+            return
+        row["lock_flag"] = locked
+        if not locked:
+            row["locked_by"] = None
+        self._mark(level, key_hash, "lock" if locked else "unlock", {"lock": locked})
+        self.locks_changed = True
+
+    def weights(self) -> dict[str, float]:
+        weights: dict[str, float] = {}
+        for level, rows in self._rows.items():
+            self.load(level)
+            for key_hash, row in rows.items():
+                try:
+                    if row.get("weight") is not None:
+                        weights[key_hash] = float(row["weight"])
+                except Exception:
+                    continue
+        return weights
+
+    def overlay(self) -> Dict[str, Any]:
+        return {level: self.payloads(level) for level in ("aggregate", "det")}
+
+    def _mark(
+        self, level: str, key_hash: str, event_type: str, payload: Dict[str, Any]
+    ) -> None:
+        self._dirty.add((level, key_hash))
+        self._events.append(
+            {
+                "version_id": self.version_id,
+                "level": level,
+                "key_hash": key_hash,
+                "event_type": event_type,
+                "payload_json": json.dumps(payload, ensure_ascii=False),
+            }
+        )
+
+    def flush(self, *, actor: str, note: str | None = None) -> int:
+        """変更したキーのオーバーライドとイベントを1回で書き込み、件数を返す。"""
+        overrides: list[Dict[str, Any]] = []
+        for level, key_hash in sorted(self._dirty):
+            row = self._rows[level][key_hash]
+            overrides.append(
+                {
+                    "version_id": self.version_id,
+                    "level": level,
+                    "key_hash": key_hash,
+                    "payload_json": json.dumps(
+                        row.get("payload") or {}, ensure_ascii=False
+                    ),
+                    "lock_flag": bool(row.get("lock_flag")),
+                    "locked_by": row.get("locked_by"),
+                    "weight": row.get("weight"),
+                    "author": row.get("author"),
+                    "source": row.get("source") or "psi",
+                }
+            )
+        events = [{**e, "actor": actor, "notes": note} for e in self._events]
+        if overrides:
+            try:
+                _PLAN_REPOSITORY.upsert_overrides(
+                    self.version_id, overrides=overrides, events=events
+                )
+            except PlanRepositoryError:
+                logging.exception(
+                    "plans_api_plan_repository_override_failed",
+                    extra={"version_id": self.version_id},
+                )
+        self._dirty.clear()
+        self._events.clear()
+        return len(overrides)
+
+    def write_mirror(self) -> None:
+        """変更のあった psi_overrides.json / psi_locks.json 成果物を書き直す。"""
+        if self.overlay_changed:
+            db.upsert_plan_artifact(
+                self.version_id,
+                "psi_overrides.json",
+                json.dumps(self.overlay(), ensure_ascii=False),
+            )
+        if self.locks_changed:
+            db.upsert_plan_artifact(
+                self.version_id,
+                "psi_locks.json",
+                json.dumps({"locks": sorted(self.locks())}, ensure_ascii=False),
+            )
+
+
+def _overlay_entry_key(level: str, entry: Dict[str, Any]) -> str:
+    if level == "aggregate":
+        return _psi_overlay_key_agg(entry.get("period"), entry.get("family"))
+    return _psi_overlay_key_det(entry.get("week"), entry.get("sku"))
+
+
 def _apply_overlay(
     level: str, base_rows: list[Dict[str, Any]], overlay_rows: list[Dict[str, Any]]
 ):
@@ -652,6 +708,7 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
 
         input_dir = str(temp_input_dir)
         calendar_args = _calendar_cli_args(input_dir=input_dir, fallback_weeks=4)
+        pipeline = PlanningPipeline()
         canonical_snapshot_path = artifact_paths.get("canonical_snapshot.json")
         planning_inputs_path = artifact_paths.get("planning_inputs.json")
 
@@ -668,7 +725,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                 round_mode,
                 "--version-id",
                 version_id,
-            ]
+            ],
+            pipeline,
         )
         logging.info("Finished script execution: plan_aggregate.py")
 
@@ -688,7 +746,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                 "--version-id",
                 version_id,
                 *calendar_args,
-            ]
+            ],
+            pipeline,
         )
         logging.info("Finished script execution: allocate.py")
 
@@ -709,7 +768,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                     "--version-id",
                     version_id,
                     *calendar_args,
-                ]
+                ],
+                pipeline,
             )
             logging.info("Finished script execution: mrp.py")
 
@@ -747,7 +807,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                     "--version-id",
                     version_id,
                     *calendar_args,
-                ]
+                ],
+                pipeline,
             )
             logging.info("Finished script execution: reconcile.py")
 
@@ -781,7 +842,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                         else ["--tol-rel", "1e-6"]
                     ),
                     *calendar_args,
-                ]
+                ],
+                pipeline,
             )
             logging.info("Finished script execution: reconcile_levels.py")
         # optional: anchor/adjusted flow
@@ -822,7 +884,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                     "--version-id",
                     version_id,
                     *calendar_args,
-                ]
+                ],
+                pipeline,
             )
             logging.info("Finished script execution: anchor_adjust.py")
 
@@ -856,7 +919,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                         else ["--tol-rel", "1e-6"]
                     ),
                     *calendar_args,
-                ]
+                ],
+                pipeline,
             )
             logging.info("Finished script execution: reconcile_levels.py (adjusted)")
 
@@ -876,7 +940,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                         "--version-id",
                         version_id,
                         *calendar_args,
-                    ]
+                    ],
+                    pipeline,
                 )
                 logging.info("Finished script execution: mrp.py (adjusted)")
 
@@ -921,7 +986,8 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                         "--version-id",
                         version_id,
                         *calendar_args,
-                    ]
+                    ],
+                    pipeline,
                 )
                 logging.info("Finished script execution: reconcile.py (adjusted)")
 
@@ -1034,11 +1100,11 @@ def post_plans_create_and_execute(body: Dict[str, Any] = Body(...)):
                         artifacts.append(name)
         else:
             artifacts = []
-        aggregate_obj = _load_json(out_dir / "aggregate.json")
-        detail_obj = _load_json(out_dir / "sku_week.json")
-        plan_final_obj = _load_json(out_dir / "plan_final_adjusted.json") or _load_json(
-            out_dir / "plan_final.json"
-        )
+        aggregate_obj = pipeline.load_json(out_dir / "aggregate.json")
+        detail_obj = pipeline.load_json(out_dir / "sku_week.json")
+        plan_final_obj = pipeline.load_json(
+            out_dir / "plan_final_adjusted.json"
+        ) or pipeline.load_json(out_dir / "plan_final.json")
         if plan_final_obj:
             detail_obj, aggregate_obj = apply_plan_final_receipts(
                 detail_obj, aggregate_obj, plan_final_obj
@@ -1177,52 +1243,114 @@ def get_plan_psi(
     q: Optional[str] = Query(None),
     limit: int = Query(200),
     offset: int = Query(0),
+    item: Optional[List[str]] = Query(None),
+    bucket: Optional[List[str]] = Query(None),
 ):
     level = level if level in ("aggregate", "det") else "aggregate"
+    start = max(0, int(offset))
+    size = max(1, int(limit))
+    search = q.strip() if isinstance(q, str) and q.strip() else None
+    item = item if isinstance(item, list) else None
+    bucket = bucket if isinstance(bucket, list) else None
+    # 絞込み・検索・ページングは plan_series 側で行い、オーバレイはページ分だけ重ねる
+    rows, total = repo_fetch_psi_page(
+        _PLAN_REPOSITORY,
+        version_id,
+        level,
+        item_keys=item or None,
+        bucket_keys=bucket or None,
+        search=search,
+        limit=size,
+        offset=start,
+    )
+    if not total:
+        _, stored = _PLAN_REPOSITORY.fetch_plan_series_page(version_id, level, limit=0)
+        if not stored:
+            return _get_plan_psi_from_artifacts(
+                version_id, level, search, start, size, item, bucket
+            )
+    locks = _get_locks(version_id)
+    rows = _apply_overlay(level, rows, _get_page_overlay(version_id, level, rows))
+    return {
+        "level": level,
+        "total": total,
+        "rows": rows,
+        "locks": sorted(list(locks)),
+    }
+
+
+def _get_page_overlay(
+    version_id: str, level: str, rows: list[Dict[str, Any]]
+) -> list[Dict[str, Any]]:
+    """rows のキーに当たるオーバレイだけを返す（無ければ成果物へフォールバック）。"""
     if level == "aggregate":
-        base_rows = repo_fetch_aggregate_rows(_PLAN_REPOSITORY, version_id)
+        keys = [_psi_overlay_key_agg(r.get("period"), r.get("family")) for r in rows]
     else:
-        base_rows = repo_fetch_detail_rows(_PLAN_REPOSITORY, version_id)
+        keys = [_psi_overlay_key_det(r.get("week"), r.get("sku")) for r in rows]
+    repo_rows = repo_fetch_overrides(
+        _PLAN_REPOSITORY, version_id, level, key_hashes=keys
+    )
+    if repo_rows:
+        return [dict(r.get("payload") or {}) for r in repo_rows]
+    if _PLAN_REPOSITORY.has_plan_overrides(version_id, ("aggregate", "det")):
+        return []
+    return _get_overlay(version_id).get(level) or []
 
-    if not base_rows:
-        if level == "aggregate":
-            agg = db.get_plan_artifact(version_id, "aggregate.json") or {}
-            base_rows = [
-                {
-                    "period": r.get("period"),
-                    "family": r.get("family"),
-                    "demand": r.get("demand"),
-                    "supply": r.get("supply"),
-                    "backlog": r.get("backlog"),
-                }
-                for r in list(agg.get("rows") or [])
-            ]
-        else:
-            det = db.get_plan_artifact(version_id, "sku_week.json") or {}
-            base_rows = [
-                {
-                    "week": r.get("week"),
-                    "sku": r.get("sku"),
-                    "demand": r.get("demand"),
-                    "supply_plan": r.get("supply_plan"),
-                    "backlog": r.get("backlog"),
-                    "on_hand_start": r.get("on_hand_start"),
-                    "on_hand_end": r.get("on_hand_end"),
-                }
-                for r in list(det.get("rows") or [])
-            ]
+
+def _get_plan_psi_from_artifacts(
+    version_id: str,
+    level: str,
+    search: Optional[str],
+    start: int,
+    size: int,
+    item: Optional[List[str]],
+    bucket: Optional[List[str]],
+) -> Dict[str, Any]:
+    """plan_series に行が無い版は成果物（aggregate.json / sku_week.json）から返す。"""
+    if level == "aggregate":
+        agg = db.get_plan_artifact(version_id, "aggregate.json") or {}
+        base_rows = [
+            {
+                "period": r.get("period"),
+                "family": r.get("family"),
+                "demand": r.get("demand"),
+                "supply": r.get("supply"),
+                "backlog": r.get("backlog"),
+            }
+            for r in list(agg.get("rows") or [])
+        ]
+        item_field, bucket_field = "family", "period"
+    else:
+        det = db.get_plan_artifact(version_id, "sku_week.json") or {}
+        base_rows = [
+            {
+                "week": r.get("week"),
+                "sku": r.get("sku"),
+                "demand": r.get("demand"),
+                "supply_plan": r.get("supply_plan"),
+                "backlog": r.get("backlog"),
+                "on_hand_start": r.get("on_hand_start"),
+                "on_hand_end": r.get("on_hand_end"),
+            }
+            for r in list(det.get("rows") or [])
+        ]
+        item_field, bucket_field = "sku", "week"
     overlay = _get_overlay(version_id)
     locks = _get_locks(version_id)
     rows = _apply_overlay(level, base_rows, overlay.get(level) or [])
     # フィルタ
-    if isinstance(q, str) and q.strip():
-        s = q.strip().lower()
+    if item:
+        items = set(item)
+        rows = [r for r in rows if str(r.get(item_field)) in items]
+    if bucket:
+        buckets = set(bucket)
+        rows = [r for r in rows if str(r.get(bucket_field)) in buckets]
+    if search:
+        s = search.lower()
         rows = [r for r in rows if s in json.dumps(r, ensure_ascii=False).lower()]
     total = len(rows)
     # ページング
-    start = max(0, int(offset))
-    end = max(start, start + max(1, int(limit)))
-    rows = rows[start:end]
+    rows = rows[start : start + size]
     return {
         "level": level,
         "total": total,
@@ -1233,7 +1361,10 @@ def get_plan_psi(
 
 @app.patch("/plans/{version_id}/psi")
 def patch_plan_psi(
-    version_id: str, request: Request, body: Dict[str, Any] = Body(default={})
+    version_id: str,
+    request: Request,
+    body: Dict[str, Any] = Body(default={}),
+    background_tasks: BackgroundTasks = None,
 ):  # noqa: C901
     if not _has_edit(request):
         return JSONResponse(status_code=401, content={"detail": "unauthorized"})
@@ -1242,8 +1373,34 @@ def patch_plan_psi(
     lock_mode = body.get("lock")  # 'lock'|'unlock'|'toggle'|None
     if level not in ("aggregate", "det"):
         return JSONResponse(status_code=400, content={"detail": "invalid level"})
-    overlay = _get_overlay(version_id)
-    locks = _get_locks(version_id)
+    recalc_mrp = level == "det" and bool(body.get("recalc_mrp") or False)
+    config_version_id = None
+    if recalc_mrp:
+        ver = db.get_plan_version(version_id) or {}
+        config_version_id = ver.get("config_version_id")
+        if config_version_id is None:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": "plan does not have canonical config version"},
+            )
+        mrp_stats = _PLAN_REPOSITORY.fetch_series_stats([version_id])
+        mrp_in_repository = bool((mrp_stats.get(version_id) or {}).get("mrp"))
+        mrp_base = db.get_plan_artifact(version_id, "mrp.json")
+        if not mrp_in_repository and not mrp_base:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": "plan has no mrp result to update"},
+            )
+    store = _PsiOverlayStore(version_id)
+    locks = store.locks()
+    artifacts: Dict[str, Dict[str, Any]] = {}
+
+    def _artifact_rows(name: str) -> list[Dict[str, Any]]:
+        # 成果物はリクエスト内で1回だけ読む
+        if name not in artifacts:
+            artifacts[name] = db.get_plan_artifact(version_id, name) or {}
+        return list(artifacts[name].get("rows") or [])
+
     # index overlay by key
     if level == "aggregate":
 
@@ -1255,9 +1412,6 @@ def patch_plan_psi(
         def mk(row):
             return _psi_overlay_key_det(row.get("week"), row.get("sku"))
 
-    omap: Dict[str, Dict[str, Any]] = {}
-    for r in overlay.get(level) or []:
-        omap[mk(r)] = dict(r)
     updated = 0
     skipped: list[str] = []
     affected_keys: set[str] = set()
@@ -1292,6 +1446,8 @@ def patch_plan_psi(
             return val
         return val
 
+    # 編集するキーのオーバーライドだけをまとめて読む
+    store.load(level, [k for k in (mk(e.get("key") or {}) for e in edits) if k])
     for e in edits:
         key = mk(e.get("key") or {})
         if not key:
@@ -1301,7 +1457,7 @@ def patch_plan_psi(
         if key in locks:
             skipped.append(key)
             continue
-        row = omap.get(key) or {}
+        row = store.payload(level, key)
         # key項目を保持
         for k in ("period", "family", "week", "sku"):
             if k in (e.get("key") or {}):
@@ -1317,17 +1473,9 @@ def patch_plan_psi(
                     row[fn] = float(val)
                 except Exception:
                     row[fn] = val
-        omap[key] = row
+        store.set_payload(level, key, row)
         updated += 1
-    # rebuild overlay list
-    new_rows: list[Dict[str, Any]] = []
-    for v in omap.values():
-        # キー以外が空なら除外
-        payload = {k: v.get(k) for k in v.keys()}
-        new_rows.append(payload)
-    overlay[level] = new_rows
     actor = _request_actor(request)
-    _save_overlay(version_id, overlay, actor=actor, note=note)
     # lock operation
     explicit_lock_keys = set()
     for lk in list(body.get("lock_keys") or []):
@@ -1341,146 +1489,20 @@ def patch_plan_psi(
         keys_to_apply = set(affected_keys) | set(explicit_lock_keys)
         for k in keys_to_apply:
             if lock_mode == "lock":
-                locks.add(k)
+                store.set_locked(k, True)
             elif lock_mode == "unlock":
-                if k in locks:
-                    locks.discard(k)
+                store.set_locked(k, False)
             else:  # toggle
-                if k in locks:
-                    locks.discard(k)
-                else:
-                    locks.add(k)
-        _save_locks(version_id, locks, actor=actor, note=note)
+                store.set_locked(k, k not in locks)
+        locks = store.locks()
     # 自動集計（Detail→Aggregate, 編集対象のみロールアップ）
     try:
         if level == "det" and updated > 0 and not body.get("no_auto"):
-            agg_base = db.get_plan_artifact(version_id, "aggregate.json") or {}
-            agg_rows = list(agg_base.get("rows") or [])
+            agg_rows = _artifact_rows("aggregate.json")
             if agg_rows:
-                det_base = db.get_plan_artifact(version_id, "sku_week.json") or {}
-                det_rows = list(det_base.get("rows") or [])
+                det_rows = _artifact_rows("sku_week.json")
                 if det_rows:
-                    overlay_full = _get_overlay(version_id)
-                    det_rows_applied = _apply_overlay(
-                        "det", det_rows, overlay_full.get("det") or []
-                    )
-                    agg_overlay_rows = overlay_full.get("aggregate") or []
-                    agg_key_candidates: set[tuple[str, str]] = set()
-                    for row in agg_rows + agg_overlay_rows:
-                        per = row.get("period")
-                        fam = row.get("family")
-                        if per is None or fam is None:
-                            continue
-                        agg_key_candidates.add((str(per), str(fam)))
-                    if agg_key_candidates:
-                        det_to_agg: Dict[str, tuple[str, str]] = {}
-                        for row in det_rows_applied:
-                            fam = row.get("family")
-                            if fam is None:
-                                continue
-                            fam_s = str(fam)
-                            candidates: list[str] = []
-                            per = row.get("period")
-                            if per is not None:
-                                candidates.append(str(per))
-                            wk = row.get("week")
-                            if wk:
-                                wk_s = str(wk)
-                                candidates.append(wk_s)
-                                m = _week_to_month(wk_s)
-                                if m:
-                                    candidates.append(m)
-                            seen: set[str] = set()
-                            for cand in candidates:
-                                if cand in seen:
-                                    continue
-                                seen.add(cand)
-                                key = (cand, fam_s)
-                                if key in agg_key_candidates:
-                                    det_key = _psi_overlay_key_det(
-                                        row.get("week"), row.get("sku")
-                                    )
-                                    if det_key:
-                                        det_to_agg[det_key] = key
-                                    break
-                        if det_to_agg:
-                            target_aggs: set[tuple[str, str]] = set()
-                            for e in edits:
-                                key_d = e.get("key") or {}
-                                det_key = _psi_overlay_key_det(
-                                    key_d.get("week"), key_d.get("sku")
-                                )
-                                if det_key and det_key in det_to_agg:
-                                    target_aggs.add(det_to_agg[det_key])
-                            if target_aggs:
-                                agg_sums: Dict[tuple[str, str], Dict[str, float]] = (
-                                    defaultdict(dict)
-                                )
-                                rollup_map = {
-                                    "demand": ("demand",),
-                                    "supply": ("supply_plan", "supply"),
-                                    "backlog": ("backlog",),
-                                }
-                                for row in det_rows_applied:
-                                    det_key = _psi_overlay_key_det(
-                                        row.get("week"), row.get("sku")
-                                    )
-                                    if not det_key:
-                                        continue
-                                    agg_key = det_to_agg.get(det_key)
-                                    if not agg_key or agg_key not in target_aggs:
-                                        continue
-                                    for agg_field, src_fields in rollup_map.items():
-                                        val = None
-                                        for src in src_fields:
-                                            if row.get(src) is not None:
-                                                val = row.get(src)
-                                                break
-                                        if val is None:
-                                            continue
-                                        try:
-                                            cur = agg_sums[agg_key].get(agg_field, 0.0)
-                                            agg_sums[agg_key][agg_field] = cur + float(
-                                                val
-                                            )
-                                        except Exception:
-                                            continue
-                                if agg_sums:
-                                    locks = _get_locks(version_id)
-                                    agg_overlay_map: Dict[str, Dict[str, Any]] = {}
-                                    for row in agg_overlay_rows:
-                                        key = _psi_overlay_key_agg(
-                                            row.get("period"), row.get("family")
-                                        )
-                                        if key:
-                                            agg_overlay_map[key] = dict(row)
-                                    for (period, family), fields in agg_sums.items():
-                                        krow = _psi_overlay_key_agg(period, family)
-                                        if not krow or krow in locks:
-                                            continue
-                                        row = agg_overlay_map.get(krow) or {
-                                            "period": period,
-                                            "family": family,
-                                        }
-                                        updated_any = False
-                                        for agg_field, total in fields.items():
-                                            kcell = f"{krow}:field={agg_field}"
-                                            if kcell in locks:
-                                                continue
-                                            row[agg_field] = total
-                                            updated_any = True
-                                        if updated_any:
-                                            agg_overlay_map[krow] = row
-                                    if agg_overlay_map:
-                                        overlay_full["aggregate"] = list(
-                                            agg_overlay_map.values()
-                                        )
-                                        _save_overlay(
-                                            version_id,
-                                            overlay_full,
-                                            actor=actor,
-                                            note=note,
-                                        )
+                    _rollup_detail_edits(store, edits, det_rows, agg_rows)
     except Exception:
         pass
     # 自動分配（Aggregate→Detail, 比例配分・セル/行ロック尊重）
@@ -1493,21 +1515,10 @@ def patch_plan_psi(
                 "backlog": "backlog",
             }
             # base det rows
-            det = db.get_plan_artifact(version_id, "sku_week.json") or {}
-            det_rows = list(det.get("rows") or [])
-            # current det overlay map
-            det_overlay = _get_overlay(version_id).get("det") or []
+            det_rows = _artifact_rows("sku_week.json")
+            # 分配で書き換えた det オーバレイ
             det_map: Dict[str, Dict[str, Any]] = {}
-            for r in det_overlay:
-                k = _psi_overlay_key_det(r.get("week"), r.get("sku"))
-                det_map[k] = dict(r)
-            # locks (row/cell)
-            locks = _get_locks(version_id)
-            # rebuild aggregate overlay index
-            agg_overlay = _get_overlay(version_id).get("aggregate") or []
-            agg_idx: Dict[tuple, Dict[str, Any]] = {}
-            for r in agg_overlay:
-                agg_idx[(r.get("period"), r.get("family"))] = r
+            weights: Optional[dict[str, float]] = None
             # For each affected key, distribute edited fields
             for e in edits:
                 keyd = e.get("key") or {}
@@ -1546,6 +1557,10 @@ def patch_plan_psi(
                         idxs.append(r)
                 if not idxs:
                     continue
+                store.load(
+                    "det",
+                    [_psi_overlay_key_det(r.get("week"), r.get("sku")) for r in idxs],
+                )
                 # current totals
                 cur_tot: Dict[str, float] = {}
                 for fn_d in targets.keys():
@@ -1568,7 +1583,9 @@ def patch_plan_psi(
                         base_vals = [1.0] * len(idxs)
                     else:
                         if weight_mode == "weights":
-                            wm = _get_weights(version_id)
+                            if weights is None:
+                                weights = store.weights()
+                            wm = weights
                             for r in idxs:
                                 k = _psi_overlay_key_det(r.get("week"), r.get("sku"))
                                 base_vals.append(float(wm.get(k, 0.0)))
@@ -1609,29 +1626,297 @@ def patch_plan_psi(
                     for i in unlocked_idx:
                         r = idxs[i]
                         k = _psi_overlay_key_det(r.get("week"), r.get("sku"))
-                        row = det_map.get(k) or {
-                            "week": r.get("week"),
-                            "sku": r.get("sku"),
-                        }
+                        row = (
+                            det_map.get(k)
+                            or store.payload("det", k)
+                            or {"week": r.get("week"), "sku": r.get("sku")}
+                        )
                         row[fn_d] = new_vals[i] * scale
                         det_map[k] = row
             # save det overlay (with optional rounding)
-            det_rows_new = list(det_map.values())
-            # apply rounding per field if configured
-            if isinstance(round_map, dict) and det_rows_new:
-                for r in det_rows_new:
+            for k, r in det_map.items():
+                # apply rounding per field if configured
+                if isinstance(round_map, dict):
                     for f, cfg in round_map.items():
                         if f in r and r.get(f) is not None:
                             try:
                                 r[f] = _round_value(float(r.get(f)), cfg)
                             except Exception:
                                 pass
-            ov = _get_overlay(version_id)
-            ov["det"] = det_rows_new
-            _save_overlay(version_id, ov, actor=actor, note=note)
+                store.set_payload("det", k, r)
     except Exception:
         pass
-    return {"updated": updated, "skipped": skipped, "locked": sorted(list(locks))}
+    # 変更したキーだけを書き込み、成果物のミラーはレスポンス後に書く
+    store.flush(actor=actor, note=note)
+    if background_tasks is not None:
+        background_tasks.add_task(store.write_mirror)
+    else:
+        store.write_mirror()
+    result: Dict[str, Any] = {
+        "updated": updated,
+        "skipped": skipped,
+        "locked": sorted(list(locks)),
+    }
+    if recalc_mrp and updated > 0:
+        changed = [
+            e.get("key") or {}
+            for e in edits
+            if mk(e.get("key") or {}) and mk(e.get("key") or {}) not in skipped
+        ]
+        try:
+            result["mrp"] = _recalc_mrp_net_change(
+                version_id,
+                int(config_version_id),
+                changed,
+                body,
+                base=mrp_base,
+                use_repository=mrp_in_repository,
+                det_rows=_artifact_rows("sku_week.json"),
+                store=store,
+                background_tasks=background_tasks,
+            )
+        except (RuntimeError, OSError, subprocess.CalledProcessError) as exc:
+            # 編集は flush 済みなので、保存できたことと再計算の失敗を分けて返す
+            logging.error(
+                "MRP net-change recalc failed",
+                extra={
+                    "version_id": version_id,
+                    "exception": str(exc),
+                    "stderr": getattr(exc, "stderr", None),
+                },
+            )
+            result["mrp"] = {
+                "error": str(exc),
+                "stderr": getattr(exc, "stderr", None) or "",
+            }
+    return result
+
+
+def _rollup_detail_edits(
+    store: _PsiOverlayStore,
+    edits: list[Dict[str, Any]],
+    det_rows: list[Dict[str, Any]],
+    agg_rows: list[Dict[str, Any]],
+) -> None:
+    """編集した det 行の family×期間だけを aggregate オーバレイへ集計し直す。
+
+    集計に使うのは編集行と同じ family の det 行と、そのキーのオーバーライドだけ
+    （他の family は結果に影響しない）。
+    """
+    edited = {
+        _psi_overlay_key_det(k.get("week"), k.get("sku"))
+        for k in (e.get("key") or {} for e in edits)
+    }
+    families = {
+        str(r.get("family"))
+        for r in det_rows
+        if r.get("family") is not None
+        and _psi_overlay_key_det(r.get("week"), r.get("sku")) in edited
+    }
+    if not families:
+        return
+    family_rows = [r for r in det_rows if str(r.get("family")) in families]
+    det_rows_applied = _apply_overlay(
+        "det",
+        family_rows,
+        store.payloads(
+            "det",
+            [_psi_overlay_key_det(r.get("week"), r.get("sku")) for r in family_rows],
+        ),
+    )
+    family_aggs = [r for r in agg_rows if str(r.get("family")) in families]
+    agg_overlay = store.payloads(
+        "aggregate",
+        [_psi_overlay_key_agg(r.get("period"), r.get("family")) for r in family_aggs],
+    )
+    agg_key_candidates: set[tuple[str, str]] = set()
+    for row in family_aggs + agg_overlay:
+        per = row.get("period")
+        fam = row.get("family")
+        if per is None or fam is None or str(fam) not in families:
+            continue
+        agg_key_candidates.add((str(per), str(fam)))
+    det_to_agg: Dict[str, tuple[str, str]] = {}
+    for row in det_rows_applied:
+        fam_s = str(row.get("family"))
+        candidates: list[str] = []
+        per = row.get("period")
+        if per is not None:
+            candidates.append(str(per))
+        wk = row.get("week")
+        if wk:
+            wk_s = str(wk)
+            candidates.append(wk_s)
+            m = _week_to_month(wk_s)
+            if m:
+                candidates.append(m)
+        for cand in dict.fromkeys(candidates):
+            key = (cand, fam_s)
+            if key in agg_key_candidates:
+                det_to_agg[_psi_overlay_key_det(row.get("week"), row.get("sku"))] = key
+                break
+    target_aggs = {det_to_agg[k] for k in edited if k in det_to_agg}
+    if not target_aggs:
+        return
+    agg_sums: Dict[tuple[str, str], Dict[str, float]] = defaultdict(dict)
+    rollup_map = {
+        "demand": ("demand",),
+        "supply": ("supply_plan", "supply"),
+        "backlog": ("backlog",),
+    }
+    for row in det_rows_applied:
+        agg_key = det_to_agg.get(_psi_overlay_key_det(row.get("week"), row.get("sku")))
+        if not agg_key or agg_key not in target_aggs:
+            continue
+        for agg_field, src_fields in rollup_map.items():
+            val = None
+            for src in src_fields:
+                if row.get(src) is not None:
+                    val = row.get(src)
+                    break
+            if val is None:
+                continue
+            try:
+                cur = agg_sums[agg_key].get(agg_field, 0.0)
+                agg_sums[agg_key][agg_field] = cur + float(val)
+            except Exception:
+                continue
+    locks = store.locks()
+    for (period, family), fields in agg_sums.items():
+        krow = _psi_overlay_key_agg(period, family)
+        if krow in locks:
+            continue
+        row = store.payload("aggregate", krow) or {"period": period, "family": family}
+        updated_any = False
+        for agg_field, total in fields.items():
+            if f"{krow}:field={agg_field}" in locks:
+                continue
+            row[agg_field] = total
+            updated_any = True
+        if updated_any:
+            store.set_payload("aggregate", krow, row)
+
+
+def _net_change_input_dir(version_id: str, config_version_id: int) -> Path:
+    """正味変更の再計算に使う Canonical 入力フォルダ（設定版ごとに1回だけ作る）。
+
+    Canonical 設定は保存のたびに新しい版になるため、版IDが同じなら中身も同じ。
+    """
+    out_dir = Path(
+        BASE_DIR / "out" / f"psi_apply_{version_id}" / f"config_{config_version_id}"
+    )
+    ready = out_dir / ".ready"
+    if not ready.exists():
+        out_dir.mkdir(parents=True, exist_ok=True)
+        prepare_canonical_inputs(config_version_id, out_dir, write_artifacts=False)
+        ready.touch()
+    return out_dir / "canonical_inputs"
+
+
+def _store_mrp_net_change(
+    version_id: str, base: Dict[str, Any], payload: Dict[str, Any]
+) -> None:
+    """正味変更の結果を基準へ併合し、mrp.json 成果物を書き直す。"""
+    db.upsert_plan_artifact(
+        version_id,
+        "mrp.json",
+        json.dumps(merge_net_change(base, payload), ensure_ascii=False),
+    )
+
+
+def _recalc_mrp_net_change(
+    version_id: str,
+    config_version_id: int,
+    changed: list[Dict[str, Any]],
+    body: Dict[str, Any],
+    *,
+    base: Optional[Dict[str, Any]],
+    use_repository: bool,
+    det_rows: list[Dict[str, Any]],
+    store: _PsiOverlayStore,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> Dict[str, Any]:
+    """編集された SKU とその BOM 子孫だけ MRP を再計算する。
+
+    det_rows は sku_week 成果物の行。基準は mrp.json 成果物（無ければ PlanRepository の
+    mrp 行）。LT 単位・BOM 展開・週の並びは基準を作った設定（mrp.json の
+    inputs_summary）に揃える。BOM から需要の要る品目を先に決め、その品目の行と
+    オーバレイだけを pipeline.store 経由で mrp ステージへ渡す。再計算した品目の行で
+    PlanRepository の mrp 行（保存されている場合）を置き換え、mrp.json 成果物の
+    書き直しは background_tasks があればレスポンス後に行う。
+    """
+    out_dir = Path(BASE_DIR / "out" / f"psi_apply_{version_id}")
+    changes = [{"sku": k.get("sku"), "week": k.get("week")} for k in changed]
+    summary = (base or {}).get("inputs_summary") or {}
+    lt_unit = str(summary.get("lt_unit") or body.get("lt_unit") or "day")
+    bom_mode = summary.get("bom_mode") or body.get("bom_mode")
+    input_dir = _net_change_input_dir(version_id, config_version_id)
+    needed = net_change_demand_items(
+        str(input_dir / "bom.csv"),
+        {str(k["sku"]) for k in changes if k.get("sku")},
+        bom_mode=bom_mode or os.getenv("SCPLN_MRP_BOM_MODE", "single"),
+    )
+    if base and summary.get("weeks"):
+        # 基準の行は品目順で、各品目が全週を持つ。先頭品目の行が計画の週の並び
+        weeks = [
+            str(r.get("week"))
+            for r in (base.get("rows") or [])[: int(summary["weeks"])]
+        ]
+    else:
+        weeks = list(dict.fromkeys(str(r.get("week")) for r in det_rows))
+    scoped = [r for r in det_rows if str(r.get("sku")) in needed]
+    overlay = store.payloads(
+        "det", key_hashes=[_overlay_entry_key("det", r) for r in scoped]
+    )
+    pipeline = PlanningPipeline()
+    pipeline.store.put(
+        out_dir / "sku_week.json", {"rows": _apply_overlay("det", scoped, overlay)}
+    )
+    pipeline.store.put(
+        out_dir / "mrp_net_change.json", {"keys": changes, "weeks": weeks}
+    )
+    base_args: list[str] = []
+    if base:
+        pipeline.store.put(out_dir / "mrp_base.json", base)
+        base_args = ["--base", str(out_dir / "mrp_base.json")]
+    payload = _run_py(
+        [
+            "scripts/mrp.py",
+            "-i",
+            str(out_dir / "sku_week.json"),
+            "-I",
+            str(input_dir),
+            "-o",
+            str(out_dir / "mrp_net_change_result.json"),
+            "--lt-unit",
+            lt_unit,
+            *(["--bom-mode", str(bom_mode)] if bom_mode else []),
+            "--net-change",
+            str(out_dir / "mrp_net_change.json"),
+            *base_args,
+            "--storage",
+            "both" if use_repository else "files",
+            "--version-id",
+            version_id,
+            *_calendar_cli_args(input_dir=input_dir, fallback_weeks=4),
+        ],
+        pipeline,
+    )
+    if payload is None:
+        payload = json.loads(
+            (out_dir / "mrp_net_change_result.json").read_text(encoding="utf-8")
+        )
+    if base:
+        if background_tasks is not None:
+            background_tasks.add_task(_store_mrp_net_change, version_id, base, payload)
+        else:
+            _store_mrp_net_change(version_id, base, payload)
+    net_change = (payload.get("inputs_summary") or {}).get("net_change") or {}
+    return {
+        "changed": sorted({str(k["sku"]) for k in changes if k.get("sku")}),
+        "items": net_change.get("items"),
+        "rows": len(payload.get("rows") or []),
+    }
 
 
 @app.get("/plans/{version_id}/psi/events")
@@ -1684,6 +1969,9 @@ def post_plan_psi_reconcile(
     (out_dir / "sku_week.json").write_text(
         json.dumps({"rows": det_rows2}, ensure_ascii=False), encoding="utf-8"
     )
+    pipeline = PlanningPipeline()
+    pipeline.store.put(out_dir / "aggregate.json", {"rows": agg_rows2})
+    pipeline.store.put(out_dir / "sku_week.json", {"rows": det_rows2})
 
     calendar_args = _calendar_cli_args(input_dir=out_dir, fallback_weeks=4)
 
@@ -1703,7 +1991,8 @@ def post_plan_psi_reconcile(
             "--tol-rel",
             str(body.get("tol_rel") or "1e-6"),
             *calendar_args,
-        ]
+        ],
+        pipeline,
     )
     # 成果物を更新
     db.upsert_plan_artifact(
@@ -1772,7 +2061,8 @@ def post_plan_psi_reconcile(
                 "-I",
                 input_dir,
                 *calendar_args_adj,
-            ]
+            ],
+            pipeline,
         )
         _run_py(
             [
@@ -1802,7 +2092,8 @@ def post_plan_psi_reconcile(
                     else ["--tol-rel", "1e-6"]
                 ),
                 *calendar_args_adj,
-            ]
+            ],
+            pipeline,
         )
         db.upsert_plan_artifact(
             version_id,
@@ -1827,7 +2118,8 @@ def post_plan_psi_reconcile(
                     "--lt-unit",
                     lt_unit,
                     *calendar_args_adj,
-                ]
+                ],
+                pipeline,
             )
             _run_py(
                 [
@@ -1849,7 +2141,8 @@ def post_plan_psi_reconcile(
                     "--round",
                     round_mode,
                     *calendar_args_adj,
-                ]
+                ],
+                pipeline,
             )
             db.upsert_plan_artifact(
                 version_id,
@@ -1893,8 +2186,10 @@ def get_plan_psi_csv(
     q: Optional[str] = Query(None),
     limit: int = Query(10000),
     offset: int = Query(0),
+    item: Optional[List[str]] = Query(None),
+    bucket: Optional[List[str]] = Query(None),
 ):
-    data = get_plan_psi(version_id, level, q, limit, offset)
+    data = get_plan_psi(version_id, level, q, limit, offset, item, bucket)
     rows = data.get("rows") or []
     if data.get("level") == "aggregate":
         header = ["period", "family", "demand", "supply", "backlog"]
@@ -2324,6 +2619,9 @@ def post_plan_reconcile(
     (out_dir / "sku_week.json").write_text(
         json.dumps(det, ensure_ascii=False), encoding="utf-8"
     )
+    pipeline = PlanningPipeline()
+    pipeline.store.put(out_dir / "aggregate.json", agg)
+    pipeline.store.put(out_dir / "sku_week.json", det)
     cutover_date = body.get("cutover_date") or ver.get("cutover_date")
     recon_window_days = body.get("recon_window_days") or ver.get("recon_window_days")
     anchor_policy = body.get("anchor_policy")
@@ -2380,7 +2678,8 @@ def post_plan_reconcile(
                 if tol_rel is not None
                 else ["--tol-rel", "1e-6"]
             ),
-        ]
+        ],
+        pipeline,
     )
     db.upsert_plan_artifact(
         version_id,
@@ -2418,7 +2717,8 @@ def post_plan_reconcile(
                 *(["--tol-rel", str(tol_rel)] if (tol_rel is not None) else []),
                 "-I",
                 input_dir,
-            ]
+            ],
+            pipeline,
         )
         _run_py(
             [
@@ -2448,7 +2748,8 @@ def post_plan_reconcile(
                     if tol_rel is not None
                     else ["--tol-rel", "1e-6"]
                 ),
-            ]
+            ],
+            pipeline,
         )
         db.upsert_plan_artifact(
             version_id,
@@ -2475,7 +2776,8 @@ def post_plan_reconcile(
                     body.get("lt_unit") or "day",
                     "--weeks",
                     str(body.get("weeks") or 4),
-                ]
+                ],
+                pipeline,
             )
             _run_py(
                 [
@@ -2498,7 +2800,8 @@ def post_plan_reconcile(
                     *(["--anchor-policy", str(anchor_policy)] if anchor_policy else []),
                     "--round",
                     round_mode,
-                ]
+                ],
+                pipeline,
             )
             db.upsert_plan_artifact(
                 version_id,
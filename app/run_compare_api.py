@@ -4,6 +4,9 @@ import os
 import time
 from app import db
 from app.api import app
+from app.run_registry import RUN_META_FIELDS
+from app.run_registry_db import decode_cursor, encode_cursor
+from engine.cost_trace import trace_records
 from app.metrics import (
     RUNS_LIST_REQUESTS,
     RUNS_LIST_RETURNED,
@@ -82,10 +85,12 @@ def list_runs(
     plan_version_id: str | None = Query(None),
     scenario_name: str | None = Query(None),
     input_set_label: str | None = Query(None),
+    cursor: str | None = Query(None),
 ):
     """ラン一覧を返す。
     - detail=false（既定）: 軽量メタ+summary のみ
     - detail=true: フル（results/daily_profit_loss/cost_trace 含む）
+    - cursor: 前ページの next_cursor を渡すとキーセットで続きを返す（offset は無視）
     """
     scenario_name_ids = None
     if scenario_name:
@@ -96,8 +101,13 @@ def list_runs(
             if isinstance(row.get("name"), str) and name in row.get("name").lower()
         }
         if not scenario_name_ids:
-            empty = {"runs": [], "total": 0, "offset": offset, "limit": limit or 0}
-            return empty
+            return {
+                "runs": [],
+                "total": 0,
+                "offset": offset,
+                "limit": limit or 0,
+                "next_cursor": None,
+            }
     if isinstance(input_set_label, str):
         input_set_label = input_set_label.strip()
         if input_set_label == "":
@@ -119,8 +129,22 @@ def list_runs(
                 status_code=400,
                 detail="detail=true の場合は limit <= 10 にしてください",
             )
-        # DBバックエンドはSQLでページング
-        if hasattr(REGISTRY, "list_page"):
+    else:
+        if limit is None:
+            limit = 50
+        # DBバックエンド時は上限に応じたクリーンアップを実施（テスト・運用の安定化）
+        try:
+            import os as _os
+
+            max_rows = int(_os.getenv("RUNS_DB_MAX_ROWS", "0") or 0)
+            if max_rows > 0 and hasattr(REGISTRY, "cleanup_by_capacity"):
+                REGISTRY.cleanup_by_capacity(max_rows)
+        except Exception:
+            pass
+    detail_label = "true" if detail else "false"
+    if hasattr(REGISTRY, "list_page"):
+        # DBバックエンド: すべてのフィルタを SQL 述語に落とし、1ページ分だけ読む
+        try:
             resp = REGISTRY.list_page(
                 offset=offset,
                 limit=limit,
@@ -129,189 +153,36 @@ def list_runs(
                 schema_version=schema_version,
                 config_id=config_id,
                 scenario_id=scenario_id,
-                detail=True,
+                detail=detail,
+                config_version_id=config_version_id,
+                plan_version_id=plan_version_id,
+                scenario_ids=scenario_name_ids,
+                input_set_label=input_set_label,
+                cursor=cursor,
             )
-            runs_list = resp.get("runs") or []
-            for r in runs_list:
-                resolved = _resolve_input_set_label(r)
-                if resolved:
-                    r["input_set_label"] = resolved
-            if config_version_id is not None:
-                runs_list = [
-                    r
-                    for r in runs_list
-                    if r.get("config_version_id") == config_version_id
-                ]
-                resp["runs"] = runs_list
-                resp["total"] = len(runs_list)
-            if scenario_name_ids is not None:
-                runs_list = [
-                    r for r in runs_list if r.get("scenario_id") in scenario_name_ids
-                ]
-                resp["runs"] = runs_list
-                resp["total"] = len(runs_list)
-            if plan_version_id is not None:
-                runs_list = [
-                    r for r in runs_list if r.get("plan_version_id") == plan_version_id
-                ]
-                resp["runs"] = runs_list
-                resp["total"] = len(runs_list)
-            if input_set_label is not None:
-                runs_list = [
-                    r for r in runs_list if _matches_input_set(r, input_set_label)
-                ]
-                resp["runs"] = runs_list
-                resp["total"] = len(runs_list)
-            try:
-                RUNS_LIST_REQUESTS.labels(detail="true", backend=_BACKEND).inc()
-                RUNS_LIST_RETURNED.observe(len(resp.get("runs") or []))
-            except Exception:
-                pass
-            return resp
-        runs = REGISTRY.list()
-        for entry in runs:
-            resolved = _resolve_input_set_label(entry)
-            if resolved:
-                entry["input_set_label"] = resolved
-        runs = _filter_and_sort(
-            runs,
-            sort,
-            order,
-            schema_version,
-            config_id,
-            config_version_id,
-            scenario_id,
-            plan_version_id,
-            scenario_name_ids,
-            input_set_label,
-        )
-        total = len(runs)
-        sliced = runs[offset : offset + limit]
-        try:
-            RUNS_LIST_REQUESTS.labels(detail="true", backend=_BACKEND).inc()
-            RUNS_LIST_RETURNED.observe(len(sliced))
-        except Exception:
-            pass
-        return {"runs": sliced, "total": total, "offset": offset, "limit": limit}
-    REGISTRY, _BACKEND = _get_registry()
-    # DBバックエンド時は上限に応じたクリーンアップを実施（テスト・運用の安定化）
-    try:
-        import os as _os
-
-        max_rows = int(_os.getenv("RUNS_DB_MAX_ROWS", "0") or 0)
-        if max_rows > 0 and hasattr(REGISTRY, "cleanup_by_capacity"):
-            REGISTRY.cleanup_by_capacity(max_rows)
-    except Exception:
-        pass
-    ids = REGISTRY.list_ids()
-    out = []
-    if limit is None:
-        limit = 50
-    for rid in ids:
-        rec = REGISTRY.get(rid) or {}
-        row = {
-            "run_id": rec.get("run_id"),
-            "started_at": rec.get("started_at"),
-            "duration_ms": rec.get("duration_ms"),
-            "schema_version": rec.get("schema_version"),
-            "summary": rec.get("summary", {}),
-            "config_id": rec.get("config_id"),
-            "config_version_id": rec.get("config_version_id"),
-            "scenario_id": rec.get("scenario_id"),
-            "plan_version_id": rec.get("plan_version_id"),
-            "input_set_label": rec.get("input_set_label"),
-            "created_at": rec.get("created_at", rec.get("started_at")),
-            "updated_at": rec.get(
-                "updated_at",
-                (rec.get("started_at") or 0) + (rec.get("duration_ms") or 0),
-            ),
-        }
-        out.append(row)
-    # DBバックエンドはSQLでページング（ただし config_id 指定時は後方互換のためアプリ側でフィルタリングに切替）
-    if (
-        hasattr(REGISTRY, "list_page")
-        and config_id is None
-        and scenario_id is None
-        and plan_version_id is None
-    ):
-        resp = REGISTRY.list_page(
-            offset=offset,
-            limit=limit,
-            sort=sort,
-            order=order,
-            schema_version=schema_version,
-            config_id=config_id,
-            scenario_id=scenario_id,
-            detail=False,
-        )
-        # backfill config_id using config_json when missing (DB backend lightweight mode includes config_json)
-        runs_list = resp.get("runs") or []
-        for r in runs_list:
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        for r in resp.get("runs") or []:
             resolved = _resolve_input_set_label(r)
             if resolved:
                 r["input_set_label"] = resolved
-        if config_version_id is not None:
-            runs_list = [
-                r for r in runs_list if r.get("config_version_id") == config_version_id
-            ]
-            resp["runs"] = runs_list
-            resp["total"] = len(runs_list)
-        if input_set_label is not None:
-            runs_list = [r for r in runs_list if _matches_input_set(r, input_set_label)]
-            resp["runs"] = runs_list
-            resp["total"] = len(runs_list)
         try:
-            RUNS_LIST_REQUESTS.labels(detail="false", backend=_BACKEND).inc()
+            RUNS_LIST_REQUESTS.labels(detail=detail_label, backend=_BACKEND).inc()
             RUNS_LIST_RETURNED.observe(len(resp.get("runs") or []))
         except Exception:
             pass
         return resp
-    elif hasattr(REGISTRY, "list_ids"):
-        # 後方互換: DBでも config_id / scenario_id 指定時は全件からアプリ側でフィルタ（config_json を用いた推定を含む）
-        ids2 = REGISTRY.list_ids()
-        rows2: List[Dict[str, Any]] = []
-        for rid in ids2:
-            rec = REGISTRY.get(rid) or {}
-            row = {
-                "run_id": rec.get("run_id"),
-                "started_at": rec.get("started_at"),
-                "duration_ms": rec.get("duration_ms"),
-                "schema_version": rec.get("schema_version"),
-                "summary": rec.get("summary", {}),
-                "config_id": rec.get("config_id"),
-                "config_version_id": rec.get("config_version_id"),
-                "scenario_id": rec.get("scenario_id"),
-                "plan_version_id": rec.get("plan_version_id"),
-                "input_set_label": rec.get("input_set_label"),
-                "created_at": rec.get("created_at", rec.get("started_at")),
-                "updated_at": rec.get(
-                    "updated_at",
-                    (rec.get("started_at") or 0) + (rec.get("duration_ms") or 0),
-                ),
-            }
-            rows2.append(row)
-        rows2 = _filter_and_sort(
-            rows2,
-            sort,
-            order,
-            schema_version,
-            config_id,
-            config_version_id,
-            scenario_id,
-            plan_version_id,
-            scenario_name_ids,
-            input_set_label,
-        )
-        total2 = len(rows2)
-        rows2 = rows2[offset : offset + limit]
-        try:
-            RUNS_LIST_REQUESTS.labels(detail="false", backend=_BACKEND).inc()
-            RUNS_LIST_RETURNED.observe(len(rows2))
-        except Exception:
-            pass
-        return {"runs": rows2, "total": total2, "offset": offset, "limit": limit}
-    out = _filter_and_sort(
-        out,
+    # メモリ実装（容量上限つき）はアプリ側でフィルタ・ソートする
+    if detail:
+        runs = [_with_trace_records(rec) for rec in REGISTRY.list()]
+    else:
+        runs = [_meta_row(rec) for rec in REGISTRY.list(fields=RUN_META_FIELDS)]
+    for entry in runs:
+        resolved = _resolve_input_set_label(entry)
+        if resolved:
+            entry["input_set_label"] = resolved
+    runs = _filter_and_sort(
+        runs,
         sort,
         order,
         schema_version,
@@ -322,24 +193,67 @@ def list_runs(
         scenario_name_ids,
         input_set_label,
     )
-    total = len(out)
-    out = out[offset : offset + limit]
+    total = len(runs)
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        runs = [r for r in runs if _after_cursor(r, sort, order, last_value, last_id)]
+        offset = 0
+    sliced = runs[offset : offset + limit]
+    next_cursor = (
+        encode_cursor(sliced[-1].get(sort), sliced[-1].get("run_id"))
+        if len(sliced) == limit and len(runs) > offset + limit
+        else None
+    )
     try:
-        RUNS_LIST_REQUESTS.labels(detail="false", backend=_BACKEND).inc()
-        RUNS_LIST_RETURNED.observe(len(out))
+        RUNS_LIST_REQUESTS.labels(detail=detail_label, backend=_BACKEND).inc()
+        RUNS_LIST_RETURNED.observe(len(sliced))
     except Exception:
         pass
-    return {"runs": out, "total": total, "offset": offset, "limit": limit}
+    return {
+        "runs": sliced,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
+
+
+def _after_cursor(
+    row: Dict[str, Any], sort: str, order: str, last_value: Any, last_id: str
+) -> bool:
+    key = (row.get(sort), row.get("run_id") or "")
+    if key[0] is None:
+        return False
+    return (
+        key < (last_value, last_id) if order == "desc" else key > (last_value, last_id)
+    )
+
+
+def _with_trace_records(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """メモリ版 Registry が型付きで持つ cost_trace を応答用の行 dict にする。"""
+    if "cost_trace" in rec:
+        rec["cost_trace"] = trace_records(rec["cost_trace"])
+    return rec
 
 
 @app.get("/runs/{run_id}")
 def get_run(run_id: str, detail: bool = Query(False)):
     REGISTRY, _ = _get_registry()
-    r = REGISTRY.get(run_id)
+    r = (
+        REGISTRY.get(run_id)
+        if detail
+        else REGISTRY.get(
+            run_id,
+            fields=("run_id", "started_at", "duration_ms", "schema_version", "summary"),
+        )
+    )
     if not r:
         raise HTTPException(status_code=404, detail="run not found")
     if detail:
-        return r
+        return _with_trace_records(r)
     return {
         "run_id": r.get("run_id"),
         "started_at": r.get("started_at"),
@@ -374,7 +288,7 @@ def compare_runs(
 
     rows = []
     for rid in ids:
-        r = REGISTRY.get(rid)
+        r = REGISTRY.get(rid, fields=("summary",))
         if not r:
             raise HTTPException(status_code=404, detail=f"run not found: {rid}")
         rows.append({"run_id": rid, **_pick(r.get("summary", {}), use_keys)})
@@ -421,7 +335,7 @@ def compare_runs(
 @app.delete("/runs/{run_id}")
 def delete_run(run_id: str, request: Request):
     REGISTRY, _ = _get_registry()
-    r = REGISTRY.get(run_id)
+    r = REGISTRY.get(run_id, fields=("run_id",))
     if not r:
         raise HTTPException(status_code=404, detail="run not found")
     # RBACライト: 有効時はX-Roleヘッダ（planner/adminなど）を要求
@@ -443,6 +357,26 @@ def delete_run(run_id: str, request: Request):
     return {"status": "deleted", "run_id": run_id}
 
 
+def _meta_row(rec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "run_id": rec.get("run_id"),
+        "started_at": rec.get("started_at"),
+        "duration_ms": rec.get("duration_ms"),
+        "schema_version": rec.get("schema_version"),
+        "summary": rec.get("summary", {}),
+        "config_id": rec.get("config_id"),
+        "config_version_id": rec.get("config_version_id"),
+        "scenario_id": rec.get("scenario_id"),
+        "plan_version_id": rec.get("plan_version_id"),
+        "input_set_label": rec.get("input_set_label"),
+        "created_at": rec.get("created_at", rec.get("started_at")),
+        "updated_at": rec.get(
+            "updated_at",
+            (rec.get("started_at") or 0) + (rec.get("duration_ms") or 0),
+        ),
+    }
+
+
 def _filter_and_sort(
     rows: List[Dict[str, Any]],
     sort: str,
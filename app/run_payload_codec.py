@@ -0,0 +1,185 @@
+"""runs テーブルの大きなペイロード列（results / daily_profit_loss / cost_trace）の符号化。
+
+従来は各列に JSON 文字列（TEXT）をそのまま保存していたが、長期間・多ノードの Run では
+1行が数十MBになり、保存・読込の大半が JSON の生成/解析と I/O に費やされる。
+ここでは列ごとにバージョン付きのバイナリ blob として保存する:
+
+  blob = MAGIC(4B) + version(1B) + codec_id(1B) + zlib(body)
+
+codec:
+  - ``json``     : 従来の TEXT（非圧縮 JSON）。旧行・互換用。
+  - ``zjson``    : JSON を zlib 圧縮したもの。
+  - ``columnar`` : list[dict] を列指向（fields + columns）に組み替えてから JSON 化・圧縮。
+                   nested 形式の daily_results は engine.columnar の列形式に変換する。
+
+読込側は ``decode_field`` で TEXT/blob の両方を透過的に扱う。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from engine.columnar import METRICS, ColumnarResults
+from engine.cost_trace import CostTrace
+
+PAYLOAD_FIELDS = ("results", "daily_profit_loss", "cost_trace")
+PAYLOAD_CODECS = ("json", "zjson", "columnar")
+DEFAULT_CODEC = "zjson"
+BLOB_VERSION = 1
+
+_MAGIC = b"SCRP"
+_HEADER_LEN = len(_MAGIC) + 2
+_CODEC_IDS = {"zjson": 1, "columnar": 2}
+_CODEC_NAMES = {v: k for k, v in _CODEC_IDS.items()}
+_ZLIB_LEVEL = 6
+
+
+def resolve_codec(value: Optional[str] = None) -> str:
+    """codec 名を検証して返す。未指定なら RUNS_PAYLOAD_CODEC、既定は zjson。"""
+    name = (value or os.getenv("RUNS_PAYLOAD_CODEC") or DEFAULT_CODEC).lower()
+    if name not in PAYLOAD_CODECS:
+        raise ValueError(f"unknown payload codec: {value or name}")
+    return name
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _nested_results_ok(value: Any) -> bool:
+    """全品目が METRICS ちょうどの数値を持つ nested daily_results なら列形式へ無損失に変換できる。"""
+    metric_keys = set(METRICS)
+    prev_day = None
+    for snapshot in value:
+        if not isinstance(snapshot, dict) or set(snapshot) != {"day", "nodes"}:
+            return False
+        day = snapshot["day"]
+        # 列形式は日で行を区切るため、日は厳密に増加している必要がある
+        if not isinstance(day, int) or (prev_day is not None and day <= prev_day):
+            return False
+        prev_day = day
+        for items in (snapshot["nodes"] or {}).values():
+            if not isinstance(items, dict) or not items:
+                return False
+            for metrics in items.values():
+                if not isinstance(metrics, dict) or metrics.keys() != metric_keys:
+                    return False
+                for v in metrics.values():
+                    if not isinstance(v, (int, float)) or isinstance(v, bool):
+                        return False
+    return True
+
+
+def _records_to_columns(value: List[Any]) -> Optional[Dict[str, Any]]:
+    """全行が同じキー順の dict なら {fields, columns} に組み替える。"""
+    if not value or not isinstance(value[0], dict):
+        return None
+    fields = list(value[0])
+    for row in value:
+        if not isinstance(row, dict) or list(row) != fields:
+            return None
+    columns = [[row[f] for row in value] for f in fields]
+    return {"fields": fields, "columns": columns}
+
+
+def _columnar_body(field: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, CostTrace):
+        # 型付きバッファは行の dict を作らずに列へ展開する
+        return {"kind": "records", "data": value.to_columns()}
+    if isinstance(value, list) and value:
+        if field == "results" and _nested_results_ok(value):
+            return {
+                "kind": "nested_results",
+                "data": ColumnarResults.from_nested(value).to_dict(),
+            }
+        table = _records_to_columns(value)
+        if table is not None:
+            return {"kind": "records", "data": table}
+    # 列形式の results（dict）や不揃いな行はそのまま保存する
+    return {"kind": "raw", "data": value}
+
+
+def encode_field(
+    field: str, value: Any, codec: Optional[str] = None
+) -> Union[str, bytes]:
+    """1列分の値を保存用の TEXT（json）または blob（zjson/columnar）にする。"""
+    codec = resolve_codec(codec)
+    if isinstance(value, CostTrace) and codec != "columnar":
+        value = value.to_records()
+    if codec == "json":
+        return json.dumps(value, ensure_ascii=False)
+    if codec == "zjson":
+        body = _dumps(value)
+    else:
+        body = _dumps(_columnar_body(field, value))
+    header = _MAGIC + bytes((BLOB_VERSION, _CODEC_IDS[codec]))
+    return header + zlib.compress(body, _ZLIB_LEVEL)
+
+
+def blob_codec(raw: Any) -> Optional[str]:
+    """保存値の codec 名。TEXT（従来 JSON）は "json"、空は None。"""
+    if raw is None or raw == "" or raw == b"":
+        return None
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        head = bytes(raw[:_HEADER_LEN])
+        if head[: len(_MAGIC)] == _MAGIC and len(head) == _HEADER_LEN:
+            return _CODEC_NAMES.get(head[-1])
+    return "json"
+
+
+def _split_blob(raw: bytes) -> Tuple[int, str, bytes]:
+    version, codec_id = raw[len(_MAGIC)], raw[len(_MAGIC) + 1]
+    if version > BLOB_VERSION:
+        raise ValueError(f"unsupported payload blob version: {version}")
+    codec = _CODEC_NAMES.get(codec_id)
+    if codec is None:
+        raise ValueError(f"unknown payload codec id: {codec_id}")
+    return version, codec, zlib.decompress(raw[_HEADER_LEN:])
+
+
+def decode_field(raw: Any, default: Any = None) -> Any:
+    """encode_field の逆変換。従来の JSON TEXT もそのまま読める。"""
+    if raw is None or raw == "" or raw == b"":
+        return [] if default is None else default
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    if isinstance(raw, (bytes, bytearray)):
+        raw = bytes(raw)
+        if not raw.startswith(_MAGIC):
+            # 旧ドライバ経由で bytes になった JSON TEXT
+            return json.loads(raw.decode("utf-8"))
+        _version, codec, body = _split_blob(raw)
+        doc = json.loads(body)
+        if codec == "zjson":
+            return doc
+        kind, data = doc.get("kind"), doc.get("data")
+        if kind == "nested_results":
+            return ColumnarResults.from_dict(data).to_nested()
+        if kind == "records":
+            fields = data["fields"]
+            return [dict(zip(fields, row)) for row in zip(*data["columns"])]
+        return data
+    return json.loads(raw)
+
+
+def encode_payload(
+    payload: Dict[str, Any], codec: Optional[str] = None
+) -> Dict[str, Union[str, bytes]]:
+    """payload の3列をまとめて符号化する（欠損は空リスト扱い）。"""
+    return {f: encode_field(f, payload.get(f) or [], codec) for f in PAYLOAD_FIELDS}
+
+
+__all__ = [
+    "PAYLOAD_FIELDS",
+    "PAYLOAD_CODECS",
+    "DEFAULT_CODEC",
+    "BLOB_VERSION",
+    "resolve_codec",
+    "encode_field",
+    "decode_field",
+    "encode_payload",
+    "blob_codec",
+]
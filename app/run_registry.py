@@ -1,9 +1,37 @@
+import json
 import threading
 import os
 import time
 import logging
 from uuid import uuid4
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# 一覧・比較で使う軽量メタ（results/daily_profit_loss/cost_trace を含まない）
+RUN_META_FIELDS = (
+    "run_id",
+    "started_at",
+    "duration_ms",
+    "schema_version",
+    "summary",
+    "config_id",
+    "config_version_id",
+    "scenario_id",
+    "plan_version_id",
+    "input_set_label",
+    "created_at",
+    "updated_at",
+)
+
+
+def project_record(
+    run_id: str, rec: Dict[str, Any], fields: Iterable[str]
+) -> Dict[str, Any]:
+    """rec から fields のキーだけを取り出す（run_id は常に含める）。"""
+    out = {"run_id": run_id}
+    for k in fields:
+        if k in rec:
+            out[k] = rec[k]
+    return out
 
 
 class RunRegistry:
@@ -15,22 +43,44 @@ class RunRegistry:
 
     def put(self, run_id: str, payload: Dict[str, Any]) -> None:
         with self._lock:
-            if run_id in self._runs:
-                self._runs[run_id].update(payload)
-                return
-            self._runs[run_id] = payload
-            self._order.append(run_id)
-            if len(self._order) > self.capacity:
-                old = self._order.pop(0)
-                self._runs.pop(old, None)
-
-    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+            self._put(run_id, payload)
+
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """複数の Run をまとめて保存する（途中で他スレッドの put を挟まない）。"""
+        with self._lock:
+            for run_id, payload in items:
+                self._put(run_id, payload)
+
+    def _put(self, run_id: str, payload: Dict[str, Any]) -> None:
+        if run_id in self._runs:
+            self._runs[run_id].update(payload)
+            return
+        self._runs[run_id] = payload
+        self._order.append(run_id)
+        if len(self._order) > self.capacity:
+            old = self._order.pop(0)
+            self._runs.pop(old, None)
+
+    def get(
+        self, run_id: str, fields: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """fields 指定時はそのキーだけを返す（大きな日次データを複製しない）。"""
         with self._lock:
-            return dict(self._runs.get(run_id, {}))
+            rec = self._runs.get(run_id)
+            if rec is None:
+                return {}
+            if fields is None:
+                return dict(rec)
+            return project_record(run_id, rec, fields)
 
-    def list(self) -> List[Dict[str, Any]]:
+    def list(self, fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
         with self._lock:
-            return [dict(self._runs[r]) for r in reversed(self._order)]
+            if fields is None:
+                return [dict(self._runs[r]) for r in reversed(self._order)]
+            fields = tuple(fields)
+            return [
+                project_record(r, self._runs[r], fields) for r in reversed(self._order)
+            ]
 
     def list_ids(self) -> List[str]:
         with self._lock:
@@ -141,3 +191,108 @@ def record_canonical_run(
             },
         )
         return None
+
+
+def registry_capacity(reg: Any) -> Optional[int]:
+    """reg が保持できる Run 数の上限（上限なしは None）。
+
+    メモリ版は capacity、DB版は RUNS_DB_MAX_ROWS（put 後に古い順に削除される）。
+    """
+    cap = getattr(reg, "capacity", None)
+    if cap:
+        return int(cap)
+    max_rows = int(os.getenv("RUNS_DB_MAX_ROWS", "0") or 0)
+    return max_rows if max_rows > 0 else None
+
+
+def record_sweep_runs(
+    sim_input,
+    *,
+    config_version_id: Optional[int],
+    grid: Optional[Dict[str, Any]] = None,
+    variants: Optional[List[Dict[str, Any]]] = None,
+    scenario_id: Optional[int] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    detail_level: str = "summary",
+    registry: Optional[RunRegistry] = None,
+) -> Dict[str, Any]:
+    """シナリオスイープを実行し、全バリアントの Run を1回の put_many で保存する。
+
+    戻り値の variants はバリアント順の {index, run_id, params, summary, duration_ms}。
+    scenario_id 未指定時はスイープ用のシナリオを作成し、全 Run に同じ scenario_id を付ける。
+    パラメータの誤りや、バリアント数が Registry の保持上限を超える場合は ValueError
+    （保存直後に自分の Run が削除されるため。Run もシナリオも作らない）。
+    """
+    from engine.sweep import expand_grid, run_sweep
+
+    reg = registry or REGISTRY
+    if variants is None:
+        variants = expand_grid(grid or {})
+    capacity = registry_capacity(reg)
+    if capacity is not None and len(variants) > capacity:
+        raise ValueError(
+            f"sweep has {len(variants)} variants but the run registry keeps"
+            f" only {capacity} runs (REGISTRY_CAPACITY / RUNS_DB_MAX_ROWS)"
+        )
+    start = time.time()
+    sweep = run_sweep(
+        sim_input,
+        variants=variants,
+        workers=workers,
+        engine=engine,
+        detail_level=detail_level,
+    )
+    if scenario_id is None:
+        from app import db
+
+        scenario_id = db.create_scenario(
+            f"sweep v{config_version_id} ({len(sweep['variants'])} variants)",
+            None,
+            "sweep",
+            json.dumps(grid if grid is not None else variants, ensure_ascii=False),
+        )
+    started_at = int(start * 1000)
+    items = []
+    for v in sweep["variants"]:
+        run_id = uuid4().hex
+        v["run_id"] = run_id
+        summary = dict(v["summary"] or {})
+        summary.setdefault("_sweep_index", v["index"])
+        summary.setdefault("_sweep_params", v["params"])
+        items.append(
+            (
+                run_id,
+                {
+                    "run_id": run_id,
+                    "started_at": started_at,
+                    "duration_ms": v["duration_ms"],
+                    "schema_version": getattr(sim_input, "schema_version", "1.0"),
+                    "summary": summary,
+                    "results": v.get("results", []),
+                    "daily_profit_loss": v.get("daily_profit_loss", []),
+                    "cost_trace": v.get("cost_trace", []),
+                    "config_version_id": config_version_id,
+                    "scenario_id": scenario_id,
+                },
+            )
+        )
+    reg.put_many(items)
+    try:
+        from app import run_latest
+
+        for run_id, _ in items:
+            run_latest.record(scenario_id, run_id)
+    except Exception:
+        pass
+    return {
+        "scenario_id": scenario_id,
+        "config_version_id": config_version_id,
+        "workers": sweep["workers"],
+        # 日次結果・明細は /runs/{run_id} から参照する
+        "variants": [
+            {k: v[k] for k in ("index", "run_id", "params", "summary", "duration_ms")}
+            for v in sweep["variants"]
+        ],
+        "duration_ms": int((time.time() - start) * 1000),
+    }
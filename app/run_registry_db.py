@@ -1,10 +1,73 @@
+import base64
 import json
 import os
 import sqlite3
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .db import _conn
+from .run_payload_codec import (
+    PAYLOAD_FIELDS,
+    decode_field,
+    encode_payload,
+    resolve_codec,
+)
+
+# get/list(fields=...) で射影できるレコードのキー（= runs の列名）
+RECORD_FIELDS = (
+    "run_id",
+    "started_at",
+    "duration_ms",
+    "schema_version",
+    "summary",
+    "results",
+    "daily_profit_loss",
+    "cost_trace",
+    "config_id",
+    "config_version_id",
+    "scenario_id",
+    "plan_version_id",
+    "config_json",
+    "input_set_label",
+)
+
+
+def _stored_input_set_label(payload: Dict[str, Any]) -> Optional[str]:
+    """runs.input_set_label に保存するラベル（payload → summary._input_set_label →
+    summary.input_set_label の順、前後の空白を除き空文字は None）。
+
+    /runs の input_set_label 絞込みが列の等値比較（索引）だけで済むよう、書込み時に
+    解決しておく（既存行はマイグレーション 5c1e7a9b3d42 が同じ規則で埋める）。
+    """
+    summary = payload.get("summary")
+    if not isinstance(summary, dict):
+        summary = {}
+    candidates = (
+        payload.get("input_set_label"),
+        summary.get("_input_set_label") or summary.get("input_set_label"),
+    )
+    for label in candidates:
+        if label is not None and str(label).strip():
+            return str(label).strip()
+    return None
+
+
+def encode_cursor(sort_value: Any, run_id: str) -> str:
+    """キーセットページングのカーソル（(ソート値, run_id) の URL-safe base64）。"""
+    raw = json.dumps([sort_value, run_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "started_at") -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, run_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as exc:
+        raise ValueError(f"invalid cursor: {cursor}") from exc
+    expected = str if sort == "schema_version" else (int, float)
+    if not isinstance(run_id, str) or not isinstance(value, expected):
+        raise ValueError(f"invalid cursor: {cursor}")
+    return value, run_id
 
 
 def table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
@@ -24,107 +87,31 @@ def table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
 
 class RunRegistryDB:
     def put(self, run_id: str, payload: Dict[str, Any]) -> None:
-        now = int(time.time() * 1000)
+        self.put_many([(run_id, payload)])
+
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """複数の Run を1トランザクションで保存する（シナリオスイープの一括保存など）。"""
+        items = list(items)
         with _conn() as c:
-            row = c.execute(
-                "SELECT run_id FROM runs WHERE run_id=?", (run_id,)
-            ).fetchone()
-            doc = {
-                "run_id": run_id,
-                "started_at": int(payload.get("started_at") or now),
-                "duration_ms": int(payload.get("duration_ms") or 0),
-                "schema_version": str(payload.get("schema_version") or "1.0"),
-                "summary": json.dumps(payload.get("summary") or {}, ensure_ascii=False),
-                "results": json.dumps(payload.get("results") or [], ensure_ascii=False),
-                "daily_profit_loss": json.dumps(
-                    payload.get("daily_profit_loss") or [], ensure_ascii=False
-                ),
-                "cost_trace": json.dumps(
-                    payload.get("cost_trace") or [], ensure_ascii=False
-                ),
-                "config_id": payload.get("config_id"),
-                "config_version_id": payload.get("config_version_id"),
-                "scenario_id": payload.get("scenario_id"),
-                "plan_version_id": payload.get("plan_version_id"),
-                "plan_job_id": payload.get("plan_job_id"),
-                "input_set_label": payload.get("input_set_label"),
-                "config_json": (
-                    json.dumps(payload.get("config_json"))
-                    if payload.get("config_json") is not None
-                    else None
-                ),
-                "created_at": int(payload.get("started_at") or now),
-                "updated_at": now,
-            }
-            if row:
-                c.execute(
-                    """
-                    UPDATE runs SET started_at=?, duration_ms=?, schema_version=?, summary=?, results=?,
-                        daily_profit_loss=?, cost_trace=?, config_id=?, config_version_id=?, scenario_id=?, plan_version_id=?, plan_job_id=?, config_json=?, updated_at=?, input_set_label=?
-                    WHERE run_id=?
-                    """,
-                    (
-                        doc["started_at"],
-                        doc["duration_ms"],
-                        doc["schema_version"],
-                        doc["summary"],
-                        doc["results"],
-                        doc["daily_profit_loss"],
-                        doc["cost_trace"],
-                        doc["config_id"],
-                        doc["config_version_id"],
-                        doc["scenario_id"],
-                        doc["plan_version_id"],
-                        doc["plan_job_id"],
-                        doc["config_json"],
-                        doc["updated_at"],
-                        doc["input_set_label"],
-                        run_id,
-                    ),
-                )
-            else:
-                c.execute(
-                    """
-                    INSERT INTO runs(run_id, started_at, duration_ms, schema_version, summary, results,
-                        daily_profit_loss, cost_trace, config_id, config_version_id, scenario_id, plan_version_id, plan_job_id, config_json, created_at, updated_at, input_set_label)
-                    VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        doc["run_id"],
-                        doc["started_at"],
-                        doc["duration_ms"],
-                        doc["schema_version"],
-                        doc["summary"],
-                        doc["results"],
-                        doc["daily_profit_loss"],
-                        doc["cost_trace"],
-                        doc["config_id"],
-                        doc["config_version_id"],
-                        doc["scenario_id"],
-                        doc["plan_version_id"],
-                        doc["plan_job_id"],
-                        doc["config_json"],
-                        doc["created_at"],
-                        doc["updated_at"],
-                        doc["input_set_label"],
-                    ),
-                )
-        try:
-            # Log what we saved (booleans only, to avoid large payloads)
-            import logging
+            for run_id, payload in items:
+                self._write(c, run_id, payload)
+        for run_id, payload in items:
+            try:
+                # Log what we saved (booleans only, to avoid large payloads)
+                import logging
 
-            logging.debug(
-                "run_saved",
-                extra={
-                    "event": "run_saved",
-                    "run_id": run_id,
-                    "config_id": payload.get("config_id"),
-                    "config_version_id": payload.get("config_version_id"),
-                    "config_json_present": bool(payload.get("config_json")),
-                },
-            )
-        except Exception:
-            pass
+                logging.debug(
+                    "run_saved",
+                    extra={
+                        "event": "run_saved",
+                        "run_id": run_id,
+                        "config_id": payload.get("config_id"),
+                        "config_version_id": payload.get("config_version_id"),
+                        "config_json_present": bool(payload.get("config_json")),
+                    },
+                )
+            except Exception:
+                pass
         # オプション: 容量上限制御（古いRunのクリーンアップ）
         try:
             max_rows = int(os.getenv("RUNS_DB_MAX_ROWS", "0") or 0)
@@ -133,15 +120,109 @@ class RunRegistryDB:
         except Exception:
             pass
 
-    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+    def _write(
+        self, c: sqlite3.Connection, run_id: str, payload: Dict[str, Any]
+    ) -> None:
+        now = int(time.time() * 1000)
+        # results/daily_profit_loss/cost_trace は Run ごとの codec で blob 化する
+        codec = resolve_codec(payload.get("payload_codec"))
+        encoded = encode_payload(payload, codec)
+        row = c.execute("SELECT run_id FROM runs WHERE run_id=?", (run_id,)).fetchone()
+        doc = {
+            "run_id": run_id,
+            "started_at": int(payload.get("started_at") or now),
+            "duration_ms": int(payload.get("duration_ms") or 0),
+            "schema_version": str(payload.get("schema_version") or "1.0"),
+            "summary": json.dumps(payload.get("summary") or {}, ensure_ascii=False),
+            "results": encoded["results"],
+            "daily_profit_loss": encoded["daily_profit_loss"],
+            "cost_trace": encoded["cost_trace"],
+            "payload_format": codec,
+            "config_id": payload.get("config_id"),
+            "config_version_id": payload.get("config_version_id"),
+            "scenario_id": payload.get("scenario_id"),
+            "plan_version_id": payload.get("plan_version_id"),
+            "plan_job_id": payload.get("plan_job_id"),
+            "input_set_label": _stored_input_set_label(payload),
+            "config_json": (
+                json.dumps(payload.get("config_json"))
+                if payload.get("config_json") is not None
+                else None
+            ),
+            "created_at": int(payload.get("started_at") or now),
+            "updated_at": now,
+        }
+        if row:
+            c.execute(
+                """
+                UPDATE runs SET started_at=?, duration_ms=?, schema_version=?, summary=?, results=?,
+                    daily_profit_loss=?, cost_trace=?, config_id=?, config_version_id=?, scenario_id=?, plan_version_id=?, plan_job_id=?, config_json=?, updated_at=?, input_set_label=?, payload_format=?
+                WHERE run_id=?
+                """,
+                (
+                    doc["started_at"],
+                    doc["duration_ms"],
+                    doc["schema_version"],
+                    doc["summary"],
+                    doc["results"],
+                    doc["daily_profit_loss"],
+                    doc["cost_trace"],
+                    doc["config_id"],
+                    doc["config_version_id"],
+                    doc["scenario_id"],
+                    doc["plan_version_id"],
+                    doc["plan_job_id"],
+                    doc["config_json"],
+                    doc["updated_at"],
+                    doc["input_set_label"],
+                    doc["payload_format"],
+                    run_id,
+                ),
+            )
+        else:
+            c.execute(
+                """
+                INSERT INTO runs(run_id, started_at, duration_ms, schema_version, summary, results,
+                    daily_profit_loss, cost_trace, config_id, config_version_id, scenario_id, plan_version_id, plan_job_id, config_json, created_at, updated_at, input_set_label, payload_format)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """,
+                (
+                    doc["run_id"],
+                    doc["started_at"],
+                    doc["duration_ms"],
+                    doc["schema_version"],
+                    doc["summary"],
+                    doc["results"],
+                    doc["daily_profit_loss"],
+                    doc["cost_trace"],
+                    doc["config_id"],
+                    doc["config_version_id"],
+                    doc["scenario_id"],
+                    doc["plan_version_id"],
+                    doc["plan_job_id"],
+                    doc["config_json"],
+                    doc["created_at"],
+                    doc["updated_at"],
+                    doc["input_set_label"],
+                    doc["payload_format"],
+                ),
+            )
+
+    def get(
+        self, run_id: str, fields: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """fields 指定時は該当列だけを SELECT/デコードする（run_id は常に含む）。"""
+        cols = self._select_columns(fields)
         with _conn() as c:
             row = c.execute(
-                "SELECT * FROM runs WHERE run_id=?",
+                f"SELECT {cols} FROM runs WHERE run_id=?",
                 (run_id,),
             ).fetchone()
             # 後方互換: メモリ実装は見つからない場合に {} を返すコードパスがあるため、
             # DB実装でも {} を返して同等に扱えるようにする
-            return self._row_to_rec(row) if row else {}
+            if not row:
+                return {}
+            return self._row_to_rec(row) if fields is None else self._project(row)
 
     def list_ids(self) -> List[str]:
         with _conn() as c:
@@ -150,12 +231,37 @@ class RunRegistryDB:
             ).fetchall()
             return [r["run_id"] for r in rows]
 
-    def list(self) -> List[Dict[str, Any]]:
+    def list(self, fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        cols = self._select_columns(fields)
         with _conn() as c:
             rows = c.execute(
-                "SELECT * FROM runs ORDER BY started_at DESC, run_id DESC"
+                f"SELECT {cols} FROM runs ORDER BY started_at DESC, run_id DESC"
             ).fetchall()
-            return [self._row_to_rec(r) for r in rows]
+            if fields is None:
+                return [self._row_to_rec(r) for r in rows]
+            return [self._project(r) for r in rows]
+
+    @staticmethod
+    def _select_columns(fields: Optional[Iterable[str]]) -> str:
+        if fields is None:
+            return "*"
+        wanted = set(fields)
+        return ", ".join(f for f in RECORD_FIELDS if f == "run_id" or f in wanted)
+
+    @staticmethod
+    def _project(row) -> Dict[str, Any]:
+        """射影 SELECT の行を、選択された列だけデコードして dict にする。"""
+        rec: Dict[str, Any] = {}
+        for k in row.keys():
+            v = row[k]
+            if k == "summary":
+                v = json.loads(v or "{}")
+            elif k in PAYLOAD_FIELDS:
+                v = decode_field(v, [])
+            elif k == "config_json":
+                v = json.loads(v) if v else None
+            rec[k] = v
+        return rec
 
     # ページング/ソート/フィルタ対応（/runs 用）
     def list_page(
@@ -168,7 +274,17 @@ class RunRegistryDB:
         config_id: Optional[int] = None,
         scenario_id: Optional[int] = None,
         detail: bool = False,
+        config_version_id: Optional[int] = None,
+        plan_version_id: Optional[str] = None,
+        scenario_ids: Optional[Iterable[int]] = None,
+        input_set_label: Optional[str] = None,
+        cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
+        """フィルタをすべて SQL 述語にして1ページ分を返す。
+
+        cursor（前ページの next_cursor）指定時は offset を無視し、
+        (sort列, run_id) のキーセットで続きを取得する。total は COUNT(*)。
+        """
         sort_keys = {"started_at", "duration_ms", "schema_version"}
         if sort not in sort_keys:
             sort = "started_at"
@@ -181,10 +297,40 @@ class RunRegistryDB:
         if config_id is not None:
             where.append("config_id = ?")
             params.append(config_id)
+        if config_version_id is not None:
+            where.append("config_version_id = ?")
+            params.append(config_version_id)
         if scenario_id is not None:
             where.append("scenario_id = ?")
             params.append(scenario_id)
+        if scenario_ids is not None:
+            ids = sorted({int(x) for x in scenario_ids if x is not None})
+            if not ids:
+                return {
+                    "runs": [],
+                    "total": 0,
+                    "offset": offset,
+                    "limit": limit,
+                    "next_cursor": None,
+                }
+            where.append(f"scenario_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if plan_version_id is not None:
+            where.append("plan_version_id = ?")
+            params.append(plan_version_id)
+        if input_set_label:
+            where.append("input_set_label = ?")
+            params.append(input_set_label)
+        page_where = list(where)
+        page_params = list(params)
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, sort)
+            cmp = "<" if order == "DESC" else ">"
+            page_where.append(f"({sort}, run_id) {cmp} (?, ?)")
+            page_params.extend([last_value, last_id])
+            offset = 0
         where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+        page_sql = (" WHERE " + " AND ".join(page_where)) if page_where else ""
         with _conn() as c:
             total = c.execute(
                 f"SELECT COUNT(*) as cnt FROM runs{where_sql}", params
@@ -195,9 +341,14 @@ class RunRegistryDB:
                 else "run_id, started_at, duration_ms, schema_version, summary, config_id, config_version_id, scenario_id, plan_version_id, input_set_label, config_json, created_at, updated_at"
             )
             rows = c.execute(
-                f"SELECT {cols} FROM runs{where_sql} ORDER BY {sort} {order}, run_id {order} LIMIT ? OFFSET ?",
-                (*params, limit, offset),
+                f"SELECT {cols} FROM runs{page_sql} ORDER BY {sort} {order}, run_id {order} LIMIT ? OFFSET ?",
+                (*page_params, limit, offset),
             ).fetchall()
+            next_cursor = (
+                encode_cursor(rows[-1][sort], rows[-1]["run_id"])
+                if len(rows) == limit
+                else None
+            )
             if detail:
                 data = [self._row_to_rec(r) for r in rows]
             else:
@@ -234,7 +385,13 @@ class RunRegistryDB:
                             "updated_at": r["updated_at"],
                         }
                     )
-        return {"runs": data, "total": total, "offset": offset, "limit": limit}
+        return {
+            "runs": data,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }
 
     @staticmethod
     def _row_to_rec(row) -> Dict[str, Any]:
@@ -245,9 +402,9 @@ class RunRegistryDB:
             "duration_ms": row["duration_ms"],
             "schema_version": row["schema_version"],
             "summary": summary_obj,
-            "results": json.loads(row["results"] or "[]"),
-            "daily_profit_loss": json.loads(row["daily_profit_loss"] or "[]"),
-            "cost_trace": json.loads(row["cost_trace"] or "[]"),
+            "results": decode_field(row["results"], []),
+            "daily_profit_loss": decode_field(row["daily_profit_loss"], []),
+            "cost_trace": decode_field(row["cost_trace"], []),
             "config_id": row["config_id"],
             "config_version_id": (
                 row["config_version_id"] if "config_version_id" in row.keys() else None
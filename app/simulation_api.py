@@ -4,11 +4,20 @@ from uuid import uuid4
 import logging
 from fastapi import APIRouter, HTTPException, Query, Request
 from domain.models import SimulationInput
-from engine.simulator import SupplyChainSimulator
+from engine.simulator import SupplyChainSimulator, validate_detail_level
+from engine.compiled import ENGINES as SIM_ENGINES, create_simulator
+from engine.montecarlo import run_montecarlo
+from engine.columnar import ColumnarResults, as_nested, validate_result_format
+from engine.cost_trace import (
+    CostTrace,
+    CsvTraceSink,
+    trace_records,
+    trace_spool_path,
+)
 from engine.simulation_stub import run_stub as run_stub_simulation
 import time
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from app.metrics import RUNS_TOTAL, SIM_DURATION
 from app import run_latest as _run_latest
@@ -70,6 +79,35 @@ def _get_registry():
     return REGISTRY, _BACKEND, _DB_MAX_ROWS
 
 
+def _load_canonical(version_id: int):
+    """Canonical設定を読み込み、検証エラーがあれば HTTPException を送出する。"""
+    try:
+        canonical_config, canonical_validation = load_canonical_config_from_db(
+            version_id, validate=True
+        )
+    except CanonicalConfigNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+    if canonical_validation and canonical_validation.has_errors:
+        errors = [
+            {
+                "code": issue.code,
+                "message": issue.message,
+                "context": issue.context,
+            }
+            for issue in canonical_validation.issues
+            if issue.severity == "error"
+        ]
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "canonical config validation failed",
+                "errors": errors,
+            },
+        )
+    return canonical_config, canonical_validation
+
+
 @router.post("/simulation")
 def post_simulation(
     payload: SimulationInput | None = None,
@@ -80,38 +118,33 @@ def post_simulation(
         None,
         description="Canonical設定のバージョンID。指定時はCanonicalから入力を生成",
     ),
+    engine: str | None = Query(
+        None,
+        description="シミュレーションエンジン（legacy|compiled）。未指定時は SCPLN_SIM_ENGINE",
+    ),
+    result_format: str = Query(
+        "nested",
+        description="日次結果の形式（nested|columnar）。columnar は指標ごとの列で返す",
+    ),
+    detail_level: str = Query(
+        "full",
+        description="出力の粒度（summary|pl|full）。summary はKPIのみ、pl は日次PLまで",
+    ),
     request: Request = None,
 ):
+    if engine is not None and engine.lower() not in SIM_ENGINES:
+        raise HTTPException(status_code=400, detail=f"unknown engine: {engine}")
+    try:
+        result_format = validate_result_format(result_format)
+        detail_level = validate_detail_level(detail_level)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     canonical_version_id: Optional[int] = config_version_id
     canonical_config = None
     canonical_validation = None
 
     if canonical_version_id is not None:
-        try:
-            canonical_config, canonical_validation = load_canonical_config_from_db(
-                canonical_version_id, validate=True
-            )
-        except CanonicalConfigNotFoundError as exc:
-            raise HTTPException(status_code=404, detail=str(exc))
-
-        if canonical_validation and canonical_validation.has_errors:
-            errors = [
-                {
-                    "code": issue.code,
-                    "message": issue.message,
-                    "context": issue.context,
-                }
-                for issue in canonical_validation.issues
-                if issue.severity == "error"
-            ]
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "message": "canonical config validation failed",
-                    "errors": errors,
-                },
-            )
-
+        canonical_config, canonical_validation = _load_canonical(canonical_version_id)
         payload = build_simulation_input(canonical_config)
 
     if payload is None:
@@ -140,22 +173,43 @@ def post_simulation(
     results: list[dict[str, object]] | list = []
     daily_pl: list[dict[str, object]] | list = []
     summary: dict[str, object] = {}
-    cost_trace: list[dict[str, object]] = []
+    cost_trace: CostTrace | list[dict[str, object]] = []
     sim: SupplyChainSimulator | None = None
 
     if skip_simulation:
         summary, results, daily_pl, cost_trace = run_stub_simulation(
             payload, include_trace=True
         )
+        if detail_level != "full":
+            results, cost_trace = [], []
+        if detail_level == "summary":
+            daily_pl = []
+        if result_format == "columnar" and results:
+            results = ColumnarResults.from_nested(results).to_dict()
         duration_ms = int((time.time() - start) * 1000)
     else:
-        sim = SupplyChainSimulator(payload)
+        # SCPLN_TRACE_DIR 設定時、応答に含めない明細は trace.csv 用のファイルへ逐次書く
+        spool = (
+            None
+            if include_trace or detail_level != "full"
+            else trace_spool_path(run_id)
+        )
+        sim = create_simulator(
+            payload,
+            engine=engine,
+            result_format=result_format,
+            trace_sink=CsvTraceSink(spool, run_id=run_id) if spool else None,
+            detail_level=detail_level,
+        )
         results, daily_pl = sim.run()
+        if sim.columnar_results is not None:
+            results = sim.columnar_results.to_dict()
         duration_ms = int((time.time() - start) * 1000)
         try:
             summary = sim.compute_summary()
         except Exception:
             summary = {}
+        # RunRegistry へは型付きバッファのまま渡す（dict 化は応答・出力時だけ）
         cost_trace = getattr(sim, "cost_trace", [])
 
     try:
@@ -239,7 +293,7 @@ def post_simulation(
             "event": "run_completed",
             "run_id": run_id,
             "duration": duration_ms,
-            "results": len(results or []),
+            "results": len(as_nested(results or [])),
             "pl_days": len(daily_pl or []),
             "trace_events": len(cost_trace or []),
             "schema": getattr(payload, "schema_version", "1.0"),
@@ -253,8 +307,12 @@ def post_simulation(
         "daily_profit_loss": daily_pl,
         "profit_loss": daily_pl,
         "summary": summary,
-        "cost_trace": cost_trace if include_trace else [],
+        "cost_trace": trace_records(cost_trace) if include_trace else [],
     }
+    if result_format != "nested":
+        resp["result_format"] = result_format
+    if detail_level != "full":
+        resp["detail_level"] = detail_level
     if canonical_version_id is not None:
         resp["config_version_id"] = canonical_version_id
         if canonical_validation:
@@ -272,6 +330,132 @@ def post_simulation(
     return resp
 
 
+@router.post("/simulation/montecarlo")
+def post_simulation_montecarlo(
+    payload: SimulationInput | None = None,
+    replications: int = Query(100, ge=1, le=10000, description="複製数"),
+    base_seed: int | None = Query(
+        None, description="先頭シード（未指定時は payload.random_seed または 0）"
+    ),
+    workers: int | None = Query(
+        None, ge=1, description="プロセス数。未指定時は SCPLN_MC_WORKERS / CPU数"
+    ),
+    include_samples: bool = Query(False, description="シードごとのKPI値を含める"),
+    config_version_id: int | None = Query(
+        None,
+        description="Canonical設定のバージョンID。指定時はCanonicalから入力を生成",
+    ),
+    engine: str | None = Query(
+        None,
+        description="シミュレーションエンジン（legacy|compiled）。未指定時は SCPLN_SIM_ENGINE",
+    ),
+):
+    """シード違いの複製を並列実行し、KPIの分位点（p5/p50/p95）を返す。"""
+    if engine is not None and engine.lower() not in SIM_ENGINES:
+        raise HTTPException(status_code=400, detail=f"unknown engine: {engine}")
+    if config_version_id is not None:
+        canonical_config, _ = _load_canonical(config_version_id)
+        payload = build_simulation_input(canonical_config)
+    if payload is None:
+        raise HTTPException(status_code=400, detail="simulation payload is required")
+
+    start = time.time()
+    result = run_montecarlo(
+        payload,
+        replications,
+        base_seed=base_seed,
+        workers=workers,
+        engine=engine,
+        include_samples=include_samples,
+    )
+    result["duration_ms"] = int((time.time() - start) * 1000)
+    if config_version_id is not None:
+        result["config_version_id"] = config_version_id
+    return result
+
+
+class SweepRequest(BaseModel):
+    """POST /simulation/sweep の本文。grid か variants のどちらかを指定する。"""
+
+    config_version_id: int
+    grid: Dict[str, List[Any]] | None = None
+    variants: List[Dict[str, Any]] | None = None
+    scenario_id: int | None = None
+    workers: int | None = None
+    engine: str | None = None
+    detail_level: str = "summary"
+
+
+@router.post("/simulation/sweep")
+def post_simulation_sweep(body: SweepRequest, request: Request = None):
+    """Canonical設定のパラメータ違い（grid の直積）を並列実行し、Run として保存する。
+
+    Canonical → 入力の変換とネットワーク/需要の前計算は1回だけ行い、各バリアントは
+    パッチとして適用する。全 Run は同じ scenario_id で1回の書き込みで保存する。
+    """
+    if (body.grid is None) == (body.variants is None):
+        raise HTTPException(
+            status_code=400, detail="either grid or variants is required"
+        )
+    if body.engine is not None and body.engine.lower() not in SIM_ENGINES:
+        raise HTTPException(status_code=400, detail=f"unknown engine: {body.engine}")
+    if body.workers is not None and body.workers < 1:
+        raise HTTPException(status_code=400, detail="workers must be >= 1")
+    try:
+        detail_level = validate_detail_level(body.detail_level)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if os.getenv("RBAC_ENABLED", "0") == "1":
+        role = request.headers.get("X-Role") if request else None
+        org = request.headers.get("X-Org-ID") if request else None
+        tenant = request.headers.get("X-Tenant-ID") if request else None
+        allowed = {
+            x.strip()
+            for x in (os.getenv("RBAC_MUTATE_ROLES", "planner,admin").split(","))
+            if x.strip()
+        }
+        if not role or role not in allowed:
+            raise HTTPException(status_code=403, detail="forbidden: role not allowed")
+        if not org or not tenant:
+            raise HTTPException(status_code=400, detail="missing org/tenant headers")
+    canonical_config, _ = _load_canonical(body.config_version_id)
+    sim_input = build_simulation_input(canonical_config)
+
+    from app.run_registry import record_sweep_runs
+
+    REGISTRY, _BACKEND, _DB_MAX_ROWS = _get_registry()
+    try:
+        result = record_sweep_runs(
+            sim_input,
+            config_version_id=body.config_version_id,
+            grid=body.grid,
+            variants=body.variants,
+            scenario_id=body.scenario_id,
+            workers=body.workers,
+            engine=body.engine,
+            detail_level=detail_level,
+            registry=REGISTRY,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        SIM_DURATION.observe(result["duration_ms"])
+        RUNS_TOTAL.inc(len(result["variants"]))
+    except Exception:
+        pass
+    logging.info(
+        "sweep_completed",
+        extra={
+            "event": "sweep_completed",
+            "scenario_id": result["scenario_id"],
+            "config_version_id": body.config_version_id,
+            "variants": len(result["variants"]),
+            "duration": result["duration_ms"],
+        },
+    )
+    return result
+
+
 # FastAPI appへルーターを登録（import時の副作用で有効化）
 try:
     from app.api import app as _app  # 循環依存を避けるため遅延import
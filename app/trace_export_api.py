@@ -3,9 +3,11 @@ import csv
 import json
 from typing import Any, Dict, Iterable, List, Set
 from fastapi import HTTPException, Response
-from starlette.responses import StreamingResponse
+from starlette.responses import FileResponse, StreamingResponse
 from app.api import app
 from app import db as _db
+from engine.columnar import as_nested
+from engine.cost_trace import TRACE_CSV_FIELDS, trace_spool_path
 
 
 def _get_registry():
@@ -25,13 +27,14 @@ def _get_rec(run_id: str):
             if not row:
                 return None
             import json as _json
+            from app.run_payload_codec import decode_field
 
             return {
                 "run_id": row["run_id"],
                 "summary": _json.loads(row["summary"] or "{}"),
-                "results": _json.loads(row["results"] or "[]"),
-                "daily_profit_loss": _json.loads(row["daily_profit_loss"] or "[]"),
-                "cost_trace": _json.loads(row["cost_trace"] or "[]"),
+                "results": decode_field(row["results"], []),
+                "daily_profit_loss": decode_field(row["daily_profit_loss"], []),
+                "cost_trace": decode_field(row["cost_trace"], []),
                 "config_id": (
                     row.get("config_id") if hasattr(row, "get") else row["config_id"]
                 ),
@@ -45,17 +48,7 @@ def _get_rec(run_id: str):
         return None
 
 
-FIELDS = [
-    "run_id",
-    "day",
-    "node",
-    "item",
-    "event",
-    "qty",
-    "unit_cost",
-    "amount",
-    "account",
-]
+FIELDS = list(TRACE_CSV_FIELDS)
 
 
 @app.get("/runs/{run_id}/trace.csv")
@@ -64,6 +57,13 @@ def get_trace_csv(run_id: str):
     if not rec:
         raise HTTPException(status_code=404, detail="run not found")
     trace = rec.get("cost_trace") or []
+    headers = {"Content-Disposition": f"attachment; filename=trace_{run_id}.csv"}
+    # 実行中に SCPLN_TRACE_DIR へ書き出した明細はファイルをそのまま返す
+    spool = trace_spool_path(run_id)
+    if not trace and spool is not None and spool.is_file():
+        return FileResponse(
+            spool, media_type="text/csv; charset=utf-8", headers=headers
+        )
 
     def _iter():
         buf = io.StringIO()
@@ -80,7 +80,6 @@ def get_trace_csv(run_id: str):
             buf.seek(0)
             buf.truncate(0)
 
-    headers = {"Content-Disposition": f"attachment; filename=trace_{run_id}.csv"}
     return StreamingResponse(
         _iter(), media_type="text/csv; charset=utf-8", headers=headers
     )
@@ -111,7 +110,7 @@ def get_results_csv(run_id: str):
     rec = _get_rec(run_id)
     if not rec:
         raise HTTPException(status_code=404, detail="run not found")
-    results = rec.get("results") or []
+    results = as_nested(rec.get("results") or [])
     # 1st pass: collect header
     field_set: Set[str] = set()
     for r in results:
@@ -2,7 +2,7 @@ from app.api import app
 from fastapi import Request, Form, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from typing import List
+from typing import Iterable, List
 from pathlib import Path
 import csv
 import io
@@ -16,27 +16,35 @@ def _get_registry():
     return REGISTRY
 
 
-def _get_rec(run_id: str):
-    rec = _get_registry().get(run_id)
+# DBフォールバック時に読む列（fields 未指定時）
+_FALLBACK_FIELDS = (
+    "summary",
+    "results",
+    "daily_profit_loss",
+    "cost_trace",
+    "config_id",
+    "scenario_id",
+)
+
+
+def _get_rec(run_id: str, fields: Iterable[str] | None = None):
+    """Runを取得する。比較など summary だけで足りる箇所は fields で列を絞る。"""
+    registry = _get_registry()
+    rec = (
+        registry.get(run_id) if fields is None else registry.get(run_id, fields=fields)
+    )
     if rec:
         return rec
     # fallback to DB
     try:
-        with _db._conn() as c:  # type: ignore[attr-defined]
-            row = c.execute("SELECT * FROM runs WHERE run_id=?", (run_id,)).fetchone()
-            if not row:
-                return None
-            import json as _json
-
-            return {
-                "run_id": row["run_id"],
-                "summary": _json.loads(row["summary"] or "{}"),
-                "results": _json.loads(row["results"] or "[]"),
-                "daily_profit_loss": _json.loads(row["daily_profit_loss"] or "[]"),
-                "cost_trace": _json.loads(row["cost_trace"] or "[]"),
-                "config_id": row["config_id"],
-                "scenario_id": row["scenario_id"],
-            }
+        from app.run_registry_db import RunRegistryDB
+
+        return (
+            RunRegistryDB().get(
+                run_id, fields=_FALLBACK_FIELDS if fields is None else fields
+            )
+            or None
+        )
     except Exception:
         return None
 
@@ -87,7 +95,7 @@ def ui_compare(
 
     rows = []
     for rid in ids:
-        rec = _get_rec(rid)
+        rec = _get_rec(rid, fields=("summary",))
         if not rec:
             raise HTTPException(status_code=404, detail=f"run not found: {rid}")
         s = rec.get("summary") or {}
@@ -164,7 +172,7 @@ def _latest_runs_by_scenarios(
                 ids = getattr(REGISTRY, "list_ids", lambda: [])()
                 matched = []
                 for rid in ids:
-                    rec = _get_rec(rid) or {}
+                    rec = _get_rec(rid, fields=("scenario_id",)) or {}
                     if rec.get("scenario_id") == sid:
                         matched.append(rid)
                         if len(matched) >= n:
@@ -224,7 +232,8 @@ def ui_compare_preset(
     recent: List[dict] = []
     try:
         # 1) REGISTRY.list()（メモリ/DB双方で有用）
-        recent.extend(getattr(REGISTRY, "list", lambda: [])() or [])
+        list_fn = getattr(REGISTRY, "list", lambda **_: [])
+        recent.extend(list_fn(fields=("scenario_id", "started_at")) or [])
     except Exception:
         pass
     try:
@@ -324,7 +333,7 @@ def ui_compare_preset(
             use_keys = filt
     rows = []
     for rid in ids:
-        rec = _get_rec(rid)
+        rec = _get_rec(rid, fields=("summary",))
         s = (rec.get("summary") or {}) if rec else {}
         row = {"run_id": rid}
         for k in use_keys:
@@ -386,7 +395,7 @@ def ui_compare_metrics_csv(request: Request, run_ids: str, base_id: str | None =
     ]
     rows = []
     for rid in ids:
-        rec = REGISTRY.get(rid)
+        rec = REGISTRY.get(rid, fields=("summary",))
         if not rec:
             raise HTTPException(status_code=404, detail=f"run not found: {rid}")
         s = rec.get("summary") or {}
@@ -455,7 +464,7 @@ def ui_compare_diffs_csv(
 
     rows = []
     for rid in ids:
-        r = REGISTRY.get(rid)
+        r = REGISTRY.get(rid, fields=("summary",))
         if not r:
             raise HTTPException(status_code=404, detail=f"run not found: {rid}")
         rows.append({"run_id": rid, **_pick(r.get("summary", {}))})
@@ -7,6 +7,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from app import db
 from app.template_filters import register_format_filters
+from engine.columnar import as_nested
 from app.utils import ms_to_jst_str
 from app.metrics import (
     PLAN_DB_WRITE_LATENCY,
@@ -14,6 +15,7 @@ from app.metrics import (
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 from core.plan_repository import PlanRepository
 from core.config.storage import (
@@ -29,6 +31,7 @@ _PLAN_REPOSITORY = PlanRepository(
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 
 
@@ -126,14 +129,14 @@ def ui_run_detail(request: Request, run_id: str):
                 if row:
                     import json as _json
 
+                    from app.run_payload_codec import decode_field
+
                     rec = {
                         "run_id": row["run_id"],
                         "summary": _json.loads(row["summary"] or "{}"),
-                        "results": _json.loads(row["results"] or "[]"),
-                        "daily_profit_loss": _json.loads(
-                            row["daily_profit_loss"] or "[]"
-                        ),
-                        "cost_trace": _json.loads(row["cost_trace"] or "[]"),
+                        "results": decode_field(row["results"], []),
+                        "daily_profit_loss": decode_field(row["daily_profit_loss"], []),
+                        "cost_trace": decode_field(row["cost_trace"], []),
                         "config_id": row["config_id"],
                         "config_version_id": (
                             row["config_version_id"]
@@ -148,7 +151,7 @@ def ui_run_detail(request: Request, run_id: str):
         raise HTTPException(status_code=404, detail="run not found")
     summary = rec.get("summary") or {}
     counts = {
-        "results_len": len(rec.get("results") or []),
+        "results_len": len(as_nested(rec.get("results") or [])),
         "pl_len": len(rec.get("daily_profit_loss") or []),
         "trace_len": len(rec.get("cost_trace") or []),
     }
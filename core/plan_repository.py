@@ -6,12 +6,15 @@ Alembicで追加した各テーブルへ書き込み・読出しを行い、Plan
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 import sqlite3
 import time
 from datetime import datetime, timedelta
 from collections.abc import Callable, Iterable, Sequence
+from itertools import islice
 import sys
 from typing import Any, TypedDict
 
@@ -27,6 +30,26 @@ def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
+# SQLite のバインド変数上限（既定 999）を超えないよう IN 句を分割する件数
+_IN_CHUNK = 500
+
+
+def _chunked(values: Iterable[str], size: int = _IN_CHUNK) -> list[list[str]]:
+    items = list(values)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+# plan_series は正規化済みタプルをこの行数ずつ executemany する（中間リストの上限）
+_SERIES_INSERT_CHUNK = 5000
+
+# 1回の書込みがこの行数に達したら plan_series の二次インデックスを外して挿入し、
+# コミット前に作り直す（0 で無効）
+_BULK_INDEX_ENV = "PLANS_DB_BULK_INDEX_ROWS"
+_BULK_INDEX_DEFAULT = 100_000
+# 上記の一括書込み中だけ使うページキャッシュ（負値は KiB 指定）
+_BULK_CACHE_SIZE = -65536
+
+
 class PlanRepositoryError(RuntimeError):
     """Plan永続化時のラップド例外。"""
 
@@ -73,6 +96,15 @@ class PlanSeriesRow(TypedDict):
     updated_at: NotRequired[int]
 
 
+class PlanSeriesDiff(TypedDict):
+    """replace_plan_series_level の書込み件数。"""
+
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
 class PlanOverrideRow(TypedDict):
     version_id: str
     level: str
@@ -186,8 +218,69 @@ _PLAN_SERIES_COLUMNS: Sequence[str] = (
     "extra_json",
     "created_at",
     "updated_at",
+    "content_hash",
+    "search_text",
 )
 
+# plan_series の自然キー（version_id / level 以外）と、content_hash の対象範囲
+_SERIES_KEY_COLUMNS: Sequence[str] = (
+    "time_bucket_type",
+    "time_bucket_key",
+    "item_key",
+    "location_key",
+)
+_SERIES_KEY_INDEX = tuple(_PLAN_SERIES_COLUMNS.index(c) for c in _SERIES_KEY_COLUMNS)
+_SERIES_HASHED = slice(
+    _PLAN_SERIES_COLUMNS.index("time_bucket_type"),
+    _PLAN_SERIES_COLUMNS.index("created_at"),
+)
+# 差分更新で書き換える列（キーと created_at 以外）
+_SERIES_UPDATE_COLUMNS: Sequence[str] = tuple(
+    c
+    for c in _PLAN_SERIES_COLUMNS
+    if c not in ("version_id", "level", "created_at", *_SERIES_KEY_COLUMNS)
+)
+_SERIES_UPDATE_INDEX = tuple(
+    _PLAN_SERIES_COLUMNS.index(c) for c in _SERIES_UPDATE_COLUMNS
+)
+_SERIES_KEY_WHERE = "version_id=? AND level=? AND " + " AND ".join(
+    f"{c}=?" for c in _SERIES_KEY_COLUMNS
+)
+
+_SERIES_HASH_INDEX = _PLAN_SERIES_COLUMNS.index("content_hash")
+
+
+def _series_content_hash(values: tuple) -> str:
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _series_search_text(
+    item_key: Any, bucket_key: Any, item_name: Any, extra_json: Any
+) -> str:
+    """fetch_plan_series_page の search が突き合わせる文字列（小文字）。
+
+    品目・期間・品目名と extra_json の family/period を空白で連結する
+    （既存行はマイグレーション d7a1f3c5e820 が SQL で同じ形に埋める）。
+    """
+    extra: Any = extra_json
+    if isinstance(extra_json, str):
+        extra = {}
+        if '"family"' in extra_json or '"period"' in extra_json:
+            try:
+                extra = json.loads(extra_json)
+            except ValueError:
+                extra = {}
+    if not isinstance(extra, dict):
+        extra = {}
+    parts = (
+        item_key,
+        bucket_key,
+        item_name,
+        extra.get("family"),
+        extra.get("period"),
+    )
+    return " ".join("" if p is None else str(p) for p in parts).lower()
+
 
 _PLAN_OVERRIDE_COLUMNS: Sequence[str] = (
     "version_id",
@@ -277,6 +370,7 @@ class PlanRepository:
         plan_db_last_success_timestamp: Any | None = None,
         plan_db_guard_trim_total: Any | None = None,
         plan_db_last_trim_timestamp: Any | None = None,
+        plan_db_write_rows_per_second: Any | None = None,
     ):
         self._conn_factory = conn_factory
         self._plan_db_write_latency = plan_db_write_latency or _NullMetric()
@@ -288,6 +382,17 @@ class PlanRepository:
         self._capacity_env_key = "PLANS_DB_MAX_ROWS"
         self._trim_alert_threshold_key = "PLANS_DB_GUARD_ALERT_THRESHOLD"
         self._plan_db_last_trim_timestamp = plan_db_last_trim_timestamp or _NullMetric()
+        self._plan_db_write_rows_per_second = (
+            plan_db_write_rows_per_second or _NullMetric()
+        )
+        self._series_insert_sql = self._build_insert_sql(
+            "plan_series", _PLAN_SERIES_COLUMNS
+        )
+        self._series_update_sql = (
+            "UPDATE plan_series SET "
+            + ",".join(f"{c}=?" for c in _SERIES_UPDATE_COLUMNS)
+            + f" WHERE {_SERIES_KEY_WHERE}"
+        )
 
     # --- public API -------------------------------------------------
     def write_plan(
@@ -301,15 +406,19 @@ class PlanRepository:
         job: PlanJobRow | None = None,
         storage_mode: str = "unknown",
     ) -> None:
-        """Plan一式を書き込み。既存versionの行は置き換える。"""
+        """Plan一式を書き込み。既存versionの行は置き換える。
+
+        series は1回だけ順に読み出し、_SERIES_INSERT_CHUNK 行ずつ挿入するため、
+        区画ごとに行を生成するジェネレータも渡せる（全行をリストに保持しない）。
+        大量の行では plan_series の二次インデックスを外して挿入し、同じトランザクション内で
+        作り直す。生成中の例外はロールバックして送出する。
+        """
 
         t0 = time.monotonic()
         success = False
+        series_count = 0
         try:
             now = _now_ms()
-            series_rows = [
-                self._normalize_series_row(version_id, row, now) for row in series
-            ]
             override_rows = [
                 self._normalize_override_row(version_id, row, now)
                 for row in (overrides or [])
@@ -331,11 +440,9 @@ class PlanRepository:
             try:
                 conn.execute("BEGIN IMMEDIATE")
                 self._delete_plan(conn, version_id)
-                if series_rows:
-                    conn.executemany(
-                        self._build_insert_sql("plan_series", _PLAN_SERIES_COLUMNS),
-                        series_rows,
-                    )
+                series_count = self._write_series(conn, version_id, series, now)[
+                    "inserted"
+                ]
                 if override_rows:
                     conn.executemany(
                         self._build_insert_sql(
@@ -365,7 +472,7 @@ class PlanRepository:
                 conn.commit()
 
                 # --- Metrics on success ---
-                self._plan_series_rows_total.set(len(series_rows))
+                self._plan_series_rows_total.set(series_count)
                 self._plan_db_last_success_timestamp.set_to_current_time()
                 success = True
 
@@ -384,6 +491,10 @@ class PlanRepository:
             self._plan_db_write_latency.labels(storage_mode=storage_mode).observe(
                 duration
             )
+        if success and duration > 0:
+            self._plan_db_write_rows_per_second.labels(storage_mode=storage_mode).set(
+                series_count / duration
+            )
         if success:
             try:
                 self._enforce_capacity_guard()
@@ -397,7 +508,9 @@ class PlanRepository:
         *,
         bucket_type: str | None = None,
         bucket_key: str | None = None,
+        item_keys: Iterable[str] | None = None,
     ) -> list[dict]:
+        """plan_series を取得する。item_keys 指定時はその品目の行のみ。"""
         sql = [
             "SELECT * FROM plan_series WHERE version_id=? AND level=?",
         ]
@@ -408,22 +521,149 @@ class PlanRepository:
         if bucket_key is not None:
             sql.append("AND time_bucket_key=?")
             params.append(bucket_key)
-        sql.append("ORDER BY time_bucket_type, time_bucket_key, item_key, location_key")
-        rows = self._fetch_rows(" ".join(sql), tuple(params))
+        if item_keys is not None:
+            rows = []
+            for chunk in _chunked(dict.fromkeys(str(k) for k in item_keys)):
+                chunk_sql = [
+                    *sql,
+                    "AND item_key IN (" + ",".join(["?"] * len(chunk)) + ")",
+                ]
+                rows.extend(self._fetch_rows(" ".join(chunk_sql), (*params, *chunk)))
+        else:
+            sql.append(
+                "ORDER BY time_bucket_type, time_bucket_key, item_key, location_key"
+            )
+            rows = self._fetch_rows(" ".join(sql), tuple(params))
+        for row in rows:
+            # 差分更新・検索用の内部列は呼び出し側に見せない
+            row.pop("content_hash", None)
+            row.pop("search_text", None)
         rows.sort(key=_plan_series_sort_key)
         return rows
 
+    def fetch_plan_series_page(
+        self,
+        version_id: str,
+        level: str,
+        *,
+        item_keys: Iterable[str] | None = None,
+        bucket_keys: Iterable[str] | None = None,
+        search: str | None = None,
+        search_keys: Iterable[tuple[str, str]] | None = None,
+        limit: int = 200,
+        offset: int = 0,
+    ) -> tuple[list[dict], int]:
+        """plan_series を絞り込み、1ページ分の行と該当件数を返す。
+
+        絞込み・検索・ページングは SQL 側で行い、ページの行だけを読み出す。
+        search は search_text（item_key / time_bucket_key / item_name と extra_json の
+        family/period を小文字化した文字列）への部分一致。search_keys の
+        (item_key, time_bucket_key) の行も search に一致したものとして扱う
+        （オーバーライドの値で一致した行を呼び出し側が渡す）。並び順は主キー順
+        （文字列の昇順）。
+        """
+        where = ["version_id=? AND level=?"]
+        params: list[object] = [version_id, level]
+        for column, values in (
+            ("item_key", item_keys),
+            ("time_bucket_key", bucket_keys),
+        ):
+            if values is None:
+                continue
+            values = list(dict.fromkeys(str(v) for v in values))
+            where.append(f"{column} IN (" + ",".join(["?"] * len(values)) + ")")
+            params.extend(values)
+        if search:
+            escaped = (
+                search.lower()
+                .replace("\\", "\\\\")
+                .replace("%", "\\%")
+                .replace("_", "\\_")
+            )
+            matches = ["search_text LIKE ? ESCAPE '\\'"]
+            params.append(f"%{escaped}%")
+            keys = list(dict.fromkeys((str(i), str(b)) for i, b in search_keys or ()))
+            if keys:
+                matches.append(
+                    "(item_key, time_bucket_key) IN (VALUES "
+                    + ",".join(["(?,?)"] * len(keys))
+                    + ")"
+                )
+                params.extend(v for key in keys for v in key)
+            where.append("(" + " OR ".join(matches) + ")")
+        clause = " AND ".join(where)
+        # 品目で絞るときは品目索引で引いてから並べ替える（主キー順の全件走査を避ける）
+        order = "+" if item_keys is not None else ""
+        conn = self._conn_factory()
+        try:
+            (total,) = conn.execute(
+                f"SELECT COUNT(*) FROM plan_series WHERE {clause}", params
+            ).fetchone()
+        finally:
+            conn.close()
+        if not total or limit <= 0 or offset >= total:
+            return [], int(total)
+        rows = self._fetch_rows(
+            f"SELECT * FROM plan_series WHERE {clause} ORDER BY "
+            + ", ".join(f"{order}{c}" for c in _SERIES_KEY_COLUMNS)
+            + " LIMIT ? OFFSET ?",
+            (*params, max(0, int(limit)), max(0, int(offset))),
+        )
+        for row in rows:
+            row.pop("content_hash", None)
+            row.pop("search_text", None)
+        return rows, int(total)
+
     def fetch_plan_overrides(
-        self, version_id: str, level: str | None = None
+        self,
+        version_id: str,
+        level: str | None = None,
+        *,
+        key_hashes: Iterable[str] | None = None,
+        locked: bool | None = None,
     ) -> list[dict]:
+        """plan_overrides を取得する。
+
+        key_hashes 指定時はそのキーの行のみ、locked 指定時は lock_flag が一致する行のみ。
+        """
         sql = ["SELECT * FROM plan_overrides WHERE version_id=?"]
         params: list[object] = [version_id]
         if level is not None:
             sql.append("AND level=?")
             params.append(level)
+        if locked is not None:
+            sql.append("AND lock_flag=?")
+            params.append(1 if locked else 0)
+        if key_hashes is not None:
+            rows = []
+            for chunk in _chunked(dict.fromkeys(str(k) for k in key_hashes)):
+                chunk_sql = [
+                    *sql,
+                    "AND key_hash IN (" + ",".join(["?"] * len(chunk)) + ")",
+                ]
+                rows.extend(self._fetch_rows(" ".join(chunk_sql), (*params, *chunk)))
+            rows.sort(key=lambda r: r.get("updated_at") or 0, reverse=True)
+            return rows
         sql.append("ORDER BY updated_at DESC")
         return self._fetch_rows(" ".join(sql), tuple(params))
 
+    def has_plan_overrides(self, version_id: str, levels: Iterable[str]) -> bool:
+        """version_id に levels いずれかの plan_overrides 行があるか。"""
+        levels = list(levels)
+        if not levels:
+            return False
+        conn = self._conn_factory()
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM plan_overrides WHERE version_id=? AND level IN ("
+                + ",".join(["?"] * len(levels))
+                + ") LIMIT 1",
+                (version_id, *levels),
+            ).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
     def fetch_plan_override_events(self, version_id: str) -> list[dict]:
         sql = (
             "SELECT * FROM plan_override_events WHERE version_id=? "
@@ -515,30 +755,36 @@ class PlanRepository:
             conn.close()
 
     def replace_plan_series_level(
-        self, version_id: str, level: str, rows: Iterable[PlanSeriesRow]
-    ) -> None:
+        self,
+        version_id: str,
+        level: str,
+        rows: Iterable[PlanSeriesRow],
+        *,
+        item_keys: Iterable[str] | None = None,
+    ) -> PlanSeriesDiff:
+        """level の plan_series を rows で置き換え、書込み件数を返す。
+
+        既存行とは自然キー（time_bucket_type, time_bucket_key, item_key, location_key）と
+        content_hash で突き合わせ、追加・内容が変わった行の更新・rows に無い行の削除だけを行う
+        （変わらない行は updated_at も含めて書き換えない）。
+        item_keys を渡すと、その品目の行だけを置き換えの対象にする（部分更新）。
+        それ以外の品目の行はそのまま残る。rows の挿入は write_plan と同じく区切って行う。
+        """
         now = _now_ms()
-        normalized_rows = [
-            self._normalize_series_row(
-                version_id,
-                row if row.get("level") else {**row, "level": level},
-                now,
-            )
-            for row in rows
-        ]
-
         conn = self._conn_factory()
         try:
             conn.execute("BEGIN IMMEDIATE")
-            conn.execute(
-                "DELETE FROM plan_series WHERE version_id=? AND level=?",
-                (version_id, level),
+            existing = self._fetch_series_hashes(conn, version_id, level, item_keys)
+            diff = self._write_series(
+                conn, version_id, rows, now, level=level, existing=existing
             )
-            if normalized_rows:
+            stale = [(version_id, level, *key) for key in existing]
+            for start in range(0, len(stale), _SERIES_INSERT_CHUNK):
                 conn.executemany(
-                    self._build_insert_sql("plan_series", _PLAN_SERIES_COLUMNS),
-                    normalized_rows,
+                    f"DELETE FROM plan_series WHERE {_SERIES_KEY_WHERE}",
+                    stale[start : start + _SERIES_INSERT_CHUNK],
                 )
+            diff["deleted"] = len(stale)
             conn.commit()
         except sqlite3.Error as exc:  # pragma: no cover - DB障害
             conn.rollback()
@@ -550,6 +796,7 @@ class PlanRepository:
             raise
         finally:
             conn.close()
+        return diff
 
     def replace_plan_kpis(
         self, version_id: str, rows: Iterable[PlanKpiRow] | None
@@ -589,6 +836,166 @@ class PlanRepository:
         conn.execute("DELETE FROM plan_overrides WHERE version_id=?", (version_id,))
         conn.execute("DELETE FROM plan_jobs WHERE version_id=?", (version_id,))
 
+    def _fetch_series_hashes(
+        self,
+        conn: sqlite3.Connection,
+        version_id: str,
+        level: str,
+        item_keys: Iterable[str] | None,
+    ) -> dict[tuple, str | None]:
+        """(version_id, level) の既存行の自然キー → content_hash。"""
+        sql = (
+            f"SELECT {','.join(_SERIES_KEY_COLUMNS)}, content_hash FROM plan_series "
+            "WHERE version_id=? AND level=?"
+        )
+        if item_keys is None:
+            batches = [conn.execute(sql, (version_id, level))]
+        else:
+            batches = [
+                conn.execute(
+                    sql + " AND item_key IN (" + ",".join(["?"] * len(chunk)) + ")",
+                    (version_id, level, *chunk),
+                )
+                for chunk in _chunked(dict.fromkeys(str(k) for k in item_keys))
+            ]
+        return {tuple(r[:4]): r[4] for cur in batches for r in cur}
+
+    def _write_series(
+        self,
+        conn: sqlite3.Connection,
+        version_id: str,
+        rows: Iterable[PlanSeriesRow],
+        now: int,
+        *,
+        level: str | None = None,
+        existing: dict[tuple, str | None] | None = None,
+    ) -> PlanSeriesDiff:
+        """rows を plan_series へ区切りながら書き込み、件数を返す。
+
+        level を渡すと level 未指定の行に補う。existing（自然キー → content_hash）を渡すと
+        差分書込みになり、一致した行は existing から取り除いて更新または据え置く
+        （残ったキーの削除は呼び出し側で行う）。挿入行数が閾値を超えた時点で二次インデックスを
+        外し、最後に作り直す（呼び出し側のトランザクション内で行うため、失敗時は
+        ロールバックでインデックスも元に戻る）。
+        """
+        threshold = self._read_bulk_index_threshold()
+        dropped: list[str] | None = None
+        cache_size = None
+        diff: PlanSeriesDiff = {
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+            "unchanged": 0,
+        }
+        it = iter(rows)
+        try:
+            while True:
+                chunk = [
+                    self._normalize_series_row(
+                        version_id,
+                        (
+                            row
+                            if level is None or row.get("level")
+                            else {**row, "level": level}
+                        ),
+                        now,
+                    )
+                    for row in islice(it, _SERIES_INSERT_CHUNK)
+                ]
+                if not chunk:
+                    break
+                inserts = chunk
+                if existing is not None:
+                    inserts, updates = self._diff_series_chunk(
+                        chunk, version_id, level, existing
+                    )
+                    if updates:
+                        conn.executemany(self._series_update_sql, updates)
+                    diff["updated"] += len(updates)
+                    diff["unchanged"] += len(chunk) - len(inserts) - len(updates)
+                if not inserts:
+                    continue
+                diff["inserted"] += len(inserts)
+                if dropped is None and 0 < threshold <= diff["inserted"]:
+                    dropped = self._drop_series_indexes(conn, diff["inserted"])
+                    if dropped:
+                        # 主キー索引の更新と作り直しのソートが収まるようページキャッシュを広げる
+                        cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+                        conn.execute(f"PRAGMA cache_size={_BULK_CACHE_SIZE}")
+                conn.executemany(self._series_insert_sql, inserts)
+            if dropped:
+                t0 = time.monotonic()
+                for sql in dropped:
+                    conn.execute(sql)
+                logging.info(
+                    "plan_repository_bulk_load",
+                    extra={
+                        "event": "plan_repository_bulk_load",
+                        "version_id": version_id,
+                        "rows": diff["inserted"],
+                        "rebuilt_indexes": len(dropped),
+                        "rebuild_ms": int((time.monotonic() - t0) * 1000),
+                    },
+                )
+        finally:
+            if cache_size is not None:
+                # 接続はプールで再利用されるため元に戻す
+                conn.execute(f"PRAGMA cache_size={int(cache_size)}")
+        return diff
+
+    def _diff_series_chunk(
+        self,
+        chunk: list[tuple],
+        version_id: str,
+        level: str | None,
+        existing: dict[tuple, str | None],
+    ) -> tuple[list[tuple], list[tuple]]:
+        """正規化済みの行を (挿入する行, UPDATE のパラメータ) に分ける。"""
+        inserts: list[tuple] = []
+        updates: list[tuple] = []
+        missing = object()
+        for values in chunk:
+            old = missing
+            if values[0] == version_id and values[1] == level:
+                key = tuple(values[i] for i in _SERIES_KEY_INDEX)
+                old = existing.pop(key, missing)
+            if old is missing:
+                inserts.append(values)
+            elif old != values[_SERIES_HASH_INDEX]:
+                updates.append(
+                    (
+                        *(values[i] for i in _SERIES_UPDATE_INDEX),
+                        version_id,
+                        level,
+                        *key,
+                    )
+                )
+        return inserts, updates
+
+    def _drop_series_indexes(self, conn: sqlite3.Connection, loading: int) -> list[str]:
+        """plan_series の二次インデックスを外し、作り直す CREATE 文を返す。
+
+        作り直しはテーブル全体を走査するため、既存の行（rowid の最大値で見積もる）が
+        書込み済みの行数の2倍を超える場合は外さない。
+        """
+        existing = conn.execute("SELECT MAX(rowid) FROM plan_series").fetchone()[0]
+        if (existing or 0) > 2 * loading:
+            return []
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type='index' AND tbl_name='plan_series' AND sql IS NOT NULL"
+        ).fetchall()
+        for name, _sql in indexes:
+            conn.execute(f'DROP INDEX "{name}"')
+        return [sql for _name, sql in indexes]
+
+    def _read_bulk_index_threshold(self) -> int:
+        try:
+            value = os.getenv(_BULK_INDEX_ENV, str(_BULK_INDEX_DEFAULT))
+            return max(0, int(value or 0))
+        except Exception:
+            return 0
+
     def _enforce_capacity_guard(self) -> None:
         max_rows = self._read_capacity_limit()
         if max_rows <= 0:
@@ -695,7 +1102,7 @@ class PlanRepository:
         if not location_key:
             raise PlanRepositoryError("PlanSeriesRow.location_key が未指定です")
 
-        return (
+        values = (
             row.get("version_id", version_id),
             level,
             bucket_type,
@@ -736,6 +1143,13 @@ class PlanRepository:
             row.get("created_at", now),
             row.get("updated_at", now),
         )
+        return (
+            *values,
+            _series_content_hash(values[_SERIES_HASHED]),
+            _series_search_text(
+                item_key, bucket_key, row.get("item_name"), row.get("extra_json")
+            ),
+        )
 
     def _read_trim_alert_threshold(self) -> int:
         try:
@@ -995,21 +1409,34 @@ class PlanRepository:
                     "source=excluded.source, "
                     "updated_at=excluded.updated_at"
                 )
-                for row in override_rows:
-                    normalized = self._normalize_override_row(version_id, row, now)
-                    conn.execute(upsert_sql, normalized)
+                conn.executemany(
+                    upsert_sql,
+                    [
+                        self._normalize_override_row(version_id, row, now)
+                        for row in override_rows
+                    ],
+                )
             override_id_map: dict[tuple[str, str], int] = {}
             if override_rows:
-                cursor = conn.execute(
-                    "SELECT id, level, key_hash FROM plan_overrides WHERE version_id=?",
-                    (version_id,),
-                )
-                for rec in cursor.fetchall():
-                    level = rec[1]
-                    key_hash = rec[2]
-                    if level is None or key_hash is None:
+                # 書き込んだキーの id だけを引く（版の全オーバーライドは読まない）
+                keys_by_level: dict[str, set[str]] = {}
+                for row in (*override_rows, *event_rows):
+                    if row.get("key_hash") is None:
                         continue
-                    override_id_map[(str(level), str(key_hash))] = rec[0]
+                    keys_by_level.setdefault(
+                        str(row.get("level") or "aggregate"), set()
+                    ).add(str(row["key_hash"]))
+                for level, keys in keys_by_level.items():
+                    for chunk in _chunked(sorted(keys)):
+                        cursor = conn.execute(
+                            "SELECT id, key_hash FROM plan_overrides "
+                            "WHERE version_id=? AND level=? AND key_hash IN ("
+                            + ",".join(["?"] * len(chunk))
+                            + ")",
+                            (version_id, level, *chunk),
+                        )
+                        for rec_id, key_hash in cursor.fetchall():
+                            override_id_map[(level, str(key_hash))] = rec_id
             if event_rows:
                 insert_sql = (
                     "INSERT INTO plan_override_events("
@@ -1017,6 +1444,7 @@ class PlanRepository:
                     "payload_json, actor, notes"
                     ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"
                 )
+                params_list = []
                 for row in event_rows:
                     normalized_event = self._normalize_override_event_row(
                         version_id, row, now
@@ -1031,18 +1459,20 @@ class PlanRepository:
                         override_id = override_id_map.get((level, key_hash))
                     if not override_id:
                         continue
-                    params = (
-                        override_id,
-                        event_dict.get("version_id"),
-                        level,
-                        key_hash,
-                        event_dict.get("event_type"),
-                        event_dict.get("event_ts"),
-                        event_dict.get("payload_json"),
-                        event_dict.get("actor"),
-                        event_dict.get("notes"),
+                    params_list.append(
+                        (
+                            override_id,
+                            event_dict.get("version_id"),
+                            level,
+                            key_hash,
+                            event_dict.get("event_type"),
+                            event_dict.get("event_ts"),
+                            event_dict.get("payload_json"),
+                            event_dict.get("actor"),
+                            event_dict.get("notes"),
+                        )
                     )
-                    conn.execute(insert_sql, params)
+                conn.executemany(insert_sql, params_list)
             conn.commit()
         except sqlite3.Error as exc:  # pragma: no cover - DB障害
             conn.rollback()
@@ -21,32 +21,22 @@ def _load_extra(row: Dict[str, Any]) -> Dict[str, Any]:
         return {}
 
 
-def fetch_aggregate_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, Any]]:
-    rows = repo.fetch_plan_series(version_id, "aggregate")
-    result: list[Dict[str, Any]] = []
-    for row in rows:
-        extra = _load_extra(row)
-        result.append(
-            {
-                "family": row.get("item_key"),
-                "period": row.get("time_bucket_key"),
-                "demand": row.get("demand"),
-                "supply": row.get("supply"),
-                "backlog": row.get("backlog"),
-                "cost_total": row.get("cost_total"),
-                "capacity_total": extra.get("capacity_total")
-                or row.get("capacity_used"),
-            }
-        )
-    return result
+def _aggregate_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    extra = _load_extra(row)
+    return {
+        "family": row.get("item_key"),
+        "period": row.get("time_bucket_key"),
+        "demand": row.get("demand"),
+        "supply": row.get("supply"),
+        "backlog": row.get("backlog"),
+        "cost_total": row.get("cost_total"),
+        "capacity_total": extra.get("capacity_total") or row.get("capacity_used"),
+    }
 
 
-def fetch_detail_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, Any]]:
-    rows = repo.fetch_plan_series(version_id, "det")
-    try:
-        inv_rows = repo.fetch_plan_series(version_id, "mrp_final")
-    except Exception:
-        inv_rows = []
+def _inventory_map(
+    inv_rows: Iterable[Dict[str, Any]],
+) -> dict[tuple[str, str], dict[str, Any]]:
     inventory_map: dict[tuple[str, str], dict[str, Any]] = {}
     for inv in inv_rows:
         week = inv.get("time_bucket_key")
@@ -73,6 +63,13 @@ def fetch_detail_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, A
             "planned_receipt_adj": extra_inv.get("planned_order_receipt_adj"),
             "scheduled_receipts": extra_inv.get("scheduled_receipts"),
         }
+    return inventory_map
+
+
+def _detail_rows(
+    rows: Iterable[Dict[str, Any]], inv_rows: Iterable[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    inventory_map = _inventory_map(inv_rows)
     result: list[Dict[str, Any]] = []
     for row in rows:
         extra = _load_extra(row)
@@ -106,10 +103,129 @@ def fetch_detail_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, A
     return result
 
 
+def fetch_aggregate_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, Any]]:
+    rows = repo.fetch_plan_series(version_id, "aggregate")
+    return [_aggregate_row(row) for row in rows]
+
+
+def fetch_detail_rows(repo: PlanRepository, version_id: str) -> List[Dict[str, Any]]:
+    rows = repo.fetch_plan_series(version_id, "det")
+    try:
+        inv_rows = repo.fetch_plan_series(version_id, "mrp_final")
+    except Exception:
+        inv_rows = []
+    return _detail_rows(rows, inv_rows)
+
+
+def _override_search_keys(
+    repo: PlanRepository, version_id: str, level: str, search: str
+) -> List[tuple[str, str]]:
+    """payload に search を含むオーバーライドの (item_key, time_bucket_key)。
+
+    オーバーライドは編集したセルの分だけなので、全件を読んで Python 側で突き合わせる
+    （照合する文字列は成果物経路と同じく JSON 表現の小文字）。
+    """
+    item_field, bucket_field = (
+        ("family", "period") if level == "aggregate" else ("sku", "week")
+    )
+    term = search.lower()
+    keys: List[tuple[str, str]] = []
+    for row in fetch_overrides_by_level(repo, version_id, level):
+        payload = row["payload"]
+        if term not in json.dumps(payload, ensure_ascii=False).lower():
+            continue
+        item, bucket = payload.get(item_field), payload.get(bucket_field)
+        if item is not None and bucket is not None:
+            keys.append((str(item), str(bucket)))
+    return keys
+
+
+def fetch_psi_page(
+    repo: PlanRepository,
+    version_id: str,
+    level: str,
+    *,
+    item_keys: Optional[Iterable[str]] = None,
+    bucket_keys: Optional[Iterable[str]] = None,
+    search: Optional[str] = None,
+    limit: int = 200,
+    offset: int = 0,
+) -> tuple[List[Dict[str, Any]], int]:
+    """PSI グリッドの1ページ分（aggregate/det の行の形）と該当件数を返す。
+
+    det の在庫・需給は、ページに含まれる SKU の mrp_final 行だけを読んで重ねる。
+    search はキー・品目名に加え、オーバーライドの値（payload）にも部分一致させる。
+    """
+    rows, total = repo.fetch_plan_series_page(
+        version_id,
+        "aggregate" if level == "aggregate" else "det",
+        item_keys=item_keys,
+        bucket_keys=bucket_keys,
+        search=search,
+        search_keys=(
+            _override_search_keys(repo, version_id, level, search) if search else None
+        ),
+        limit=limit,
+        offset=offset,
+    )
+    if level == "aggregate":
+        return [_aggregate_row(row) for row in rows], total
+    try:
+        inv_rows = repo.fetch_plan_series(
+            version_id,
+            "mrp_final",
+            item_keys=[row.get("item_key") for row in rows],
+        )
+    except Exception:
+        inv_rows = []
+    return _detail_rows(rows, inv_rows), total
+
+
+def fetch_mrp_rows(
+    repo: PlanRepository,
+    version_id: str,
+    *,
+    item_keys: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    """plan_series の mrp 行を scripts/mrp.py の出力行の形に戻す。"""
+    rows = repo.fetch_plan_series(version_id, "mrp", item_keys=item_keys)
+    result: list[Dict[str, Any]] = []
+    for row in rows:
+        extra = _load_extra(row)
+        item = row.get("item_key")
+        result.append(
+            {
+                "item": item,
+                "sku": item,
+                "week": row.get("time_bucket_key"),
+                "gross_req": row.get("demand"),
+                "scheduled_receipts": extra.get("scheduled_receipts"),
+                "on_hand_start": extra.get("on_hand_start"),
+                "net_req": row.get("backlog"),
+                "planned_order_receipt": extra.get(
+                    "planned_order_receipt", row.get("supply")
+                ),
+                "planned_order_release": extra.get("planned_order_release"),
+                "lt_weeks": extra.get("lt_weeks"),
+                "lot": extra.get("lot"),
+                "moq": extra.get("moq"),
+                "on_hand_end": extra.get("on_hand_end"),
+            }
+        )
+    return result
+
+
 def fetch_overrides_by_level(
-    repo: PlanRepository, version_id: str, level: str
+    repo: PlanRepository,
+    version_id: str,
+    level: str,
+    *,
+    key_hashes: Optional[Iterable[str]] = None,
+    locked: Optional[bool] = None,
 ) -> List[Dict[str, Any]]:
-    rows = repo.fetch_plan_overrides(version_id, level)
+    rows = repo.fetch_plan_overrides(
+        version_id, level, key_hashes=key_hashes, locked=locked
+    )
     result: list[Dict[str, Any]] = []
     for row in rows:
         payload_raw = row.get("payload_json")
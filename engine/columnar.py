@@ -0,0 +1,237 @@
+"""日次結果（daily_results）の列指向表現。
+
+従来の daily_results は「日 → ノード → 品目 → 指標」のネストした dict で、
+365日×数千ノード品目では数千万の dict エントリになる。`result_format="columnar"`
+では同じ内容を (day, node_idx, item_idx) で索引付けした型付き列（array）として保持し、
+UI/CSV など従来形式が必要な箇所には `nested()` の遅延ビューで1日分ずつ復元する。
+
+JSON 表現（RunRegistry 保存・API応答）:
+  {"format": "columnar", "version": 1, "metrics": [...], "nodes": [...],
+   "items": [...], "days": [...],
+   "columns": {"day": [...], "node_idx": [...], "item_idx": [...], <metric>: [...]}}
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+RESULT_FORMATS = ("nested", "columnar")
+COLUMNAR_VERSION = 1
+
+# 日次スナップショットの指標（nested 形式の各品目 dict のキー順）
+METRICS = (
+    "start_stock",
+    "end_stock",
+    "ordered_quantity",
+    "incoming",
+    "demand",
+    "sales",
+    "consumption",
+    "produced",
+    "shortage",
+    "backorder_balance",
+)
+
+
+def validate_result_format(value: Optional[str]) -> str:
+    name = (value or "nested").lower()
+    if name not in RESULT_FORMATS:
+        raise ValueError(f"unknown result format: {value}")
+    return name
+
+
+class ColumnarResults:
+    """(day, node_idx, item_idx) をキーとする指標列の集合。
+
+    行は日 → ノード名 → 品目名の昇順で追加する前提で、nested 形式への復元時も
+    その順序をそのまま使う。
+    """
+
+    def __init__(
+        self,
+        nodes: Optional[List[str]] = None,
+        items: Optional[List[str]] = None,
+    ):
+        # nodes/items は呼び出し側の intern 済みリストを共有してもよい
+        self.nodes: List[str] = nodes if nodes is not None else []
+        self.items: List[str] = items if items is not None else []
+        self._node_idx: Dict[str, int] = {n: i for i, n in enumerate(self.nodes)}
+        self._item_idx: Dict[str, int] = {n: i for i, n in enumerate(self.items)}
+        self.day = array("i")
+        self.node_idx = array("i")
+        self.item_idx = array("i")
+        self.columns: Dict[str, array] = {m: array("d") for m in METRICS}
+        self._metric_columns = [self.columns[m] for m in METRICS]
+        self.days: List[int] = []
+        self._day_offsets = array("q", [0])
+        self._current_day = 0
+
+    # ------------------------------------------------------------------
+    # 構築
+    # ------------------------------------------------------------------
+    def node_index(self, name: str) -> int:
+        idx = self._node_idx.get(name)
+        if idx is None:
+            idx = len(self.nodes)
+            self.nodes.append(name)
+            self._node_idx[name] = idx
+        return idx
+
+    def item_index(self, name: str) -> int:
+        idx = self._item_idx.get(name)
+        if idx is None:
+            idx = len(self.items)
+            self.items.append(name)
+            self._item_idx[name] = idx
+        return idx
+
+    def begin_day(self, day: int) -> None:
+        self.days.append(day)
+        self._current_day = day
+
+    def append_row(self, node_k: int, item_k: int, values: Iterable[float]) -> None:
+        """values は METRICS の順。"""
+        self.day.append(self._current_day)
+        self.node_idx.append(node_k)
+        self.item_idx.append(item_k)
+        for col, v in zip(self._metric_columns, values):
+            col.append(v)
+
+    def end_day(self) -> None:
+        self._day_offsets.append(len(self.day))
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.day)
+
+    def day_snapshot(self, i: int) -> Dict[str, Any]:
+        """i 番目の日を従来の nested 形式で返す。"""
+        lo, hi = self._day_offsets[i], self._day_offsets[i + 1]
+        nodes: Dict[str, Dict[str, Dict[str, float]]] = {}
+        node_names, item_names = self.nodes, self.items
+        cols = self._metric_columns
+        for r in range(lo, hi):
+            node_name = node_names[self.node_idx[r]]
+            bucket = nodes.get(node_name)
+            if bucket is None:
+                bucket = nodes[node_name] = {}
+            bucket[item_names[self.item_idx[r]]] = {
+                m: col[r] for m, col in zip(METRICS, cols)
+            }
+        return {"day": self.days[i], "nodes": nodes}
+
+    def nested(self) -> "NestedResultsView":
+        return NestedResultsView(self)
+
+    def to_nested(self) -> List[Dict[str, Any]]:
+        return [self.day_snapshot(i) for i in range(len(self.days))]
+
+    # ------------------------------------------------------------------
+    # 変換
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        columns: Dict[str, List[Any]] = {
+            "day": self.day.tolist(),
+            "node_idx": self.node_idx.tolist(),
+            "item_idx": self.item_idx.tolist(),
+        }
+        for m in METRICS:
+            columns[m] = self.columns[m].tolist()
+        return {
+            "format": "columnar",
+            "version": COLUMNAR_VERSION,
+            "metrics": list(METRICS),
+            "nodes": list(self.nodes),
+            "items": list(self.items),
+            "days": list(self.days),
+            "columns": columns,
+        }
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "ColumnarResults":
+        res = cls(list(doc.get("nodes") or []), list(doc.get("items") or []))
+        columns = doc.get("columns") or {}
+        res.day = array("i", columns.get("day") or [])
+        res.node_idx = array("i", columns.get("node_idx") or [])
+        res.item_idx = array("i", columns.get("item_idx") or [])
+        n_rows = len(res.day)
+        for m in METRICS:
+            values = columns.get(m)
+            res.columns[m] = array("d", values if values else bytes(8 * n_rows))
+        res._metric_columns = [res.columns[m] for m in METRICS]
+        res.days = list(doc.get("days") or [])
+        offsets = array("q", [0])
+        r = 0
+        for d in res.days:
+            while r < n_rows and res.day[r] == d:
+                r += 1
+            offsets.append(r)
+        res._day_offsets = offsets
+        return res
+
+    @classmethod
+    def from_nested(cls, results: Iterable[Dict[str, Any]]) -> "ColumnarResults":
+        res = cls()
+        for snapshot in results:
+            res.begin_day(snapshot.get("day"))
+            for node_name in sorted(snapshot.get("nodes") or {}):
+                node_k = res.node_index(node_name)
+                items = snapshot["nodes"][node_name]
+                for item_name in sorted(items):
+                    metrics = items[item_name]
+                    res.append_row(
+                        node_k,
+                        res.item_index(item_name),
+                        (metrics.get(m, 0) or 0 for m in METRICS),
+                    )
+            res.end_day()
+        return res
+
+
+class NestedResultsView(Sequence):
+    """ColumnarResults を従来の list[dict] として読む遅延ビュー。
+
+    要素アクセスのたびにその日の dict を組み立て、全日分を保持しない。
+    """
+
+    def __init__(self, columnar: ColumnarResults):
+        self._columnar = columnar
+
+    def __len__(self) -> int:
+        return len(self._columnar)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._columnar.day_snapshot(k) for k in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._columnar.day_snapshot(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, NestedResultsView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+
+def is_columnar(results: Any) -> bool:
+    return isinstance(results, dict) and results.get("format") == "columnar"
+
+
+def as_nested(results: Any) -> Any:
+    """保存済みの results を nested 形式として読めるようにする。
+
+    列形式（dict）なら遅延ビューを返し、それ以外（従来の list 等）はそのまま返す。
+    """
+    if is_columnar(results):
+        return ColumnarResults.from_dict(results).nested()
+    return results
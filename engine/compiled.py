@@ -0,0 +1,1168 @@
+"""整数インデックス化した状態で日次ループを回すコンパイル済みシミュレーションエンジン。
+
+`SupplyChainSimulator` と同じ `daily_results` / `daily_profit_loss` / `cost_trace`
+を返すオプトインのエンジン。ノード・品目・リンクを `__init__` で整数IDへ intern し、
+在庫・パイプライン・日次イベントカウンタを `array.array` に保持することで、
+`f"{node}_{item}"` 形式のキー生成と `split("_", 1)` による再分解を排除する。
+
+利用方法:
+  - `create_simulator(sim_input, engine="compiled")`
+  - 環境変数 `SCPLN_SIM_ENGINE=compiled`（`engine` 未指定時の既定値）
+
+互換性メモ:
+  - 従来エンジンはイベントキーを `_` で分解するため、ノード名に `_` を含む場合は
+    集計が崩れる。本エンジンは分解を行わないため、そのケースでは出力が異なる
+    （こちらが正しい値）。
+  - リードタイム0の発注は従来どおり当日分の出荷処理後に積まれるため出荷されない。
+    パイプライン指標にも従来どおり残す。
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import os
+import sys
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from domain.models import SimulationInput
+from engine.columnar import ColumnarResults
+from engine.simulator import PreparedNetwork, SupplyChainSimulator
+
+ENGINES = ("legacy", "compiled")
+
+# 容量の既定値（sys.float_info.max）以上は「無制限」とみなして追跡を省略する
+_UNBOUNDED = sys.float_info.max
+
+_TRANSPORT_TYPES = {
+    ("material", "factory"): "material_transport",
+    ("factory", "warehouse"): "warehouse_transport",
+    ("warehouse", "store"): "store_transport",
+}
+_STORAGE_CATEGORIES = {
+    "material": "material_storage",
+    "factory": "factory_storage",
+    "warehouse": "warehouse_storage",
+    "store": "store_storage",
+}
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CompiledSupplyChainSimulator(SupplyChainSimulator):
+    """配列ベースの状態で `SupplyChainSimulator.run` と同じ結果を生成する。"""
+
+    def __init__(
+        self,
+        sim_input: SimulationInput,
+        *,
+        result_format: str = "nested",
+        trace_sink: Any = None,
+        detail_level: str = "full",
+        prepared: Optional[PreparedNetwork] = None,
+    ):
+        super().__init__(
+            sim_input,
+            result_format=result_format,
+            trace_sink=trace_sink,
+            detail_level=detail_level,
+            prepared=prepared,
+        )
+        self._compile()
+        if self.columnar_results is not None:
+            # 列データのノード/品目インデックスは intern 済みIDをそのまま使う
+            self.columnar_results = ColumnarResults(self._node_names, self._item_names)
+            self.daily_results = self.columnar_results.nested()
+
+    # ------------------------------------------------------------------
+    # intern / 前計算
+    # ------------------------------------------------------------------
+    def _compile(self) -> None:
+        self._node_names: List[str] = list(self.nodes_map.keys())
+        self._node_objs = list(self.nodes_map.values())
+        self._node_idx: Dict[str, int] = {
+            name: k for k, name in enumerate(self._node_names)
+        }
+        self._node_type = [n.node_type for n in self._node_objs]
+        self._sorted_nodes = sorted(
+            range(len(self._node_names)), key=lambda k: self._node_names[k]
+        )
+        self._store_nodes = [
+            self._node_idx[n.name] for n in self.input.nodes if n.node_type == "store"
+        ]
+
+        caps = [getattr(n, "storage_capacity", float("inf")) for n in self._node_objs]
+        self._storage_cap = array("d", caps)
+        self._storage_capped = bytearray(1 if c < _UNBOUNDED else 0 for c in caps)
+        self._storage_allow = bytearray(
+            1 if getattr(n, "allow_storage_over_capacity", True) else 0
+            for n in self._node_objs
+        )
+        self._backorder_enabled = bytearray(
+            1 if getattr(n, "backorder_enabled", True) else 0 for n in self._node_objs
+        )
+        self._keeps_customer_bo = bytearray(
+            (
+                1
+                if getattr(n, "backorder_enabled", True)
+                and not getattr(n, "lost_sales", False)
+                else 0
+            )
+            for n in self._node_objs
+        )
+
+        # 品目
+        self._item_names: List[str] = []
+        self._item_idx: Dict[str, int] = {}
+        self._item_price = array("d")
+        self._item_unit_cost = array("d")
+        self._item_sgna = array("d")
+        for p in self.input.products:
+            self._intern_item(p.name)
+        for n in self.input.nodes:
+            for name in n.initial_stock:
+                self._intern_item(name)
+            for attr in ("producible_products", "reorder_point", "material_cost"):
+                for name in getattr(n, attr, None) or ():
+                    self._intern_item(name)
+        for cd in self.input.customer_demand:
+            self._intern_item(cd.product_name)
+
+        # リンク（network_map と同じく (from, to) 単位で後勝ち）
+        self._links = list(self.network_map.values())
+        self._link_idx: Dict[Tuple[int, int], int] = {}
+        self._link_from = array("l")
+        self._link_to = array("l")
+        self._link_cap = array("d")
+        self._link_capped = bytearray()
+        self._link_allow = bytearray()
+        self._link_lead = array("l")
+        self._link_class: List[Optional[str]] = []
+        for k, link in enumerate(self._links):
+            src = self._node_idx.get(link.from_node, -1)
+            dst = self._node_idx.get(link.to_node, -1)
+            self._link_idx[(src, dst)] = k
+            self._link_from.append(src)
+            self._link_to.append(dst)
+            self._link_cap.append(link.capacity_per_day)
+            self._link_capped.append(1 if link.capacity_per_day < _UNBOUNDED else 0)
+            self._link_allow.append(1 if link.allow_over_capacity else 0)
+            self._link_lead.append(link.lead_time)
+            types = (
+                self._node_type[src] if src >= 0 else None,
+                self._node_type[dst] if dst >= 0 else None,
+            )
+            self._link_class.append(_TRANSPORT_TYPES.get(types))
+
+        # (node, item) ペア単位の状態配列
+        self._pair_idx: Dict[Tuple[int, int], int] = {}
+        self._pair_node = array("l")
+        self._pair_item = array("l")
+        self._stock = array("d")
+        self._present = bytearray()
+        self._ev_sales = array("d")
+        self._ev_shortage = array("d")
+        self._ev_incoming = array("d")
+        self._ev_produced = array("d")
+        self._touched_flag = bytearray()
+        self._pend_dest = array("d")
+        self._pend_sup = array("d")
+        self._stale_sup = array("d")
+        self._prod_pipe = array("d")
+        self._cust_bo = array("d")
+        self._cust_bo_known = bytearray()
+        self._ordered_today = array("d")
+
+        n_nodes = len(self._node_names)
+        # 在庫キーの挿入順（保管費トレース順序）と品目名順（スナップショット順序）
+        self._present_order: List[List[int]] = [[] for _ in range(n_nodes)]
+        self._present_sorted: List[List[int]] = [[] for _ in range(n_nodes)]
+        self._bo_order: List[List[int]] = [[] for _ in range(n_nodes)]
+        self._storage_rates: List[Dict[int, float]] = [{} for _ in range(n_nodes)]
+        for k, node in enumerate(self._node_objs):
+            for item_name, unit_sv in node.storage_cost_variable.items():
+                if unit_sv > 0:
+                    self._storage_rates[k][self._intern_item(item_name)] = unit_sv
+            for item_name, qty in self.stock[node.name].items():
+                self._stock_add(self._pair(k, self._intern_item(item_name)), qty)
+
+        # 日次ワーク領域
+        self._touched: List[int] = []
+        self._ordered_pairs: List[int] = []
+        self._pending: Dict[int, List[tuple]] = defaultdict(list)
+        self._production: Dict[int, List[tuple]] = defaultdict(list)
+        self._transport: Dict[Tuple[int, int], float] = {}
+        self._transport_over: Dict[int, float] = {}
+        self._storage_over: Dict[int, float] = {}
+
+        # (需要行番号, pair) — 需要量は run() で前もって生成した行列から引く
+        self._demand_rows = []
+        for row, cd in enumerate(self.input.customer_demand):
+            node_k = self._node_idx.get(cd.store_name)
+            if node_k is None:
+                continue
+            self._demand_rows.append(
+                (row, self._pair(node_k, self._intern_item(cd.product_name)))
+            )
+        self._plan = self._compile_planning()
+
+    def _intern_item(self, name: str) -> int:
+        idx = self._item_idx.get(name)
+        if idx is not None:
+            return idx
+        idx = len(self._item_names)
+        self._item_idx[name] = idx
+        self._item_names.append(name)
+        product = self.products.get(name)
+        self._item_price.append(_as_float(getattr(product, "sales_price", 0)))
+        self._item_unit_cost.append(_as_float(getattr(product, "unit_cost", 0)))
+        self._item_sgna.append(_as_float(getattr(product, "sgna_cost_per_unit", 0)))
+        return idx
+
+    def _pair(self, node_k: int, item_k: int) -> int:
+        key = (node_k, item_k)
+        p = self._pair_idx.get(key)
+        if p is not None:
+            return p
+        p = len(self._pair_node)
+        self._pair_idx[key] = p
+        self._pair_node.append(node_k)
+        self._pair_item.append(item_k)
+        for arr in (
+            self._stock,
+            self._ev_sales,
+            self._ev_shortage,
+            self._ev_incoming,
+            self._ev_produced,
+            self._pend_dest,
+            self._pend_sup,
+            self._stale_sup,
+            self._prod_pipe,
+            self._cust_bo,
+            self._ordered_today,
+        ):
+            arr.append(0.0)
+        self._present.append(0)
+        self._touched_flag.append(0)
+        self._cust_bo_known.append(0)
+        return p
+
+    def _item_sort_key(self, p: int) -> str:
+        return self._item_names[self._pair_item[p]]
+
+    def _stock_add(self, p: int, qty: float) -> None:
+        if not self._present[p]:
+            self._present[p] = 1
+            node_k = self._pair_node[p]
+            self._present_order[node_k].append(p)
+            bisect.insort(self._present_sorted[node_k], p, key=self._item_sort_key)
+        self._stock[p] += qty
+
+    def _touch(self, p: int) -> None:
+        if not self._touched_flag[p]:
+            self._touched_flag[p] = 1
+            self._touched.append(p)
+
+    def _node_stock_total(self, node_k: int) -> float:
+        stock = self._stock
+        return sum(stock[p] for p in self._present_order[node_k])
+
+    def _compile_planning(self) -> List[tuple]:
+        """node_order 順の発注/生産計画エントリを前計算する。
+
+        補充方針（供給元・MOQ/倍数・リードタイム）は基底クラスの
+        _policy_cache を共有し、ここでは order-up-to 水準を確定させる。
+        """
+        plan: List[tuple] = []
+        for node_name in self.node_order:
+            node = self.nodes_map[node_name]
+            node_k = self._node_idx[node_name]
+            if node.node_type in ("store", "warehouse"):
+                is_store = node.node_type == "store"
+                deduct_bo = is_store and not getattr(node, "lost_sales", False)
+                for item_name in self._managed_items.get(node_name, ()):
+                    policy = self._policy_cache[(node_name, item_name)]
+                    if policy.supplier not in self._node_idx:
+                        continue
+                    parent_k = self._node_idx[policy.supplier]
+                    demand_mean, demand_std = self._demand_profile(node, item_name)
+                    eff_LR = max(0.0, (policy.lead_time + policy.review_period))
+                    order_up_to = policy.z * demand_std * math.sqrt(
+                        eff_LR
+                    ) + demand_mean * (eff_LR + 1)
+                    item_k = self._intern_item(item_name)
+                    plan.append(
+                        (
+                            "replenish",
+                            self._pair(node_k, item_k),
+                            self._pair(parent_k, item_k),
+                            self._link_idx.get((parent_k, node_k), -1),
+                            order_up_to,
+                            deduct_bo,
+                            not is_store,
+                            policy,
+                        )
+                    )
+            elif node.node_type == "factory":
+                factory_profile = self.factory_demand_profiles.get(node_name, {})
+                for fg_item in node.producible_products:
+                    profile = factory_profile.get(fg_item)
+                    if not profile:
+                        continue
+                    policy = self._production_policy_cache[(node_name, fg_item)]
+                    demand_mean = profile["mean"]
+                    demand_std = profile.get("std_dev", 0.0)
+                    eff_LR = max(0.0, (policy.lead_time + policy.review_period))
+                    order_up_to = policy.z * demand_std * math.sqrt(
+                        eff_LR
+                    ) + demand_mean * (eff_LR + 1)
+                    plan.append(
+                        (
+                            "produce",
+                            self._pair(node_k, self._intern_item(fg_item)),
+                            order_up_to,
+                            max(1, int(math.ceil(policy.lead_time))),
+                        )
+                    )
+                for item_name, reorder_point in getattr(
+                    node, "reorder_point", {}
+                ).items():
+                    if reorder_point is None:
+                        continue
+                    policy = self._policy_cache.get((node_name, item_name))
+                    item_k = self._intern_item(item_name)
+                    parent_pair = -1
+                    link_k = -1
+                    if policy is not None:
+                        parent_k = self._node_idx[policy.supplier]
+                        parent_pair = self._pair(parent_k, item_k)
+                        link_k = self._link_idx.get((parent_k, node_k), -1)
+                    plan.append(
+                        (
+                            "component",
+                            self._pair(node_k, item_k),
+                            parent_pair,
+                            link_k,
+                            reorder_point,
+                            node.order_up_to_level.get(item_name),
+                            policy,
+                        )
+                    )
+        return plan
+
+    # ------------------------------------------------------------------
+    # 日次ループ
+    # ------------------------------------------------------------------
+    def run(self):
+        self._demand_matrix = self._demand_draws()
+        record = self.record_daily_results
+        for day in range(self.input.planning_horizon):
+            start_stock = array("d", self._stock) if record else None
+            self._ship(day)
+            self._complete_production(day)
+            self._fill_customer_backorders()
+            self._consume_customer_demand(day)
+            self._plan_and_order(day)
+            self._record_snapshot(day, start_stock)
+            self._profit_loss(day)
+            self._reset_day()
+        self._export_state()
+        self.cost_trace.close()
+        return self.daily_results, self.daily_profit_loss
+
+    def _ship(self, day: int) -> None:
+        recs = self._pending.pop(day, None)
+        if not recs:
+            return
+        stock = self._stock
+        pair_node = self._pair_node
+        shipped_so_far: Dict[int, float] = {}
+        incoming_today: Dict[int, float] = {}
+        for qty, sp, dp, link_k, _is_bo in recs:
+            self._pend_dest[dp] -= qty
+            self._pend_sup[sp] -= qty
+            dest_k = pair_node[dp]
+            request_qty = min(stock[sp], qty)
+
+            link_capped = link_k >= 0 and self._link_capped[link_k]
+            shipped_candidate = request_qty
+            if link_capped and not self._link_allow[link_k]:
+                remaining_link_cap = max(
+                    0.0, self._link_cap[link_k] - shipped_so_far.get(link_k, 0.0)
+                )
+                shipped_candidate = min(shipped_candidate, remaining_link_cap)
+
+            node_capped = self._storage_capped[dest_k]
+            if node_capped:
+                storage_cap = self._storage_cap[dest_k]
+                total_stock_now = self._node_stock_total(dest_k)
+                if not self._storage_allow[dest_k]:
+                    remaining_storage = max(
+                        0.0,
+                        storage_cap
+                        - (total_stock_now + incoming_today.get(dest_k, 0.0)),
+                    )
+                    shipped_candidate = min(shipped_candidate, remaining_storage)
+
+            shipped = max(0.0, min(request_qty, shipped_candidate))
+
+            self._touch(sp)
+            if shipped > 0:
+                stock[sp] -= shipped
+                self._ev_sales[sp] += shipped
+                if node_capped:
+                    incoming = incoming_today.get(dest_k, 0.0) + shipped
+                    incoming_today[dest_k] = incoming
+                    if self._storage_allow[dest_k]:
+                        before_over = max(
+                            0.0, (total_stock_now + incoming - shipped) - storage_cap
+                        )
+                        after_over = max(
+                            0.0, (total_stock_now + incoming) - storage_cap
+                        )
+                        storage_over_add = max(0.0, after_over - before_over)
+                        if storage_over_add > 0:
+                            self._storage_over[dest_k] = (
+                                self._storage_over.get(dest_k, 0.0) + storage_over_add
+                            )
+
+                self._stock_add(dp, shipped)
+                self._touch(dp)
+                self._ev_incoming[dp] += shipped
+                if link_k >= 0:
+                    tkey = (link_k, self._pair_item[dp])
+                    self._transport[tkey] = self._transport.get(tkey, 0.0) + shipped
+
+                if link_capped:
+                    so_far = shipped_so_far.get(link_k, 0.0) + shipped
+                    shipped_so_far[link_k] = so_far
+                    if self._link_allow[link_k]:
+                        link_cap = self._link_cap[link_k]
+                        before_over_link = max(0.0, (so_far - shipped) - link_cap)
+                        after_over_link = max(0.0, so_far - link_cap)
+                        over_added = max(0.0, after_over_link - before_over_link)
+                        if over_added > 0:
+                            self._transport_over[link_k] = (
+                                self._transport_over.get(link_k, 0.0) + over_added
+                            )
+
+            if qty > shipped:
+                shortage = qty - shipped
+                self._ev_shortage[sp] += shortage
+                if self._backorder_enabled[pair_node[sp]]:
+                    self._pending[day + 1].append((shortage, sp, dp, link_k, True))
+                    self._pend_dest[dp] += shortage
+                    self._pend_sup[sp] += shortage
+
+    def _complete_production(self, day: int) -> None:
+        for qty, p in self._production.pop(day, ()):
+            self._prod_pipe[p] -= qty
+            factory_k = self._pair_node[p]
+            allow_over = self._storage_allow[factory_k]
+            capped = self._storage_capped[factory_k]
+            to_store = qty
+            if capped:
+                storage_cap = self._storage_cap[factory_k]
+                total_stock_now = self._node_stock_total(factory_k)
+                if not allow_over:
+                    to_store = min(qty, max(0.0, storage_cap - total_stock_now))
+            if to_store > 0:
+                self._stock_add(p, to_store)
+                self._touch(p)
+                self._ev_produced[p] += to_store
+                if allow_over and capped:
+                    over_after = max(0.0, (total_stock_now + to_store) - storage_cap)
+                    over_before = max(0.0, total_stock_now - storage_cap)
+                    over_add = max(0.0, over_after - over_before)
+                    if over_add > 0:
+                        self._storage_over[factory_k] = (
+                            self._storage_over.get(factory_k, 0.0) + over_add
+                        )
+            if to_store < qty and not allow_over:
+                remaining = qty - to_store
+                self._production[day + 1].append((remaining, p))
+                self._prod_pipe[p] += remaining
+
+    def _fill_customer_backorders(self) -> None:
+        stock = self._stock
+        cust_bo = self._cust_bo
+        for node_k in self._store_nodes:
+            for p in self._bo_order[node_k]:
+                bo_qty = cust_bo[p]
+                if bo_qty <= 0:
+                    continue
+                shipped = min(stock[p], bo_qty)
+                if shipped > 0:
+                    stock[p] -= shipped
+                    cust_bo[p] -= shipped
+                    self._touch(p)
+                    self._ev_sales[p] += shipped
+
+    def _consume_customer_demand(self, day: int) -> None:
+        stock = self._stock
+        matrix = self._demand_matrix
+        base = day * len(self.input.customer_demand)
+        for row, p in self._demand_rows:
+            demand_qty = matrix[base + row]
+            if demand_qty <= 0:
+                continue
+            self._touch(p)
+            shipped = min(stock[p], demand_qty)
+            if shipped > 0:
+                stock[p] -= shipped
+                self._ev_sales[p] += shipped
+            if demand_qty > shipped:
+                self._ev_shortage[p] += demand_qty - shipped
+                if self._keeps_customer_bo[self._pair_node[p]]:
+                    if not self._cust_bo_known[p]:
+                        self._cust_bo_known[p] = 1
+                        self._bo_order[self._pair_node[p]].append(p)
+                    self._cust_bo[p] += demand_qty - shipped
+
+    def _plan_and_order(self, day: int) -> None:
+        stock = self._stock
+        pend_dest = self._pend_dest
+        pend_sup = self._pend_sup
+        for entry in self._plan:
+            kind = entry[0]
+            if kind == "replenish":
+                _, p, sp, link_k, order_up_to, deduct_bo, deduct_out, policy = entry
+                inv_pos = stock[p] + pend_dest[p]
+                if deduct_bo:
+                    inv_pos -= self._cust_bo[p]
+                elif deduct_out:
+                    inv_pos -= pend_sup[p]
+                qty_to_order = max(0, math.ceil(order_up_to - inv_pos))
+                if qty_to_order > 0:
+                    qty_to_order = policy.round_quantity(qty_to_order)
+                    self._order(day, sp, p, link_k, qty_to_order)
+            elif kind == "produce":
+                _, p, order_up_to, completion_offset = entry
+                inv_pos = (
+                    stock[p] + self._prod_pipe[p] - (pend_sup[p] - self._stale_sup[p])
+                )
+                qty_to_produce = max(0, math.ceil(order_up_to - inv_pos))
+                if qty_to_produce > 0:
+                    self._production[day + completion_offset].append(
+                        (qty_to_produce, p)
+                    )
+                    self._prod_pipe[p] += qty_to_produce
+            else:
+                _, p, sp, link_k, reorder_point, level, policy = entry
+                inv_pos = stock[p] + pend_dest[p]
+                if inv_pos <= reorder_point:
+                    order_up_to = level if level is not None else inv_pos
+                    qty_to_order = max(0, order_up_to - inv_pos)
+                    if qty_to_order > 0 and sp >= 0:
+                        qty_to_order = policy.round_quantity(qty_to_order)
+                        self._order(day, sp, p, link_k, qty_to_order)
+
+    def _order(self, day: int, sp: int, dp: int, link_k: int, quantity) -> None:
+        supplier_name = self._node_names[self._pair_node[sp]]
+        customer_name = self._node_names[self._pair_node[dp]]
+        item_name = self._item_names[self._pair_item[dp]]
+        logging.debug(
+            "Day %s: Placing order for %s qty %s from %s to %s.",
+            day,
+            item_name,
+            quantity,
+            supplier_name,
+            customer_name,
+        )
+        if self.record_daily_results:
+            self.order_history[day].append(
+                (item_name, quantity, supplier_name, customer_name)
+            )
+        self.cumulative_ordered[(customer_name, item_name)] += quantity
+        ship_day = day + (self._link_lead[link_k] if link_k >= 0 else 0)
+        self._pending[ship_day].append((quantity, sp, dp, link_k, False))
+        self._pend_dest[dp] += quantity
+        self._pend_sup[sp] += quantity
+        if ship_day <= day:
+            # 当日分の出荷処理は完了済みのため、この発注は出荷されない
+            self._stale_sup[sp] += quantity
+        if not self._ordered_today[dp]:
+            self._ordered_pairs.append(dp)
+        self._ordered_today[dp] += quantity
+
+    def _backorder_balances(self, day: int) -> Dict[int, float]:
+        # バックオーダー出荷は常に翌日に積まれるため、翌日分のみ走査すればよい
+        balance: Dict[int, float] = {}
+        for qty, sp, _dp, _link_k, is_bo in self._pending.get(day + 1, ()):
+            if is_bo:
+                balance[sp] = balance.get(sp, 0.0) + qty
+        cust_bo = self._cust_bo
+        for node_k in self._store_nodes:
+            for p in self._bo_order[node_k]:
+                if cust_bo[p] > 0:
+                    balance[p] = balance.get(p, 0.0) + cust_bo[p]
+        return balance
+
+    def _snapshot_pairs(self) -> Iterator[Tuple[int, List[int]]]:
+        """スナップショット対象の (node_k, pair の品目名昇順) をノード名順に返す。"""
+        extras: Dict[int, List[int]] = defaultdict(list)
+        for p in self._touched:
+            if not self._present[p]:
+                extras[self._pair_node[p]].append(p)
+        for node_k in self._sorted_nodes:
+            pairs = self._present_sorted[node_k]
+            if node_k in extras:
+                pairs = sorted(
+                    set(pairs) | set(extras[node_k]), key=self._item_sort_key
+                )
+            yield node_k, pairs
+
+    def _observe_snapshot_kpis(
+        self, node_pairs: List[Tuple[int, List[int]]], balance: Dict[int, float]
+    ) -> None:
+        kpi = self.kpi
+        add_row = kpi.add_row
+        node_types = kpi.node_types
+        stock = self._stock
+        ev_sales = self._ev_sales
+        ev_shortage = self._ev_shortage
+        item_names = self._item_names
+        pair_item = self._pair_item
+        for node_k, pairs in node_pairs:
+            ntype = node_types.get(self._node_names[node_k])
+            if not ntype:
+                continue
+            for p in pairs:
+                sales = ev_sales[p]
+                shortage = ev_shortage[p]
+                add_row(
+                    ntype,
+                    item_names[pair_item[p]],
+                    sales + shortage,
+                    sales,
+                    shortage,
+                    stock[p],
+                    balance.get(p, 0.0),
+                )
+        kpi.end_day()
+
+    def _record_snapshot(self, day: int, start_stock: Optional[array]) -> None:
+        balance = self._backorder_balances(day)
+        node_pairs = list(self._snapshot_pairs())
+        self._observe_snapshot_kpis(node_pairs, balance)
+        if not self.record_daily_results:
+            return
+        if self.columnar_results is not None:
+            self._record_columnar_snapshot(day, start_stock, node_pairs, balance)
+            return
+        snapshot: Dict[str, Any] = {"day": day + 1, "nodes": {}}
+        n_start = len(start_stock)
+        stock = self._stock
+        ev_sales = self._ev_sales
+        ev_shortage = self._ev_shortage
+        for node_k, pairs in node_pairs:
+            if not pairs:
+                continue
+            node_snapshot = {}
+            for p in pairs:
+                sales = ev_sales[p]
+                shortage = ev_shortage[p]
+                node_snapshot[self._item_names[self._pair_item[p]]] = {
+                    "start_stock": start_stock[p] if p < n_start else 0,
+                    "end_stock": stock[p],
+                    "ordered_quantity": self._ordered_today[p],
+                    "incoming": self._ev_incoming[p],
+                    "demand": sales + shortage,
+                    "sales": sales,
+                    "consumption": 0,
+                    "produced": self._ev_produced[p],
+                    "shortage": shortage,
+                    "backorder_balance": balance.get(p, 0.0),
+                }
+            snapshot["nodes"][self._node_names[node_k]] = node_snapshot
+        self.daily_results.append(snapshot)
+
+    def _record_columnar_snapshot(
+        self,
+        day: int,
+        start_stock: array,
+        node_pairs: List[Tuple[int, List[int]]],
+        balance: Dict[int, float],
+    ) -> None:
+        columnar = self.columnar_results
+        columnar.begin_day(day + 1)
+        n_start = len(start_stock)
+        stock = self._stock
+        ev_sales = self._ev_sales
+        ev_shortage = self._ev_shortage
+        pair_item = self._pair_item
+        append_row = columnar.append_row
+        for node_k, pairs in node_pairs:
+            for p in pairs:
+                sales = ev_sales[p]
+                shortage = ev_shortage[p]
+                append_row(
+                    node_k,
+                    pair_item[p],
+                    (
+                        start_stock[p] if p < n_start else 0,
+                        stock[p],
+                        self._ordered_today[p],
+                        self._ev_incoming[p],
+                        sales + shortage,
+                        sales,
+                        0,
+                        self._ev_produced[p],
+                        shortage,
+                        balance.get(p, 0.0),
+                    ),
+                )
+        columnar.end_day()
+
+    def _profit_loss(self, day: int) -> None:
+        pl = {
+            "day": day + 1,
+            "revenue": 0,
+            "material_cost": 0,
+            "sgna_cost": 0,
+            "flow_costs": {
+                "material_transport_fixed": 0,
+                "material_transport_variable": 0,
+                "production_fixed": 0,
+                "production_variable": 0,
+                "warehouse_transport_fixed": 0,
+                "warehouse_transport_variable": 0,
+                "store_transport_fixed": 0,
+                "store_transport_variable": 0,
+            },
+            "stock_costs": {
+                "material_storage_fixed": 0,
+                "material_storage_variable": 0,
+                "factory_storage_fixed": 0,
+                "factory_storage_variable": 0,
+                "warehouse_storage_fixed": 0,
+                "warehouse_storage_variable": 0,
+                "store_storage_fixed": 0,
+                "store_storage_variable": 0,
+            },
+            "penalty_costs": {
+                "stockout": 0,
+                "backorder": 0,
+            },
+            "total_cost": 0,
+            "profit_loss": 0,
+        }
+        flow = pl["flow_costs"]
+        stock_costs = pl["stock_costs"]
+        node_names = self._node_names
+        item_names = self._item_names
+
+        # 販売（売上・売上原価・販管費）と生産実績
+        produced_by_factory: Dict[str, float] = {}
+        nodes_produced = set()
+        for p in self._touched:
+            node_k = self._pair_node[p]
+            produced_qty = self._ev_produced[p]
+            if produced_qty > 0:
+                name = node_names[node_k]
+                produced_by_factory[name] = (
+                    produced_by_factory.get(name, 0.0) + produced_qty
+                )
+                nodes_produced.add(name)
+            sales_qty = self._ev_sales[p]
+            if sales_qty > 0 and self._node_type[node_k] == "store":
+                item_k = self._pair_item[p]
+                item_name = item_names[item_k]
+                if not item_name:
+                    continue
+                price = self._item_price[item_k]
+                unit_cost = self._item_unit_cost[item_k]
+                sgna_unit = self._item_sgna[item_k]
+                if price > 0:
+                    pl["revenue"] += sales_qty * price
+                if unit_cost > 0:
+                    pl["material_cost"] += sales_qty * unit_cost
+                    self._push_cost(
+                        day,
+                        node_names[node_k],
+                        item_name,
+                        "sale_cogs",
+                        sales_qty,
+                        unit_cost,
+                        "material",
+                    )
+                if sgna_unit > 0:
+                    pl["sgna_cost"] += sales_qty * sgna_unit
+                    self._push_cost(
+                        day,
+                        node_names[node_k],
+                        item_name,
+                        "sale_sgna",
+                        sales_qty,
+                        sgna_unit,
+                        "sgna",
+                    )
+
+        # 輸送
+        transport_costs_by_type = {
+            "material_transport": {"fixed": 0.0, "variable": 0.0},
+            "warehouse_transport": {"fixed": 0.0, "variable": 0.0},
+            "store_transport": {"fixed": 0.0, "variable": 0.0},
+        }
+        for (link_k, item_k), qty in self._transport.items():
+            if qty <= 0:
+                continue
+            ttype = self._link_class[link_k]
+            if ttype is None:
+                continue
+            link = self._links[link_k]
+            dest_name = node_names[self._link_to[link_k]]
+            item = item_names[item_k]
+            costs = transport_costs_by_type[ttype]
+            costs["fixed"] += link.transportation_cost_fixed
+            self._push_cost(
+                day,
+                dest_name,
+                item,
+                "transport_fixed",
+                1.0,
+                link.transportation_cost_fixed,
+                "transport_fixed",
+            )
+            costs["variable"] += link.transportation_cost_variable * qty
+            self._push_cost(
+                day,
+                dest_name,
+                item,
+                "transport_var",
+                qty,
+                link.transportation_cost_variable,
+                "transport_var",
+            )
+            if ttype == "material_transport":
+                supplier = self._node_objs[self._link_from[link_k]]
+                unit_material = getattr(supplier, "material_cost", {}).get(item, 0)
+                pl["material_cost"] += unit_material * qty
+                self._push_cost(
+                    day,
+                    dest_name,
+                    item,
+                    "material_purchase",
+                    qty,
+                    unit_material,
+                    "material",
+                )
+
+        # 生産
+        for node_name in nodes_produced:
+            node = self.nodes_map.get(node_name)
+            if node.node_type == "factory" and node.production_cost_fixed > 0:
+                flow["production_fixed"] += node.production_cost_fixed
+                self._push_cost(
+                    day,
+                    node_name,
+                    "",
+                    "production_fixed",
+                    1.0,
+                    node.production_cost_fixed,
+                    "production_fixed",
+                )
+        for node_name, qty_prod in produced_by_factory.items():
+            node = self.nodes_map.get(node_name)
+            if node.node_type != "factory":
+                continue
+            var_cost = getattr(node, "production_cost_variable", 0) or 0
+            if var_cost > 0 and qty_prod > 0:
+                flow["production_variable"] += var_cost * qty_prod
+                self._push_cost(
+                    day,
+                    node_name,
+                    "",
+                    "production_var",
+                    qty_prod,
+                    var_cost,
+                    "production_var",
+                )
+            prod_cap = getattr(node, "production_capacity", float("inf"))
+            allow_over = getattr(node, "allow_production_over_capacity", True)
+            if prod_cap == float("inf") or not allow_over:
+                continue
+            over_qty = max(0.0, qty_prod - prod_cap)
+            if over_qty > 0:
+                if node.production_over_capacity_variable_cost > 0:
+                    flow["production_variable"] += (
+                        node.production_over_capacity_variable_cost * over_qty
+                    )
+                    self._push_cost(
+                        day,
+                        node_name,
+                        "",
+                        "production_over_var",
+                        over_qty,
+                        node.production_over_capacity_variable_cost,
+                        "production_var",
+                    )
+                if node.production_over_capacity_fixed_cost > 0:
+                    flow["production_fixed"] += node.production_over_capacity_fixed_cost
+                    self._push_cost(
+                        day,
+                        node_name,
+                        "",
+                        "production_over_fixed",
+                        1.0,
+                        node.production_over_capacity_fixed_cost,
+                        "production_fixed",
+                    )
+
+        for transport_type, costs in transport_costs_by_type.items():
+            flow[f"{transport_type}_fixed"] = costs["fixed"]
+            flow[f"{transport_type}_variable"] = costs["variable"]
+
+        # 輸送キャパ超過
+        for link_k, over_qty in self._transport_over.items():
+            if over_qty <= 0:
+                continue
+            ttype = self._link_class[link_k]
+            if ttype is None:
+                continue
+            link = self._links[link_k]
+            dest_name = node_names[self._link_to[link_k]]
+            flow[f"{ttype}_variable"] += link.over_capacity_variable_cost * over_qty
+            if link.over_capacity_variable_cost > 0:
+                self._push_cost(
+                    day,
+                    dest_name,
+                    "",
+                    "transport_over_var",
+                    over_qty,
+                    link.over_capacity_variable_cost,
+                    "transport_var",
+                )
+            if link.over_capacity_fixed_cost > 0:
+                flow[f"{ttype}_fixed"] += link.over_capacity_fixed_cost
+                self._push_cost(
+                    day,
+                    dest_name,
+                    "",
+                    "transport_over_fixed",
+                    1.0,
+                    link.over_capacity_fixed_cost,
+                    "transport_fixed",
+                )
+
+        # 保管
+        stock = self._stock
+        for node_k, node in enumerate(self._node_objs):
+            cat = _STORAGE_CATEGORIES.get(node.node_type)
+            if not cat:
+                continue
+            if node.storage_cost_fixed > 0:
+                stock_costs[f"{cat}_fixed"] += node.storage_cost_fixed
+                self._push_cost(
+                    day,
+                    node.name,
+                    "",
+                    "storage_fixed",
+                    1.0,
+                    node.storage_cost_fixed,
+                    "storage_fixed",
+                )
+            rates = self._storage_rates[node_k]
+            if rates:
+                for p in self._present_order[node_k]:
+                    item_k = self._pair_item[p]
+                    unit_sv = rates.get(item_k)
+                    if unit_sv:
+                        qty = stock[p]
+                        stock_costs[f"{cat}_variable"] += qty * unit_sv
+                        self._push_cost(
+                            day,
+                            node.name,
+                            item_names[item_k],
+                            "storage_var",
+                            qty,
+                            unit_sv,
+                            "storage_var",
+                        )
+            over_qty = self._storage_over.get(node_k, 0)
+            if over_qty > 0:
+                if node.storage_over_capacity_variable_cost > 0:
+                    stock_costs[f"{cat}_variable"] += (
+                        node.storage_over_capacity_variable_cost * over_qty
+                    )
+                    self._push_cost(
+                        day,
+                        node.name,
+                        "",
+                        "storage_over_var",
+                        over_qty,
+                        node.storage_over_capacity_variable_cost,
+                        "storage_var",
+                    )
+                if node.storage_over_capacity_fixed_cost > 0:
+                    stock_costs[f"{cat}_fixed"] += node.storage_over_capacity_fixed_cost
+                    self._push_cost(
+                        day,
+                        node.name,
+                        "",
+                        "storage_over_fixed",
+                        1.0,
+                        node.storage_over_capacity_fixed_cost,
+                        "storage_fixed",
+                    )
+
+        # ペナルティ（欠品）
+        for p in self._touched:
+            shortage = self._ev_shortage[p]
+            if shortage > 0:
+                node = self._node_objs[self._pair_node[p]]
+                unit_cost = getattr(node, "stockout_cost_per_unit", 0)
+                if unit_cost > 0:
+                    pl["penalty_costs"]["stockout"] += unit_cost * shortage
+                    self._push_cost(
+                        day,
+                        node.name,
+                        "",
+                        "penalty_stockout",
+                        shortage,
+                        unit_cost,
+                        "penalty_stockout",
+                    )
+
+        # ペナルティ（バックオーダー保有）
+        supplier_bo_by_node: Dict[int, float] = {}
+        for qty, sp, _dp, _link_k, is_bo in self._pending.get(day + 1, ()):
+            if is_bo:
+                node_k = self._pair_node[sp]
+                supplier_bo_by_node[node_k] = supplier_bo_by_node.get(node_k, 0.0) + qty
+        cust_bo = self._cust_bo
+        store_bo_by_node = [
+            (node_k, sum(cust_bo[p] for p in self._bo_order[node_k] if cust_bo[p] > 0))
+            for node_k in self._store_nodes
+        ]
+        for node_k, qty in list(supplier_bo_by_node.items()) + store_bo_by_node:
+            node = self._node_objs[node_k]
+            unit_cost = getattr(node, "backorder_cost_per_unit_per_day", 0)
+            if qty > 0 and unit_cost > 0:
+                pl["penalty_costs"]["backorder"] += unit_cost * qty
+                self._push_cost(
+                    day,
+                    node.name,
+                    "",
+                    "penalty_backorder",
+                    qty,
+                    unit_cost,
+                    "penalty_backorder",
+                )
+
+        total_flow = sum(flow.values())
+        total_stock = sum(stock_costs.values())
+        total_penalty = sum(pl["penalty_costs"].values())
+        total_sgna = float(pl.get("sgna_cost", 0) or 0)
+        pl["total_cost"] = (
+            pl["material_cost"] + total_flow + total_stock + total_penalty + total_sgna
+        )
+        pl["profit_loss"] = pl["revenue"] - pl["total_cost"]
+        if self.record_profit_loss:
+            self.daily_profit_loss.append(pl)
+        self.kpi.add_profit_loss(pl)
+
+    def _reset_day(self) -> None:
+        for p in self._touched:
+            self._touched_flag[p] = 0
+            self._ev_sales[p] = 0.0
+            self._ev_shortage[p] = 0.0
+            self._ev_incoming[p] = 0.0
+            self._ev_produced[p] = 0.0
+        self._touched = []
+        for p in self._ordered_pairs:
+            self._ordered_today[p] = 0.0
+        self._ordered_pairs = []
+        self._transport = {}
+        self._transport_over = {}
+        self._storage_over = {}
+
+    def _export_state(self) -> None:
+        """配列状態を従来エンジンと同じ名前キーの構造へ書き戻す。"""
+        node_names = self._node_names
+        item_names = self._item_names
+
+        def _key(p: int) -> Tuple[str, str]:
+            return node_names[self._pair_node[p]], item_names[self._pair_item[p]]
+
+        self.stock = {
+            name: defaultdict(
+                float,
+                {item_names[self._pair_item[p]]: self._stock[p] for p in order},
+            )
+            for name, order in zip(node_names, self._present_order)
+        }
+        self.pending_shipments = defaultdict(list)
+        self._pending_by_dest_item = defaultdict(float)
+        self._pending_by_supplier_item = defaultdict(float)
+        self._backorders_by_ship_day = defaultdict(lambda: defaultdict(float))
+        for ship_day, recs in self._pending.items():
+            for qty, sp, dp, _link_k, is_bo in recs:
+                supplier_name, item_name = _key(sp)
+                dest_name = node_names[self._pair_node[dp]]
+                self.pending_shipments[ship_day].append(
+                    (item_name, qty, supplier_name, dest_name, is_bo)
+                )
+                self._pending_by_dest_item[(dest_name, item_name)] += qty
+                self._pending_by_supplier_item[(supplier_name, item_name)] += qty
+                if is_bo:
+                    self._backorders_by_ship_day[ship_day][
+                        (supplier_name, item_name)
+                    ] += qty
+        self._stale_by_supplier_item = defaultdict(float)
+        for p in range(len(self._stale_sup)):
+            if self._stale_sup[p]:
+                self._stale_by_supplier_item[_key(p)] = self._stale_sup[p]
+        self.production_orders = defaultdict(list)
+        self._production_by_factory_item = defaultdict(float)
+        for completion_day, recs in self._production.items():
+            for qty, p in recs:
+                factory_name, item_name = _key(p)
+                self.production_orders[completion_day].append(
+                    (item_name, qty, factory_name)
+                )
+                self._production_by_factory_item[(factory_name, item_name)] += qty
+        self.customer_backorders = defaultdict(lambda: defaultdict(float))
+        for node_k in self._store_nodes:
+            bucket = self.customer_backorders[node_names[node_k]]
+            for p in self._bo_order[node_k]:
+                bucket[item_names[self._pair_item[p]]] = self._cust_bo[p]
+
+
+def create_simulator(
+    sim_input: SimulationInput,
+    *,
+    engine: Optional[str] = None,
+    result_format: str = "nested",
+    trace_sink: Any = None,
+    detail_level: str = "full",
+    prepared: Optional[PreparedNetwork] = None,
+) -> SupplyChainSimulator:
+    """エンジン名に応じたシミュレータを生成する。
+
+    engine 未指定時は環境変数 SCPLN_SIM_ENGINE（既定: legacy）を参照する。
+    result_format="columnar" で日次結果を列形式で保持する（engine/columnar.py）。
+    trace_sink を渡すと cost_trace をその sink へ逐次書き出す（engine/cost_trace.py）。
+    detail_level="pl" / "summary" では daily_results と cost_trace（summary は日次PLも）を
+    記録せず、compute_summary の KPI だけを日次ループ内で集計する（engine/kpi.py）。
+    prepared には構造と需要が同じ入力の `SupplyChainSimulator.prepare()` を渡せる。
+    """
+    name = (engine or os.getenv("SCPLN_SIM_ENGINE", "legacy") or "legacy").lower()
+    if name not in ENGINES:
+        raise ValueError(f"unknown simulation engine: {name}")
+    cls = CompiledSupplyChainSimulator if name == "compiled" else SupplyChainSimulator
+    return cls(
+        sim_input,
+        result_format=result_format,
+        trace_sink=trace_sink,
+        detail_level=detail_level,
+        prepared=prepared,
+    )
@@ -0,0 +1,292 @@
+"""コスト明細（cost_trace）の型付きバッファ。
+
+従来の cost_trace は1イベントごとに8キーの dict を積むリストで、長期間・多ノードの
+シミュレーションではメモリ使用量の大半を占めていた。`CostTrace` は同じ内容を
+intern 済みのコードと型付き列（array）で保持する:
+
+  day: int32 / node・item・event・account: int16（コード）/ qty・unit_cost・amount: float64
+
+読み手には従来どおり dict の列（Sequence）として見え、要素アクセスのたびに1行分の
+dict を組み立てる。sink を渡すと一定行数ごとに sink へ書き出してバッファを空にし、
+全行を保持しない（日×勘定科目の合計だけを残すので `account_totals` は使える）。
+
+sink は ``write(rows)`` と ``close()`` を持つオブジェクト（`CsvTraceSink` など）。
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# 1行の dict のキー順（従来の cost_trace と同じ）
+TRACE_FIELDS = (
+    "day",
+    "node",
+    "item",
+    "event",
+    "qty",
+    "unit_cost",
+    "amount",
+    "account",
+)
+# /runs/{run_id}/trace.csv の列
+TRACE_CSV_FIELDS = ("run_id", *TRACE_FIELDS)
+TRACE_DIR_ENV = "SCPLN_TRACE_DIR"
+
+_DEFAULT_CHUNK_ROWS = 65536
+# int16 コードの上限。超えた列は int32 に広げる
+_SHORT_MAX = 32767
+
+
+class CostTrace(Sequence):
+    """(day, node, item, event, account) をコード化したコスト明細の列。"""
+
+    def __init__(
+        self,
+        sink: Any = None,
+        *,
+        retain: Optional[bool] = None,
+        chunk_rows: int = _DEFAULT_CHUNK_ROWS,
+    ):
+        """retain 未指定時は sink が無ければ保持、あれば sink へ書いた行を捨てる。"""
+        self.nodes: List[str] = []
+        self.items: List[str] = []
+        self.events: List[str] = []
+        self.accounts: List[str] = []
+        self._codes: Dict[str, Dict[str, int]] = {
+            "node_idx": {},
+            "item_idx": {},
+            "event_idx": {},
+            "account_idx": {},
+        }
+        self.day = array("i")
+        self.node_idx = array("h")
+        self.item_idx = array("h")
+        self.event_idx = array("h")
+        self.account_idx = array("h")
+        self.qty = array("d")
+        self.unit_cost = array("d")
+        self.amount = array("d")
+        self.sink = sink
+        self.retain = sink is None if retain is None else retain
+        self.chunk_rows = max(1, int(chunk_rows))
+        self._code_maps = tuple(self._codes.values())
+        # sink へ書き出し済みの行位置と、捨てた行の件数・(day, account) 合計
+        self._flushed = 0
+        self._flush_at = self.chunk_rows if sink is not None else float("inf")
+        self._dropped = 0
+        self._dropped_totals: Dict[Tuple[int, int], float] = {}
+
+    # ------------------------------------------------------------------
+    # 構築
+    # ------------------------------------------------------------------
+    def _code(self, column: str, names: List[str], name: str) -> int:
+        codes = self._codes[column]
+        idx = codes.get(name)
+        if idx is None:
+            idx = codes[name] = len(names)
+            names.append(name)
+            col = getattr(self, column)
+            if idx > _SHORT_MAX and col.typecode == "h":
+                setattr(self, column, array("i", col))
+        return idx
+
+    def append(
+        self,
+        day: int,
+        node: str,
+        item: str,
+        event: str,
+        qty: float,
+        unit_cost: float,
+        amount: float,
+        account: str,
+    ) -> None:
+        """1行を追加する（day は 1-based）。"""
+        node_codes, item_codes, event_codes, account_codes = self._code_maps
+        # 新しい名前のコード付けで列が int32 に置き換わることがあるため、先にコードを得る
+        k = node_codes.get(node)
+        if k is None:
+            k = self._code("node_idx", self.nodes, node)
+        self.node_idx.append(k)
+        k = item_codes.get(item)
+        if k is None:
+            k = self._code("item_idx", self.items, item)
+        self.item_idx.append(k)
+        k = event_codes.get(event)
+        if k is None:
+            k = self._code("event_idx", self.events, event)
+        self.event_idx.append(k)
+        k = account_codes.get(account)
+        if k is None:
+            k = self._code("account_idx", self.accounts, account)
+        self.account_idx.append(k)
+        day_col = self.day
+        day_col.append(day)
+        self.qty.append(qty)
+        self.unit_cost.append(unit_cost)
+        self.amount.append(amount)
+        if len(day_col) >= self._flush_at:
+            self.flush()
+
+    def flush(self) -> None:
+        """未書出しの行を sink へ書く。retain=False なら書いた行をバッファから捨てる。"""
+        if self.sink is None:
+            return
+        n = len(self.day)
+        if n > self._flushed:
+            self.sink.write(self.iter_records(self._flushed, n))
+        self._flushed = n
+        self._flush_at = n + self.chunk_rows
+        if self.retain or not n:
+            return
+        totals = self._dropped_totals
+        for key, amount in zip(zip(self.day, self.account_idx), self.amount):
+            totals[key] = totals.get(key, 0.0) + amount
+        for col in self._columns():
+            del col[:]
+        self._dropped += n
+        self._flushed = 0
+        self._flush_at = self.chunk_rows
+
+    def close(self) -> None:
+        """残りを sink へ書いて sink を閉じる。"""
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+    def _columns(self) -> Tuple[array, ...]:
+        return (
+            self.day,
+            self.node_idx,
+            self.item_idx,
+            self.event_idx,
+            self.account_idx,
+            self.qty,
+            self.unit_cost,
+            self.amount,
+        )
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def total_rows(self) -> int:
+        """sink へ書いて捨てた行も含む件数。"""
+        return self._dropped + len(self.day)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """i 番目の行を従来の dict 形式で返す。"""
+        return next(self.iter_records(i, i + 1))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.record(k) for k in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_records()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, CostTrace)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def iter_records(
+        self, lo: int = 0, hi: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        hi = len(self.day) if hi is None else hi
+        nodes, items, events, accounts = (
+            self.nodes,
+            self.items,
+            self.events,
+            self.accounts,
+        )
+        for i in range(lo, hi):
+            yield {
+                "day": self.day[i],
+                "node": nodes[self.node_idx[i]],
+                "item": items[self.item_idx[i]],
+                "event": events[self.event_idx[i]],
+                "qty": self.qty[i],
+                "unit_cost": self.unit_cost[i],
+                "amount": self.amount[i],
+                "account": accounts[self.account_idx[i]],
+            }
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self.iter_records())
+
+    def to_columns(self) -> Dict[str, Any]:
+        """行の dict を作らずに {fields, columns}（TRACE_FIELDS 順の列）を返す。"""
+        return {
+            "fields": list(TRACE_FIELDS),
+            "columns": [
+                self.day.tolist(),
+                [self.nodes[k] for k in self.node_idx],
+                [self.items[k] for k in self.item_idx],
+                [self.events[k] for k in self.event_idx],
+                self.qty.tolist(),
+                self.unit_cost.tolist(),
+                self.amount.tolist(),
+                [self.accounts[k] for k in self.account_idx],
+            ],
+        }
+
+    def account_totals(self) -> Dict[Tuple[int, str], float]:
+        """(day, account) ごとの amount 合計（sink へ書いて捨てた行も含む）。
+
+        行の dict を作らず day/account/amount の列だけを走査する。同じキーの中では
+        追加順に足すので、従来の行ごとの集計と同じ値になる。
+        """
+        totals = dict(self._dropped_totals)
+        for key, amount in zip(zip(self.day, self.account_idx), self.amount):
+            totals[key] = totals.get(key, 0.0) + amount
+        accounts = self.accounts
+        return {(day, accounts[acc]): v for (day, acc), v in totals.items()}
+
+
+class CsvTraceSink:
+    """cost_trace を /runs/{run_id}/trace.csv と同じ列の CSV へ書く sink。"""
+
+    def __init__(self, path: Union[str, Path], run_id: str = ""):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=TRACE_CSV_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, rows: Iterable[Dict[str, Any]]) -> None:
+        run_id = self.run_id
+        self._writer.writerows({"run_id": run_id, **row} for row in rows)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def trace_spool_path(run_id: str) -> Optional[Path]:
+    """SCPLN_TRACE_DIR 設定時に run_id の trace CSV を書く（読む）パス。"""
+    base = os.getenv(TRACE_DIR_ENV)
+    if not base:
+        return None
+    return Path(base) / f"{run_id}.csv"
+
+
+def trace_records(trace: Any) -> List[Dict[str, Any]]:
+    """RunRegistry・API応答へ渡す cost_trace（従来の list[dict]）を返す。"""
+    if isinstance(trace, CostTrace):
+        return trace.to_records()
+    return trace or []
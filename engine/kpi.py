@@ -0,0 +1,154 @@
+"""シミュレーション KPI（`compute_summary`）のオンライン集計。
+
+従来の `compute_summary` は実行後に daily_results の全日×全ノード×全品目を走査し、
+さらに daily_profit_loss を科目ごとに7回走査していた。`KpiAccumulator` は日次ループの
+中でスナップショット行と日次PLを1回ずつ受け取り、サマリに必要な値だけを保持する:
+
+  - ノード種別ごとの需要・販売・欠品・期末在庫の合計（平均在庫は日数で割る）
+  - 店舗の日次バックオーダー残の最大値とその日（同値は先の日）
+  - 店舗の品目別欠品合計（上位 k 件は最後に heapq で選ぶ）
+  - 売上・原価・物流費・保管費・販管費・ペナルティの合計
+
+行と日次PLは従来の走査と同じ順序（日 → ノード名 → 品目名）で加算するため、
+浮動小数点の丸めも含めて従来のサマリと同じ値になる。daily_results を記録しない
+実行（モンテカルロ・シナリオ比較）でもサマリを返せる。
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+NODE_TYPES = ("store", "warehouse", "factory", "material")
+TOP_SHORTAGE_ITEMS = 5
+
+
+class KpiAccumulator:
+    """日次のスナップショット行と PL を逐次受け取って KPI を集計する。"""
+
+    def __init__(self, node_types: Mapping[str, str], top_k: int = TOP_SHORTAGE_ITEMS):
+        self.node_types = dict(node_types)
+        self.top_k = top_k
+        self.days = 0
+        # 種別 -> [demand, sales, shortage, end_stock_sum]
+        self.totals: Dict[str, list] = {t: [0.0, 0.0, 0.0, 0.0] for t in NODE_TYPES}
+        self.shortage_by_item: Dict[str, float] = {}
+        self.backorder_peak: Optional[float] = None
+        self.backorder_peak_day = 0
+        self._backorder_today = 0.0
+        self.revenue = 0
+        self.material = 0
+        self.flow = 0
+        self.stock = 0
+        self.sgna = 0
+        self.penalty_stockout = 0
+        self.penalty_backorder = 0
+
+    @classmethod
+    def from_results(
+        cls,
+        node_types: Mapping[str, str],
+        daily_results: Iterable[Dict[str, Any]],
+        daily_profit_loss: Iterable[Dict[str, Any]],
+    ) -> "KpiAccumulator":
+        """記録済みの daily_results / daily_profit_loss から集計し直す。"""
+        acc = cls(node_types)
+        for day in daily_results:
+            for node_name, items in day.get("nodes", {}).items():
+                ntype = acc.node_types.get(node_name)
+                if not ntype:
+                    continue
+                for item_name, m in items.items():
+                    acc.add_row(
+                        ntype,
+                        item_name,
+                        m.get("demand", 0) or 0,
+                        m.get("sales", 0) or 0,
+                        m.get("shortage", 0) or 0,
+                        m.get("end_stock", 0) or 0,
+                        m.get("backorder_balance", 0) or 0,
+                    )
+            acc.end_day()
+        for pl in daily_profit_loss:
+            acc.add_profit_loss(pl)
+        return acc
+
+    def add_row(
+        self,
+        ntype: str,
+        item: str,
+        demand: float,
+        sales: float,
+        shortage: float,
+        end_stock: float,
+        backorder_balance: float,
+    ) -> None:
+        """1ノード×1品目のスナップショット行を加える（ntype 不明の行は呼ばない）。"""
+        t = self.totals[ntype]
+        t[0] += demand
+        t[1] += sales
+        t[2] += shortage
+        t[3] += end_stock
+        if ntype == "store":
+            by_item = self.shortage_by_item
+            by_item[item] = by_item.get(item, 0.0) + shortage
+            self._backorder_today += backorder_balance
+
+    def end_day(self) -> None:
+        """1日分の行を加え終えたら呼ぶ。"""
+        self.days += 1
+        bo = self._backorder_today
+        if self.backorder_peak is None or bo > self.backorder_peak:
+            self.backorder_peak = bo
+            self.backorder_peak_day = self.days
+        self._backorder_today = 0.0
+
+    def add_profit_loss(self, pl: Dict[str, Any]) -> None:
+        self.revenue += pl.get("revenue", 0) or 0
+        self.material += pl.get("material_cost", 0) or 0
+        self.flow += sum((pl.get("flow_costs", {}) or {}).values())
+        self.stock += sum((pl.get("stock_costs", {}) or {}).values())
+        self.sgna += pl.get("sgna_cost", 0) or 0
+        penalty = pl.get("penalty_costs", {}) or {}
+        self.penalty_stockout += penalty.get("stockout", 0) or 0
+        self.penalty_backorder += penalty.get("backorder", 0) or 0
+
+    def summary(self) -> Dict[str, Any]:
+        days = max(1, self.days)
+        totals = self.totals
+        store_demand = totals["store"][0]
+        store_sales = totals["store"][1]
+        fill_rate = (store_sales / store_demand) if store_demand > 0 else 1.0
+        total_penalty = self.penalty_stockout + self.penalty_backorder
+        total_cost = self.material + self.flow + self.stock + total_penalty + self.sgna
+        total_profit = self.revenue - total_cost
+        # sorted(..., key=-qty)[:k] と同じく、同値は最初に現れた品目を優先する
+        top_short = heapq.nlargest(
+            self.top_k, self.shortage_by_item.items(), key=lambda x: x[1]
+        )
+        return {
+            "planning_days": days,
+            "fill_rate": fill_rate,
+            "store_demand_total": store_demand,
+            "store_sales_total": store_sales,
+            "customer_shortage_total": totals["store"][2],
+            "network_shortage_total": sum(
+                totals[t][2] for t in ("warehouse", "factory", "material")
+            ),
+            "avg_on_hand_by_type": {t: totals[t][3] / days for t in NODE_TYPES},
+            "backorder_peak": (
+                self.backorder_peak if self.backorder_peak is not None else 0
+            ),
+            "backorder_peak_day": self.backorder_peak_day,
+            "revenue_total": self.revenue,
+            "cost_total": total_cost,
+            "sgna_total": self.sgna,
+            "penalty_stockout_total": self.penalty_stockout,
+            "penalty_backorder_total": self.penalty_backorder,
+            "penalty_total": total_penalty,
+            "profit_total": total_profit,
+            "profit_per_day_avg": total_profit / days if days else 0,
+            "top_shortage_items": [
+                {"item": it, "shortage": qty} for it, qty in top_short
+            ],
+        }
@@ -0,0 +1,186 @@
+"""シード違いの複製シミュレーションを並列実行するモンテカルロ実行器。
+
+`SimulationInput.random_seed` 1つでは1本のサンプルパスしか得られないため、
+`base_seed + i`（i = 0..N-1）の N 本を `ProcessPoolExecutor` で実行し、
+`compute_summary()` の主要KPIを分位点（p5/p50/p95）として返す。
+
+設計メモ:
+  - 入力はワーカー初期化時に1回だけ渡す（タスクごとには送らない）。タスクは
+    シードのチャンクのみを受け取る。
+  - 結果はチャンク完了順に受け取り、KPIの値だけを蓄積する（各複製も
+    `detail_level="summary"` で日次結果を記録しない）。
+  - workers<=1 の場合はプロセスを起動せず同一プロセスで順に実行する。
+  - ワーカー数の既定値は環境変数 `SCPLN_MC_WORKERS`（未設定時は CPU 数）。
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from domain.models import SimulationInput
+from engine.compiled import create_simulator
+
+MC_METRICS = ("fill_rate", "profit_total", "backorder_peak")
+PERCENTILES = (5, 50, 95)
+
+_WORKER_INPUT: Optional[SimulationInput] = None
+_WORKER_ENGINE: Optional[str] = None
+
+
+def _init_worker(sim_input: SimulationInput, engine: Optional[str]) -> None:
+    global _WORKER_INPUT, _WORKER_ENGINE
+    _WORKER_INPUT = sim_input
+    _WORKER_ENGINE = engine
+
+
+def _run_one(
+    sim_input: SimulationInput, engine: Optional[str], seed: int
+) -> Dict[str, Any]:
+    replica = sim_input.model_copy(update={"random_seed": seed})
+    # KPI は日次ループ内で集計されるため、日次結果は記録しない
+    sim = create_simulator(replica, engine=engine, detail_level="summary")
+    sim.run()
+    return sim.compute_summary()
+
+
+def _run_chunk(seeds: Sequence[int]) -> List[Tuple[int, Dict[str, Any]]]:
+    if _WORKER_INPUT is None:
+        raise RuntimeError("montecarlo worker is not initialized")
+    return [(seed, _run_one(_WORKER_INPUT, _WORKER_ENGINE, seed)) for seed in seeds]
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """線形補間による分位点（NumPy の既定と同じ定義）。"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * (q / 100.0)
+    lo = math.floor(rank)
+    hi = math.ceil(rank)
+    if lo == hi:
+        return float(sorted_values[lo])
+    frac = rank - lo
+    return float(sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * frac)
+
+
+class MonteCarloAccumulator:
+    """複製ごとのサマリを受け取り、KPI 値のみを保持して分位点を計算する。"""
+
+    def __init__(self, metrics: Sequence[str] = MC_METRICS):
+        self.metrics = tuple(metrics)
+        self.values: Dict[str, List[float]] = {m: [] for m in self.metrics}
+        self.count = 0
+
+    def add(self, summary: Dict[str, Any]) -> None:
+        for m in self.metrics:
+            self.values[m].append(float(summary.get(m, 0) or 0))
+        self.count += 1
+
+    def bands(self) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        for m in self.metrics:
+            vals = sorted(self.values[m])
+            band = {f"p{q}": percentile(vals, q) for q in PERCENTILES}
+            band["mean"] = (sum(vals) / len(vals)) if vals else 0.0
+            band["min"] = vals[0] if vals else 0.0
+            band["max"] = vals[-1] if vals else 0.0
+            out[m] = band
+        return out
+
+
+def _resolve_workers(workers: Optional[int], replications: int) -> int:
+    if workers is None:
+        env = os.getenv("SCPLN_MC_WORKERS")
+        workers = int(env) if env else (os.cpu_count() or 1)
+    return max(1, min(int(workers), replications))
+
+
+def iter_replications(
+    sim_input: SimulationInput,
+    replications: int,
+    *,
+    base_seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(seed, compute_summary()) を完了順に返す。"""
+    if replications <= 0:
+        return
+    if base_seed is None:
+        base_seed = int(getattr(sim_input, "random_seed", None) or 0)
+    seeds = [base_seed + i for i in range(replications)]
+    n_workers = _resolve_workers(workers, replications)
+    if n_workers <= 1:
+        for seed in seeds:
+            yield seed, _run_one(sim_input, engine, seed)
+        return
+    if chunk_size is None:
+        # ワーカーあたり数チャンクに分け、偏りとIPC回数のバランスを取る
+        chunk_size = max(1, replications // (n_workers * 4))
+    chunks = [seeds[i : i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(sim_input, engine),
+    ) as pool:
+        futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+        for fut in as_completed(futures):
+            yield from fut.result()
+
+
+def run_montecarlo(
+    sim_input: SimulationInput,
+    replications: int,
+    *,
+    base_seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    include_samples: bool = False,
+    on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """N 本の複製を実行し、fill_rate / profit_total / backorder_peak の分位点を返す。
+
+    include_samples=True の場合は各シードのKPI値をシード順で添付する。
+    on_result は各複製の完了時に (seed, summary) で呼ばれる（進捗通知用）。
+    """
+    if replications <= 0:
+        raise ValueError("replications must be positive")
+    if base_seed is None:
+        base_seed = int(getattr(sim_input, "random_seed", None) or 0)
+    n_workers = _resolve_workers(workers, replications)
+    acc = MonteCarloAccumulator()
+    samples: List[Dict[str, Any]] = []
+    for seed, summary in iter_replications(
+        sim_input,
+        replications,
+        base_seed=base_seed,
+        workers=n_workers,
+        engine=engine,
+    ):
+        acc.add(summary)
+        if include_samples:
+            samples.append(
+                {"seed": seed, **{m: summary.get(m, 0) or 0 for m in MC_METRICS}}
+            )
+        if on_result is not None:
+            on_result(seed, summary)
+    result: Dict[str, Any] = {
+        "replications": acc.count,
+        "base_seed": base_seed,
+        "workers": n_workers,
+        "metrics": acc.bands(),
+    }
+    if include_samples:
+        result["samples"] = sorted(samples, key=lambda r: r["seed"])
+    return result
+
+
+def bands_to_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """metrics を1行1指標の行リストへ展開する（ジョブ結果/CSV 用）。"""
+    return [
+        {"metric": metric, **band}
+        for metric, band in (result.get("metrics") or {}).items()
+    ]
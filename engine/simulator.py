@@ -1,7 +1,13 @@
 import logging
 import math
 import random
+from array import array
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from engine.columnar import ColumnarResults, validate_result_format
+from engine.cost_trace import CostTrace
+from engine.kpi import KpiAccumulator
 from domain.models import (
     SimulationInput,
     StoreNode,
@@ -20,6 +26,21 @@ except Exception:  # pragma: no cover
     norm_ppf = NormalDist().inv_cdf
 
 
+# 記録する出力の粒度。summary: KPI のみ / pl: 日次PLまで / full: 日次結果と cost_trace も
+DETAIL_LEVELS = ("summary", "pl", "full")
+
+
+def validate_detail_level(value: Optional[str]) -> str:
+    name = (value or "full").lower()
+    if name not in DETAIL_LEVELS:
+        raise ValueError(f"unknown detail level: {value}")
+    return name
+
+
+def _skip_cost(*_args, **_kwargs) -> None:
+    """cost_trace を記録しない粒度で `_push_cost` の代わりに使う。"""
+
+
 def _service_level_z(p: float) -> float:
     if p is None:
         return 0.0
@@ -30,14 +51,189 @@ def _service_level_z(p: float) -> float:
     return float(norm_ppf(p))
 
 
+def _is_int(x: float) -> bool:
+    return math.isclose(x, round(x))
+
+
+_STORAGE_CATEGORIES = {
+    "material": "material_storage",
+    "factory": "factory_storage",
+    "warehouse": "warehouse_storage",
+    "store": "store_storage",
+}
+
+
+def _as_price(value) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _transport_class(supplier, dest) -> Optional[str]:
+    """リンク両端のノード種別から輸送費の区分を返す（対象外は None）。"""
+    if isinstance(supplier, MaterialNode) and isinstance(dest, FactoryNode):
+        return "material_transport"
+    if isinstance(supplier, FactoryNode) and isinstance(dest, WarehouseNode):
+        return "warehouse_transport"
+    if isinstance(supplier, WarehouseNode) and isinstance(dest, StoreNode):
+        return "store_transport"
+    return None
+
+
+def _parse_event_key(key: str) -> tuple:
+    """daily_events のキーを (種別, ...) に分解する。
+
+    - "{node}_{item}" → ("pair", node, item)
+    - "transport:{from}->{to}:{item}" → ("transport", from, to, item)
+    - "transport_overage:{from}->{to}" → ("transport_overage", from, to)
+    - "storage_overage:{node}" → ("storage_overage", node)
+    それ以外（分解できないキー）は ("",)。
+    """
+    if ":" not in key:
+        node_name, sep, item_name = key.partition("_")
+        return ("pair", node_name, item_name) if sep else ("",)
+    if key.startswith("transport:"):
+        route, sep, item = key.split(":", 1)[1].partition(":")
+        supplier_name, arrow, dest_name = route.partition("->")
+        if sep and arrow:
+            return ("transport", supplier_name, dest_name, item)
+    elif key.startswith("transport_overage:"):
+        supplier_name, arrow, dest_name = key.split(":", 1)[1].partition("->")
+        if arrow:
+            return ("transport_overage", supplier_name, dest_name)
+    elif key.startswith("storage_overage:"):
+        return ("storage_overage", key.split(":", 1)[1])
+    return ("",)
+
+
+def _standard_normals(rng: random.Random, count: int) -> list:
+    """標準正規乱数を count 個まとめて生成する。
+
+    `rng.gauss()` を count 回呼んだ場合と同じ系列（Box-Muller の2値を順に使用）を
+    返し、呼び出しごとのメソッド/属性参照を省く。余った1値は rng.gauss_next に残す。
+    """
+    out = []
+    append = out.append
+    uniform = rng.random
+    pending = rng.gauss_next
+    rng.gauss_next = None
+    if pending is not None and count > 0:
+        append(pending)
+        pending = None
+    cos, sin, log, sqrt = math.cos, math.sin, math.log, math.sqrt
+    two_pi = 2.0 * math.pi
+    while len(out) < count:
+        x2pi = uniform() * two_pi
+        g2rad = sqrt(-2.0 * log(1.0 - uniform()))
+        append(cos(x2pi) * g2rad)
+        if len(out) < count:
+            append(sin(x2pi) * g2rad)
+        else:
+            pending = sin(x2pi) * g2rad
+    rng.gauss_next = pending
+    return out
+
+
+@dataclass(frozen=True)
+class ReplenishmentPolicy:
+    """ノード×品目ごとの補充方針。__init__ で一度だけ解決する。"""
+
+    supplier: str
+    z: float
+    lead_time: float
+    review_period: float
+    moq: float = 0
+    # ノード/リンク双方が整数倍数を持つ場合の最小公倍数（0 は未設定）
+    order_multiple: int = 0
+    # order_multiple が無い場合に順に適用する個別倍数
+    multiples: Tuple[float, ...] = ()
+
+    @classmethod
+    def resolve(cls, node_obj, link_obj, item_name, *, supplier, z, lead_time):
+        node_moq = getattr(node_obj, "moq", {}).get(item_name, 0)
+        node_mult = getattr(node_obj, "order_multiple", {}).get(item_name, 0)
+        link_moq = getattr(link_obj, "moq", {}).get(item_name, 0) if link_obj else 0
+        link_mult = (
+            getattr(link_obj, "order_multiple", {}).get(item_name, 0) if link_obj else 0
+        )
+        eff_mult = 0
+        if (node_mult or 0) > 0 and (link_mult or 0) > 0:
+            if _is_int(node_mult) and _is_int(link_mult):
+                a, b = int(round(node_mult)), int(round(link_mult))
+                eff_mult = abs(a * b) // math.gcd(a, b)
+        return cls(
+            supplier=supplier,
+            z=z,
+            lead_time=lead_time,
+            review_period=getattr(node_obj, "review_period_days", 0) or 0,
+            moq=max(node_moq or 0, link_moq or 0),
+            order_multiple=eff_mult,
+            multiples=tuple(m for m in (node_mult, link_mult) if m and m > 0),
+        )
+
+    def round_quantity(self, qty):
+        """MOQ と発注倍数を適用した発注数量を返す。"""
+        if 0 < qty < self.moq:
+            qty = self.moq
+        if self.order_multiple:
+            return int(math.ceil(qty / self.order_multiple) * self.order_multiple)
+        for m in self.multiples:
+            qty = int(math.ceil(qty / m) * m)
+        return qty
+
+
+@dataclass(frozen=True)
+class PreparedNetwork:
+    """ネットワーク構造と顧客需要だけから決まる前計算（`SupplyChainSimulator.prepare`）。
+
+    隣接インデックス・倉庫/工場の需要プロファイル・需要の抽選結果を持つ。サービス水準・
+    MOQ・キャパシティ・リードタイムなど数値だけが異なる入力（同じ乱数シード）の間で
+    共有でき、シナリオスイープ（engine/sweep.py）が各バリアントで使い回す。読み取り専用。
+    """
+
+    parent_by_child: Dict[str, str]
+    children_by_parent: Dict[str, list]
+    material_supplier_by_factory_item: Dict[Tuple[str, str], str]
+    demands_by_store: Dict[str, list]
+    demand_by_store_item: Dict[Tuple[str, str], object]
+    warehouse_demand_profiles: Dict[str, Dict[str, dict]]
+    factory_demand_profiles: Dict[str, Dict[str, dict]]
+    demand_matrix: array
+
+
 class SupplyChainSimulator:
-    def __init__(self, sim_input: SimulationInput):
+    def __init__(
+        self,
+        sim_input: SimulationInput,
+        *,
+        result_format: str = "nested",
+        trace_sink: Any = None,
+        detail_level: str = "full",
+        prepared: Optional[PreparedNetwork] = None,
+    ):
         self.input = sim_input
+        self.result_format = validate_result_format(result_format)
+        # full 以外は daily_results・cost_trace（と日次の発注履歴）を記録しない。
+        # KPI（compute_summary）は粒度によらず日次ループ内で集計する
+        self.detail_level = validate_detail_level(detail_level)
+        self.record_daily_results = self.detail_level == "full"
+        self.record_profit_loss = self.detail_level != "summary"
         self.products = {p.name: p for p in self.input.products}
         self.nodes_map = {n.name: n for n in self.input.nodes}
         self.network_map = {
             (link.from_node, link.to_node): link for link in self.input.network
         }
+        self._prepared_demand: Optional[array] = None
+        if prepared is None:
+            self._build_topology_index()
+            self.warehouse_demand_profiles = self._calculate_warehouse_demand_profiles()
+            self.factory_demand_profiles = self._calculate_factory_demand_profiles()
+        else:
+            self._use_prepared(prepared)
+        self._snapshot_node_set: set = set()
+        self._snapshot_node_order: list = []
+        self._snapshot_item_order: Dict[str, tuple] = {}
 
         self.stock = {
             n.name: defaultdict(float, n.initial_stock) for n in self.input.nodes
@@ -56,44 +252,236 @@ class SupplyChainSimulator:
         # Sum of quantities across all future days, keyed by (dest,item) and (supplier,item)
         self._pending_by_dest_item = defaultdict(float)
         self._pending_by_supplier_item = defaultdict(float)
+        # 出荷日 <= 発注日 の出荷（リードタイム0）は処理されないまま残るため、
+        # 工場の出荷予定からは除外できるよう供給元別に別集計する
+        self._stale_by_supplier_item = defaultdict(float)
+        # Future production receipts keyed by (factory, item)
+        self._production_by_factory_item = defaultdict(float)
+        # Backorder re-shipments keyed by ship day -> (supplier, item)
+        self._backorders_by_ship_day = defaultdict(lambda: defaultdict(float))
 
         self.cumulative_ordered = defaultdict(float)
         self.cumulative_received = defaultdict(float)
 
         self.daily_results = []
+        self.columnar_results: Optional[ColumnarResults] = None
+        if self.result_format == "columnar" and self.record_daily_results:
+            # daily_results は列データを nested 形式で読む遅延ビューになる
+            self.columnar_results = ColumnarResults()
+            self.daily_results = self.columnar_results.nested()
         self.daily_profit_loss = []
+        self.kpi = KpiAccumulator(
+            {name: n.node_type for name, n in self.nodes_map.items()}
+        )
         self.node_order = self._get_topological_order()
         self.pl_summary = {}
-        self.cost_trace = []
-        self.warehouse_demand_profiles = self._calculate_warehouse_demand_profiles()
-        self.factory_demand_profiles = self._calculate_factory_demand_profiles()
+        # trace_sink 指定時は明細を sink へ逐次書き出し、全行は保持しない
+        self.cost_trace = CostTrace(trace_sink if self.record_daily_results else None)
+        if not self.record_daily_results:
+            self._push_cost = _skip_cost
+        self._compile_cost_model()
+        self._production_policy_cache: Dict[Tuple[str, str], ReplenishmentPolicy] = {}
+        self._policy_cache = self._build_policy_cache()
+        # 従来と同じ set の走査順を保ったまま、方針が解決できた品目だけを保持する
+        self._managed_items = {
+            node.name: [
+                item_name
+                for item_name in set(node.initial_stock.keys())
+                if (node.name, item_name) in self._policy_cache
+            ]
+            for node in self.input.nodes
+            if isinstance(node, (StoreNode, WarehouseNode))
+        }
+
+    def _compile_cost_model(self):
+        """日次PLで使う単価・料率・輸送区分を前計算する。
+
+        calculate_daily_profit_loss が日ごと・キーごとに行っていた品目/ノードの解決、
+        isinstance による輸送区分の判定、価格の float 変換を初期化時の1回にまとめる。
+        daily_events のキーの分解結果も初出時にキャッシュする。
+        """
+        # 品目 → (販売価格, 売上原価単価, 販管費単価)
+        self._sale_rates: Dict[str, Tuple[float, float, float]] = {
+            name: (
+                _as_price(getattr(product, "sales_price", 0)),
+                _as_price(getattr(product, "unit_cost", 0)),
+                _as_price(getattr(product, "sgna_cost_per_unit", 0)),
+            )
+            for name, product in self.products.items()
+        }
+        self._store_names = {
+            name for name, node in self.nodes_map.items() if isinstance(node, StoreNode)
+        }
+        # (from, to) → (輸送区分, リンク, 供給元の原材料単価)。区分外のリンクは持たない
+        self._link_costs: Dict[Tuple[str, str], tuple] = {}
+        for (supplier_name, dest_name), link in self.network_map.items():
+            supplier = self.nodes_map.get(supplier_name)
+            ttype = _transport_class(supplier, self.nodes_map.get(dest_name))
+            if ttype:
+                self._link_costs[(supplier_name, dest_name)] = (
+                    ttype,
+                    link,
+                    getattr(supplier, "material_cost", {}),
+                )
+        # 保管費: (ノード, 区分, 正の変動保管単価だけの dict)
+        self._storage_costs = [
+            (
+                node,
+                _STORAGE_CATEGORIES[node.node_type],
+                {k: v for k, v in node.storage_cost_variable.items() if v > 0},
+            )
+            for node in self.nodes_map.values()
+            if node.node_type in _STORAGE_CATEGORIES
+        ]
+        self._stockout_rates: Dict[str, float] = {}
+        self._backorder_rates: Dict[str, float] = {}
+        for name, node in self.nodes_map.items():
+            if getattr(node, "stockout_cost_per_unit", 0) > 0:
+                self._stockout_rates[name] = node.stockout_cost_per_unit
+            if getattr(node, "backorder_cost_per_unit_per_day", 0) > 0:
+                self._backorder_rates[name] = node.backorder_cost_per_unit_per_day
+        self._event_keys: Dict[str, tuple] = {}
+
+    def prepare(self) -> PreparedNetwork:
+        """構造と需要が同じ別の入力で使い回せる前計算を取り出す。"""
+        return PreparedNetwork(
+            parent_by_child=self._parent_by_child,
+            children_by_parent=self._children_by_parent,
+            material_supplier_by_factory_item=self._material_supplier_by_factory_item,
+            demands_by_store=self._demands_by_store,
+            demand_by_store_item=self._demand_by_store_item,
+            warehouse_demand_profiles=self.warehouse_demand_profiles,
+            factory_demand_profiles=self.factory_demand_profiles,
+            demand_matrix=self._demand_draws(),
+        )
+
+    def _use_prepared(self, prepared: PreparedNetwork) -> None:
+        self._parent_by_child = prepared.parent_by_child
+        self._children_by_parent = prepared.children_by_parent
+        self._material_supplier_by_factory_item = (
+            prepared.material_supplier_by_factory_item
+        )
+        self._demands_by_store = prepared.demands_by_store
+        self._demand_by_store_item = prepared.demand_by_store_item
+        self.warehouse_demand_profiles = prepared.warehouse_demand_profiles
+        self.factory_demand_profiles = prepared.factory_demand_profiles
+        self._prepared_demand = prepared.demand_matrix
+
+    def _build_topology_index(self):
+        """ネットワーク/需要の隣接インデックスを構築する。
+
+        いずれも入力順で最初に見つかった要素を採用し、従来の線形探索
+        （next(...)）と同じ結果を返す。
+        """
+        self._parent_by_child: Dict[str, str] = {}
+        self._children_by_parent: Dict[str, list] = defaultdict(list)
+        self._material_supplier_by_factory_item: Dict[Tuple[str, str], str] = {}
+        for link in self.input.network:
+            self._parent_by_child.setdefault(link.to_node, link.from_node)
+            self._children_by_parent[link.from_node].append(link.to_node)
+            supplier = self.nodes_map.get(link.from_node)
+            if supplier is not None and supplier.node_type == "material":
+                for item_name in supplier.material_cost:
+                    self._material_supplier_by_factory_item.setdefault(
+                        (link.to_node, item_name), link.from_node
+                    )
+        self._demands_by_store: Dict[str, list] = defaultdict(list)
+        self._demand_by_store_item: Dict[Tuple[str, str], object] = {}
+        for demand in self.input.customer_demand:
+            self._demands_by_store[demand.store_name].append(demand)
+            self._demand_by_store_item.setdefault(
+                (demand.store_name, demand.product_name), demand
+            )
+
+    def _build_policy_cache(self) -> Dict[Tuple[str, str], ReplenishmentPolicy]:
+        """(node, item) ごとの補充方針を前計算する。
+
+        供給元が無い、または需要プロファイルが無い組み合わせは登録しない
+        （日次ループ側で対象外として扱う）。工場の完成品生産方針は
+        _production_policy_cache に格納する。
+        """
+        cache: Dict[Tuple[str, str], ReplenishmentPolicy] = {}
+        for node in self.input.nodes:
+            node_name = node.name
+            if isinstance(node, (StoreNode, WarehouseNode)):
+                parent_name = self._parent_by_child.get(node_name)
+                if not parent_name:
+                    continue
+                link_obj = self.network_map.get((parent_name, node_name))
+                z = _service_level_z(node.service_level)
+                for item_name in node.initial_stock:
+                    if self._demand_profile(node, item_name) is None:
+                        continue
+                    cache[(node_name, item_name)] = ReplenishmentPolicy.resolve(
+                        node,
+                        link_obj,
+                        item_name,
+                        supplier=parent_name,
+                        z=z,
+                        lead_time=link_obj.lead_time if link_obj else 0,
+                    )
+            elif isinstance(node, FactoryNode):
+                z = _service_level_z(node.service_level)
+                for fg_item in node.producible_products:
+                    self._production_policy_cache[(node_name, fg_item)] = (
+                        ReplenishmentPolicy(
+                            supplier=node_name,
+                            z=z,
+                            lead_time=getattr(node, "lead_time", 0),
+                            review_period=getattr(node, "review_period_days", 0) or 0,
+                        )
+                    )
+                for item_name in getattr(node, "reorder_point", {}):
+                    parent_name = self._material_supplier_by_factory_item.get(
+                        (node_name, item_name)
+                    )
+                    if not parent_name:
+                        continue
+                    link_obj = self.network_map.get((parent_name, node_name))
+                    cache[(node_name, item_name)] = ReplenishmentPolicy.resolve(
+                        node,
+                        link_obj,
+                        item_name,
+                        supplier=parent_name,
+                        z=z,
+                        lead_time=link_obj.lead_time if link_obj else 0,
+                    )
+        return cache
+
+    def _demand_profile(self, node, item_name) -> Optional[Tuple[float, float]]:
+        """店舗/倉庫の (平均, 標準偏差) 需要プロファイルを返す。"""
+        if isinstance(node, WarehouseNode):
+            profile = self.warehouse_demand_profiles.get(node.name, {}).get(item_name)
+            if not profile:
+                return None
+            return profile["mean"], profile["std_dev"]
+        demand = self._demand_by_store_item.get((node.name, item_name))
+        if not demand:
+            return None
+        return demand.demand_mean, demand.demand_std_dev
 
     def _get_topological_order(self):
         order = []
+        seen = set()
         node_types = ["store", "warehouse", "factory", "material"]
         for n_type in node_types:
             for node in self.input.nodes:
-                if node.node_type == n_type and node.name not in order:
+                if node.node_type == n_type and node.name not in seen:
+                    seen.add(node.name)
                     order.append(node.name)
         return order
 
     def _calculate_warehouse_demand_profiles(self):
         profiles = defaultdict(lambda: defaultdict(lambda: {"mean": 0, "variance": 0}))
         for wh in [n for n in self.input.nodes if n.node_type == "warehouse"]:
-            for link in self.input.network:
-                if (
-                    link.from_node == wh.name
-                    and self.nodes_map[link.to_node].node_type == "store"
-                ):
-                    store_name = link.to_node
-                    for demand in self.input.customer_demand:
-                        if demand.store_name == store_name:
-                            profiles[wh.name][demand.product_name][
-                                "mean"
-                            ] += demand.demand_mean
-                            profiles[wh.name][demand.product_name]["variance"] += (
-                                demand.demand_std_dev**2
-                            )
+            for store_name in self._children_by_parent.get(wh.name, ()):
+                if self.nodes_map[store_name].node_type != "store":
+                    continue
+                for demand in self._demands_by_store.get(store_name, ()):
+                    profiles[wh.name][demand.product_name]["mean"] += demand.demand_mean
+                    profiles[wh.name][demand.product_name]["variance"] += (
+                        demand.demand_std_dev**2
+                    )
         for _, products in profiles.items():
             for _, data in products.items():
                 data["std_dev"] = math.sqrt(data["variance"])
@@ -102,12 +490,8 @@ class SupplyChainSimulator:
     def _calculate_factory_demand_profiles(self):
         profiles = defaultdict(lambda: defaultdict(lambda: {"mean": 0, "variance": 0}))
         for factory in [n for n in self.input.nodes if n.node_type == "factory"]:
-            for link in self.input.network:
-                if (
-                    link.from_node == factory.name
-                    and self.nodes_map[link.to_node].node_type == "warehouse"
-                ):
-                    wh_name = link.to_node
+            for wh_name in self._children_by_parent.get(factory.name, ()):
+                if self.nodes_map[wh_name].node_type == "warehouse":
                     wh_profile = self.warehouse_demand_profiles.get(wh_name, {})
                     for item, data in wh_profile.items():
                         if item in factory.producible_products:
@@ -118,22 +502,68 @@ class SupplyChainSimulator:
                 data["std_dev"] = math.sqrt(data["variance"])
         return profiles
 
+    def _new_rng(self) -> random.Random:
+        """シミュレータ専用の乱数生成器を返す（グローバル状態は使わない）。"""
+        return random.Random(getattr(self.input, "random_seed", None))
+
+    def _demand_draws(self) -> array:
+        """需要の抽選結果を返す（前計算を渡されていればそれを使う）。"""
+        if self._prepared_demand is not None:
+            return self._prepared_demand
+        return self._draw_demand_matrix(self._new_rng())
+
+    def _draw_demand_matrix(self, rng: random.Random) -> array:
+        """ホライズン×需要行の需要量を一括で前もって生成する。
+
+        戻り値は日優先のフラット配列で、`day * len(customer_demand) + row` が
+        その日・その需要行の数量（非負の整数）。start_day/end_day の期間外は 0。
+        乱数の消費順は従来の日次ループ（日→需要行の順に期間内の行だけ抽選）と
+        同じため、同一シードなら従来と同じ需要系列になる。
+        """
+        rows = self.input.customer_demand
+        horizon = self.input.planning_horizon
+        n_rows = len(rows)
+        matrix = array("q", bytes(8 * horizon * n_rows))
+        windows = []
+        for r, cd in enumerate(rows):
+            start_day = getattr(cd, "start_day", None)
+            end_day = getattr(cd, "end_day", None)
+            lo = 0 if start_day is None else max(0, start_day)
+            hi = horizon - 1 if end_day is None else min(horizon - 1, end_day)
+            if lo <= hi:
+                windows.append((r, lo, hi, cd.demand_mean, cd.demand_std_dev))
+        normals = _standard_normals(
+            rng, sum(hi - lo + 1 for _, lo, hi, _, _ in windows)
+        )
+        k = 0
+        for day in range(horizon):
+            base = day * n_rows
+            for r, lo, hi, mu, sigma in windows:
+                if lo <= day <= hi:
+                    qty = round(mu + normals[k] * sigma)
+                    k += 1
+                    if qty > 0:
+                        matrix[base + r] = qty
+        return matrix
+
     def run(self):
-        if getattr(self.input, "random_seed", None) is not None:
-            try:
-                random.seed(self.input.random_seed)
-            except Exception:
-                pass
+        demand_matrix = self._demand_draws()
+        n_demand_rows = len(self.input.customer_demand)
         for day in range(self.input.planning_horizon):
-            start_of_day_stock = {
-                name: self.stock[name].copy() for name in self.nodes_map
-            }
+            # 在庫のキーは増える一方なので、日次結果を記録しない場合は
+            # 期首在庫を複製せずに当日の在庫をそのまま品目集合として使う
+            start_of_day_stock = (
+                {name: self.stock[name].copy() for name in self.nodes_map}
+                if self.record_daily_results
+                else self.stock
+            )
             daily_events = defaultdict(lambda: defaultdict(float))
 
             logging.debug(f"--- Day {day}: Receiving Orders ---")
             defaultdict(list)
             # in_transit_orders は廃止済み
 
+            self._backorders_by_ship_day.pop(day, None)
             if day in self.pending_shipments:
                 shipped_so_far = defaultdict(float)
                 dest_incoming_today = defaultdict(float)
@@ -260,9 +690,13 @@ class SupplyChainSimulator:
                             self._pending_by_supplier_item[
                                 (supplier_name, item)
                             ] += shortage
+                            self._backorders_by_ship_day[day + 1][
+                                (supplier_name, item)
+                            ] += shortage
 
             # Legacy in_transit_orders 経路は廃止（pending_shipmentsに統一）
             for item, qty, factory_name in self.production_orders.pop(day, []):
+                self._production_by_factory_item[(factory_name, item)] -= qty
                 factory_node = self.nodes_map[factory_name]
                 storage_cap = getattr(factory_node, "storage_capacity", float("inf"))
                 allow_over = getattr(factory_node, "allow_storage_over_capacity", True)
@@ -290,6 +724,7 @@ class SupplyChainSimulator:
                     self.production_orders[day + 1].append(
                         (item, remaining, factory_name)
                     )
+                    self._production_by_factory_item[(factory_name, item)] += remaining
 
             for node in self.input.nodes:
                 if node.node_type == "store":
@@ -310,16 +745,9 @@ class SupplyChainSimulator:
             demand_signals = defaultdict(
                 lambda: defaultdict(lambda: defaultdict(float))
             )
-            for cd in self.input.customer_demand:
-                start_day = getattr(cd, "start_day", None)
-                end_day = getattr(cd, "end_day", None)
-                if start_day is not None and day < start_day:
-                    continue
-                if end_day is not None and day > end_day:
-                    continue
-                demand_qty = max(
-                    0, round(random.gauss(cd.demand_mean, cd.demand_std_dev))
-                )
+            day_base = day * n_demand_rows
+            for r, cd in enumerate(self.input.customer_demand):
+                demand_qty = demand_matrix[day_base + r]
                 if demand_qty > 0:
                     store_name, item_name = cd.store_name, cd.product_name
                     logging.debug(
@@ -386,50 +814,12 @@ class SupplyChainSimulator:
                                 f"Day {day}: Shortage of {demand_qty - shipped} for {item_name} at {node_name}"
                             )
 
-                items_to_manage = set(current_node.initial_stock.keys())
                 if isinstance(current_node, (StoreNode, WarehouseNode)):
                     logging.debug(f"Day {day}: Replenishment planning for {node_name}")
-                    for item_name in items_to_manage:
-                        parent_name = next(
-                            (
-                                link.from_node
-                                for link in self.input.network
-                                if link.to_node == node_name
-                            ),
-                            None,
-                        )
-                        if not parent_name:
-                            continue
-                        link_obj = self.network_map.get((parent_name, node_name))
-                        replenishment_lt = link_obj.lead_time if link_obj else 0
-                        review_R = getattr(current_node, "review_period_days", 0) or 0
-
-                        profile = (
-                            self.warehouse_demand_profiles.get(node_name, {}).get(
-                                item_name
-                            )
-                            if isinstance(current_node, WarehouseNode)
-                            else next(
-                                (
-                                    d
-                                    for d in self.input.customer_demand
-                                    if d.store_name == node_name
-                                    and d.product_name == item_name
-                                ),
-                                None,
-                            )
-                        )
-                        if not profile:
-                            continue
-                        demand_mean = (
-                            profile["mean"]
-                            if isinstance(profile, dict)
-                            else profile.demand_mean
-                        )
-                        demand_std = (
-                            profile["std_dev"]
-                            if isinstance(profile, dict)
-                            else profile.demand_std_dev
+                    for item_name in self._managed_items.get(node_name, ()):
+                        policy = self._policy_cache[(node_name, item_name)]
+                        demand_mean, demand_std = self._demand_profile(
+                            current_node, item_name
                         )
 
                         inv_on_hand = self.stock[node_name].get(item_name, 0)
@@ -449,10 +839,9 @@ class SupplyChainSimulator:
                                 )
                         elif isinstance(current_node, WarehouseNode):
                             inv_pos -= scheduled_outgoing
-                        z = _service_level_z(current_node.service_level)
                         # 互換性維持のため μ*(L+R+1)
-                        eff_LR = max(0.0, (replenishment_lt + review_R))
-                        order_up_to = z * demand_std * math.sqrt(
+                        eff_LR = max(0.0, (policy.lead_time + policy.review_period))
+                        order_up_to = policy.z * demand_std * math.sqrt(
                             eff_LR
                         ) + demand_mean * (eff_LR + 1)
                         qty_to_order = max(0, math.ceil(order_up_to - inv_pos))
@@ -461,51 +850,9 @@ class SupplyChainSimulator:
                         )
 
                         if qty_to_order > 0:
-                            node_moq = getattr(current_node, "moq", {}).get(
-                                item_name, 0
-                            )
-                            node_mult = getattr(current_node, "order_multiple", {}).get(
-                                item_name, 0
-                            )
-                            link_moq = (
-                                getattr(link_obj, "moq", {}).get(item_name, 0)
-                                if link_obj
-                                else 0
-                            )
-                            link_mult = (
-                                getattr(link_obj, "order_multiple", {}).get(
-                                    item_name, 0
-                                )
-                                if link_obj
-                                else 0
-                            )
-
-                            effective_moq = max(node_moq or 0, link_moq or 0)
-                            if 0 < qty_to_order < effective_moq:
-                                qty_to_order = effective_moq
-
-                            def _is_int(x: float) -> bool:
-                                return math.isclose(x, round(x))
-
-                            eff_mult = 0
-                            if (node_mult or 0) > 0 and (link_mult or 0) > 0:
-                                if _is_int(node_mult) and _is_int(link_mult):
-                                    a, b = int(round(node_mult)), int(round(link_mult))
-                                    eff_mult = abs(a * b) // math.gcd(a, b)
-                                else:
-                                    eff_mult = 0
-                            if eff_mult:
-                                qty_to_order = int(
-                                    math.ceil(qty_to_order / eff_mult) * eff_mult
-                                )
-                            else:
-                                for m in [node_mult, link_mult]:
-                                    if m and m > 0:
-                                        qty_to_order = int(
-                                            math.ceil(qty_to_order / m) * m
-                                        )
+                            qty_to_order = policy.round_quantity(qty_to_order)
                             self._place_order(
-                                parent_name, node_name, item_name, qty_to_order, day
+                                policy.supplier, node_name, item_name, qty_to_order, day
                             )
 
                 if isinstance(current_node, FactoryNode):
@@ -515,44 +862,37 @@ class SupplyChainSimulator:
                         profile = factory_profile.get(fg_item)
                         if not profile:
                             continue
+                        policy = self._production_policy_cache[(node_name, fg_item)]
                         demand_mean = profile["mean"]
                         demand_std = profile.get("std_dev", 0.0)
-                        prod_lt = getattr(current_node, "lead_time", 0)
-                        review_R = getattr(current_node, "review_period_days", 0) or 0
 
                         inv_on_hand = self.stock[node_name].get(fg_item, 0)
                         # Incoming finished goods from previously scheduled production
-                        pipeline_incoming = 0.0
-                        for d, orders in self.production_orders.items():
-                            if d > day:
-                                for it, q, fac in orders:
-                                    if fac == node_name and it == fg_item:
-                                        pipeline_incoming += q
-                        # Outgoing commitments (factory -> warehouses)
-                        scheduled_outgoing = 0.0
-                        for d, orders in self.pending_shipments.items():
-                            if d > day:
-                                for rec in orders:
-                                    if len(rec) == 4:
-                                        it, q, supplier, _dest = rec
-                                    else:
-                                        it, q, supplier, _dest, _is_bo = rec
-                                    if supplier == node_name and it == fg_item:
-                                        scheduled_outgoing += q
+                        pipeline_incoming = self._production_by_factory_item[
+                            (node_name, fg_item)
+                        ]
+                        # Outgoing commitments (factory -> warehouses), excluding
+                        # shipments whose ship day has already been processed
+                        scheduled_outgoing = (
+                            self._pending_by_supplier_item[(node_name, fg_item)]
+                            - self._stale_by_supplier_item[(node_name, fg_item)]
+                        )
 
                         inv_pos = inv_on_hand + pipeline_incoming - scheduled_outgoing
-                        z = _service_level_z(current_node.service_level)
-                        eff_LR = max(0.0, (prod_lt + review_R))
-                        order_up_to = z * demand_std * math.sqrt(
+                        eff_LR = max(0.0, (policy.lead_time + policy.review_period))
+                        order_up_to = policy.z * demand_std * math.sqrt(
                             eff_LR
                         ) + demand_mean * (eff_LR + 1)
                         qty_to_produce = max(0, math.ceil(order_up_to - inv_pos))
                         if qty_to_produce > 0:
-                            completion_offset = max(1, int(math.ceil(prod_lt)))
+                            completion_offset = max(1, int(math.ceil(policy.lead_time)))
                             completion_day = day + completion_offset
                             self.production_orders[completion_day].append(
                                 (fg_item, qty_to_produce, node_name)
                             )
+                            self._production_by_factory_item[
+                                (node_name, fg_item)
+                            ] += qty_to_produce
 
                     # Component replenishment planning (Factory -> Material suppliers)
                     for item_name, reorder_point in getattr(
@@ -572,81 +912,23 @@ class SupplyChainSimulator:
                                 item_name, inv_pos
                             )
                             qty_to_order = max(0, order_up_to - inv_pos)
-                            if qty_to_order > 0:
-                                parent_name = next(
-                                    (
-                                        link.from_node
-                                        for link in self.input.network
-                                        if link.to_node == node_name
-                                        and self.nodes_map[link.from_node].node_type
-                                        == "material"
-                                        and item_name
-                                        in self.nodes_map[link.from_node].material_cost
-                                    ),
-                                    None,
+                            policy = self._policy_cache.get((node_name, item_name))
+                            if qty_to_order > 0 and policy is not None:
+                                qty_to_order = policy.round_quantity(qty_to_order)
+                                self._place_order(
+                                    policy.supplier,
+                                    node_name,
+                                    item_name,
+                                    qty_to_order,
+                                    day,
                                 )
-                                if parent_name:
-                                    link_obj = self.network_map.get(
-                                        (parent_name, node_name)
-                                    )
-                                    node_moq = getattr(current_node, "moq", {}).get(
-                                        item_name, 0
-                                    )
-                                    node_mult = getattr(
-                                        current_node, "order_multiple", {}
-                                    ).get(item_name, 0)
-                                    link_moq = (
-                                        getattr(link_obj, "moq", {}).get(item_name, 0)
-                                        if link_obj
-                                        else 0
-                                    )
-                                    link_mult = (
-                                        getattr(link_obj, "order_multiple", {}).get(
-                                            item_name, 0
-                                        )
-                                        if link_obj
-                                        else 0
-                                    )
-                                    effective_moq = max(node_moq or 0, link_moq or 0)
-                                    if 0 < qty_to_order < effective_moq:
-                                        qty_to_order = effective_moq
-
-                                    def _is_int(x: float) -> bool:
-                                        return math.isclose(x, round(x))
-
-                                    eff_mult = 0
-                                    if (node_mult or 0) > 0 and (link_mult or 0) > 0:
-                                        if _is_int(node_mult) and _is_int(link_mult):
-                                            a, b = int(round(node_mult)), int(
-                                                round(link_mult)
-                                            )
-                                            eff_mult = abs(a * b) // math.gcd(a, b)
-                                        else:
-                                            eff_mult = 0
-                                    if eff_mult:
-                                        qty_to_order = int(
-                                            math.ceil(qty_to_order / eff_mult)
-                                            * eff_mult
-                                        )
-                                    else:
-                                        for m in [node_mult, link_mult]:
-                                            if m and m > 0:
-                                                qty_to_order = int(
-                                                    math.ceil(qty_to_order / m) * m
-                                                )
-                                    self._place_order(
-                                        parent_name,
-                                        node_name,
-                                        item_name,
-                                        qty_to_order,
-                                        day,
-                                    )
 
             self.record_daily_snapshot(
                 day, start_of_day_stock, self.stock, daily_events
             )
             self.calculate_daily_profit_loss(day, daily_events)
 
+        self.cost_trace.close()
         return self.daily_results, self.daily_profit_loss
 
     def _place_order(
@@ -660,9 +942,10 @@ class SupplyChainSimulator:
         logging.debug(
             f"DEBUG: Day {current_day}: Placing order for {item_name} qty {quantity} from {supplier_node_name} to {customer_node_name}."
         )
-        self.order_history[current_day].append(
-            (item_name, quantity, supplier_node_name, customer_node_name)
-        )
+        if self.record_daily_results:
+            self.order_history[current_day].append(
+                (item_name, quantity, supplier_node_name, customer_node_name)
+            )
         self.cumulative_ordered[(customer_node_name, item_name)] += quantity
         link_obj = self.network_map.get((supplier_node_name, customer_node_name))
         link_lt = link_obj.lead_time if link_obj else 0
@@ -673,115 +956,23 @@ class SupplyChainSimulator:
         # Update indices for future shipments
         self._pending_by_dest_item[(customer_node_name, item_name)] += quantity
         self._pending_by_supplier_item[(supplier_node_name, item_name)] += quantity
+        if ship_day <= current_day:
+            self._stale_by_supplier_item[(supplier_node_name, item_name)] += quantity
 
     def compute_summary(self):
-        node_type_map = {name: n.node_type for name, n in self.nodes_map.items()}
-        totals_by_type = {
-            t: {"demand": 0.0, "sales": 0.0, "shortage": 0.0, "end_stock_sum": 0.0}
-            for t in ("store", "warehouse", "factory", "material")
-        }
-        top_shortage_by_item = defaultdict(float)
-        backorder_total_by_day = []
-
-        for day in self.daily_results:
-            bo_day_total = 0.0
-            for node_name, items in day.get("nodes", {}).items():
-                ntype = node_type_map.get(node_name)
-                if not ntype:
-                    continue
-                for item_name, m in items.items():
-                    d = m.get("demand", 0) or 0
-                    s = m.get("sales", 0) or 0
-                    sh = m.get("shortage", 0) or 0
-                    end = m.get("end_stock", 0) or 0
-                    totals_by_type[ntype]["demand"] += d
-                    totals_by_type[ntype]["sales"] += s
-                    totals_by_type[ntype]["shortage"] += sh
-                    totals_by_type[ntype]["end_stock_sum"] += end
-                    if ntype == "store":
-                        top_shortage_by_item[item_name] += sh
-                        bo_day_total += m.get("backorder_balance", 0) or 0
-            backorder_total_by_day.append(bo_day_total)
-
-        days = max(1, len(self.daily_results))
-        avg_on_hand_by_type = {
-            t: totals_by_type[t]["end_stock_sum"] / days for t in totals_by_type
-        }
-        store_demand = totals_by_type["store"]["demand"]
-        store_sales = totals_by_type["store"]["sales"]
-        fill_rate = (store_sales / store_demand) if store_demand > 0 else 1.0
-
-        total_revenue = sum(pl.get("revenue", 0) or 0 for pl in self.daily_profit_loss)
-        total_material = sum(
-            pl.get("material_cost", 0) or 0 for pl in self.daily_profit_loss
-        )
-        total_flow = sum(
-            sum((pl.get("flow_costs", {}) or {}).values())
-            for pl in self.daily_profit_loss
-        )
-        total_stock = sum(
-            sum((pl.get("stock_costs", {}) or {}).values())
-            for pl in self.daily_profit_loss
-        )
-        total_sgna = sum(pl.get("sgna_cost", 0) or 0 for pl in self.daily_profit_loss)
-        total_penalty_stockout = sum(
-            ((pl.get("penalty_costs", {}) or {}).get("stockout", 0) or 0)
-            for pl in self.daily_profit_loss
-        )
-        total_penalty_backorder = sum(
-            ((pl.get("penalty_costs", {}) or {}).get("backorder", 0) or 0)
-            for pl in self.daily_profit_loss
-        )
-        total_penalty = total_penalty_stockout + total_penalty_backorder
-        total_cost = (
-            total_material + total_flow + total_stock + total_penalty + total_sgna
-        )
-        total_profit = total_revenue - total_cost
-
-        top_short = sorted(top_shortage_by_item.items(), key=lambda x: -x[1])[:5]
-
-        summary = {
-            "planning_days": days,
-            "fill_rate": fill_rate,
-            "store_demand_total": store_demand,
-            "store_sales_total": store_sales,
-            "customer_shortage_total": totals_by_type["store"]["shortage"],
-            "network_shortage_total": sum(
-                totals_by_type[t]["shortage"]
-                for t in ("warehouse", "factory", "material")
-            ),
-            "avg_on_hand_by_type": avg_on_hand_by_type,
-            "backorder_peak": (
-                max(backorder_total_by_day) if backorder_total_by_day else 0
-            ),
-            "backorder_peak_day": (
-                (backorder_total_by_day.index(max(backorder_total_by_day)) + 1)
-                if backorder_total_by_day
-                else 0
-            ),
-            "revenue_total": total_revenue,
-            "cost_total": total_cost,
-            "sgna_total": total_sgna,
-            "penalty_stockout_total": total_penalty_stockout,
-            "penalty_backorder_total": total_penalty_backorder,
-            "penalty_total": total_penalty,
-            "profit_total": total_profit,
-            "profit_per_day_avg": total_profit / days if days else 0,
-            "top_shortage_items": [
-                {"item": it, "shortage": qty} for it, qty in top_short
-            ],
-        }
-        return summary
+        """KPI サマリを返す（日次ループで集計済みの値を読むだけ）。"""
+        kpi = self.kpi
+        if self.record_daily_results and kpi.days != len(self.daily_results):
+            # run() を経ずに結果を差し替えた場合は記録済みの結果から集計し直す
+            kpi = KpiAccumulator.from_results(
+                kpi.node_types, self.daily_results, self.daily_profit_loss
+            )
+        return kpi.summary()
 
     def record_daily_snapshot(self, day, start_stock, end_stock, events):
         snapshot = {"day": day + 1, "nodes": {}}
         all_node_names = set(start_stock.keys()) | set(end_stock.keys())
 
-        daily_ordered_quantities = defaultdict(lambda: defaultdict(float))
-        for item, qty, _supplier, dest in self.order_history.get(day, []):
-            if dest in self.nodes_map:
-                daily_ordered_quantities[dest][item] += qty
-
         event_items_by_node = defaultdict(set)
         for key in events.keys():
             if ":" in key:
@@ -793,26 +984,46 @@ class SupplyChainSimulator:
             event_items_by_node[node_name].add(item_name)
 
         backorder_balance_map = defaultdict(lambda: defaultdict(float))
-        future_days = [d for d in self.pending_shipments.keys() if d >= day + 1]
-        for d in future_days:
-            for rec in self.pending_shipments.get(d, []):
-                if len(rec) == 5:
-                    item, qty, supplier, _dest, is_backorder = rec
-                    if is_backorder:
-                        backorder_balance_map[supplier][item] += qty
+        for d, balances in self._backorders_by_ship_day.items():
+            if d >= day + 1:
+                for (supplier, item), qty in balances.items():
+                    backorder_balance_map[supplier][item] += qty
         for store_name, items in self.customer_backorders.items():
             for item, qty in items.items():
                 if qty > 0:
                     backorder_balance_map[store_name][item] += qty
 
-        for name in sorted(list(all_node_names | set(event_items_by_node.keys()))):
-            node_snapshot = {}
-            all_items = (
-                set(start_stock.get(name, {}).keys())
-                | set(end_stock.get(name, {}).keys())
-                | set(event_items_by_node.get(name, set()))
+        node_names = all_node_names | set(event_items_by_node.keys())
+        if node_names != self._snapshot_node_set:
+            self._snapshot_node_set = node_names
+            self._snapshot_node_order = sorted(node_names)
+        self._observe_snapshot_kpis(
+            start_stock, end_stock, events, event_items_by_node, backorder_balance_map
+        )
+        if not self.record_daily_results:
+            return
+
+        daily_ordered_quantities = defaultdict(lambda: defaultdict(float))
+        for item, qty, _supplier, dest in self.order_history.get(day, []):
+            if dest in self.nodes_map:
+                daily_ordered_quantities[dest][item] += qty
+        if self.columnar_results is not None:
+            self._record_columnar_snapshot(
+                day,
+                start_stock,
+                end_stock,
+                events,
+                event_items_by_node,
+                daily_ordered_quantities,
+                backorder_balance_map,
             )
-            for item in sorted(list(all_items)):
+            return
+
+        for name in self._snapshot_node_order:
+            node_snapshot = {}
+            for item in self._snapshot_items(
+                name, start_stock, end_stock, event_items_by_node
+            ):
                 event_key = f"{name}_{item}"
                 item_snapshot = events.get(event_key, defaultdict(float))
                 item_snapshot["start_stock"] = start_stock.get(name, {}).get(item, 0)
@@ -839,6 +1050,107 @@ class SupplyChainSimulator:
 
         self.daily_results.append(snapshot)
 
+    def _observe_snapshot_kpis(
+        self, start_stock, end_stock, events, event_items_by_node, backorder_balance_map
+    ):
+        """スナップショットと同じ行（ノード名 → 品目名の昇順）を KPI に加える。"""
+        add_row = self.kpi.add_row
+        node_types = self.kpi.node_types
+        for name in self._snapshot_node_order:
+            ntype = node_types.get(name)
+            if not ntype:
+                continue
+            end_items = end_stock.get(name, {})
+            balances = backorder_balance_map.get(name, {})
+            for item in self._snapshot_items(
+                name, start_stock, end_stock, event_items_by_node
+            ):
+                ev = events.get(f"{name}_{item}") or {}
+                sales = ev.get("sales", 0)
+                shortage = ev.get("shortage", 0)
+                add_row(
+                    ntype,
+                    item,
+                    sales + shortage,
+                    sales,
+                    shortage,
+                    end_items.get(item, 0),
+                    balances.get(item, 0.0),
+                )
+        self.kpi.end_day()
+
+    def _snapshot_items(self, name, start_stock, end_stock, event_items_by_node):
+        """スナップショット対象の品目名（昇順）を返す。
+
+        在庫のキーは増える一方なので、キー数とイベント品目が変わらない限り
+        前日の並びを再利用する。
+        """
+        start_items = start_stock.get(name, {})
+        end_items = end_stock.get(name, {})
+        event_items = event_items_by_node.get(name, ())
+        cached = self._snapshot_item_order.get(name)
+        if (
+            cached is not None
+            and cached[0] == len(start_items)
+            and cached[1] == len(end_items)
+            and all(item in cached[2] for item in event_items)
+        ):
+            return cached[3]
+        all_items = set(start_items.keys()) | set(end_items.keys()) | set(event_items)
+        order = sorted(all_items)
+        self._snapshot_item_order[name] = (
+            len(start_items),
+            len(end_items),
+            all_items,
+            order,
+        )
+        return order
+
+    def _record_columnar_snapshot(
+        self,
+        day,
+        start_stock,
+        end_stock,
+        events,
+        event_items_by_node,
+        daily_ordered_quantities,
+        backorder_balance_map,
+    ):
+        columnar = self.columnar_results
+        columnar.begin_day(day + 1)
+        for name in self._snapshot_node_order:
+            items = self._snapshot_items(
+                name, start_stock, end_stock, event_items_by_node
+            )
+            if not items:
+                continue
+            node_k = columnar.node_index(name)
+            start_items = start_stock.get(name, {})
+            end_items = end_stock.get(name, {})
+            ordered = daily_ordered_quantities.get(name, {})
+            balances = backorder_balance_map.get(name, {})
+            for item in items:
+                ev = events.get(f"{name}_{item}") or {}
+                sales = ev.get("sales", 0)
+                shortage = ev.get("shortage", 0)
+                columnar.append_row(
+                    node_k,
+                    columnar.item_index(item),
+                    (
+                        start_items.get(item, 0),
+                        end_items.get(item, 0),
+                        ordered.get(item, 0.0),
+                        ev.get("incoming", 0),
+                        sales + shortage,
+                        sales,
+                        ev.get("consumption", 0),
+                        ev.get("produced", 0),
+                        shortage,
+                        balances.get(item, 0.0),
+                    ),
+                )
+        columnar.end_day()
+
     def _push_cost(
         self,
         day: int,
@@ -849,19 +1161,9 @@ class SupplyChainSimulator:
         unit_cost: float,
         account: str,
     ):
-        amount = qty * unit_cost
         self.cost_trace.append(
-            {
-                "day": day + 1,  # 1-based
-                "node": node,
-                "item": item,
-                "event": event,
-                "qty": qty,
-                "unit_cost": unit_cost,
-                "amount": amount,
-                "account": account,
-            }
-        )
+            day + 1, node, item, event, qty, unit_cost, qty * unit_cost, account
+        )  # day は 1-based
 
     def calculate_daily_profit_loss(self, day, events):
         pl = {
@@ -897,68 +1199,64 @@ class SupplyChainSimulator:
             "profit_loss": 0,
         }
 
+        # キーの分解は初出時だけ行い、種別ごとに元の順序のまま振り分ける
+        parsed_keys = self._event_keys
+        pair_events = []
+        transport_events = []
+        transport_overages = []
+        storage_overage_qty_by_node = defaultdict(float)
+        for key, data in events.items():
+            parsed = parsed_keys.get(key)
+            if parsed is None:
+                parsed = parsed_keys[key] = _parse_event_key(key)
+            kind = parsed[0]
+            if kind == "pair":
+                pair_events.append((parsed[1], parsed[2], data))
+            elif kind == "transport":
+                transport_events.append((parsed[1:], data))
+            elif kind == "transport_overage":
+                transport_overages.append((parsed[1:], data))
+            elif kind == "storage_overage":
+                storage_overage_qty_by_node[parsed[1]] += data.get("qty", 0) or 0
+
         produced_by_factory = defaultdict(float)
         nodes_produced = set()
-        for key, data in events.items():
-            if ":" in key:
-                continue
-            try:
-                node_name, item_name = key.split("_", 1)
-            except ValueError:
-                continue
+        store_names = self._store_names
+        sale_rates = self._sale_rates
+        for node_name, item_name, data in pair_events:
             produced_qty = data.get("produced", 0) or 0
             if produced_qty > 0:
                 produced_by_factory[node_name] += produced_qty
                 nodes_produced.add(node_name)
             sales_qty = data.get("sales", 0) or 0
-            if sales_qty > 0 and item_name:
-                node = self.nodes_map.get(node_name)
-                if isinstance(node, StoreNode):
-                    product = self.products.get(item_name)
-                    price = 0.0
-                    unit_cost = 0.0
-                    sgna_unit = 0.0
-                    if product is not None:
-                        try:
-                            price = float(getattr(product, "sales_price", 0) or 0.0)
-                        except (TypeError, ValueError):
-                            price = 0.0
-                        try:
-                            unit_cost = float(getattr(product, "unit_cost", 0) or 0.0)
-                        except (TypeError, ValueError):
-                            unit_cost = 0.0
-                        try:
-                            sgna_unit = float(
-                                getattr(product, "sgna_cost_per_unit", 0) or 0.0
-                            )
-                        except (TypeError, ValueError):
-                            sgna_unit = 0.0
-                    if price > 0:
-                        pl["revenue"] += sales_qty * price
-                    if unit_cost > 0:
-                        cost_amount = sales_qty * unit_cost
-                        pl["material_cost"] += cost_amount
-                        self._push_cost(
-                            day=day,
-                            node=node_name,
-                            item=item_name,
-                            event="sale_cogs",
-                            qty=sales_qty,
-                            unit_cost=unit_cost,
-                            account="material",
-                        )
-                    if sgna_unit > 0:
-                        sgna_amount = sales_qty * sgna_unit
-                        pl["sgna_cost"] += sgna_amount
-                        self._push_cost(
-                            day=day,
-                            node=node_name,
-                            item=item_name,
-                            event="sale_sgna",
-                            qty=sales_qty,
-                            unit_cost=sgna_unit,
-                            account="sgna",
-                        )
+            if sales_qty > 0 and item_name and node_name in store_names:
+                price, unit_cost, sgna_unit = sale_rates.get(item_name, (0.0, 0.0, 0.0))
+                if price > 0:
+                    pl["revenue"] += sales_qty * price
+                if unit_cost > 0:
+                    cost_amount = sales_qty * unit_cost
+                    pl["material_cost"] += cost_amount
+                    self._push_cost(
+                        day=day,
+                        node=node_name,
+                        item=item_name,
+                        event="sale_cogs",
+                        qty=sales_qty,
+                        unit_cost=unit_cost,
+                        account="material",
+                    )
+                if sgna_unit > 0:
+                    sgna_amount = sales_qty * sgna_unit
+                    pl["sgna_cost"] += sgna_amount
+                    self._push_cost(
+                        day=day,
+                        node=node_name,
+                        item=item_name,
+                        event="sale_sgna",
+                        qty=sales_qty,
+                        unit_cost=sgna_unit,
+                        account="sgna",
+                    )
 
         transport_costs_by_type = {
             "material_transport": {"fixed": 0.0, "variable": 0.0},
@@ -966,112 +1264,48 @@ class SupplyChainSimulator:
             "store_transport": {"fixed": 0.0, "variable": 0.0},
         }
 
-        for key, data in events.items():
-            if key.startswith("transport:"):
-                try:
-                    route, item = key.split(":", 1)[1].split(":", 1)
-                    supplier_name, dest_name = route.split("->", 1)
-                except Exception:
-                    continue
-                qty = data.get("qty", 0) or 0
-                if qty <= 0:
-                    continue
-                link = self.network_map.get((supplier_name, dest_name))
-                if not link:
-                    continue
-                supplier = self.nodes_map.get(supplier_name)
-                dest = self.nodes_map.get(dest_name)
-                if isinstance(supplier, MaterialNode) and isinstance(dest, FactoryNode):
-                    transport_costs_by_type["material_transport"][
-                        "fixed"
-                    ] += link.transportation_cost_fixed
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_fixed",
-                        1.0,
-                        link.transportation_cost_fixed,
-                        "transport_fixed",
-                    )
-                    transport_costs_by_type["material_transport"]["variable"] += (
-                        link.transportation_cost_variable * qty
-                    )
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_var",
-                        qty,
-                        link.transportation_cost_variable,
-                        "transport_var",
-                    )
-                    pl["material_cost"] += (
-                        getattr(supplier, "material_cost", {}).get(item, 0) * qty
-                    )
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "material_purchase",
-                        qty,
-                        getattr(supplier, "material_cost", {}).get(item, 0),
-                        "material",
-                    )
-                elif isinstance(supplier, FactoryNode) and isinstance(
-                    dest, WarehouseNode
-                ):
-                    transport_costs_by_type["warehouse_transport"][
-                        "fixed"
-                    ] += link.transportation_cost_fixed
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_fixed",
-                        1.0,
-                        link.transportation_cost_fixed,
-                        "transport_fixed",
-                    )
-                    transport_costs_by_type["warehouse_transport"]["variable"] += (
-                        link.transportation_cost_variable * qty
-                    )
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_var",
-                        qty,
-                        link.transportation_cost_variable,
-                        "transport_var",
-                    )
-                elif isinstance(supplier, WarehouseNode) and isinstance(
-                    dest, StoreNode
-                ):
-                    transport_costs_by_type["store_transport"][
-                        "fixed"
-                    ] += link.transportation_cost_fixed
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_fixed",
-                        1.0,
-                        link.transportation_cost_fixed,
-                        "transport_fixed",
-                    )
-                    transport_costs_by_type["store_transport"]["variable"] += (
-                        link.transportation_cost_variable * qty
-                    )
-                    self._push_cost(
-                        day,
-                        dest_name,
-                        item,
-                        "transport_var",
-                        qty,
-                        link.transportation_cost_variable,
-                        "transport_var",
-                    )
+        link_costs = self._link_costs
+        for (supplier_name, dest_name, item), data in transport_events:
+            qty = data.get("qty", 0) or 0
+            if qty <= 0:
+                continue
+            entry = link_costs.get((supplier_name, dest_name))
+            if entry is None:
+                continue
+            ttype, link, material_cost = entry
+            costs = transport_costs_by_type[ttype]
+            costs["fixed"] += link.transportation_cost_fixed
+            self._push_cost(
+                day,
+                dest_name,
+                item,
+                "transport_fixed",
+                1.0,
+                link.transportation_cost_fixed,
+                "transport_fixed",
+            )
+            costs["variable"] += link.transportation_cost_variable * qty
+            self._push_cost(
+                day,
+                dest_name,
+                item,
+                "transport_var",
+                qty,
+                link.transportation_cost_variable,
+                "transport_var",
+            )
+            if ttype == "material_transport":
+                unit_material = material_cost.get(item, 0)
+                pl["material_cost"] += unit_material * qty
+                self._push_cost(
+                    day,
+                    dest_name,
+                    item,
+                    "material_purchase",
+                    qty,
+                    unit_material,
+                    "material",
+                )
 
         for node_name in nodes_produced:
             node = self.nodes_map.get(node_name)
@@ -1142,184 +1376,142 @@ class SupplyChainSimulator:
             pl["flow_costs"][f"{transport_type}_variable"] = costs["variable"]
 
         overage_fixed_applied = set()
-        for key, data in events.items():
-            if key.startswith("transport_overage:"):
-                try:
-                    route = key.split(":", 1)[1]
-                    supplier_name, dest_name = route.split("->", 1)
-                except Exception:
-                    continue
-                link = self.network_map.get((supplier_name, dest_name))
-                if not link:
-                    continue
-                over_qty = data.get("qty", 0) or 0
-                if over_qty <= 0:
-                    continue
-                supplier = self.nodes_map.get(supplier_name)
-                dest = self.nodes_map.get(dest_name)
-                if isinstance(supplier, MaterialNode) and isinstance(dest, FactoryNode):
-                    ttype = "material_transport"
-                elif isinstance(supplier, FactoryNode) and isinstance(
-                    dest, WarehouseNode
-                ):
-                    ttype = "warehouse_transport"
-                elif isinstance(supplier, WarehouseNode) and isinstance(
-                    dest, StoreNode
-                ):
-                    ttype = "store_transport"
-                else:
-                    ttype = None
-                if ttype:
-                    pl["flow_costs"][f"{ttype}_variable"] += (
-                        link.over_capacity_variable_cost * over_qty
-                    )
-                    # traceにもオーバー分の輸送コストを記録（可変）
-                    if link.over_capacity_variable_cost > 0:
-                        self._push_cost(
-                            day=day,
-                            node=dest_name,
-                            item="",
-                            event="transport_over_var",
-                            qty=over_qty,
-                            unit_cost=link.over_capacity_variable_cost,
-                            account="transport_var",
-                        )
-                    lkey = (supplier_name, dest_name)
-                    if (
-                        lkey not in overage_fixed_applied
-                        and link.over_capacity_fixed_cost > 0
-                    ):
-                        pl["flow_costs"][
-                            f"{ttype}_fixed"
-                        ] += link.over_capacity_fixed_cost
-                        overage_fixed_applied.add(lkey)
-                        # traceにもオーバー分の輸送コストを記録（固定）
-                        self._push_cost(
-                            day=day,
-                            node=dest_name,
-                            item="",
-                            event="transport_over_fixed",
-                            qty=1.0,
-                            unit_cost=link.over_capacity_fixed_cost,
-                            account="transport_fixed",
-                        )
+        for (supplier_name, dest_name), data in transport_overages:
+            entry = link_costs.get((supplier_name, dest_name))
+            if entry is None:
+                continue
+            over_qty = data.get("qty", 0) or 0
+            if over_qty <= 0:
+                continue
+            ttype, link, _material_cost = entry
+            pl["flow_costs"][f"{ttype}_variable"] += (
+                link.over_capacity_variable_cost * over_qty
+            )
+            # traceにもオーバー分の輸送コストを記録（可変）
+            if link.over_capacity_variable_cost > 0:
+                self._push_cost(
+                    day=day,
+                    node=dest_name,
+                    item="",
+                    event="transport_over_var",
+                    qty=over_qty,
+                    unit_cost=link.over_capacity_variable_cost,
+                    account="transport_var",
+                )
+            lkey = (supplier_name, dest_name)
+            if lkey not in overage_fixed_applied and link.over_capacity_fixed_cost > 0:
+                pl["flow_costs"][f"{ttype}_fixed"] += link.over_capacity_fixed_cost
+                overage_fixed_applied.add(lkey)
+                # traceにもオーバー分の輸送コストを記録（固定）
+                self._push_cost(
+                    day=day,
+                    node=dest_name,
+                    item="",
+                    event="transport_over_fixed",
+                    qty=1.0,
+                    unit_cost=link.over_capacity_fixed_cost,
+                    account="transport_fixed",
+                )
 
-        storage_overage_qty_by_node = defaultdict(float)
-        for key, data in events.items():
-            if key.startswith("storage_overage:"):
-                node_name = key.split(":", 1)[1]
-                storage_overage_qty_by_node[node_name] += data.get("qty", 0) or 0
-
-        for node in self.nodes_map.values():
-            cost_cat_map = {
-                "material": "material_storage",
-                "factory": "factory_storage",
-                "warehouse": "warehouse_storage",
-                "store": "store_storage",
-            }
-            cat = cost_cat_map.get(node.node_type)
-            if cat:
-                if node.storage_cost_fixed > 0:
-                    pl["stock_costs"][f"{cat}_fixed"] += node.storage_cost_fixed
+        stock_costs = pl["stock_costs"]
+        push_cost = self._push_cost
+        for node, cat, variable_rates in self._storage_costs:
+            if node.storage_cost_fixed > 0:
+                pl["stock_costs"][f"{cat}_fixed"] += node.storage_cost_fixed
+                self._push_cost(
+                    day=day,
+                    node=node.name,
+                    item="",
+                    event="storage_fixed",
+                    qty=1.0,
+                    unit_cost=node.storage_cost_fixed,
+                    account="storage_fixed",
+                )
+            if variable_rates:
+                var_key = f"{cat}_variable"
+                for item, stock in self.stock[node.name].items():
+                    unit_sv = variable_rates.get(item)
+                    if unit_sv:
+                        stock_costs[var_key] += stock * unit_sv
+                        push_cost(
+                            day,
+                            node.name,
+                            item,
+                            "storage_var",
+                            stock,
+                            unit_sv,
+                            "storage_var",
+                        )
+            over_qty = storage_overage_qty_by_node.get(node.name, 0)
+            if over_qty > 0:
+                if node.storage_over_capacity_variable_cost > 0:
+                    pl["stock_costs"][f"{cat}_variable"] += (
+                        node.storage_over_capacity_variable_cost * over_qty
+                    )
                     self._push_cost(
                         day=day,
                         node=node.name,
                         item="",
-                        event="storage_fixed",
+                        event="storage_over_var",
+                        qty=over_qty,
+                        unit_cost=node.storage_over_capacity_variable_cost,
+                        account="storage_var",
+                    )
+                if node.storage_over_capacity_fixed_cost > 0:
+                    pl["stock_costs"][
+                        f"{cat}_fixed"
+                    ] += node.storage_over_capacity_fixed_cost
+                    self._push_cost(
+                        day=day,
+                        node=node.name,
+                        item="",
+                        event="storage_over_fixed",
                         qty=1.0,
-                        unit_cost=node.storage_cost_fixed,
+                        unit_cost=node.storage_over_capacity_fixed_cost,
                         account="storage_fixed",
                     )
-                for item, stock in self.stock[node.name].items():
-                    unit_sv = node.storage_cost_variable.get(item, 0)
-                    if unit_sv > 0:
-                        pl["stock_costs"][f"{cat}_variable"] += stock * unit_sv
-                        self._push_cost(
-                            day=day,
-                            node=node.name,
-                            item=item,
-                            event="storage_var",
-                            qty=stock,
-                            unit_cost=unit_sv,
-                            account="storage_var",
-                        )
-                over_qty = storage_overage_qty_by_node.get(node.name, 0)
-                if over_qty > 0:
-                    if node.storage_over_capacity_variable_cost > 0:
-                        pl["stock_costs"][f"{cat}_variable"] += (
-                            node.storage_over_capacity_variable_cost * over_qty
-                        )
-                        self._push_cost(
-                            day=day,
-                            node=node.name,
-                            item="",
-                            event="storage_over_var",
-                            qty=over_qty,
-                            unit_cost=node.storage_over_capacity_variable_cost,
-                            account="storage_var",
-                        )
-                    if node.storage_over_capacity_fixed_cost > 0:
-                        pl["stock_costs"][
-                            f"{cat}_fixed"
-                        ] += node.storage_over_capacity_fixed_cost
-                        self._push_cost(
-                            day=day,
-                            node=node.name,
-                            item="",
-                            event="storage_over_fixed",
-                            qty=1.0,
-                            unit_cost=node.storage_over_capacity_fixed_cost,
-                            account="storage_fixed",
-                        )
 
         # Penalties
         # Stockout cost: apply per node shortage units on the day
-        for key, data in events.items():
-            if ":" in key:
-                continue
-            try:
-                node_name, _item = key.split("_", 1)
-            except ValueError:
-                continue
+        stockout_rates = self._stockout_rates
+        for node_name, _item, data in pair_events:
             shortage = data.get("shortage", 0) or 0
-            if shortage > 0:
-                node = self.nodes_map.get(node_name)
-                if node and getattr(node, "stockout_cost_per_unit", 0) > 0:
-                    unit_cost = getattr(node, "stockout_cost_per_unit", 0)
-                    pl["penalty_costs"]["stockout"] += unit_cost * shortage
-                    self._push_cost(
-                        day=day,
-                        node=node_name,
-                        item="",
-                        event="penalty_stockout",
-                        qty=shortage,
-                        unit_cost=unit_cost,
-                        account="penalty_stockout",
-                    )
+            if shortage > 0 and node_name in stockout_rates:
+                unit_cost = stockout_rates[node_name]
+                pl["penalty_costs"]["stockout"] += unit_cost * shortage
+                self._push_cost(
+                    day=day,
+                    node=node_name,
+                    item="",
+                    event="penalty_stockout",
+                    qty=shortage,
+                    unit_cost=unit_cost,
+                    account="penalty_stockout",
+                )
 
-        # Backorder carrying cost per day
+        # Backorder carrying cost per day（単価を持つノードが無ければ集計しない）
+        backorder_rates = self._backorder_rates
         supplier_bo_by_node = defaultdict(float)
-        for future_day, records in self.pending_shipments.items():
+        store_bo_by_node = defaultdict(float)
+        for future_day, records in (
+            self.pending_shipments.items() if backorder_rates else ()
+        ):
             if future_day >= day + 1:
                 for rec in records:
                     if len(rec) == 5:
                         _item, qty, supplier, _dest, is_bo = rec
                         if is_bo:
                             supplier_bo_by_node[supplier] += qty
-        store_bo_by_node = defaultdict(float)
-        for store_name, items in self.customer_backorders.items():
+        for store_name, items in (
+            self.customer_backorders.items() if backorder_rates else ()
+        ):
             store_bo_by_node[store_name] += sum(q for q in items.values() if q > 0)
 
         for node_name, qty in list(supplier_bo_by_node.items()) + list(
             store_bo_by_node.items()
         ):
-            node = self.nodes_map.get(node_name)
-            if (
-                node
-                and qty > 0
-                and getattr(node, "backorder_cost_per_unit_per_day", 0) > 0
-            ):
-                unit_cost = getattr(node, "backorder_cost_per_unit_per_day", 0)
+            if qty > 0 and node_name in backorder_rates:
+                unit_cost = backorder_rates[node_name]
                 pl["penalty_costs"]["backorder"] += unit_cost * qty
                 self._push_cost(
                     day=day,
@@ -1339,7 +1531,9 @@ class SupplyChainSimulator:
             pl["material_cost"] + total_flow + total_stock + total_penalty + total_sgna
         )
         pl["profit_loss"] = pl["revenue"] - pl["total_cost"]
-        self.daily_profit_loss.append(pl)
+        if self.record_profit_loss:
+            self.daily_profit_loss.append(pl)
+        self.kpi.add_profit_loss(pl)
 
     def recompute_pl_from_trace(self) -> list[dict]:
         """cost_trace を日別に集計し、PL風の辞書配列を返す。
@@ -1416,12 +1610,10 @@ class SupplyChainSimulator:
             "sgna": ("sgna_cost", None),
         }
 
-        for rec in self.cost_trace:
-            day = int(rec.get("day", 0) or 0)
+        # 行の dict は作らず、(day, account) ごとの合計を列から求める
+        for (day, account), amount in self.cost_trace.account_totals().items():
             if not (1 <= day <= days):
                 continue
-            account = rec.get("account")
-            amount = float(rec.get("amount", 0) or 0)
             target = mapping.get(account)
             if not target:
                 continue
@@ -0,0 +1,352 @@
+"""1つの入力から派生したパラメータ違いのバリアントを並列実行するシナリオスイープ。
+
+同じ Canonical 設定のサービス水準・MOQ・キャパシティ・リードタイム違いを 50〜200 本
+評価するとき、バリアントごとに Canonical → `SimulationInput` の変換とシミュレータの
+初期化を最初からやり直すと、毎回同じ前計算を繰り返すことになる。ここでは:
+
+  - 基準の `SimulationInput` は呼び出し側で1回だけ作る。
+  - バリアントは基準入力へのパッチ（パス → 値）で表し、変更したノード/リンク等だけを
+    複製して入力を組み立てる（他の要素は基準入力と共有する）。
+  - 隣接インデックス・需要プロファイル・需要の抽選（`PreparedNetwork`）はプロセスごとに
+    1回だけ作り、構造や需要を変えないバリアントで共有する。
+  - montecarlo と同じく基準入力とバリアント一覧はワーカー初期化時に1回だけ渡し、
+    タスクにはバリアント番号のチャンクだけを送る。
+
+パラメータのパス（セレクタ `*` は該当フィールドを持つ全要素）:
+  nodes.<name|*>.<field>                  例: nodes.*.service_level
+  nodes.<name|*>.<dict field>.<item|*>    例: nodes.S1.moq.P1（`*` は既存キー＋在庫品目）
+  network.<from>-><to>|*.<field>[.<item|*>]  例: network.*.lead_time
+  products.<name|*>.<field>
+  customer_demand.<store>:<product>|*.<field>
+  <field>                                 例: planning_horizon（トップレベル）
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from domain.models import SimulationInput
+from engine.compiled import create_simulator
+from engine.simulator import PreparedNetwork
+
+MAX_VARIANTS = 1000
+# ジョブ結果（result.json / result.csv）の行に含める KPI
+SWEEP_METRICS = (
+    "fill_rate",
+    "profit_total",
+    "cost_total",
+    "customer_shortage_total",
+    "backorder_peak",
+)
+
+_COLLECTION_KEYS = {
+    "nodes": lambda o: o.name,
+    "network": lambda o: f"{o.from_node}->{o.to_node}",
+    "products": lambda o: o.name,
+    "customer_demand": lambda o: f"{o.store_name}:{o.product_name}",
+}
+# 変更すると PreparedNetwork（構造・需要・乱数）を共有できなくなるもの
+_STRUCTURAL_FIELDS = {
+    "name",
+    "node_type",
+    "from_node",
+    "to_node",
+    "material_cost",
+    "producible_products",
+}
+_STRUCTURAL_TOP = {"planning_horizon", "random_seed"}
+
+_WORKER: Optional["_SweepRunner"] = None
+
+
+@dataclass(frozen=True)
+class ParamPath:
+    collection: Optional[str]  # None はトップレベルのフィールド
+    selector: str
+    field: str
+    key: Optional[str] = None
+
+    @property
+    def structural(self) -> bool:
+        if self.collection is None:
+            return self.field in _STRUCTURAL_TOP
+        return self.collection == "customer_demand" or self.field in _STRUCTURAL_FIELDS
+
+
+def parse_path(path: str) -> ParamPath:
+    parts = path.split(".")
+    if len(parts) == 1:
+        if parts[0] not in SimulationInput.model_fields or parts[0] in _COLLECTION_KEYS:
+            raise ValueError(f"unknown sweep parameter: {path}")
+        return ParamPath(None, "", parts[0])
+    if parts[0] not in _COLLECTION_KEYS or len(parts) not in (3, 4) or not all(parts):
+        raise ValueError(f"invalid sweep parameter path: {path}")
+    return ParamPath(
+        parts[0], parts[1], parts[2], parts[3] if len(parts) == 4 else None
+    )
+
+
+def expand_grid(grid: Mapping[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """{パス: 値のリスト} の直積をバリアント（パス → 値）のリストにする（キー順）。"""
+    for path, values in grid.items():
+        if not isinstance(values, (list, tuple)) or not values:
+            raise ValueError(f"grid values must be a non-empty list: {path}")
+    paths = list(grid)
+    return [
+        dict(zip(paths, combo))
+        for combo in itertools.product(*(grid[p] for p in paths))
+    ]
+
+
+def _patched(obj, p: ParamPath, value: Any, validate: bool):
+    if p.key is None:
+        new = obj.model_copy(update={p.field: value})
+    else:
+        current = getattr(obj, p.field)
+        if not isinstance(current, dict):
+            raise ValueError(f"{p.field} is not a per-item field")
+        keys = (
+            list(dict.fromkeys([*current, *getattr(obj, "initial_stock", {})]))
+            if p.key == "*"
+            else [p.key]
+        )
+        new = obj.model_copy(
+            update={p.field: {**current, **dict.fromkeys(keys, value)}}
+        )
+    if validate:
+        new = type(new).model_validate(new.model_dump())
+    return new
+
+
+def apply_patch(
+    sim_input: SimulationInput, patch: Mapping[str, Any], *, validate: bool = False
+) -> SimulationInput:
+    """patch を適用した入力を返す（変更した要素だけを複製し、sim_input は変えない）。"""
+    updates: Dict[str, Any] = {}
+    for path, value in patch.items():
+        p = parse_path(path)
+        if p.collection is None:
+            updates[p.field] = value
+            continue
+        items = updates.get(p.collection)
+        if items is None:
+            items = updates[p.collection] = list(getattr(sim_input, p.collection))
+        key_of = _COLLECTION_KEYS[p.collection]
+        matched = False
+        for i, obj in enumerate(items):
+            if p.selector != "*" and key_of(obj) != p.selector:
+                continue
+            if p.field not in type(obj).model_fields:
+                if p.selector == "*":
+                    continue
+                raise ValueError(f"{p.selector} has no field {p.field}: {path}")
+            items[i] = _patched(obj, p, value, validate)
+            matched = True
+        if not matched:
+            raise ValueError(f"no {p.collection} matches sweep parameter: {path}")
+    patched = sim_input.model_copy(update=updates)
+    if validate and any(k not in _COLLECTION_KEYS for k in updates):
+        patched = SimulationInput.model_validate(patched.model_dump())
+    return patched
+
+
+def normalize_variants(
+    sim_input: SimulationInput, variants: Sequence[Mapping[str, Any]]
+) -> List[Dict[str, Any]]:
+    """全バリアントのパスと値を検証し、値を入力モデルの型に揃えたバリアントを返す。
+
+    検証は (パス, 値) の組ごとに1回だけ行い、各バリアントの実行時には検証しない。
+    """
+    if not variants:
+        raise ValueError("sweep needs at least one variant")
+    if len(variants) > MAX_VARIANTS:
+        raise ValueError(f"too many sweep variants: {len(variants)} > {MAX_VARIANTS}")
+    checked: Dict[Tuple[str, str], Any] = {}
+    out: List[Dict[str, Any]] = []
+    for patch in variants:
+        normalized: Dict[str, Any] = {}
+        for path, value in patch.items():
+            sig = (path, repr(value))
+            if sig not in checked:
+                checked[sig] = _read(
+                    apply_patch(sim_input, {path: value}, validate=True),
+                    parse_path(path),
+                )
+            normalized[path] = checked[sig]
+        out.append(normalized)
+    return out
+
+
+def _read(sim_input: SimulationInput, p: ParamPath) -> Any:
+    """p が指す（最初の）値を読む。"""
+    if p.collection is None:
+        return getattr(sim_input, p.field)
+    key_of = _COLLECTION_KEYS[p.collection]
+    for obj in getattr(sim_input, p.collection):
+        if p.selector != "*" and key_of(obj) != p.selector:
+            continue
+        if p.field not in type(obj).model_fields:
+            continue
+        value = getattr(obj, p.field)
+        if p.key is None:
+            return value
+        if p.key != "*":
+            return value[p.key]
+        if value:
+            return next(iter(value.values()))
+    return None
+
+
+def shares_preparation(patch: Mapping[str, Any]) -> bool:
+    """patch が基準入力の PreparedNetwork をそのまま使えるか。"""
+    return not any(parse_path(path).structural for path in patch)
+
+
+class _SweepRunner:
+    """基準入力と前計算を保持してバリアントを実行する（プロセスごとに1つ）。"""
+
+    def __init__(
+        self,
+        base: SimulationInput,
+        variants: Sequence[Dict[str, Any]],
+        engine: Optional[str],
+        detail_level: str,
+    ):
+        self.base = base
+        self.variants = variants
+        self.engine = engine
+        self.detail_level = detail_level
+        self._prepared: Optional[PreparedNetwork] = None
+
+    def prepared(self) -> PreparedNetwork:
+        if self._prepared is None:
+            base_sim = create_simulator(
+                self.base, engine="legacy", detail_level="summary"
+            )
+            self._prepared = base_sim.prepare()
+        return self._prepared
+
+    def run(self, index: int) -> Tuple[int, Dict[str, Any]]:
+        patch = self.variants[index]
+        t0 = time.monotonic()
+        sim = create_simulator(
+            apply_patch(self.base, patch),
+            engine=self.engine,
+            detail_level=self.detail_level,
+            prepared=self.prepared() if shares_preparation(patch) else None,
+        )
+        results, daily_pl = sim.run()
+        out: Dict[str, Any] = {
+            "index": index,
+            "params": patch,
+            "summary": sim.compute_summary(),
+            "duration_ms": int((time.monotonic() - t0) * 1000),
+        }
+        if self.detail_level != "summary":
+            out["daily_profit_loss"] = daily_pl
+        if self.detail_level == "full":
+            out["results"] = results
+            # 型付きバッファのまま返し、Registry へもそのまま渡す
+            out["cost_trace"] = sim.cost_trace
+        return index, out
+
+
+def _init_worker(
+    base: SimulationInput,
+    variants: Sequence[Dict[str, Any]],
+    engine: Optional[str],
+    detail_level: str,
+) -> None:
+    global _WORKER
+    _WORKER = _SweepRunner(base, variants, engine, detail_level)
+
+
+def _run_chunk(indices: Sequence[int]) -> List[Tuple[int, Dict[str, Any]]]:
+    if _WORKER is None:
+        raise RuntimeError("sweep worker is not initialized")
+    return [_WORKER.run(i) for i in indices]
+
+
+def _resolve_workers(workers: Optional[int], n_variants: int) -> int:
+    if workers is None:
+        env = os.getenv("SCPLN_SWEEP_WORKERS")
+        workers = int(env) if env else (os.cpu_count() or 1)
+    return max(1, min(int(workers), n_variants))
+
+
+def iter_sweep(
+    base: SimulationInput,
+    variants: Sequence[Dict[str, Any]],
+    *,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    detail_level: str = "summary",
+    chunk_size: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(バリアント番号, 結果) を完了順に返す。variants は検証済みのものを渡す。"""
+    if not variants:
+        return
+    n_workers = _resolve_workers(workers, len(variants))
+    if n_workers <= 1:
+        runner = _SweepRunner(base, variants, engine, detail_level)
+        for i in range(len(variants)):
+            yield runner.run(i)
+        return
+    if chunk_size is None:
+        chunk_size = max(1, len(variants) // (n_workers * 4))
+    indices = list(range(len(variants)))
+    chunks = [indices[i : i + chunk_size] for i in range(0, len(indices), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(base, list(variants), engine, detail_level),
+    ) as pool:
+        futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+        for fut in as_completed(futures):
+            yield from fut.result()
+
+
+def run_sweep(
+    base: SimulationInput,
+    *,
+    grid: Optional[Mapping[str, Sequence[Any]]] = None,
+    variants: Optional[Sequence[Mapping[str, Any]]] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    detail_level: str = "summary",
+) -> Dict[str, Any]:
+    """grid の直積（または明示した variants）を実行し、バリアント順の結果を返す。"""
+    if variants is None:
+        variants = expand_grid(grid or {})
+    checked = normalize_variants(base, variants)
+    n_workers = _resolve_workers(workers, len(checked))
+    outputs: List[Optional[Dict[str, Any]]] = [None] * len(checked)
+    for index, out in iter_sweep(
+        base,
+        checked,
+        workers=n_workers,
+        engine=engine,
+        detail_level=detail_level,
+    ):
+        outputs[index] = out
+    return {"variants": outputs, "workers": n_workers}
+
+
+def variant_rows(
+    variants: Sequence[Dict[str, Any]], metrics: Sequence[str] = SWEEP_METRICS
+) -> List[Dict[str, Any]]:
+    """バリアントごとにパラメータと主要KPIを1行へ展開する（ジョブ結果/CSV 用）。"""
+    return [
+        {
+            "index": v["index"],
+            "run_id": v.get("run_id"),
+            **v["params"],
+            **{m: (v.get("summary") or {}).get(m) for m in metrics},
+        }
+        for v in variants
+    ]
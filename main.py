@@ -3,6 +3,7 @@
 from app.api import app
 import os
 from domain.models import SimulationInput
+from engine.cost_trace import trace_records
 from engine.simulator import SupplyChainSimulator
 import logging
 import math
@@ -73,6 +74,7 @@ if not globals().get("_SIM_LOADED", False):
             summary = sim.compute_summary()
         except Exception:
             summary = {}
+        cost_trace = trace_records(sim.cost_trace)
         cfg_json = None
         # header fallback
         try:
@@ -97,7 +99,7 @@ if not globals().get("_SIM_LOADED", False):
                 "summary": summary,
                 "results": results,
                 "daily_profit_loss": daily_pl,
-                "cost_trace": getattr(sim, "cost_trace", []),
+                "cost_trace": cost_trace,
                 "config_id": config_id,
                 "config_json": cfg_json,
             },
@@ -108,7 +110,7 @@ if not globals().get("_SIM_LOADED", False):
             "daily_profit_loss": daily_pl,
             "profit_loss": daily_pl,
             "summary": summary,
-            "cost_trace": getattr(sim, "cost_trace", []),
+            "cost_trace": cost_trace,
         }
 
 
@@ -5,21 +5,36 @@
 使い方:
   python scripts/allocate.py -i out/aggregate.json -o out/sku_week.json \
     -I samples/planning --weeks 4 --round int
+
+分割実行（`--workers N`）:
+  family は互いに独立なので、集約行を family 単位（SKU を共有する family は同じ区画）に
+  区画分けしてプロセスプールで按分する。ミックス表とカレンダーはワーカー初期化時に1回だけ渡し、
+  結果は入力行の順に並べ直すため、出力は逐次実行と同一。
+  `--stream` は SKU×週の行を区画ごとに PlanRepository と .jsonl 出力へ書き込み、
+  全行を1つのリストに保持しない（戻り値の payload の rows は空）。ファイルへ書く場合は
+  `-o` を .jsonl にする（行の並びは区画順）。
 """
 from __future__ import annotations
 
 import argparse
 import csv
-import json
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterator, List, Tuple, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
+from scripts.plan_interchange import JsonlRowWriter
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    is_jsonl,
+    load_stage_input,
     resolve_storage_config,
     store_allocate_payload,
+    stream_allocate_payload,
 )
 from scripts.calendar_utils import (
     build_calendar_lookup,
@@ -143,7 +158,216 @@ def _distribute_by_ratios(
     return distribute_int(floats, total_int, caps=caps_int)
 
 
-def main() -> None:
+def _allocate_row(
+    r: Dict[str, Any],
+    *,
+    mix: Dict[str, List[Tuple[str, float]]],
+    lookup: Optional[PlanningCalendarLookup],
+    weeks: int,
+    round_mode: str,
+) -> List[Dict[str, Any]]:
+    """集約1行（family×period）を SKU×週の行へ按分する。"""
+
+    out_rows: List[Dict[str, Any]] = []
+    fam = str(r.get("family"))
+    per = str(r.get("period"))
+    demand = float(r.get("demand", 0) or 0)
+    supply = float(r.get("supply", 0) or 0)
+    backlog = float(r.get("backlog", 0) or 0)
+    pairs = mix.get(fam)
+    if not pairs:
+        pairs = [(fam, 1.0)]  # ミックス未定義の場合はfamily全量を仮SKUへ
+
+    week_entries = get_week_distribution(per, lookup, weeks)
+    week_ratios = _week_ratio_weights(week_entries)
+
+    if round_mode == "int":
+        total_d = int(round_quantity(demand, mode="int"))
+        total_s = int(round_quantity(supply, mode="int"))
+        shares = [max(0.0, share) for _, share in pairs]
+        share_sum = sum(shares)
+        if share_sum <= 0:
+            shares = [1.0] * len(pairs)
+            share_sum = len(pairs)
+        norm_shares = [s / share_sum for s in shares]
+        d_sku_ints = distribute_int(
+            [total_d * s for s in norm_shares],
+            total_d,
+        )
+        s_sku_ints = distribute_int(
+            [total_s * s for s in norm_shares],
+            total_s,
+            caps=d_sku_ints,
+        )
+        b_sku_ints = [max(0, d_i - s_i) for d_i, s_i in zip(d_sku_ints, s_sku_ints)]
+        for (sku, _share), d_sku_int, s_sku_int, b_sku_int in zip(
+            pairs, d_sku_ints, s_sku_ints, b_sku_ints
+        ):
+            demand_parts = _distribute_by_ratios(d_sku_int, week_ratios)
+            supply_parts = _distribute_by_ratios(
+                s_sku_int,
+                week_ratios,
+                caps=demand_parts,
+            )
+            backlog_parts = [
+                demand_parts[i] - supply_parts[i] for i in range(len(week_entries))
+            ]
+            for i, entry in enumerate(week_entries):
+                out_rows.append(
+                    {
+                        "family": fam,
+                        "period": per,
+                        "sku": sku,
+                        "week": entry.week_code,
+                        "demand": demand_parts[i],
+                        "supply": supply_parts[i],
+                        "supply_plan": supply_parts[i],
+                        "backlog": backlog_parts[i],
+                    }
+                )
+        return out_rows
+
+    for sku, share in pairs:
+        d_sku = demand * share
+        s_sku = supply * share
+        b_sku = backlog * share
+        # カレンダーの重みで週割
+        d_parts = [d_sku * week_ratios[i] for i in range(len(week_entries))]
+        s_parts = [s_sku * week_ratios[i] for i in range(len(week_entries))]
+        b_parts = [b_sku * week_ratios[i] for i in range(len(week_entries))]
+
+        # 丸め → 誤差吸収
+        d_parts = _round_series(d_parts, mode=round_mode)
+        s_parts = _round_series(s_parts, mode=round_mode)
+        b_parts = _round_series(b_parts, mode=round_mode)
+        d_parts = _absorb_delta(d_sku, d_parts)
+        s_parts = _absorb_delta(s_sku, s_parts)
+        b_parts = _absorb_delta(b_sku, b_parts)
+
+        for i, entry in enumerate(week_entries):
+            out_rows.append(
+                {
+                    "family": fam,
+                    "period": per,
+                    "sku": sku,
+                    "week": entry.week_code,
+                    "demand": d_parts[i],
+                    "supply": s_parts[i],
+                    "supply_plan": s_parts[i],
+                    "backlog": b_parts[i],
+                }
+            )
+    return out_rows
+
+
+# --- 分割実行 ---------------------------------------------------------------
+
+_WORKER_CONTEXT: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(context: Dict[str, Any]) -> None:
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = context
+
+
+def _allocate_partition(
+    rows: Sequence[Tuple[int, Dict[str, Any]]],
+    context: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[int, List[Dict[str, Any]]]]:
+    """区画内の (入力行番号, 集約行) を按分し、(入力行番号, SKU×週の行) を返す。"""
+
+    ctx = context if context is not None else _WORKER_CONTEXT
+    if ctx is None:
+        raise RuntimeError("allocate worker is not initialized")
+    return [(index, _allocate_row(r, **ctx)) for index, r in rows]
+
+
+def partition_rows(
+    rows_in: Sequence[Dict[str, Any]],
+    mix: Dict[str, List[Tuple[str, float]]],
+    n_partitions: int,
+) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """集約行を family 単位で n_partitions 個以下の区画に分ける。
+
+    SKU を共有する family は同じ区画に入れる（SKU×週の行が区画をまたがない）。
+    区画の内容は入力だけで決まり、各区画内の行は入力順。
+    """
+
+    parent: Dict[str, str] = {}
+
+    def find(x: str) -> str:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a: str, b: str) -> None:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, r in enumerate(rows_in):
+        fam = str(r.get("family"))
+        groups.setdefault(fam, []).append((index, r))
+        for sku, _share in mix.get(fam) or [(fam, 1.0)]:
+            union("f:" + fam, "s:" + sku)
+
+    components: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for fam, members in groups.items():
+        components.setdefault(find("f:" + fam), []).extend(members)
+
+    # 行数の多い成分から、行数が最小の区画へ詰める（同数は番号の小さい区画）
+    n_partitions = max(1, min(n_partitions, len(components)))
+    partitions: List[List[Tuple[int, Dict[str, Any]]]] = [
+        [] for _ in range(n_partitions)
+    ]
+    ordered = sorted(components.values(), key=lambda m: (-len(m), m[0][0]))
+    for members in ordered:
+        target = min(range(n_partitions), key=lambda i: (len(partitions[i]), i))
+        partitions[target].extend(members)
+    for part in partitions:
+        part.sort(key=lambda item: item[0])
+    return [part for part in partitions if part]
+
+
+# --stream を同一プロセスで実行するときの区画数（書き込み単位の目安）
+_STREAM_PARTITIONS = 16
+
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    if workers is None:
+        env = os.getenv("SCPLN_ALLOCATE_WORKERS")
+        workers = int(env) if env else 1
+    return max(1, int(workers))
+
+
+def iter_partitions(
+    rows_in: Sequence[Dict[str, Any]],
+    context: Dict[str, Any],
+    *,
+    workers: int,
+) -> Iterator[List[Tuple[int, List[Dict[str, Any]]]]]:
+    """区画ごとの按分結果を区画番号順に返す（workers<=1 は同一プロセスで順に）。"""
+
+    if workers <= 1:
+        yield _allocate_partition(list(enumerate(rows_in)), context)
+        return
+    # ワーカーあたり数区画に分け、偏りとIPC回数のバランスを取る
+    partitions = partition_rows(rows_in, context["mix"], workers * 4)
+    if len(partitions) <= 1:
+        yield _allocate_partition(list(enumerate(rows_in)), context)
+        return
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(partitions)),
+        initializer=_init_worker,
+        initargs=(context,),
+    ) as pool:
+        yield from pool.map(_allocate_partition, partitions)
+
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="按分（family→SKU、月→週）")
     ap.add_argument("-i", "--input", required=True, help="plan_aggregateの出力JSON")
     ap.add_argument("-o", "--output", required=True, help="出力JSON（SKU×週）")
@@ -182,10 +406,29 @@ def main() -> None:
         default=None,
         help="PlanningカレンダーJSONのパス（未指定時は input_dir から探索）",
     )
-    args = ap.parse_args()
+    ap.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="family 区画を按分するプロセス数（既定: 環境変数 SCPLN_ALLOCATE_WORKERS または 1）",
+    )
+    ap.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        help="SKU×週の行を区画ごとに PlanRepository / .jsonl 出力へ書き込み、"
+        "出力 payload には保持しない（ファイル出力は -o *.jsonl のみ）",
+    )
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """aggregate payload を SKU×週へ按分して返す。"""
 
-    with open(args.input, encoding="utf-8") as f:
-        agg = json.load(f)
+    agg = load_stage_input(args.input, store)
     mix = _load_mix(args.input_dir, args.mix, normalize=True)
 
     rows_in: List[Dict[str, Any]] = agg.get("rows", [])
@@ -197,95 +440,23 @@ def main() -> None:
     if lookup:
         calendar_mode = lookup.spec.calendar_type or "custom"
 
-    for r in rows_in:
-        fam = str(r.get("family"))
-        per = str(r.get("period"))
-        demand = float(r.get("demand", 0) or 0)
-        supply = float(r.get("supply", 0) or 0)
-        backlog = float(r.get("backlog", 0) or 0)
-        pairs = mix.get(fam)
-        if not pairs:
-            pairs = [(fam, 1.0)]  # ミックス未定義の場合はfamily全量を仮SKUへ
-
-        week_entries = get_week_distribution(per, lookup, weeks)
-        week_ratios = _week_ratio_weights(week_entries)
-
-        if args.round_mode == "int":
-            total_d = int(round_quantity(demand, mode="int"))
-            total_s = int(round_quantity(supply, mode="int"))
-            shares = [max(0.0, share) for _, share in pairs]
-            share_sum = sum(shares)
-            if share_sum <= 0:
-                shares = [1.0] * len(pairs)
-                share_sum = len(pairs)
-            norm_shares = [s / share_sum for s in shares]
-            d_sku_ints = distribute_int(
-                [total_d * s for s in norm_shares],
-                total_d,
-            )
-            s_sku_ints = distribute_int(
-                [total_s * s for s in norm_shares],
-                total_s,
-                caps=d_sku_ints,
-            )
-            b_sku_ints = [max(0, d_i - s_i) for d_i, s_i in zip(d_sku_ints, s_sku_ints)]
-            for (sku, _share), d_sku_int, s_sku_int, b_sku_int in zip(
-                pairs, d_sku_ints, s_sku_ints, b_sku_ints
-            ):
-                demand_parts = _distribute_by_ratios(d_sku_int, week_ratios)
-                supply_parts = _distribute_by_ratios(
-                    s_sku_int,
-                    week_ratios,
-                    caps=demand_parts,
-                )
-                backlog_parts = [
-                    demand_parts[i] - supply_parts[i] for i in range(len(week_entries))
-                ]
-                for i, entry in enumerate(week_entries):
-                    out_rows.append(
-                        {
-                            "family": fam,
-                            "period": per,
-                            "sku": sku,
-                            "week": entry.week_code,
-                            "demand": demand_parts[i],
-                            "supply": supply_parts[i],
-                            "supply_plan": supply_parts[i],
-                            "backlog": backlog_parts[i],
-                        }
-                    )
-            continue
-
-        for sku, share in pairs:
-            d_sku = demand * share
-            s_sku = supply * share
-            b_sku = backlog * share
-            # カレンダーの重みで週割
-            d_parts = [d_sku * week_ratios[i] for i in range(len(week_entries))]
-            s_parts = [s_sku * week_ratios[i] for i in range(len(week_entries))]
-            b_parts = [b_sku * week_ratios[i] for i in range(len(week_entries))]
-
-            # 丸め → 誤差吸収
-            d_parts = _round_series(d_parts, mode=args.round_mode)
-            s_parts = _round_series(s_parts, mode=args.round_mode)
-            b_parts = _round_series(b_parts, mode=args.round_mode)
-            d_parts = _absorb_delta(d_sku, d_parts)
-            s_parts = _absorb_delta(s_sku, s_parts)
-            b_parts = _absorb_delta(b_sku, b_parts)
-
-            for i, entry in enumerate(week_entries):
-                out_rows.append(
-                    {
-                        "family": fam,
-                        "period": per,
-                        "sku": sku,
-                        "week": entry.week_code,
-                        "demand": d_parts[i],
-                        "supply": s_parts[i],
-                        "supply_plan": s_parts[i],
-                        "backlog": b_parts[i],
-                    }
-                )
+    context = {
+        "mix": mix,
+        "lookup": lookup,
+        "weeks": weeks,
+        "round_mode": args.round_mode,
+    }
+    workers = _resolve_workers(args.workers)
+    if args.stream:
+        return _run_streaming(args, agg, rows_in, context, workers, store=store)
+
+    # 区画の結果を入力行の順に並べ直す（逐次実行と同じ順序）
+    slots: List[List[Dict[str, Any]]] = [[] for _ in rows_in]
+    for part in iter_partitions(rows_in, context, workers=workers):
+        for index, rows in part:
+            slots[index] = rows
+    for rows in slots:
+        out_rows.extend(rows)
 
     payload = {
         "schema_version": agg.get("schema_version", "agg-1.0"),
@@ -301,6 +472,113 @@ def main() -> None:
         },
         "rows": out_rows,
     }
+    persist(args, payload, store=store)
+    return payload
+
+
+def _run_streaming(
+    args: argparse.Namespace,
+    agg: Dict[str, Any],
+    rows_in: List[Dict[str, Any]],
+    context: Dict[str, Any],
+    workers: int,
+    *,
+    store: Optional[PayloadStore] = None,
+) -> Dict[str, Any]:
+    """区画ごとの按分結果をそのまま PlanRepository / .jsonl へ書き込む（--stream）。"""
+
+    storage_config, warning = resolve_storage_config(
+        args.storage, args.version_id, cli_label="allocate"
+    )
+    if warning:
+        print(warning, file=sys.stderr)
+    if storage_config.use_files and not is_jsonl(args.output):
+        raise StageError(
+            "--stream のファイル出力は行ストリーム形式のみです（-o に .jsonl を指定）"
+        )
+
+    if workers <= 1:
+        # 同一プロセスでも区画単位に按分し、書き込みまで区画ごとに進める
+        parts: Iterator[List[Tuple[int, List[Dict[str, Any]]]]] = (
+            _allocate_partition(part, context)
+            for part in partition_rows(rows_in, context["mix"], _STREAM_PARTITIONS)
+        )
+    else:
+        parts = iter_partitions(rows_in, context, workers=workers)
+
+    lookup = context["lookup"]
+    meta = {
+        "schema_version": agg.get("schema_version", "agg-1.0"),
+        "note": "PR3: family→SKU と 月→週の比例配分（丸め/誤差吸収あり）",
+        "inputs_summary": {
+            **agg.get("inputs_summary", {}),
+            "aggregate_rows": len(rows_in),
+            "mix_families": len(context["mix"]),
+            "weeks_per_period": context["weeks"],
+            "round_mode": args.round_mode,
+            "calendar_mode": (
+                (lookup.spec.calendar_type or "custom") if lookup else "fallback_weeks"
+            ),
+            "calendar_periods": len(lookup.distributions) if lookup else 0,
+        },
+    }
+    counts = {"rows": 0, "partitions": 0}
+    writer = JsonlRowWriter(args.output, meta) if storage_config.use_files else None
+
+    def batches() -> Iterator[List[Dict[str, Any]]]:
+        for part in parts:
+            counts["partitions"] += 1
+            batch = [row for _index, rows in part for row in rows]
+            counts["rows"] += len(batch)
+            if writer is not None:
+                writer.write_rows(batch)
+            yield batch
+
+    with writer if writer is not None else nullcontext():
+        if storage_config.use_db:
+            try:
+                stream_allocate_payload(
+                    storage_config, aggregate_data=agg, batches=batches()
+                )
+            except PlanRepositoryError as exc:
+                raise StageError(
+                    f"PlanRepository書き込みに失敗しました: {exc}"
+                ) from exc
+        else:
+            for _batch in batches():
+                pass
+
+    payload = {
+        **meta,
+        "inputs_summary": {
+            **meta["inputs_summary"],
+            "streamed_rows": counts["rows"],
+            "partitions": counts["partitions"],
+        },
+        "rows": [],
+    }
+    # .jsonl を書いた場合、後続ステージは store ではなくファイルから行を順に読む
+    if store is not None and writer is None:
+        store.put(args.output, payload)
+    targets = []
+    if writer is not None:
+        targets.append(str(args.output))
+    if storage_config.use_db:
+        targets.append(f"PlanRepository version={storage_config.version_id}")
+    print(f"[ok] streamed {counts['rows']} detail rows to {', '.join(targets)}")
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
 
     storage_config, warning = resolve_storage_config(
         args.storage, args.version_id, cli_label="allocate"
@@ -311,13 +589,12 @@ def main() -> None:
     try:
         wrote_db = store_allocate_payload(
             storage_config,
-            aggregate_data=agg,
+            aggregate_data=load_stage_input(args.input, store),
             detail_data=payload,
             output_path=Path(args.output),
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -328,5 +605,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
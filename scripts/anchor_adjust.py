@@ -19,13 +19,15 @@ from __future__ import annotations
 
 import argparse
 import csv
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, DefaultDict, Optional
+from typing import Any, Dict, List, Tuple, DefaultDict, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    load_stage_input,
     resolve_storage_config,
     store_anchor_adjust_payload,
 )
@@ -54,11 +56,6 @@ def _period_from_week(week_key: str) -> str:
     return s
 
 
-def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
-
-
 def _round6(x: float) -> float:
     try:
         return round(float(x), 6)
@@ -114,7 +111,7 @@ def _week_sequence_value(code: str, fallback: int) -> int:
     return fallback
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="anchor=DET_near の簡易再配分（v2最小）")
     ap.add_argument(
         "-i", "--inputs", nargs=2, required=True, help="aggregate.json と sku_week.json"
@@ -262,7 +259,13 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """cutover 周辺で DET を AGG にアンカー調整した payload を返す。"""
 
     lookup = _resolve_calendar_lookup(args.calendar, args.input_dir)
     global _CAL_LOOKUP, _WEEK_SEQUENCE
@@ -275,32 +278,15 @@ def main() -> None:
                 _WEEK_SEQUENCE.setdefault(entry.week_code, seq)
     fallback_weeks = max(1, int(args.weeks_per_period or 4))
 
-    storage_config, warning = resolve_storage_config(
-        args.storage, args.version_id, cli_label="anchor_adjust"
-    )
-    if warning:
-        print(warning, file=sys.stderr)
-
-    agg = _load_json(args.inputs[0])
-    det = _load_json(args.inputs[1])
+    agg = load_stage_input(args.inputs[0], store)
+    det = load_stage_input(args.inputs[1], store)
     agg_rows: List[Dict[str, Any]] = agg.get("rows", [])
     det_rows: List[Dict[str, Any]] = det.get("rows", [])
 
     if not det_rows:
-        # no-op
-        wrote_db = store_anchor_adjust_payload(
-            storage_config,
-            adjusted_data=det,
-            output_path=Path(args.output),
-        )
-        if storage_config.use_files:
-            print(f"[ok] wrote {args.output} (no-op)")
-        if wrote_db:
-            print(
-                "[ok] stored adjusted det rows in PlanRepository "
-                f"version={storage_config.version_id}"
-            )
-        return
+        # no-op（DETをそのまま出力）
+        persist(args, det, store=store)
+        return det
 
     # cutover month
     s = str(args.cutover_date)
@@ -989,6 +975,27 @@ def main() -> None:
             "headroom_capacity_weight": args.headroom_capacity_weight,
         },
     }
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
+
+    storage_config, warning = resolve_storage_config(
+        args.storage, args.version_id, cli_label="anchor_adjust"
+    )
+    if warning:
+        print(warning, file=sys.stderr)
+
     try:
         wrote_db = store_anchor_adjust_payload(
             storage_config,
@@ -996,8 +1003,7 @@ def main() -> None:
             output_path=Path(args.output),
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -1008,5 +1014,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""runs テーブルの results/daily_profit_loss/cost_trace を blob 形式へ変換するバックフィル。
+
+payload_format が NULL（旧来の JSON TEXT）の行を run_id 順にバッチで読み出し、
+指定 codec で再符号化して書き戻す。バッチごとにコミットするため、中断しても
+再実行すれば未変換の行から続きを処理できる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+from app import db  # noqa: E402
+from app.run_payload_codec import (  # noqa: E402
+    PAYLOAD_CODECS,
+    PAYLOAD_FIELDS,
+    decode_field,
+    encode_field,
+    resolve_codec,
+)
+
+
+@dataclass
+class BackfillCounts:
+    converted: int = 0
+    errors: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Convert runs payload columns to the versioned blob format."
+    )
+    parser.add_argument(
+        "--db", default=None, help="対象DBパス（既定: SCPLN_DB / data/scpln.db）。"
+    )
+    parser.add_argument(
+        "--codec",
+        choices=PAYLOAD_CODECS,
+        default=None,
+        help="変換先 codec（既定: RUNS_PAYLOAD_CODEC または zjson）。",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="1コミットあたりの行数。"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="処理する行数の上限。")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="payload_format が変換先と異なる行をすべて対象にする（既定は NULL の行のみ）。",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="書き込みを行わずにサイズ変化を表示する。",
+    )
+    parser.add_argument(
+        "--vacuum", action="store_true", help="完了後に VACUUM して領域を回収する。"
+    )
+    return parser.parse_args(list(argv) if argv is not None else None)
+
+
+def _payload_size(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(value)
+
+
+def run_backfill(
+    codec: Optional[str] = None,
+    *,
+    batch_size: int = 100,
+    limit: Optional[int] = None,
+    include_all: bool = False,
+    dry_run: bool = False,
+) -> BackfillCounts:
+    codec = resolve_codec(codec)
+    batch_size = max(1, int(batch_size))
+    counts = BackfillCounts()
+    if include_all:
+        where = "(payload_format IS NULL OR payload_format != ?)"
+        where_params: tuple = (codec,)
+    else:
+        where = "payload_format IS NULL"
+        where_params = ()
+    last_id = ""
+    processed = 0
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        with db._conn() as c:
+            # run_id によるキーセット走査（変換に失敗した行で足踏みしない）
+            rows = c.execute(
+                f"SELECT run_id, results, daily_profit_loss, cost_trace FROM runs"
+                f" WHERE {where} AND run_id > ? ORDER BY run_id LIMIT ?",
+                (*where_params, last_id, size),
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                last_id = row["run_id"]
+                processed += 1
+                try:
+                    encoded = {
+                        f: encode_field(f, decode_field(row[f], []), codec)
+                        for f in PAYLOAD_FIELDS
+                    }
+                except Exception as exc:
+                    counts.errors += 1
+                    print(f"skip {row['run_id']}: {exc}", file=sys.stderr)
+                    continue
+                counts.converted += 1
+                counts.bytes_before += sum(
+                    _payload_size(row[f]) for f in PAYLOAD_FIELDS
+                )
+                counts.bytes_after += sum(_payload_size(v) for v in encoded.values())
+                if dry_run:
+                    continue
+                c.execute(
+                    "UPDATE runs SET results=?, daily_profit_loss=?, cost_trace=?,"
+                    " payload_format=? WHERE run_id=?",
+                    (
+                        encoded["results"],
+                        encoded["daily_profit_loss"],
+                        encoded["cost_trace"],
+                        codec,
+                        row["run_id"],
+                    ),
+                )
+        print(
+            f"batch: last_run_id={last_id} converted={counts.converted} errors={counts.errors}"
+        )
+    return counts
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.db:
+        db.set_db_path(args.db)
+    counts = run_backfill(
+        args.codec,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        include_all=args.all,
+        dry_run=args.dry_run,
+    )
+    if args.vacuum and not args.dry_run:
+        conn = db._conn()
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    print(
+        f"完了: converted={counts.converted}, errors={counts.errors}, "
+        f"bytes {counts.bytes_before} -> {counts.bytes_after}"
+    )
+    if counts.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,20 @@ OUT_DIR=${1:-backup}
 mkdir -p "$OUT_DIR"
 ts=$(date +%Y%m%d_%H%M%S)
 if [ -f "$DB_PATH" ]; then
-  cp -p "$DB_PATH" "$OUT_DIR/scpln_${ts}.db"
+  # WAL モードでは未チェックポイントの変更が -wal 側にあるため、
+  # ファイルコピーではなく SQLite のオンラインバックアップで複製する
+  python3 - "$DB_PATH" "$OUT_DIR/scpln_${ts}.db" <<'PY'
+import sqlite3
+import sys
+
+src = sqlite3.connect(sys.argv[1])
+dst = sqlite3.connect(sys.argv[2])
+try:
+    src.backup(dst)
+finally:
+    dst.close()
+    src.close()
+PY
   echo "Backup created: $OUT_DIR/scpln_${ts}.db"
 else
   echo "DB not found: $DB_PATH" >&2
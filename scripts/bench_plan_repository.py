@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+PlanRepository.write_plan の一括書込みベンチマーク
+
+目的:
+- 合成した plan_series 行（品目×週）を、従来の書込み（全行を正規化したリストを
+  1回の executemany）と現行の write_plan（行イテレータを区切って挿入し、大量時は
+  二次インデックスを外して作り直す）で書き込み、所要時間・rows/s・メモリ増分を比べる。
+- DB は --schema-db（既定: data/scpln.db）のスキーマだけを一時ファイルへ複製して使う。
+
+使い方:
+  PYTHONPATH=. python3 scripts/bench_plan_repository.py --rows 1000000
+  PYTHONPATH=. python3 scripts/bench_plan_repository.py --rows 200000 --existing 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Iterator
+
+from app import db
+from core.plan_repository import (
+    _BULK_INDEX_DEFAULT,
+    _BULK_INDEX_ENV,
+    _PLAN_SERIES_COLUMNS,
+    PlanRepository,
+    PlanSeriesRow,
+)
+
+_DEFAULT_SCHEMA_DB = Path(__file__).resolve().parents[1] / "data" / "scpln.db"
+
+
+def copy_schema(src: Path, dst: Path) -> None:
+    """src のテーブル/インデックス定義だけを dst へ作る。"""
+    with sqlite3.connect(str(src)) as s:
+        ddl = [
+            sql
+            for (sql,) in s.execute(
+                "SELECT sql FROM sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+                "ORDER BY type DESC"
+            )
+        ]
+    with sqlite3.connect(str(dst)) as d:
+        for sql in ddl:
+            d.execute(sql)
+
+
+def iter_series(
+    version_id: str, rows: int, *, weeks: int = 52
+) -> Iterator[PlanSeriesRow]:
+    """品目×週の det 行を rows 件生成する（リストにしない）。"""
+    for i in range(rows):
+        item, week = divmod(i, weeks)
+        yield {
+            "version_id": version_id,
+            "level": "det",
+            "time_bucket_type": "week",
+            "time_bucket_key": f"2025-W{week + 1:02d}",
+            "item_key": f"SKU{item:07d}",
+            "location_key": "global",
+            "location_type": "global",
+            "demand": float(i % 97),
+            "supply": float(i % 89),
+            "backlog": 0.0,
+            "extra_json": '{"family": "F%d"}' % (item % 50),
+            "source": "bench",
+        }
+
+
+def _legacy_write(repo: PlanRepository, version_id: str, rows: int) -> None:
+    """従来の書込み（全行を正規化したリスト → 1回の executemany）。"""
+    now = int(time.time() * 1000)
+    normalized = [
+        repo._normalize_series_row(version_id, row, now)
+        for row in iter_series(version_id, rows)
+    ]
+    conn = db._conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        repo._delete_plan(conn, version_id)
+        conn.executemany(
+            repo._build_insert_sql("plan_series", _PLAN_SERIES_COLUMNS), normalized
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _bulk_write(repo: PlanRepository, version_id: str, rows: int) -> None:
+    repo.write_plan(version_id, series=iter_series(version_id, rows))
+
+
+def _measure(fn, *args, memory: bool) -> Dict[str, float]:
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - t0
+    peak = 0
+    if memory:
+        _cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"seconds": elapsed, "peak_mb": peak / 1e6}
+
+
+def run_bench(
+    *, rows: int, existing: int, schema_db: Path, memory: bool
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, fn in (("legacy", _legacy_write), ("bulk", _bulk_write)):
+            path = Path(tmp) / f"{mode}.db"
+            copy_schema(schema_db, path)
+            db.set_db_path(str(path))
+            repo = PlanRepository(db._conn)
+            for vid in ("bench-existing", "bench"):
+                db.create_plan_version(vid, status="bench")
+            if existing:
+                repo.write_plan(
+                    "bench-existing", series=iter_series("bench-existing", existing)
+                )
+            results[mode] = _measure(fn, repo, "bench", rows, memory=memory)
+            results[mode]["rows_per_second"] = rows / results[mode]["seconds"]
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="PlanRepository 一括書込みベンチマーク")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument(
+        "--existing",
+        type=int,
+        default=0,
+        help="計測前に別versionとして書いておく plan_series 行数",
+    )
+    ap.add_argument("--schema-db", type=Path, default=_DEFAULT_SCHEMA_DB)
+    ap.add_argument(
+        "--memory",
+        action="store_true",
+        help="tracemalloc でメモリ増分のピークも測る（計測中は遅くなる）",
+    )
+    args = ap.parse_args()
+    if not args.schema_db.exists():
+        raise SystemExit(
+            f"schema DB not found: {args.schema_db} (alembic upgrade head)"
+        )
+
+    results = run_bench(
+        rows=args.rows,
+        existing=args.existing,
+        schema_db=args.schema_db,
+        memory=args.memory,
+    )
+    for mode, r in results.items():
+        line = f"{mode:6s} rows={args.rows} {r['seconds']:.2f}s {r['rows_per_second']:,.0f} rows/s"
+        if args.memory:
+            line += f" peak={r['peak_mb']:.1f}MB"
+        print(line)
+    if results["bulk"]["seconds"] > 0:
+        print(
+            f"speedup={results['legacy']['seconds'] / results['bulk']['seconds']:.2f}x"
+        )
+    threshold = os.getenv(_BULK_INDEX_ENV, str(_BULK_INDEX_DEFAULT))
+    print(f"bulk index threshold: {_BULK_INDEX_ENV}={threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+シミュレーションエンジンのベンチマーク
+
+目的:
+- 合成したネットワーク（店舗/倉庫/工場/材料 × 品目）で legacy と compiled の
+  実行時間を比較し、出力が一致することも併せて確認する。
+
+- --sampling 指定時は需要サンプリングのみを対象に、従来の日次ループ内抽選
+  （グローバル random）と前生成の需要行列の所要時間を比較する。
+
+使い方:
+  PYTHONPATH=. python3 scripts/bench_simulator.py --stores 40 --items 25 --days 365
+  PYTHONPATH=. python3 scripts/bench_simulator.py --stores 400 --days 365 --sampling
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from domain.models import SimulationInput
+from engine.compiled import create_simulator
+from engine.simulator import SupplyChainSimulator
+
+
+def build_network(
+    *,
+    stores: int = 10,
+    warehouses: int = 2,
+    factories: int = 1,
+    materials: int = 2,
+    items: int = 5,
+    days: int = 60,
+    seed: int = 0,
+    constrained: bool = False,
+) -> SimulationInput:
+    """ベンチマーク/パリティテスト用の合成ネットワークを生成する。
+
+    constrained=True の場合は保管・輸送キャパ、リードタイム0、販売逸失などの
+    分岐を通る設定を混在させる。
+    """
+    rng = random.Random(seed)
+    fg = [f"FG{i:03d}" for i in range(items)]
+    comps = [f"RM{i:03d}" for i in range(max(1, items // 2))]
+    products: List[Dict[str, Any]] = [
+        {
+            "name": name,
+            "sales_price": 100 + rng.randint(0, 50),
+            "unit_cost": 40 + rng.randint(0, 10),
+            "sgna_cost_per_unit": rng.choice([0, 2.5]),
+            "assembly_bom": [{"item_name": rng.choice(comps), "quantity_per": 2}],
+        }
+        for name in fg
+    ]
+    nodes: List[Dict[str, Any]] = []
+    network: List[Dict[str, Any]] = []
+    demand: List[Dict[str, Any]] = []
+
+    mat_names = [f"MAT{i:02d}" for i in range(materials)]
+    for k, name in enumerate(mat_names):
+        owned = comps[k::materials] or comps
+        nodes.append(
+            {
+                "name": name,
+                "node_type": "material",
+                "initial_stock": {c: 5000 for c in owned},
+                "material_cost": {c: 5 + k for c in owned},
+                "storage_cost_fixed": 10,
+            }
+        )
+    fac_names = [f"FAC{i:02d}" for i in range(factories)]
+    for k, name in enumerate(fac_names):
+        node: Dict[str, Any] = {
+            "name": name,
+            "node_type": "factory",
+            "producible_products": fg,
+            "initial_stock": {**{f: 50 for f in fg}, **{c: 300 for c in comps}},
+            "lead_time": 3,
+            "production_cost_fixed": 500,
+            "production_cost_variable": 4,
+            "reorder_point": {c: 200 for c in comps},
+            "order_up_to_level": {c: 600 for c in comps},
+            "moq": {c: 50 for c in comps},
+            "order_multiple": {c: 25 for c in comps},
+            "storage_cost_variable": {f: 0.2 for f in fg},
+            "backorder_cost_per_unit_per_day": 0.1,
+        }
+        if constrained:
+            node.update(
+                {
+                    "storage_capacity": 4000 + 100 * k,
+                    "allow_storage_over_capacity": k % 2 == 0,
+                    "storage_over_capacity_variable_cost": 1.5,
+                    "storage_over_capacity_fixed_cost": 30,
+                    "production_capacity": 60,
+                    "production_over_capacity_variable_cost": 2,
+                    "production_over_capacity_fixed_cost": 40,
+                }
+            )
+        nodes.append(node)
+        for m in mat_names:
+            network.append(
+                {
+                    "from_node": m,
+                    "to_node": name,
+                    "transportation_cost_fixed": 100,
+                    "transportation_cost_variable": 0.5,
+                    "lead_time": 5,
+                }
+            )
+    wh_names = [f"DC{i:02d}" for i in range(warehouses)]
+    for k, name in enumerate(wh_names):
+        node = {
+            "name": name,
+            "node_type": "warehouse",
+            "initial_stock": {f: 200 for f in fg},
+            "service_level": 0.9,
+            "moq": {f: 20 for f in fg},
+            "order_multiple": {f: 10 for f in fg},
+            "storage_cost_fixed": 50,
+            "storage_cost_variable": {f: 0.1 for f in fg},
+            "stockout_cost_per_unit": 1.0,
+            "backorder_cost_per_unit_per_day": 0.2,
+        }
+        if constrained:
+            node.update(
+                {
+                    "storage_capacity": 150 * items,
+                    "allow_storage_over_capacity": k % 2 == 1,
+                    "storage_over_capacity_variable_cost": 0.5,
+                    "storage_over_capacity_fixed_cost": 20,
+                    "review_period_days": k % 3,
+                }
+            )
+        nodes.append(node)
+        link: Dict[str, Any] = {
+            "from_node": fac_names[k % len(fac_names)],
+            "to_node": name,
+            "transportation_cost_fixed": 300,
+            "transportation_cost_variable": 1,
+            "lead_time": 4,
+        }
+        if constrained:
+            link.update(
+                {
+                    "capacity_per_day": 30 * items,
+                    "allow_over_capacity": k % 2 == 0,
+                    "over_capacity_fixed_cost": 70,
+                    "over_capacity_variable_cost": 0.8,
+                }
+            )
+        network.append(link)
+    for k in range(stores):
+        name = f"ST{k:03d}"
+        carried = fg[k % 3 :: 2] or fg
+        node = {
+            "name": name,
+            "node_type": "store",
+            "initial_stock": {f: 30 for f in carried},
+            "service_level": 0.95,
+            "moq": {f: 10 for f in carried},
+            "order_multiple": {f: 5 for f in carried},
+            "storage_cost_variable": {f: 0.05 for f in carried},
+            "stockout_cost_per_unit": 2.0,
+            "backorder_cost_per_unit_per_day": 0.5,
+        }
+        if constrained:
+            node["lost_sales"] = k % 4 == 0
+            node["backorder_enabled"] = k % 5 != 0
+        nodes.append(node)
+        network.append(
+            {
+                "from_node": wh_names[k % len(wh_names)],
+                "to_node": name,
+                "transportation_cost_fixed": 50,
+                "transportation_cost_variable": 0.3,
+                "lead_time": 0 if constrained and k % 7 == 0 else 2,
+                "moq": {f: 10 for f in carried},
+                "order_multiple": {f: 10 for f in carried},
+            }
+        )
+        for f in carried:
+            row: Dict[str, Any] = {
+                "store_name": name,
+                "product_name": f,
+                "demand_mean": rng.randint(2, 12),
+                "demand_std_dev": rng.choice([0, 1, 2.5]),
+            }
+            if constrained and rng.random() < 0.3:
+                row["start_day"] = rng.randint(1, max(1, days // 2))
+                row["end_day"] = row["start_day"] + rng.randint(0, days)
+            demand.append(row)
+
+    return SimulationInput(
+        planning_horizon=days,
+        products=products,
+        nodes=nodes,
+        network=network,
+        customer_demand=demand,
+        random_seed=seed,
+    )
+
+
+def _timed(sim_input: SimulationInput, engine: str):
+    t0 = time.perf_counter()
+    sim = create_simulator(sim_input, engine=engine)
+    t1 = time.perf_counter()
+    results, daily_pl = sim.run()
+    t2 = time.perf_counter()
+    return sim, results, daily_pl, t1 - t0, t2 - t1
+
+
+def bench_sampling(sim_input: SimulationInput) -> Dict[str, float]:
+    """需要サンプリングの所要時間（秒）を従来方式と前生成方式で計測する。"""
+    rows = sim_input.customer_demand
+    horizon = sim_input.planning_horizon
+    seed = sim_input.random_seed
+
+    t0 = time.perf_counter()
+    random.seed(seed)
+    inline_total = 0
+    for day in range(horizon):
+        for cd in rows:
+            start_day = getattr(cd, "start_day", None)
+            end_day = getattr(cd, "end_day", None)
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and day > end_day:
+                continue
+            qty = max(0, round(random.gauss(cd.demand_mean, cd.demand_std_dev)))
+            if qty > 0:
+                inline_total += qty
+    t1 = time.perf_counter()
+
+    sim = SupplyChainSimulator(sim_input)
+    t2 = time.perf_counter()
+    matrix = sim._draw_demand_matrix(sim._new_rng())
+    n_rows = len(rows)
+    matrix_total = 0
+    for day in range(horizon):
+        base = day * n_rows
+        for r in range(n_rows):
+            qty = matrix[base + r]
+            if qty > 0:
+                matrix_total += qty
+    t3 = time.perf_counter()
+    if inline_total != matrix_total:
+        raise AssertionError("demand draws diverged")
+    return {"inline": t1 - t0, "matrix": t3 - t2}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="シミュレーションエンジンのベンチマーク")
+    ap.add_argument("--stores", type=int, default=40)
+    ap.add_argument("--warehouses", type=int, default=4)
+    ap.add_argument("--factories", type=int, default=2)
+    ap.add_argument("--materials", type=int, default=3)
+    ap.add_argument("--items", type=int, default=25)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--constrained", action="store_true")
+    ap.add_argument(
+        "--sampling", action="store_true", help="需要サンプリングのみを計測する"
+    )
+    args = ap.parse_args()
+
+    sim_input = build_network(
+        stores=args.stores,
+        warehouses=args.warehouses,
+        factories=args.factories,
+        materials=args.materials,
+        items=args.items,
+        days=args.days,
+        seed=args.seed,
+        constrained=args.constrained,
+    )
+    if args.sampling:
+        cost = bench_sampling(sim_input)
+        print(f"sampling inline={cost['inline']:.3f}s matrix={cost['matrix']:.3f}s")
+        if cost["matrix"] > 0:
+            print(f"speedup(sampling)={cost['inline'] / cost['matrix']:.2f}x")
+        return
+    timings = {}
+    outputs = {}
+    for engine in ("legacy", "compiled"):
+        sim, results, daily_pl, t_init, t_run = _timed(sim_input, engine)
+        timings[engine] = (t_init, t_run)
+        outputs[engine] = (results, daily_pl, sim.cost_trace)
+        print(f"{engine:9s} init={t_init:.3f}s run={t_run:.3f}s")
+    legacy_run = timings["legacy"][1]
+    compiled_run = timings["compiled"][1]
+    if compiled_run > 0:
+        print(f"speedup(run)={legacy_run / compiled_run:.2f}x")
+    print("parity=", outputs["legacy"] == outputs["compiled"])
+
+
+if __name__ == "__main__":
+    main()
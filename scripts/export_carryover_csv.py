@@ -2,8 +2,9 @@
 from __future__ import annotations
 import argparse
 import csv
-import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Sequence
+
+from scripts.plan_pipeline_io import PayloadStore, load_stage_input
 
 """
 carryoverログCSVエクスポート
@@ -12,43 +13,53 @@ carryoverログCSVエクスポート
 出力: carryover.csv
 """
 
+FIELDNAMES = [
+    "family",
+    "from_period",
+    "to_period",
+    "delta_demand",
+    "delta_supply",
+    "delta_backlog",
+]
+
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="carryoverログCSVエクスポート")
     ap.add_argument("-i", dest="input", required=True, help="sku_week_adjusted.json")
     ap.add_argument("-o", dest="output", required=True, help="CSV出力")
-    args = ap.parse_args()
+    return ap
 
-    with open(args.input, encoding="utf-8") as f:
-        data: Dict[str, Any] = json.load(f)
-    rows = data.get("carryover") or []
 
-    with open(args.output, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=[
-                "family",
-                "from_period",
-                "to_period",
-                "delta_demand",
-                "delta_supply",
-                "delta_backlog",
-            ],
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """anchor_adjust の carryover ログを CSV に書き出し、{fieldnames, rows} を返す。"""
+
+    data: Dict[str, Any] = load_stage_input(args.input, store)
+    rows: List[Dict[str, Any]] = []
+    for r in data.get("carryover") or []:
+        m = r.get("metrics") or {}
+        rows.append(
+            {
+                "family": r.get("family"),
+                "from_period": r.get("from_period"),
+                "to_period": r.get("to_period"),
+                "delta_demand": m.get("demand"),
+                "delta_supply": m.get("supply"),
+                "delta_backlog": m.get("backlog"),
+            }
         )
+
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
         w.writeheader()
-        for r in rows:
-            m = r.get("metrics") or {}
-            w.writerow(
-                {
-                    "family": r.get("family"),
-                    "from_period": r.get("from_period"),
-                    "to_period": r.get("to_period"),
-                    "delta_demand": m.get("demand"),
-                    "delta_supply": m.get("supply"),
-                    "delta_backlog": m.get("backlog"),
-                }
-            )
+        w.writerows(rows)
     print(f"[ok] wrote {args.output}")
+    return {"fieldnames": list(FIELDNAMES), "rows": rows}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    run(build_parser().parse_args(argv))
 
 
 if __name__ == "__main__":
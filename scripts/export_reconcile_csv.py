@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 import argparse
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence
 
 from app import db
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    load_stage_input,
     resolve_storage_config,
     store_report_csv_payload,
 )
@@ -30,11 +32,6 @@ from scripts.plan_pipeline_io import (
 """
 
 
-def _load(path: str) -> Dict[str, Any]:
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
-
-
 def _rows(payload: Dict[str, Any], label: str) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for r in payload.get("deltas", []) or []:
@@ -64,7 +61,7 @@ def _rows(payload: Dict[str, Any], label: str) -> List[Dict[str, Any]]:
     return out
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="整合ログCSVエクスポート")
     ap.add_argument("-i", dest="input1", required=True, help="reconciliation_log.json")
     ap.add_argument("-o", dest="output", required=True, help="CSV出力パス")
@@ -95,7 +92,13 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """reconciliation_log の deltas を CSV 行にして {fieldnames, rows} を返す。"""
 
     storage_config, warning = resolve_storage_config(
         args.storage, args.version_id, cli_label="export_reconcile_csv"
@@ -105,8 +108,8 @@ def main() -> None:
 
     def _load_source(raw_path: str) -> Dict[str, Any]:
         path = Path(raw_path)
-        if path.exists():
-            return _load(str(path))
+        if (store is not None and path in store) or path.exists():
+            return load_stage_input(path, store)
         if storage_config.use_db and storage_config.version_id:
             artifact = db.get_plan_artifact(storage_config.version_id, path.name)
             if artifact:
@@ -143,6 +146,9 @@ def main() -> None:
         "ok_backlog",
         "ok",
     ]
+    payload = {"fieldnames": fieldnames, "rows": rows}
+    if store is not None:
+        store.put(args.output, payload)
 
     try:
         wrote_db = store_report_csv_payload(
@@ -153,8 +159,7 @@ def main() -> None:
             artifact_name=Path(args.output).name,
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -163,6 +168,16 @@ def main() -> None:
             "[ok] stored reconcile CSV in PlanRepository "
             f"version={storage_config.version_id}"
         )
+    return payload
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -6,9 +6,16 @@ MRPライト（PR4）: SKU×週の要求から、LT/ロット/MOQを考慮した
 - 入力: allocateの出力（SKU×週の demand/supply/backlog）
 - 在庫・入荷: `inventory.csv`（on-hand初期在庫、loc無視で合算）、`open_po.csv`（期中入荷）
 - アイテム属性: `item.csv`（`item, lt, lot, moq`）
-- 任意: `bom.csv`（`parent, child, qty`）。親の計画オーダ解放量から子の総所要量を派生
+- 任意: `bom.csv`（`parent, child, qty`）。`--bom-mode` で子の総所要量の派生方法を選ぶ
+  - `single`（既定）: 親の総所要(gross)を qty 倍して同じ週の子 gross に加算（1階層のみ）
+  - `multi`: BOM から low-level code（最下位レベル）を求め、レベル順に正味計算。
+    親の計画オーダ解放（LTだけ前倒し済み）を qty 倍して子の総所要量とする（多階層）
 - LT単位: 週 or 日（`--lt-unit`）。日指定時は `--week-days` で週換算
 - ロジック: 先行週から on_hand を繰り越し、所要量に対して在庫/入荷を充当→不足を切上げ（MOQ/ロット）して計画受入・解放を作成
+- 品目×週の値は品目インデックス順の `array('d')`（週方向）で保持し、同一レベルの品目をまとめて正味計算する
+- 正味変更（`--net-change`）: 変更された SKU とその BOM 子孫だけを再計算し、出力はそれらの品目の行のみ。
+  multi では範囲外の親の計画解放を保存済み MRP（`--base` の payload、無ければ PlanRepository の mrp 行）から取り込み、
+  db 保存時は対象品目の mrp 行だけを置き換える
 
 使い方:
   python scripts/mrp.py -i out/sku_week.json -I samples/planning -o out/mrp.json --lt-unit day --weeks 4
@@ -20,14 +27,21 @@ import json
 import os
 import sys
 import csv
+import heapq
+from array import array
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, DefaultDict, Optional
+from typing import Dict, Any, Iterable, List, Tuple, DefaultDict, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    load_stage_input,
+    open_stage_stream,
     resolve_storage_config,
     store_mrp_payload,
 )
+from scripts.plan_storage import read_mrp_rows
 from scripts.calendar_utils import (
     build_calendar_lookup,
     load_planning_calendar,
@@ -103,17 +117,6 @@ def _resolve_calendar_lookup(
     return build_calendar_lookup(spec)
 
 
-def _weeks_from_alloc(
-    alloc: Dict[str, Any], lookup: Optional[PlanningCalendarLookup]
-) -> List[str]:
-    seen: List[str] = []
-    for r in alloc.get("rows", []):
-        w = str(r.get("week"))
-        if w and w not in seen:
-            seen.append(w)
-    return ordered_weeks(seen, lookup)
-
-
 def _load_open_po(
     path: str | None,
     *,
@@ -162,11 +165,6 @@ def _lt_weeks(lt_val: float, *, lt_unit: str, week_days: int) -> int:
     return int(max(0, int(w)))
 
 
-def _roll_weeks(weeks: List[str], idx: int, offset: int) -> int:
-    j = idx - offset  # 解放は受入よりLTだけ前
-    return max(0, j)
-
-
 def _ceil_lot_moq(qty: float, *, lot: float, moq: float) -> float:
     x = max(0.0, qty)
     if x <= 0:
@@ -179,7 +177,228 @@ def _ceil_lot_moq(qty: float, *, lot: float, moq: float) -> float:
     return float(n * lot)
 
 
-def main() -> None:
+BOM_MODES = ("single", "multi")
+
+
+def low_level_codes(
+    bom: Iterable[Tuple[str, str, float]], items: Iterable[str] = ()
+) -> Dict[str, int]:
+    """BOM の各品目の low-level code（最上位=0、子は親の最大値+1）を返す。
+
+    BOM に循環がある場合は StageError。
+    """
+
+    children: Dict[str, List[str]] = {}
+    indegree: Dict[str, int] = {it: 0 for it in items}
+    for parent, child, _qty in bom:
+        children.setdefault(parent, []).append(child)
+        indegree.setdefault(parent, 0)
+        indegree[child] = indegree.get(child, 0) + 1
+
+    llc = {it: 0 for it in indegree}
+    queue = sorted(it for it, deg in indegree.items() if deg == 0)
+    remaining = dict(indegree)
+    head = 0
+    while head < len(queue):
+        it = queue[head]
+        head += 1
+        for child in children.get(it, ()):
+            llc[child] = max(llc[child], llc[it] + 1)
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                queue.append(child)
+    if len(queue) < len(indegree):
+        cyclic = sorted(it for it, deg in remaining.items() if deg > 0)
+        raise StageError(f"BOMに循環があります: {', '.join(cyclic[:10])}")
+    return llc
+
+
+class _MrpGrid:
+    """品目×週の MRP 値。品目 i の週列は各リストの i 番目の array('d')。"""
+
+    def __init__(self, items: List[str], n_weeks: int) -> None:
+        self.items = items
+        self.n_weeks = n_weeks
+        zeros = array("d", bytes(8 * n_weeks))
+
+        def columns() -> List[array]:
+            return [array("d", zeros) for _ in items]
+
+        self.gross = columns()
+        self.sched = columns()
+        self.on_hand_start = columns()
+        self.net = columns()
+        self.receipt = columns()
+        self.release = columns()
+        self.on_hand_end = columns()
+
+
+def _net_level(
+    grid: _MrpGrid,
+    members: Sequence[int],
+    *,
+    on_hand0: Sequence[float],
+    lt_w: Sequence[int],
+    lot: Sequence[float],
+    moq: Sequence[float],
+) -> None:
+    """同一レベルの品目（members）をまとめて正味計算し、grid の各列を埋める。"""
+
+    n_weeks = grid.n_weeks
+    for i in members:
+        gross, sched = grid.gross[i], grid.sched[i]
+        oh_start, net_col = grid.on_hand_start[i], grid.net[i]
+        receipt, release, oh_end = grid.receipt[i], grid.release[i], grid.on_hand_end[i]
+        lt_i, lot_i, moq_i = lt_w[i], lot[i], moq[i]
+        on_hand = on_hand0[i]
+        for wi in range(n_weeks):
+            g = gross[wi]
+            available = on_hand + sched[wi]
+            oh_start[wi] = on_hand
+            net = g - available
+            if net > 0:
+                por = _ceil_lot_moq(net, lot=lot_i, moq=moq_i)
+                on_hand = available + por - g
+                net_col[wi] = net
+                receipt[wi] = por
+                # 解放タイミング（受入よりLT前、境界は0）
+                release[max(0, wi - lt_i)] += por
+            else:
+                # 受入なし、在庫更新
+                on_hand = available - g
+            oh_end[wi] = on_hand
+
+
+def _explode_releases(
+    grid: _MrpGrid,
+    members: Sequence[int],
+    children: Dict[int, List[Tuple[int, float]]],
+) -> None:
+    """親の計画オーダ解放を子の総所要量へ展開する（解放週＝子の所要週）。"""
+
+    n_weeks = grid.n_weeks
+    for i in members:
+        links = children.get(i)
+        if not links:
+            continue
+        release = grid.release[i]
+        weeks_with_release = [wi for wi in range(n_weeks) if release[wi]]
+        for child, qty in links:
+            child_gross = grid.gross[child]
+            for wi in weeks_with_release:
+                child_gross[wi] += release[wi] * qty
+
+
+def _bom_closure(
+    bom: Iterable[Tuple[str, str, float]], seeds: Iterable[str], *, upward: bool = False
+) -> set:
+    """seeds と BOM 上の子孫（upward=True なら祖先）の集合。"""
+
+    links: Dict[str, List[str]] = {}
+    for parent, child, _qty in bom:
+        src, dst = (child, parent) if upward else (parent, child)
+        links.setdefault(src, []).append(dst)
+    seen = set(seeds)
+    stack = list(seen)
+    while stack:
+        for nxt in links.get(stack.pop(), ()):
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def _load_net_change(path: str, store: Optional[PayloadStore] = None):
+    """変更キーのJSON（[{"sku","week"}] / [[sku, week]] / [sku] または {"keys": [...]}）を読む。
+
+    (SKU 集合, 週の一覧) を返す。週の一覧は {"keys": [...], "weeks": [...]} の形で
+    計画全体の週を渡されたときだけ入り、入力が範囲内の行だけでも週の並びを保てる。
+    """
+
+    data = store.get(path) if store is not None else None
+    if data is None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise StageError(f"net-change の読み込みに失敗しました: {exc}") from exc
+    weeks: List[str] = []
+    if isinstance(data, dict):
+        weeks = [str(w) for w in data.get("weeks") or []]
+        data = data.get("keys") or []
+    skus = set()
+    for entry in data:
+        if isinstance(entry, dict):
+            sku = entry.get("sku") or entry.get("item")
+        elif isinstance(entry, (list, tuple)):
+            sku = entry[0] if entry else None
+        else:
+            sku = entry
+        if sku:
+            skus.add(str(sku))
+    return skus, weeks
+
+
+def _net_change_scope(
+    bom: Iterable[Tuple[str, str, float]], changed: Iterable[str], *, bom_mode: str
+) -> Tuple[set, set]:
+    """正味変更で計算する品目（scope）と需要を集める品目（needed）。
+
+    single は親 gross の伝播に祖先の需要が要るため、needed は scope と祖先になる。
+    """
+
+    bom = list(bom)
+    scope = _bom_closure(bom, changed)
+    needed = scope
+    if bom_mode == "single":
+        needed = _bom_closure(bom, scope, upward=True)
+    return scope, needed
+
+
+def net_change_demand_items(
+    bom_path: Optional[str], changed: Iterable[str], *, bom_mode: str
+) -> set:
+    """正味変更の再計算で需要（SKU×週の行）が要る品目。呼び出し側が入力を絞るのに使う。"""
+
+    return _net_change_scope(_load_bom(bom_path), changed, bom_mode=bom_mode)[1]
+
+
+def _base_rows(args: argparse.Namespace, store: Optional[PayloadStore], items: set):
+    """正味変更の基準となる MRP 行（items のみ）。--base が無ければ PlanRepository から。"""
+
+    if args.base:
+        base = load_stage_input(args.base, store)
+        return "payload", [
+            r for r in base.get("rows", []) if str(r.get("item")) in items
+        ]
+    if not args.version_id:
+        raise StageError("net-change には --base または --version-id が必要です")
+    try:
+        rows = read_mrp_rows(args.version_id, item_keys=items)
+    except PlanRepositoryError as exc:
+        raise StageError(f"PlanRepository読み込みに失敗しました: {exc}") from exc
+    return "plan_repository", rows
+
+
+def merge_net_change(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """正味変更の出力（delta）を基準の MRP 出力（base）へ反映した payload を返す。
+
+    どちらの行も品目順（週は各品目内の元の順序）なので、並べ替えずに1回の走査で併合する。
+    """
+
+    items = set(
+        ((delta.get("inputs_summary") or {}).get("net_change") or {}).get("items") or []
+    )
+    kept = (r for r in base.get("rows", []) if str(r.get("item")) not in items)
+    rows = list(
+        heapq.merge(kept, delta.get("rows", []), key=lambda r: str(r.get("item")))
+    )
+    summary = {**(base.get("inputs_summary") or {})}
+    summary["net_change"] = (delta.get("inputs_summary") or {}).get("net_change")
+    return {**base, "inputs_summary": summary, "rows": rows}
+
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="MRPライト（LT/ロット/MOQ対応、任意BOM）")
     ap.add_argument("-i", "--input", required=True, help="allocateの出力JSON（SKU×週）")
     ap.add_argument("-o", "--output", required=True, help="出力JSON（MRP計画）")
@@ -236,10 +455,36 @@ def main() -> None:
         default=None,
         help="PlanningカレンダーJSONのパス（未指定時は input_dir から探索）",
     )
-    args = ap.parse_args()
+    ap.add_argument(
+        "--bom-mode",
+        dest="bom_mode",
+        choices=list(BOM_MODES),
+        default=os.getenv("SCPLN_MRP_BOM_MODE", "single"),
+        help="BOM展開: single=親grossを1階層のみ / multi=low-level code順に親の計画解放を多階層展開"
+        "（既定: 環境変数 SCPLN_MRP_BOM_MODE または single）",
+    )
+    ap.add_argument(
+        "--net-change",
+        dest="net_change",
+        default=None,
+        help="変更された (sku, week) キーのJSON。指定時はその SKU と BOM 子孫のみ再計算",
+    )
+    ap.add_argument(
+        "--base",
+        dest="base",
+        default=None,
+        help="net-change の基準MRP出力JSON（未指定時は --version-id の PlanRepository mrp 行）",
+    )
+    return ap
+
 
-    with open(args.input, encoding="utf-8") as f:
-        alloc = json.load(f)
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """SKU×週の payload から MRP 計画を計算して返す。"""
+
+    # rows 以外（schema_version / inputs_summary）だけを先に読み、行は後で1回だけ走査する
+    alloc, alloc_rows = open_stage_stream(args.input, store)
 
     base = args.input_dir
     item_path = args.item or (os.path.join(base, "item.csv") if base else None)
@@ -250,31 +495,56 @@ def main() -> None:
     items = _load_items(item_path)
     inv = _load_inventory(inv_path)
     lookup = _resolve_calendar_lookup(args.calendar, args.input_dir)
-    weeks = _weeks_from_alloc(alloc, lookup)
-    fallback_weeks = max(1, int(args.weeks_per_period or 1))
-    opo = _load_open_po(
-        opo_path, weeks=weeks, lookup=lookup, fallback_weeks=fallback_weeks
-    )
     bom = _load_bom(bom_path)
 
+    # 正味変更: 変更 SKU と BOM 子孫（scope）だけを計算する。single は親 gross の
+    # 伝播に祖先の需要が要るため、需要は scope と祖先（needed）の分を集める
+    scope: Optional[set] = None
+    changed: set = set()
+    needed: Optional[set] = None
+    seen_weeks: Dict[str, None] = {}
+    if args.net_change:
+        changed, plan_weeks = _load_net_change(args.net_change, store)
+        scope, needed = _net_change_scope(bom, changed, bom_mode=args.bom_mode)
+        seen_weeks = dict.fromkeys(plan_weeks)
+
     # SKU週の要求を集約（gross: demand, backlogは無視 or 参考。ここでは demand を採用）
+    # 週の並び（出現順）も同じ走査で集める。入力は .jsonl なら1行ずつ読む
     gross_by_item_week: DefaultDict[Tuple[str, str], float] = __import__(
         "collections"
     ).defaultdict(float)
-    for r in alloc.get("rows", []):
-        it = str(r.get("sku"))
+    for r in alloc_rows:
         w = str(r.get("week"))
+        if w:
+            seen_weeks.setdefault(w)
+        it = str(r.get("sku"))
+        if needed is not None and it not in needed:
+            continue
         d = float(r.get("demand", 0) or 0)
         gross_by_item_week[(it, w)] += d
+    weeks = ordered_weeks(list(seen_weeks), lookup)
+    fallback_weeks = max(1, int(args.weeks_per_period or 1))
+    opo = _load_open_po(
+        opo_path, weeks=weeks, lookup=lookup, fallback_weeks=fallback_weeks
+    )
 
-    # 親の解放から子の総所要量を加算
-    # まずは親アイテムの計画オーダを計算してから子へ伝播する必要があるが、v0では親の総所要(gross)を準用
-    # → v0.1: 親のgrossを起点に子grossへ qty 倍で加算（LT差異は子側のLTで吸収）
-    for parent, child, qty in bom:
-        for w in weeks:
-            g = gross_by_item_week.get((parent, w), 0.0)
-            if g > 0 and qty > 0:
-                gross_by_item_week[(child, w)] += g * qty
+    if args.bom_mode == "single":
+        # v0.1: 親のgrossを起点に子grossへ qty 倍で加算（LT差異は子側のLTで吸収）
+        for parent, child, qty in bom:
+            if needed is not None and child not in needed:
+                continue
+            for w in weeks:
+                g = gross_by_item_week.get((parent, w), 0.0)
+                if g > 0 and qty > 0:
+                    gross_by_item_week[(child, w)] += g * qty
+
+    planned = set(k[0] for k in gross_by_item_week.keys()) | set(inv.keys())
+    if args.bom_mode == "multi":
+        llc = low_level_codes(bom, planned)
+    else:
+        llc = {it: 0 for it in planned}
+    if scope is not None:
+        llc = {it: code for it, code in llc.items() if it in scope}
 
     # アイテムごとのパラメータ
     def get(it: str, key: str, default: float) -> float:
@@ -283,73 +553,96 @@ def main() -> None:
         except Exception:
             return default
 
-    rows_out: List[Dict[str, Any]] = []
-    on_hand_by_item: Dict[str, float] = {
-        it: inv.get(it, 0.0)
-        for it in set(k[0] for k in gross_by_item_week.keys()) | set(inv.keys())
-    }
+    # 品目を (low-level code, 品目) 順にインデックス化
+    grid = _MrpGrid(sorted(llc, key=lambda it: (llc[it], it)), len(weeks))
+    index = {it: i for i, it in enumerate(grid.items)}
+    week_index = {w: wi for wi, w in enumerate(weeks)}
+    for (it, w), qty in gross_by_item_week.items():
+        wi = week_index.get(w)
+        # single の正味変更では祖先の需要も集めているが、計算対象は scope のみ
+        if wi is not None and it in index:
+            grid.gross[index[it]][wi] += qty
+    for (it, w), qty in opo.items():
+        if it in index:
+            grid.sched[index[it]][week_index[w]] += float(qty)
+    lt_w = [
+        _lt_weeks(get(it, "lt", 0.0), lt_unit=args.lt_unit, week_days=args.week_days)
+        for it in grid.items
+    ]
+    lots = [max(1.0, get(it, "lot", 1.0)) for it in grid.items]
+    moqs = [max(0.0, get(it, "moq", 0.0)) for it in grid.items]
+    on_hand0 = [inv.get(it, 0.0) for it in grid.items]
+
+    children: Dict[int, List[Tuple[int, float]]] = {}
+    base_source = None
+    if args.bom_mode == "multi":
+        external: List[Tuple[str, int, float]] = []
+        for parent, child, qty in bom:
+            if parent in index:
+                children.setdefault(index[parent], []).append((index[child], qty))
+            elif child in index:
+                external.append((parent, index[child], qty))
+        if external:
+            # 範囲外の親は再計算しないため、保存済みの計画解放を子の総所要量に加える
+            base_source, base_rows = _base_rows(
+                args, store, {parent for parent, _i, _q in external}
+            )
+            releases: Dict[str, array] = {}
+            for r in base_rows:
+                wi = week_index.get(str(r.get("week")))
+                if wi is None:
+                    continue
+                col = releases.setdefault(
+                    str(r.get("item")), array("d", bytes(8 * len(weeks)))
+                )
+                col[wi] += float(r.get("planned_order_release") or 0)
+            for parent, child_i, qty in external:
+                col = releases.get(parent)
+                if col is None:
+                    continue
+                child_gross = grid.gross[child_i]
+                for wi, rel in enumerate(col):
+                    if rel:
+                        child_gross[wi] += rel * qty
+
+    levels: Dict[int, List[int]] = {}
+    for i, it in enumerate(grid.items):
+        levels.setdefault(llc[it], []).append(i)
+    for level in sorted(levels):
+        members = levels[level]
+        _net_level(grid, members, on_hand0=on_hand0, lt_w=lt_w, lot=lots, moq=moqs)
+        _explode_releases(grid, members, children)
+
+    # multi では需要・在庫のない BOM 品目は従属需要が発生した場合のみ出力する
+    emit = sorted(
+        it for it in grid.items if it in planned or any(grid.gross[index[it]])
+    )
 
+    rows_out: List[Dict[str, Any]] = []
     calendar_mode = "fallback_weeks"
     if lookup:
         calendar_mode = lookup.spec.calendar_type or "custom"
 
-    for it in sorted(on_hand_by_item.keys()):
-        lt_w = _lt_weeks(
-            get(it, "lt", 0.0), lt_unit=args.lt_unit, week_days=args.week_days
-        )
-        lot = max(1.0, get(it, "lot", 1.0))
-        moq = max(0.0, get(it, "moq", 0.0))
-        on_hand = on_hand_by_item.get(it, 0.0)
-        planned_receipts: Dict[str, float] = {}
-        planned_releases: Dict[str, float] = {}
-        row_by_week: Dict[str, Dict[str, Any]] = {}
-        pending_release: Dict[str, float] = {}
-
+    for it in emit:
+        i = index[it]
         for wi, w in enumerate(weeks):
-            gross = gross_by_item_week.get((it, w), 0.0)
-            sched = float(opo.get((it, w), 0.0))
-            on_hand_start = on_hand
-            available = on_hand + sched
-            net = max(0.0, gross - available)
-
-            por = 0.0
-            if net > 0:
-                por = _ceil_lot_moq(net, lot=lot, moq=moq)
-                on_hand = available + por - gross
-                # 解放タイミング（受入よりLT前、境界は0）
-                rel_idx = _roll_weeks(weeks, wi, lt_w)
-                planned_receipts[w] = planned_receipts.get(w, 0.0) + por
-                release_week = weeks[rel_idx]
-                planned_releases[release_week] = (
-                    planned_releases.get(release_week, 0.0) + por
-                )
-                total_release = round(planned_releases[release_week], 6)
-                if release_week in row_by_week:
-                    row_by_week[release_week]["planned_order_release"] = total_release
-                else:
-                    pending_release[release_week] = total_release
-            else:
-                # 受入なし、在庫更新
-                on_hand = available - gross
-
-            release_val = round(planned_releases.get(w, pending_release.pop(w, 0.0)), 6)
-            row = {
-                "item": it,
-                "sku": it,
-                "week": w,
-                "gross_req": round(gross, 6),
-                "scheduled_receipts": round(sched, 6),
-                "on_hand_start": round(on_hand_start, 6),
-                "net_req": round(net, 6),
-                "planned_order_receipt": round(por, 6),
-                "planned_order_release": release_val,
-                "lt_weeks": lt_w,
-                "lot": lot,
-                "moq": moq,
-                "on_hand_end": round(on_hand, 6),
-            }
-            rows_out.append(row)
-            row_by_week[w] = row
+            rows_out.append(
+                {
+                    "item": it,
+                    "sku": it,
+                    "week": w,
+                    "gross_req": round(grid.gross[i][wi], 6),
+                    "scheduled_receipts": round(grid.sched[i][wi], 6),
+                    "on_hand_start": round(grid.on_hand_start[i][wi], 6),
+                    "net_req": round(grid.net[i][wi], 6),
+                    "planned_order_receipt": round(grid.receipt[i][wi], 6),
+                    "planned_order_release": round(grid.release[i][wi], 6),
+                    "lt_weeks": lt_w[i],
+                    "lot": lots[i],
+                    "moq": moqs[i],
+                    "on_hand_end": round(grid.on_hand_end[i][wi], 6),
+                }
+            )
 
     payload = {
         "schema_version": alloc.get("schema_version", "agg-1.0"),
@@ -359,12 +652,34 @@ def main() -> None:
             "items": len(items),
             "open_po": len(opo),
             "bom_links": len(bom),
+            "bom_mode": args.bom_mode,
+            "bom_levels": max(llc.values(), default=0) + 1,
             "weeks": len(weeks),
             "lt_unit": args.lt_unit,
             "calendar_mode": calendar_mode,
         },
         "rows": rows_out,
     }
+    if scope is not None:
+        payload["inputs_summary"]["net_change"] = {
+            "changed": sorted(changed),
+            "items": sorted(scope),
+            "base": base_source,
+        }
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
 
     storage_config, warning = resolve_storage_config(
         args.storage, args.version_id, cli_label="mrp"
@@ -372,13 +687,17 @@ def main() -> None:
     if warning:
         print(warning, file=sys.stderr)
 
+    # 正味変更の出力は対象品目の行だけなので、PlanRepository もその品目だけ置き換える
+    net_change = (payload.get("inputs_summary") or {}).get("net_change") or {}
     try:
         wrote_db = store_mrp_payload(
-            storage_config, mrp_data=payload, output_path=Path(args.output)
+            storage_config,
+            mrp_data=payload,
+            output_path=Path(args.output),
+            item_keys=net_change.get("items"),
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -388,5 +707,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,364 @@
+"""Planningステージ出力のコンテンツアドレス型キャッシュ。
+
+``recon_window_days`` や ``anchor_policy`` だけを変えて計画を作り直すと、入力セットも
+フラグも変わっていない plan_aggregate / allocate / mrp まで毎回再計算されていた。
+ここでは各ステージの出力 payload を次の要素のハッシュをキーとして保存し、
+同じキーのステージは計算せずに保存済みの payload を再利用する。
+
+  - ステージ名とステージのコード（スクリプト本体と、そこから import される scripts.* の
+    モジュール。import は推移的に辿る）
+  - 出力先（-o/--storage/--version-id）を除くステージ引数
+  - 上流ステージ出力（-i/--inputs）の内容ハッシュ
+  - 入力CSV/カレンダー（-I/--demand/--bom 等）のファイル内容ハッシュ
+
+エントリは ``out/stage_cache/<key>.json.z``（zlib 圧縮 JSON）に置き、件数/合計サイズの
+上限を超えたら最終利用時刻（mtime）の古い順に削除する（LRU）。
+
+環境変数:
+  - ``SCPLN_STAGE_CACHE``: 0/false で無効化（既定: 有効）
+  - ``SCPLN_STAGE_CACHE_DIR``: 保存先（既定: out/stage_cache）
+  - ``SCPLN_STAGE_CACHE_MAX_MB`` / ``SCPLN_STAGE_CACHE_MAX_ENTRIES``: 上限（既定: 256MB / 512件）
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.metrics import (
+    PLANNING_STAGE_CACHE_EVICTIONS_TOTAL,
+    PLANNING_STAGE_CACHE_TOTAL,
+)
+from scripts.plan_pipeline_io import PayloadStore, load_payload, payload_digest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CACHE_VERSION = 1
+
+# 出力 payload が引数と入力だけで決まるステージ（CSV書き出し専用のステージは対象外）
+CACHEABLE_STAGES = (
+    "plan_aggregate",
+    "allocate",
+    "mrp",
+    "reconcile",
+    "reconcile_levels",
+    "anchor_adjust",
+    "report",
+)
+
+# 出力先の指定（キーに含めない）
+_SINK_PARAMS = frozenset({"output", "storage", "version_id"})
+# 出力先の指定だが payload にも書き込まれるもの
+_PAYLOAD_ECHO_PARAMS = {"reconcile_levels": frozenset({"version_id"})}
+# 上流ステージの出力（内容ハッシュでキーに含める）
+_PAYLOAD_INPUTS = frozenset({"input", "inputs"})
+# 入力CSV/カレンダー（ファイル/ディレクトリの内容ハッシュでキーに含める）
+_SOURCE_INPUTS = frozenset(
+    {
+        "input_dir",
+        "demand",
+        "capacity",
+        "mix",
+        "calendar",
+        "item",
+        "inventory",
+        "open_po",
+        "bom",
+        "capacity_csv",
+        "open_po_csv",
+        "period_score_csv",
+        "pl_cost_csv",
+    }
+)
+# 出力を変えない実行方法の指定（キーに含めない）
+_EXECUTION_PARAMS = frozenset({"workers"})
+# 指定されると出力が保存済みの計画（PlanRepository 等）にも依存する、または
+# payload に行を持たない引数（キャッシュしない）
+_UNCACHEABLE_PARAMS = frozenset({"net_change", "stream"})
+
+_ENTRY_SUFFIX = ".json.z"
+_ZLIB_LEVEL = 6
+
+
+def cache_enabled() -> bool:
+    """SCPLN_STAGE_CACHE=0/false/no でステージキャッシュを無効にする。"""
+    raw = os.getenv("SCPLN_STAGE_CACHE", "1").strip().lower()
+    return raw not in ("0", "false", "no", "off")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _hash_file(h: Any, path: Path) -> None:
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+
+def source_digest(path: Union[str, Path]) -> str:
+    """入力ファイル/ディレクトリの内容ハッシュ。ディレクトリは配下の全ファイルを名前順に。"""
+    p = Path(path)
+    h = hashlib.sha256()
+    if p.is_file():
+        _hash_file(h, p)
+    elif p.is_dir():
+        for child in sorted(c for c in p.rglob("*") if c.is_file()):
+            h.update(child.relative_to(p).as_posix().encode("utf-8") + b"\0")
+            _hash_file(h, child)
+            h.update(b"\0")
+    else:
+        return "missing"
+    return h.hexdigest()
+
+
+_CODE_DIGESTS: Dict[Tuple[str, int], str] = {}
+_SCRIPT_IMPORTS: Dict[Tuple[str, int], Tuple[str, ...]] = {}
+
+
+def _module_path(name: str) -> Optional[str]:
+    """scripts.* のモジュール名を REPO_ROOT からの相対パスにする（無ければ None）。"""
+    rel = name.replace(".", "/")
+    for cand in (f"{rel}.py", f"{rel}/__init__.py"):
+        if (REPO_ROOT / cand).is_file():
+            return cand
+    return None
+
+
+def _script_imports(p: Path) -> Tuple[str, ...]:
+    """p が import する scripts.* モジュールの相対パス（関数内の import も含む）。"""
+    memo = (str(p), p.stat().st_mtime_ns)
+    if memo not in _SCRIPT_IMPORTS:
+        names: List[str] = []
+        for node in ast.walk(ast.parse(p.read_text(encoding="utf-8"))):
+            if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                if node.module == "scripts":
+                    names.extend(f"scripts.{a.name}" for a in node.names)
+                elif node.module.startswith("scripts."):
+                    names.append(node.module)
+            elif isinstance(node, ast.Import):
+                names.extend(
+                    a.name for a in node.names if a.name.startswith("scripts.")
+                )
+        paths = (_module_path(n) for n in dict.fromkeys(names))
+        _SCRIPT_IMPORTS[memo] = tuple(rel for rel in paths if rel)
+    return _SCRIPT_IMPORTS[memo]
+
+
+def _code_modules(stage: str) -> List[str]:
+    """ステージ本体と、そこから推移的に import される scripts.* モジュールの相対パス。"""
+    seen: Dict[str, None] = {}
+    stack = [f"scripts/{stage}.py"]
+    while stack:
+        rel = stack.pop()
+        p = REPO_ROOT / rel
+        if rel in seen or not p.is_file():
+            continue
+        seen[rel] = None
+        stack.extend(_script_imports(p))
+    return sorted(seen)
+
+
+def _code_digest(stage: str) -> str:
+    h = hashlib.sha256()
+    for rel in _code_modules(stage):
+        p = REPO_ROOT / rel
+        memo = (str(p), p.stat().st_mtime_ns)
+        if memo not in _CODE_DIGESTS:
+            _CODE_DIGESTS[memo] = source_digest(p)
+        h.update(rel.encode("utf-8") + b"\0" + _CODE_DIGESTS[memo].encode("ascii"))
+    return h.hexdigest()
+
+
+def _as_paths(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def _upstream_digest(path: str, store: Optional[PayloadStore]) -> Optional[str]:
+    if store is not None and path in store:
+        return store.digest(path)
+    try:
+        return payload_digest(load_payload(path))
+    except (OSError, ValueError):
+        return None
+
+
+def stage_cache_key(
+    stage: str, args: argparse.Namespace, store: Optional[PayloadStore] = None
+) -> Optional[str]:
+    """ステージ実行のキャッシュキー。上流出力が読めない等で決められなければ None。"""
+    if stage not in CACHEABLE_STAGES:
+        return None
+    if any(getattr(args, dest, None) for dest in _UNCACHEABLE_PARAMS):
+        return None
+    sinks = _SINK_PARAMS - _PAYLOAD_ECHO_PARAMS.get(stage, frozenset())
+    params: Dict[str, Any] = {}
+    upstream: Dict[str, List[str]] = {}
+    sources: Dict[str, List[str]] = {}
+    for dest, value in sorted(vars(args).items()):
+        if dest in sinks or dest in _EXECUTION_PARAMS:
+            continue
+        if dest in _PAYLOAD_INPUTS:
+            digests = []
+            for path in _as_paths(value):
+                digest = _upstream_digest(path, store)
+                if digest is None:
+                    return None
+                digests.append(digest)
+            upstream[dest] = digests
+        elif dest in _SOURCE_INPUTS:
+            sources[dest] = [source_digest(p) for p in _as_paths(value)]
+        else:
+            params[dest] = value
+    doc = {
+        "v": CACHE_VERSION,
+        "stage": stage,
+        "code": _code_digest(stage),
+        "params": params,
+        "upstream": upstream,
+        "sources": sources,
+    }
+    body = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """ステージ出力を ``<root>/<key>.json.z`` に保存するLRUキャッシュ。
+
+    書き込みは一時ファイル経由の置き換えで行うため、複数ワーカーが同じ
+    ディレクトリを共有しても壊れたエントリは読まれない。
+    """
+
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        *,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        if root is None:
+            root = (
+                os.getenv("SCPLN_STAGE_CACHE_DIR") or REPO_ROOT / "out" / "stage_cache"
+            )
+        self.root = Path(root)
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else _env_int("SCPLN_STAGE_CACHE_MAX_MB", 256) * 1024 * 1024
+        )
+        self.max_entries = (
+            max_entries
+            if max_entries is not None
+            else _env_int("SCPLN_STAGE_CACHE_MAX_ENTRIES", 512)
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{_ENTRY_SUFFIX}"
+
+    def get(self, stage: str, key: str) -> Optional[Tuple[Any, str]]:
+        """(payload, payload_digest) を返す。無い/壊れている場合は None（miss）。"""
+        path = self._path(key)
+        try:
+            doc = json.loads(zlib.decompress(path.read_bytes()))
+            if doc.get("stage") != stage:
+                raise ValueError("stage mismatch")
+            result = doc["payload"], doc["digest"]
+        except FileNotFoundError:
+            PLANNING_STAGE_CACHE_TOTAL.labels(stage=stage, result="miss").inc()
+            return None
+        except (OSError, ValueError, KeyError, zlib.error):
+            logging.warning(
+                "planning_stage_cache_corrupt", extra={"stage": stage, "key": key}
+            )
+            self._unlink(path)
+            PLANNING_STAGE_CACHE_TOTAL.labels(stage=stage, result="miss").inc()
+            return None
+        try:
+            os.utime(path)  # LRU: 最終利用時刻を更新
+        except OSError:
+            pass
+        PLANNING_STAGE_CACHE_TOTAL.labels(stage=stage, result="hit").inc()
+        return result
+
+    def put(
+        self, stage: str, key: str, payload: Any, *, digest: Optional[str] = None
+    ) -> str:
+        """payload を保存して payload_digest を返す。"""
+        digest = digest or payload_digest(payload)
+        doc = {"stage": stage, "digest": digest, "payload": payload}
+        body = json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(body.encode("utf-8"), _ZLIB_LEVEL))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._unlink(Path(tmp))
+            raise
+        self.evict()
+        return digest
+
+    def _entries(self) -> Iterable[os.DirEntry]:
+        try:
+            with os.scandir(self.root) as it:
+                return [e for e in it if e.name.endswith(_ENTRY_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    def evict(self) -> int:
+        """上限を超えた分を最終利用時刻の古い順に削除し、削除件数を返す。"""
+        entries = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, Path(entry.path)))
+        entries.sort(reverse=True)
+        total = 0
+        removed = 0
+        for index, (_mtime, size, path) in enumerate(entries):
+            total += size
+            if index < self.max_entries and total <= self.max_bytes:
+                continue
+            if self._unlink(path):
+                removed += 1
+        if removed:
+            PLANNING_STAGE_CACHE_EVICTIONS_TOTAL.inc(removed)
+        return removed
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            self._unlink(Path(entry.path))
+
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+
+__all__ = [
+    "CACHEABLE_STAGES",
+    "StageCache",
+    "cache_enabled",
+    "source_digest",
+    "stage_cache_key",
+]
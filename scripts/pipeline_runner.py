@@ -0,0 +1,264 @@
+"""Planningステージを同一プロセス内で連結するランナー。
+
+plan_aggregate → allocate → mrp → reconcile → reconcile_levels (→ anchor_adjust) → report
+の各ステージは、従来サブプロセスとして起動されていたため、ステージごとに
+インタプリタ起動・依存モジュールの import・前段が書いた JSON の再読込が発生していた。
+
+ここでは各スクリプトの ``run(args, store=...)`` を直接呼び出し、出力 payload を
+``PayloadStore`` 経由で後続ステージへ渡す。ファイル/PlanRepository への保存は
+各ステージの ``--storage``（files/db/both）に従う任意の出力先で、db のみの場合でも
+後続ステージは store から payload を受け取れる。
+
+``SCPLN_PIPELINE_IN_PROCESS=0`` で従来どおりステージごとのサブプロセス実行に戻せる。
+
+同一プロセス実行では ``scripts.pipeline_cache.StageCache`` を参照し、引数・上流出力・
+入力ファイルが同じステージは計算を省いて保存済みの payload を再利用する
+（保存先への書き出しは通常どおり行う）。
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from scripts.pipeline_cache import StageCache, cache_enabled, stage_cache_key
+from scripts.plan_pipeline_io import PayloadStore, StageError, load_payload
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# ステージ名 → モジュール（いずれも build_parser() / run(args, store=) / main(argv) を持ち、
+# キャッシュ対象のステージは出力の書き出しだけを行う persist(args, payload, store=) も持つ）
+STAGE_MODULES: Dict[str, str] = {
+    "plan_aggregate": "scripts.plan_aggregate",
+    "allocate": "scripts.allocate",
+    "mrp": "scripts.mrp",
+    "reconcile": "scripts.reconcile",
+    "reconcile_levels": "scripts.reconcile_levels",
+    "anchor_adjust": "scripts.anchor_adjust",
+    "report": "scripts.report",
+    "export_reconcile_csv": "scripts.export_reconcile_csv",
+    "export_carryover_csv": "scripts.export_carryover_csv",
+}
+
+# reconcile_levels / anchor_adjust はカレンダーをモジュール変数に保持するため、
+# 複数ジョブから同じステージが同時に呼ばれた場合はステージ単位で直列化する。
+_STAGE_LOCKS: Dict[str, threading.Lock] = {
+    name: threading.Lock() for name in STAGE_MODULES
+}
+
+
+class PipelineStageError(subprocess.CalledProcessError):
+    """ステージの失敗。
+
+    サブプロセス実行時代の ``subprocess.CalledProcessError`` を捕捉している
+    呼び出し側（plans_api など）がそのまま扱えるよう、そのサブクラスにしている。
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        returncode: int,
+        cmd: Sequence[str],
+        output: Optional[str] = None,
+        stderr: Optional[str] = None,
+    ) -> None:
+        super().__init__(returncode, list(cmd), output=output, stderr=stderr)
+        self.stage = stage
+
+    def __str__(self) -> str:
+        lines = [ln for ln in (self.stderr or "").splitlines() if ln.strip()]
+        detail = f": {lines[-1].strip()}" if lines else ""
+        return f"stage {self.stage} failed (exit {self.returncode}){detail}"
+
+
+def in_process_enabled() -> bool:
+    """SCPLN_PIPELINE_IN_PROCESS=0/false/no でサブプロセス実行に切り替える。"""
+    raw = os.getenv("SCPLN_PIPELINE_IN_PROCESS", "1").strip().lower()
+    return raw not in ("0", "false", "no", "off")
+
+
+def stage_name(script: Union[str, Path]) -> str:
+    """``scripts/allocate.py`` のようなスクリプトパスをステージ名にする。"""
+    name = Path(script).stem
+    if name not in STAGE_MODULES:
+        raise ValueError(f"unknown planning stage: {script}")
+    return name
+
+
+class PlanningPipeline:
+    """ステージを順に実行し、出力 payload をプロセス内で受け渡す。
+
+    1回のパイプライン実行（ジョブ/APIリクエスト）ごとに生成する。
+    ``timings`` には (ステージ名, 秒) が実行順に記録され、``cache_hits`` には
+    キャッシュから出力を再利用したステージ名が入る。
+
+    ``use_cache`` の既定は ``SCPLN_STAGE_CACHE``（有効）。``cache`` を渡すと
+    既定の ``out/stage_cache`` の代わりにそれを使う。
+
+    ``env`` / ``cwd`` はサブプロセス実行でだけ使える（プロセス内実行のステージは
+    ``os.environ`` とサーバーの作業ディレクトリを参照するため）。指定時に
+    ``in_process`` を省略するとサブプロセスで実行し、``in_process=True`` と
+    同時に指定すると ValueError。
+    """
+
+    def __init__(
+        self,
+        *,
+        store: Optional[PayloadStore] = None,
+        in_process: Optional[bool] = None,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[Union[str, Path]] = None,
+        use_cache: Optional[bool] = None,
+        cache: Optional[StageCache] = None,
+    ) -> None:
+        self.store = store if store is not None else PayloadStore()
+        if env is not None or cwd is not None:
+            if in_process:
+                raise ValueError(
+                    "env/cwd are only supported for subprocess stages (in_process=False)"
+                )
+            in_process = False
+        self.in_process = in_process_enabled() if in_process is None else in_process
+        self._env = env
+        self._cwd = Path(cwd) if cwd is not None else REPO_ROOT
+        if use_cache is None:
+            use_cache = cache is not None or cache_enabled()
+        self.cache: Optional[StageCache] = None
+        if use_cache:
+            self.cache = cache if cache is not None else StageCache()
+        self.timings: List[Tuple[str, float]] = []
+        self.cache_hits: List[str] = []
+
+    def run_stage(self, stage: str, argv: Sequence[str]) -> Any:
+        """ステージを1つ実行して出力 payload を返す（サブプロセス時は None）。"""
+        if stage not in STAGE_MODULES:
+            raise ValueError(f"unknown planning stage: {stage}")
+        argv = [str(a) for a in argv]
+        hits_before = len(self.cache_hits)
+        t0 = time.perf_counter()
+        try:
+            if self.in_process:
+                return self._run_in_process(stage, argv)
+            return self._run_subprocess(stage, argv)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.timings.append((stage, elapsed))
+            logging.info(
+                "planning_stage_finished",
+                extra={
+                    "stage": stage,
+                    "duration_ms": int(elapsed * 1000),
+                    "in_process": self.in_process,
+                    "cache_hit": len(self.cache_hits) > hits_before,
+                },
+            )
+
+    def run_script(self, args: Sequence[str]) -> Any:
+        """``["scripts/allocate.py", "-i", ...]`` 形式（旧サブプロセス引数）で実行する。"""
+        script, *argv = args
+        return self.run_stage(stage_name(script), argv)
+
+    def payload(self, path: Union[str, Path]) -> Any:
+        return self.store.get(path)
+
+    def load_json(self, path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+        """ステージ出力を store から、無ければファイルから読む（無い/壊れていれば None）。"""
+        payload = self.store.get(path)
+        if payload is not None:
+            return payload
+        p = Path(path)
+        if not p.exists():
+            return None
+        try:
+            return load_payload(p)
+        except Exception:
+            logging.exception("planning_load_json_failed", extra={"path": str(p)})
+            return None
+
+    # ------------------------------------------------------------------
+    def _cmd(self, stage: str, argv: List[str]) -> List[str]:
+        return [f"scripts/{stage}.py", *argv]
+
+    def _run_in_process(self, stage: str, argv: List[str]) -> Any:
+        module = importlib.import_module(STAGE_MODULES[stage])
+        cmd = self._cmd(stage, argv)
+        try:
+            args = module.build_parser().parse_args(argv)
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 2
+            raise PipelineStageError(
+                stage, code, cmd, stderr=f"invalid arguments for {stage}"
+            ) from None
+        with _STAGE_LOCKS[stage]:
+            try:
+                return self._run_cached(stage, module, args)
+            except StageError as exc:
+                raise PipelineStageError(
+                    stage, 1, cmd, stderr=f"[error] {exc}"
+                ) from exc
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+                raise PipelineStageError(stage, code, cmd) from exc
+            except Exception as exc:
+                raise PipelineStageError(
+                    stage, 1, cmd, stderr=traceback.format_exc()
+                ) from exc
+
+    def _run_cached(self, stage: str, module: Any, args: Any) -> Any:
+        key = None
+        if self.cache is not None:
+            key = stage_cache_key(stage, args, self.store)
+        if key is None:
+            return module.run(args, store=self.store)
+        hit = self.cache.get(stage, key)
+        if hit is not None:
+            payload, digest = hit
+            # 計算は省くが、今回の --output / --storage / --version-id へは書き出す
+            module.persist(args, payload, store=self.store)
+            self.store.put(args.output, payload, digest=digest)
+            self.cache_hits.append(stage)
+            return payload
+        payload = module.run(args, store=self.store)
+        try:
+            digest = self.cache.put(stage, key, payload)
+        except OSError:
+            logging.warning("planning_stage_cache_write_failed", exc_info=True)
+        else:
+            self.store.put(args.output, payload, digest=digest)
+        return payload
+
+    def _run_subprocess(self, stage: str, argv: List[str]) -> None:
+        env = dict(self._env if self._env is not None else os.environ)
+        env.setdefault("PYTHONPATH", str(REPO_ROOT))
+        cmd = self._cmd(stage, argv)
+        try:
+            subprocess.run(
+                [sys.executable, str(REPO_ROOT / cmd[0]), *argv],
+                cwd=str(self._cwd),
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise PipelineStageError(
+                stage, exc.returncode, cmd, output=exc.stdout, stderr=exc.stderr
+            ) from exc
+        return None
+
+
+__all__ = [
+    "STAGE_MODULES",
+    "PipelineStageError",
+    "PlanningPipeline",
+    "in_process_enabled",
+    "stage_name",
+]
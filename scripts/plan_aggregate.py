@@ -18,10 +18,12 @@ import csv
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, DefaultDict
+from typing import Dict, Any, List, Tuple, DefaultDict, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
     resolve_storage_config,
     store_aggregate_payload,
 )
@@ -202,7 +204,7 @@ def _aggregate_plan(
     return _finalize_period_rows(rows_by_period, cap_by_period, round_mode=round_mode)
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(
         description="粗粒度S&OP入力の検証と雛形出力（PR1スタブ）"
     )
@@ -239,7 +241,13 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """CSV入力を集約し、aggregate payload を返す（保存先は --storage に従う）。"""
 
     ds = load_inputs(args.input_dir, args.demand, args.capacity, args.mix)
 
@@ -251,12 +259,6 @@ def main() -> None:
         else []
     )
 
-    storage_config, warning = resolve_storage_config(
-        args.storage, args.version_id, cli_label="plan_aggregate"
-    )
-    if warning:
-        print(warning, file=sys.stderr)
-
     payload = {
         "schema_version": "agg-1.0",
         "note": "PR2: 需要と能力に基づく粗粒度供給（不足時は比例配分）。",
@@ -267,14 +269,33 @@ def main() -> None:
         },
         "rows": rows,
     }
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
+
+    storage_config, warning = resolve_storage_config(
+        args.storage, args.version_id, cli_label="plan_aggregate"
+    )
+    if warning:
+        print(warning, file=sys.stderr)
 
     try:
         wrote_db = store_aggregate_payload(
             storage_config, data=payload, output_path=Path(args.output)
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -282,5 +303,14 @@ def main() -> None:
         print(f"[ok] stored rows in PlanRepository version={storage_config.version_id}")
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,6 @@
 """Exports a plan from the database to JSON/CSV files."""
 
 import argparse
-import shutil
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -21,7 +20,14 @@ def backup_db(source_db_path: Path, destination_path: Path):
     Backs up the SQLite database file.
     """
     print(f"Backing up DB from {source_db_path} to {destination_path}...")
-    shutil.copy2(source_db_path, destination_path)
+    # WAL モードの未チェックポイント分も含めるためオンラインバックアップを使う
+    src = sqlite3.connect(str(source_db_path))
+    dst = sqlite3.connect(str(destination_path))
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
     print("Backup complete.")
 
 
@@ -0,0 +1,151 @@
+"""Planningステージ間の行ストリーム形式（JSONL）。
+
+``*.jsonl`` の出力は1行目にヘッダ（``rows`` 以外の payload キー）、2行目以降に
+1行1レコードで ``rows`` を並べる::
+
+    {"format": "plan-rows", "version": 1, "meta": {"schema_version": "agg-1.0", ...}}
+    {"family": "F1", "period": "2025-01", "demand": 120, ...}
+    ...
+
+書き手は行のイテレータをそのまま書き出し、読み手は行を1件ずつ返すため、
+ステージ間で全行のリストを作らずに受け渡せる。通常の ``*.json`` 出力も
+同じ関数で読める（その場合はファイル全体を読む）。
+
+plan_storage / plan_pipeline_io の双方から使うため、他の scripts モジュールに依存しない。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Union
+
+JSONL_FORMAT = "plan-rows"
+JSONL_VERSION = 1
+
+PathLike = Union[str, Path]
+
+
+def is_jsonl(path: PathLike) -> bool:
+    """出力パスが行ストリーム形式（拡張子 .jsonl）か。"""
+
+    return os.fspath(path).lower().endswith(".jsonl")
+
+
+def split_rows(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """payload から ``rows`` を除いたヘッダ部分を返す。"""
+
+    return {k: v for k, v in payload.items() if k != "rows"}
+
+
+class JsonlRowWriter:
+    """JSONL へ行を逐次書き込むライタ（``with`` で使う）。
+
+    ヘッダは開いた時点で書く。途中で失敗しても既存ファイルを壊さないよう、
+    一時ファイルへ書いて正常終了時にだけ置き換える。
+    """
+
+    def __init__(self, path: PathLike, meta: Dict[str, Any]) -> None:
+        self.path = Path(path)
+        self.meta = meta
+        self.count = 0
+        self._tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._file = None
+
+    def __enter__(self) -> "JsonlRowWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp, "w", encoding="utf-8")
+        header = {"format": JSONL_FORMAT, "version": JSONL_VERSION, "meta": self.meta}
+        self._file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        return self
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+        self.count += 1
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.path)
+            return
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+def write_rows_jsonl(
+    path: PathLike, meta: Dict[str, Any], rows: Iterable[Dict[str, Any]]
+) -> int:
+    """ヘッダと行を JSONL で書き出し、書いた行数を返す。
+
+    ``rows`` は1回だけ走査するので、ジェネレータを渡せば全行を保持しない。
+    """
+
+    with JsonlRowWriter(path, meta) as writer:
+        writer.write_rows(rows)
+    return writer.count
+
+
+def _read_header(f) -> Dict[str, Any]:
+    first = f.readline()
+    if not first.strip():
+        return {}
+    header = json.loads(first)
+    if not isinstance(header, dict) or header.get("format") != JSONL_FORMAT:
+        raise ValueError(f"not a {JSONL_FORMAT} JSONL file: {f.name}")
+    return dict(header.get("meta") or {})
+
+
+def read_jsonl_meta(path: PathLike) -> Dict[str, Any]:
+    """JSONL のヘッダ（rows 以外の payload キー）だけを読む。"""
+
+    with open(path, encoding="utf-8") as f:
+        return _read_header(f)
+
+
+def iter_jsonl_rows(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """JSONL の行を1件ずつ返す（ヘッダは読み飛ばす）。"""
+
+    with open(path, encoding="utf-8") as f:
+        _read_header(f)
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_jsonl_payload(path: PathLike) -> Dict[str, Any]:
+    """JSONL を通常の payload（ヘッダ + ``rows`` のリスト）に組み立てる。"""
+
+    payload = read_jsonl_meta(path)
+    payload["rows"] = list(iter_jsonl_rows(path))
+    return payload
+
+
+def load_payload(path: PathLike) -> Any:
+    """拡張子に応じて .json / .jsonl を payload として読む。"""
+
+    if is_jsonl(path):
+        return read_jsonl_payload(path)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+__all__ = [
+    "JSONL_FORMAT",
+    "JsonlRowWriter",
+    "JSONL_VERSION",
+    "is_jsonl",
+    "iter_jsonl_rows",
+    "load_payload",
+    "read_jsonl_meta",
+    "read_jsonl_payload",
+    "split_rows",
+    "write_rows_jsonl",
+]
@@ -2,15 +2,19 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, List, Union
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, List, Union
 
 from scripts.plan_storage import (
     resolve_storage_mode,
     should_use_db,
     should_use_files,
     write_allocate_result,
+    write_allocate_stream,
     write_aggregate_result,
     write_mrp_result,
     write_plan_final_result,
@@ -18,6 +22,14 @@ from scripts.plan_storage import (
     write_reconcile_log_result,
     write_report_csv_result,
 )
+from scripts.plan_interchange import (
+    is_jsonl,
+    iter_jsonl_rows,
+    load_payload,
+    read_jsonl_meta,
+    split_rows,
+    write_rows_jsonl,
+)
 
 
 @dataclass(slots=True)
@@ -38,6 +50,106 @@ class PlanStorageConfig:
         return should_use_files(self.storage_mode)
 
 
+class StageError(RuntimeError):
+    """ステージ処理の失敗。CLIでは ``[error] <message>`` を出して終了コード1になる。"""
+
+
+def payload_digest(payload: Any) -> str:
+    """payload の内容ハッシュ（sha256）。キー順も含めて同一なら同じ値になる。"""
+
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class PayloadStore:
+    """同一プロセス内のステージ間で受け渡す出力（出力パス → payload）。
+
+    パイプラインランナーが各ステージの出力を保持し、後続ステージは同じパスを
+    ファイルから読み直す代わりにここから受け取る。ステージは入力 payload を
+    書き換えない前提（各ステージは行を dict(r) で複製してから加工している）。
+    """
+
+    def __init__(self) -> None:
+        self._payloads: Dict[str, Any] = {}
+        self._digests: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return os.path.abspath(os.fspath(path))
+
+    def get(self, path: Union[str, Path]) -> Any:
+        return self._payloads.get(self._key(path))
+
+    def put(
+        self, path: Union[str, Path], payload: Any, *, digest: Optional[str] = None
+    ) -> None:
+        key = self._key(path)
+        self._payloads[key] = payload
+        if digest is not None:
+            self._digests[key] = digest
+        else:
+            self._digests.pop(key, None)
+
+    def digest(self, path: Union[str, Path]) -> Optional[str]:
+        """payload の内容ハッシュ（payload_digest）。初回参照時に計算して保持する。"""
+        key = self._key(path)
+        if key not in self._payloads:
+            return None
+        if key not in self._digests:
+            self._digests[key] = payload_digest(self._payloads[key])
+        return self._digests[key]
+
+    def __contains__(self, path: object) -> bool:
+        if not isinstance(path, (str, Path)):
+            return False
+        return self._key(path) in self._payloads
+
+
+def load_stage_input(
+    path: Union[str, Path], store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """前段ステージの出力を読む。store にあればファイルを読まずにそれを返す。"""
+
+    if store is not None:
+        payload = store.get(path)
+        if payload is not None:
+            return payload
+    return load_payload(path)
+
+
+def open_stage_stream(
+    path: Union[str, Path], store: Optional[PayloadStore] = None
+) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """前段ステージの出力を (rows 以外のキー, 行のイテレータ) として開く。
+
+    .jsonl はヘッダだけを先に読み、行は走査時に1行ずつ読む。store の payload と
+    通常の .json は読み込み済みの ``rows`` をそのまま走査する（ファイルは1回だけ読む）。
+    """
+
+    payload = store.get(path) if store is not None else None
+    if payload is None:
+        if is_jsonl(path):
+            return read_jsonl_meta(path), iter_jsonl_rows(path)
+        payload = load_payload(path)
+    return split_rows(payload), iter(payload.get("rows") or [])
+
+
+def iter_stage_rows(
+    path: Union[str, Path], store: Optional[PayloadStore] = None
+) -> Iterator[Dict[str, Any]]:
+    """前段ステージの出力行を1件ずつ返す（.jsonl は全行をリストにしない）。"""
+
+    return open_stage_stream(path, store)[1]
+
+
+def write_stage_rows(
+    path: Union[str, Path], meta: Dict[str, Any], rows: Iterable[Dict[str, Any]]
+) -> int:
+    """ステージ出力を .jsonl で書き出す。``rows`` はイテレータのまま1回だけ走査する。"""
+
+    return write_rows_jsonl(path, meta, rows)
+
+
 def resolve_storage_config(
     storage_option: Optional[str],
     version_id: Optional[str],
@@ -101,11 +213,36 @@ def store_allocate_payload(
     )
 
 
+def stream_allocate_payload(
+    config: PlanStorageConfig,
+    *,
+    aggregate_data: Optional[Dict[str, Any]],
+    batches: Iterable[Iterable[Dict[str, Any]]],
+) -> bool:
+    """allocateの按分結果をバッチごとに保存する（全行を1つのpayloadに持たない）。
+
+    バッチ間で SKU×週が重複しないこと。保存済みの .jsonl は
+    ``batches=[iter_stage_rows(path)]`` とすれば行を保持せずキーごとに集約して書き込める。
+    """
+
+    if not config.version_id:
+        return False
+    return write_allocate_stream(
+        version_id=config.version_id,
+        aggregate_data=aggregate_data,
+        batches=batches,
+        storage_mode=config.storage_mode,
+        default_location_key=config.default_location_key,
+        default_location_type=config.default_location_type,
+    )
+
+
 def store_mrp_payload(
     config: PlanStorageConfig,
     *,
     mrp_data: Dict[str, Any],
     output_path: Path,
+    item_keys: Optional[Iterable[str]] = None,
 ) -> bool:
     return write_mrp_result(
         version_id=config.version_id,
@@ -114,6 +251,7 @@ def store_mrp_payload(
         storage_mode=config.storage_mode,
         default_location_key=config.default_location_key,
         default_location_type=config.default_location_type,
+        item_keys=item_keys,
     )
 
 
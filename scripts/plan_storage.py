@@ -8,9 +8,10 @@ from __future__ import annotations
 import csv
 import io
 import json
+import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 from app import db
 from core.plan_repository import PlanRepository, PlanRepositoryError
@@ -20,6 +21,7 @@ from app.metrics import (
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 from core.plan_repository_builders import (
     PlanKpiRow,
@@ -32,6 +34,13 @@ from core.plan_repository_builders import (
     build_plan_series_from_weekly_summary,
     build_plan_series_from_mrp,
 )
+from core.plan_repository_views import fetch_mrp_rows
+from scripts.plan_interchange import (
+    is_jsonl,
+    load_payload,
+    split_rows,
+    write_rows_jsonl,
+)
 from app.plan_artifact_utils import apply_plan_final_receipts
 
 
@@ -44,9 +53,28 @@ _PLAN_REPOSITORY = PlanRepository(
     PLAN_DB_LAST_SUCCESS_TIMESTAMP,
     PLAN_DB_CAPACITY_TRIM_TOTAL,
     PLAN_DB_LAST_TRIM_TIMESTAMP,
+    PLAN_DB_WRITE_ROWS_PER_SECOND,
 )
 
 
+def _replace_series_level(
+    version_id: str,
+    level: str,
+    rows: Iterable[Dict[str, Any]],
+    *,
+    item_keys: Optional[Iterable[str]] = None,
+) -> None:
+    """replace_plan_series_level を呼び、差分の件数をログに残す。"""
+
+    diff = _PLAN_REPOSITORY.replace_plan_series_level(
+        version_id, level, rows, item_keys=item_keys
+    )
+    logging.info(
+        "plan_series_level_replaced",
+        extra={"version_id": version_id, "level": level, **diff},
+    )
+
+
 def _update_detail_inventory_from_plan_final(
     version_id: str, plan_final_data: Dict[str, Any]
 ) -> None:
@@ -59,7 +87,17 @@ def _update_detail_inventory_from_plan_final(
     if not det_rows:
         return
     attach_inventory_to_detail_series(det_rows, plan_final_data)
-    _PLAN_REPOSITORY.replace_plan_series_level(version_id, "det", det_rows)
+    _replace_series_level(version_id, "det", det_rows)
+
+
+def _stage_artifact(artifact_dir: Path, stem: str) -> Optional[Path]:
+    """ステージ出力（.json、無ければ .jsonl）のパスを返す。"""
+
+    for suffix in (".json", ".jsonl"):
+        path = artifact_dir / f"{stem}{suffix}"
+        if path.exists():
+            return path
+    return None
 
 
 def _rewrite_aggregate_and_detail_from_plan_final(
@@ -73,15 +111,15 @@ def _rewrite_aggregate_and_detail_from_plan_final(
 ) -> None:
     if not plan_final_data:
         return
-    detail_path = artifact_dir / "sku_week.json"
-    agg_path = artifact_dir / "aggregate.json"
+    detail_path = _stage_artifact(artifact_dir, "sku_week")
+    agg_path = _stage_artifact(artifact_dir, "aggregate")
     detail_obj = None
     aggregate_obj = None
     try:
-        if detail_path.exists():
-            detail_obj = json.loads(detail_path.read_text(encoding="utf-8"))
-        if agg_path.exists():
-            aggregate_obj = json.loads(agg_path.read_text(encoding="utf-8"))
+        if detail_path is not None:
+            detail_obj = load_payload(detail_path)
+        if agg_path is not None:
+            aggregate_obj = load_payload(agg_path)
     except Exception:
         detail_obj = None
         aggregate_obj = None
@@ -99,7 +137,7 @@ def _rewrite_aggregate_and_detail_from_plan_final(
             default_location_key=default_location_key,
             default_location_type=default_location_type,
         )
-        _PLAN_REPOSITORY.replace_plan_series_level(version_id, "det", det_series)
+        _replace_series_level(version_id, "det", det_series)
     if aggregate_obj:
         agg_series = build_plan_series_from_aggregate(
             version_id,
@@ -107,9 +145,7 @@ def _rewrite_aggregate_and_detail_from_plan_final(
             default_location_key=default_location_key,
             default_location_type=default_location_type,
         )
-        _PLAN_REPOSITORY.replace_plan_series_level(
-            version_id, "aggregate", agg_series
-        )
+        _replace_series_level(version_id, "aggregate", agg_series)
         kpi_rows = build_plan_kpis_from_aggregate(version_id, aggregate_obj)
         _PLAN_REPOSITORY.replace_plan_kpis(version_id, kpi_rows)
 
@@ -181,6 +217,10 @@ def write_json_artifact(
 def write_json_output(path: Path, data: dict, *, storage_mode: str) -> None:
     if not should_use_files(storage_mode):
         return
+    if is_jsonl(path):
+        # .jsonl は行ストリーム形式（ヘッダ + 1行1レコード）で書く
+        write_rows_jsonl(path, split_rows(data), data.get("rows") or [])
+        return
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
@@ -270,6 +310,47 @@ def write_allocate_result(
     return True
 
 
+def write_allocate_stream(
+    *,
+    version_id: str,
+    aggregate_data: Dict[str, Any] | None,
+    batches: Iterable[Iterable[Dict[str, Any]]],
+    storage_mode: str,
+    default_location_key: str = "global",
+    default_location_type: str = "global",
+) -> bool:
+    """按分結果をバッチ（SKU×週が重複しない単位）ごとに plan_series へ書き込む。"""
+    if not should_use_db(storage_mode):
+        return False
+
+    def series() -> Iterator[PlanSeriesRow]:
+        if aggregate_data and aggregate_data.get("rows"):
+            yield from build_plan_series_from_aggregate(
+                version_id,
+                aggregate_data,
+                default_location_key=default_location_key,
+                default_location_type=default_location_type,
+            )
+        for batch in batches:
+            yield from build_plan_series_from_detail(
+                version_id,
+                {"rows": batch},
+                default_location_key=default_location_key,
+                default_location_type=default_location_type,
+            )
+
+    kpis: List[PlanKpiRow] = []
+    if aggregate_data and aggregate_data.get("rows"):
+        kpis = build_plan_kpis_from_aggregate(version_id, aggregate_data)
+    write_plan_repository(
+        version_id,
+        storage_mode=storage_mode,
+        series=series(),
+        kpis=kpis,
+    )
+    return True
+
+
 def write_mrp_result(
     *,
     version_id: Optional[str],
@@ -278,7 +359,9 @@ def write_mrp_result(
     storage_mode: str,
     default_location_key: str = "global",
     default_location_type: str = "global",
+    item_keys: Optional[Iterable[str]] = None,
 ) -> bool:
+    """MRP 出力を保存する。item_keys 指定時は PlanRepository 上のその品目だけを置き換える。"""
     list(mrp_data.get("rows") or [])
     write_json_output(output_path, mrp_data, storage_mode=storage_mode)
     if not version_id or not should_use_db(storage_mode):
@@ -292,10 +375,17 @@ def write_mrp_result(
     )
 
     try:
-        _PLAN_REPOSITORY.replace_plan_series_level(version_id, "mrp", series)
+        _replace_series_level(version_id, "mrp", series, item_keys=item_keys)
     except PlanRepositoryError:
         raise
-    return bool(series)
+    return bool(series) or item_keys is not None
+
+
+def read_mrp_rows(
+    version_id: str, *, item_keys: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """PlanRepository に保存済みの mrp 行を MRP 出力行の形で返す。"""
+    return fetch_mrp_rows(_PLAN_REPOSITORY, version_id, item_keys=item_keys)
 
 
 def write_plan_final_result(
@@ -325,12 +415,8 @@ def write_plan_final_result(
     )
 
     try:
-        _PLAN_REPOSITORY.replace_plan_series_level(
-            version_id, "mrp_final", detail_series
-        )
-        _PLAN_REPOSITORY.replace_plan_series_level(
-            version_id, "weekly_summary", weekly_series
-        )
+        _replace_series_level(version_id, "mrp_final", detail_series)
+        _replace_series_level(version_id, "weekly_summary", weekly_series)
         write_json_artifact(
             version_id,
             "plan_final.json",
@@ -372,7 +458,7 @@ def write_anchor_adjust_result(
         level="det_adjusted",
     )
     try:
-        _PLAN_REPOSITORY.replace_plan_series_level(version_id, "det_adjusted", series)
+        _replace_series_level(version_id, "det_adjusted", series)
     except PlanRepositoryError:
         raise
     return bool(series)
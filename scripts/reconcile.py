@@ -20,10 +20,13 @@ import math
 import os
 import sys
 from pathlib import Path
-from typing import DefaultDict, Dict, Any, List, Tuple, Optional
+from typing import DefaultDict, Dict, Any, List, Tuple, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    load_stage_input,
     resolve_storage_config,
     store_plan_final_payload,
 )
@@ -260,7 +263,7 @@ def _adjust_segment(
     return adj, report, slack_carry, end_spill
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="製販物整合（CRPライト）")
     ap.add_argument(
         "-i",
@@ -342,13 +345,17 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """allocate/mrp の payload を能力で調整した plan_final を返す。"""
 
     # 入力を識別
-    with open(args.inputs[0], encoding="utf-8") as f:
-        a0 = json.load(f)
-    with open(args.inputs[1], encoding="utf-8") as f:
-        a1 = json.load(f)
+    a0 = load_stage_input(args.inputs[0], store)
+    a1 = load_stage_input(args.inputs[1], store)
     if "sku" in json.dumps(a0.get("rows", [])[:1]):
         alloc, mrp = a0, a1
     else:
@@ -709,6 +716,21 @@ def main() -> None:
         ),
         "rows": rows_out,
     }
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
+
     storage_config, warning = resolve_storage_config(
         args.storage, args.version_id, cli_label="reconcile"
     )
@@ -722,8 +744,7 @@ def main() -> None:
             output_path=Path(args.output),
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -734,5 +755,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -15,13 +15,15 @@
 from __future__ import annotations
 
 import argparse
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, DefaultDict, Optional
+from typing import Any, Dict, List, Tuple, DefaultDict, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    load_stage_input,
     resolve_storage_config,
     store_reconcile_log_payload,
 )
@@ -64,15 +66,15 @@ def _period_from_week(week_key: str) -> str:
     return s
 
 
-def _load_inputs(paths: List[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+def _load_inputs(
+    paths: List[str], store: Optional[PayloadStore] = None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     if len(paths) != 2:
         raise ValueError(
             "-i/--inputs には2ファイルを指定してください（aggregate と sku_week）"
         )
-    with open(paths[0], encoding="utf-8") as f:
-        a0 = json.load(f)
-    with open(paths[1], encoding="utf-8") as f:
-        a1 = json.load(f)
+    a0 = load_stage_input(paths[0], store)
+    a1 = load_stage_input(paths[1], store)
 
     # 判定: sku/week があれば DET とみなす
     def looks_det(a: Dict[str, Any]) -> bool:
@@ -140,7 +142,7 @@ def _resolve_calendar_lookup(
     return build_calendar_lookup(spec)
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="AGG/DET ロールアップ差分ログ（v1）")
     ap.add_argument(
         "-i",
@@ -205,19 +207,19 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
+
+
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """AGG/DET 間の差分ログ payload を返す。"""
 
     lookup = _resolve_calendar_lookup(args.calendar, None)
     global _CAL_LOOKUP
     _CAL_LOOKUP = lookup
 
-    storage_config, warning = resolve_storage_config(
-        args.storage, args.version_id, cli_label="reconcile_levels"
-    )
-    if warning:
-        print(warning, file=sys.stderr)
-
-    agg, det = _load_inputs(args.inputs)
+    agg, det = _load_inputs(args.inputs, store)
     agg_rows: List[Dict[str, Any]] = agg.get("rows", [])
     det_rows: List[Dict[str, Any]] = det.get("rows", [])
 
@@ -381,6 +383,26 @@ def main() -> None:
         },
         "deltas": deltas,
     }
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
+
+    storage_config, warning = resolve_storage_config(
+        args.storage, args.version_id, cli_label="reconcile_levels"
+    )
+    if warning:
+        print(warning, file=sys.stderr)
 
     try:
         wrote_db = store_reconcile_log_payload(
@@ -390,8 +412,7 @@ def main() -> None:
             artifact_name=Path(args.output).name,
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -402,5 +423,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
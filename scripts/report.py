@@ -14,14 +14,16 @@ from __future__ import annotations
 
 import argparse
 import csv
-import json
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any, List, DefaultDict
+from typing import Dict, Any, List, DefaultDict, Optional, Sequence
 
 from core.plan_repository import PlanRepositoryError
 from scripts.plan_pipeline_io import (
+    PayloadStore,
+    StageError,
+    open_stage_stream,
     resolve_storage_config,
     store_report_csv_payload,
 )
@@ -39,7 +41,7 @@ def _load_fg_skus(input_dir: str | None, mix_path: str | None) -> List[str]:
     return list({str(r.get("sku")) for r in _read_csv(path) if r.get("sku")})
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="KPI/レポート出力")
     ap.add_argument("-i", "--input", required=True, help="reconcileの出力JSON")
     ap.add_argument("-o", "--output", required=True, help="CSV出力パス")
@@ -64,17 +66,16 @@ def main() -> None:
         default=None,
         help="PlanRepositoryへ書き込む版ID（storageにdbを含む場合は必須）",
     )
-    args = ap.parse_args()
+    return ap
 
-    storage_config, warning = resolve_storage_config(
-        args.storage, args.version_id, cli_label="report"
-    )
-    if warning:
-        print(warning, file=sys.stderr)
 
-    with open(args.input, encoding="utf-8") as f:
-        plan = json.load(f)
-    rows = plan.get("rows", [])
+def run(
+    args: argparse.Namespace, *, store: Optional[PayloadStore] = None
+) -> Dict[str, Any]:
+    """plan_final からレポート行を作成し、{fieldnames, rows} を返す。"""
+
+    # weekly_summary はヘッダ側、明細行は1回だけ順に読む（.jsonl は全行を保持しない）
+    plan, rows = open_stage_stream(args.input, store)
     weeks = [r.get("week") for r in plan.get("weekly_summary", [])]
     fg_skus = set(_load_fg_skus(args.input_dir, args.mix))
 
@@ -145,18 +146,38 @@ def main() -> None:
         "fill_rate",
     ]
     all_rows = [*cap_rows, *svc_rows]
+    payload = {"fieldnames": fieldnames, "rows": all_rows}
+    persist(args, payload, store=store)
+    return payload
+
+
+def persist(
+    args: argparse.Namespace,
+    payload: Dict[str, Any],
+    *,
+    store: Optional[PayloadStore] = None,
+) -> None:
+    """run の出力を store と --storage の保存先（ファイル/PlanRepository）へ書き出す。"""
+
+    if store is not None:
+        store.put(args.output, payload)
+
+    storage_config, warning = resolve_storage_config(
+        args.storage, args.version_id, cli_label="report"
+    )
+    if warning:
+        print(warning, file=sys.stderr)
 
     try:
         wrote_db = store_report_csv_payload(
             storage_config,
-            rows=all_rows,
-            fieldnames=fieldnames,
+            rows=payload["rows"],
+            fieldnames=payload["fieldnames"],
             output_path=Path(args.output),
             artifact_name=Path(args.output).name,
         )
     except PlanRepositoryError as exc:
-        print(f"[error] PlanRepository書き込みに失敗しました: {exc}", file=sys.stderr)
-        sys.exit(1)
+        raise StageError(f"PlanRepository書き込みに失敗しました: {exc}") from exc
 
     if storage_config.use_files:
         print(f"[ok] wrote {args.output}")
@@ -167,5 +188,14 @@ def main() -> None:
         )
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        run(args)
+    except StageError as exc:
+        print(f"[error] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
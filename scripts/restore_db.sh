@@ -8,6 +8,8 @@ if [ -z "$SRC" ] || [ ! -f "$SRC" ]; then
   exit 1
 fi
 mkdir -p "$(dirname "$DB_PATH")"
+# 旧DBの WAL/共有メモリファイルが残っていると復元後のDBと食い違うため削除する
+rm -f "$DB_PATH-wal" "$DB_PATH-shm"
 cp -p "$SRC" "$DB_PATH"
 echo "Restored $SRC -> $DB_PATH"
 
@@ -3,6 +3,9 @@
 
 plan_aggregate → allocate → mrp → reconcile → reconcile_levels → report の順で
 既存スクリプトを呼び出し、主要オプションと storage 設定を一括で制御する。
+各ステージは scripts.pipeline_runner により同一プロセス内で実行し、出力は
+メモリ上で後続ステージへ渡す（SCPLN_PIPELINE_IN_PROCESS=0 でサブプロセス実行）。
+引数と入力が前回と同じステージは out/stage_cache の結果を再利用する（--no-cache で無効化）。
 
 従来の `run_planning_pipeline.sh` を置き換える用途を想定する。
 """
@@ -10,14 +13,12 @@ plan_aggregate → allocate → mrp → reconcile → reconcile_levels → repor
 from __future__ import annotations
 
 import argparse
-import os
-import subprocess
 import sys
 from pathlib import Path
 from typing import List
 
 from scripts.plan_pipeline_io import _calendar_cli_args
-
+from scripts.pipeline_runner import PipelineStageError, PlanningPipeline
 
 SCRIPTS_DIR = Path(__file__).resolve().parent
 REPO_ROOT = SCRIPTS_DIR.parent
@@ -36,9 +37,15 @@ def _extend_storage(
         cmd.extend(["--version-id", version_id])
 
 
-def _run_stage(step: int, total: int, label: str, cmd: List[str], env: dict) -> None:
+def _run_stage(
+    step: int, total: int, label: str, cmd: List[str], pipeline: PlanningPipeline
+) -> None:
     print(f"[{step}/{total}] {label}")
-    subprocess.run(cmd, check=True, env=env)
+    hits = len(pipeline.cache_hits)
+    # cmd は [python, script, *argv]（サブプロセス実行時と同じ引数）
+    pipeline.run_script(cmd[1:])
+    if len(pipeline.cache_hits) > hits:
+        print(f"[cache] reused {label} output")
 
 
 def _apply_preset(args: argparse.Namespace) -> None:
@@ -88,6 +95,27 @@ def main() -> None:
         help="mrpのLT単位",
     )
     ap.add_argument("--week-days", dest="week_days", type=int, default=7)
+    ap.add_argument(
+        "--allocate-workers",
+        dest="allocate_workers",
+        type=int,
+        default=None,
+        help="allocateの family 区画を並列に按分するプロセス数",
+    )
+    ap.add_argument(
+        "--interchange",
+        choices=["json", "jsonl"],
+        default="json",
+        help="行を持つステージ出力（aggregate/sku_week/mrp/plan_final）の形式。"
+        "jsonl はヘッダ+1行1レコードで、後続ステージは行を順に読む",
+    )
+    ap.add_argument(
+        "--bom-mode",
+        dest="bom_mode",
+        choices=["single", "multi"],
+        default=None,
+        help="mrpのBOM展開（未指定は SCPLN_MRP_BOM_MODE または single）",
+    )
     ap.add_argument("--cutover-date", dest="cutover_date", default=None)
     ap.add_argument(
         "--recon-window-days", dest="recon_window_days", type=int, default=None
@@ -120,6 +148,12 @@ def main() -> None:
     )
     ap.add_argument("--tol-abs", dest="tol_abs", type=float, default=1e-6)
     ap.add_argument("--tol-rel", dest="tol_rel", type=float, default=1e-6)
+    ap.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="ステージキャッシュ（out/stage_cache）を使わず全ステージを再計算する",
+    )
     args = ap.parse_args()
 
     _apply_preset(args)
@@ -128,22 +162,21 @@ def main() -> None:
     output_dir = Path(args.output_dir).resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    env = os.environ.copy()
-    env.setdefault("PYTHONPATH", str(REPO_ROOT))
-
     calendar_args = _calendar_cli_args(input_dir=input_dir, fallback_weeks=args.weeks)
 
     steps: List[tuple[str, List[str]]] = []
 
-    agg_json = output_dir / "aggregate.json"
-    sku_json = output_dir / "sku_week.json"
-    mrp_json = output_dir / "mrp.json"
-    plan_final_json = output_dir / "plan_final.json"
+    # 行テーブルの出力は --interchange の形式、調整ログは常に JSON
+    rows_ext = f".{args.interchange}"
+    agg_json = output_dir / f"aggregate{rows_ext}"
+    sku_json = output_dir / f"sku_week{rows_ext}"
+    mrp_json = output_dir / f"mrp{rows_ext}"
+    plan_final_json = output_dir / f"plan_final{rows_ext}"
     recon_log_json = output_dir / "reconciliation_log.json"
     recon_log_adj_json = output_dir / "reconciliation_log_adjusted.json"
-    sku_adj_json = output_dir / "sku_week_adjusted.json"
-    mrp_adj_json = output_dir / "mrp_adjusted.json"
-    plan_final_adj_json = output_dir / "plan_final_adjusted.json"
+    sku_adj_json = output_dir / f"sku_week_adjusted{rows_ext}"
+    mrp_adj_json = output_dir / f"mrp_adjusted{rows_ext}"
+    plan_final_adj_json = output_dir / f"plan_final_adjusted{rows_ext}"
 
     # aggregate
     cmd = [
@@ -173,6 +206,8 @@ def main() -> None:
         args.round_mode,
         *calendar_args,
     ]
+    if args.allocate_workers:
+        cmd.extend(["--workers", str(args.allocate_workers)])
     _extend_storage(cmd, args.storage, args.version_id)
     steps.append(("allocate", cmd))
 
@@ -192,6 +227,8 @@ def main() -> None:
         str(args.week_days),
         *calendar_args,
     ]
+    if args.bom_mode:
+        cmd.extend(["--bom-mode", args.bom_mode])
     _extend_storage(cmd, args.storage, args.version_id)
     steps.append(("mrp", cmd))
 
@@ -399,6 +436,8 @@ def main() -> None:
                 str(args.week_days),
                 *calendar_args,
             ]
+            if args.bom_mode:
+                cmd.extend(["--bom-mode", args.bom_mode])
             _extend_storage(cmd, args.storage, args.version_id)
             steps.append(("mrp_adjusted", cmd))
 
@@ -457,8 +496,13 @@ def main() -> None:
     steps.append(("report", cmd))
 
     total_steps = len(steps)
+    pipeline = PlanningPipeline(use_cache=False if args.no_cache else None)
     for idx, (label, cmd) in enumerate(steps, start=1):
-        _run_stage(idx, total_steps, label, cmd, env)
+        try:
+            _run_stage(idx, total_steps, label, cmd, pipeline)
+        except PipelineStageError as exc:
+            print(exc.stderr or str(exc), file=sys.stderr)
+            sys.exit(exc.returncode or 1)
 
     print(f"[ok] pipeline completed. outputs in {output_dir}")
 
@@ -16,6 +16,8 @@ from app import db as appdb
 # テスト中はPlan経由のRunRegistry記録で重いPSIシミュレーションを省略する
 os.environ.setdefault("SCPLN_SKIP_SIMULATION_API", "1")
 os.environ.setdefault("SCPLN_SKIP_STARTUP_SEED", "1")
+# ステージキャッシュ（out/stage_cache）はテスト間で共有しない。必要なテストは明示的に渡す
+os.environ.setdefault("SCPLN_STAGE_CACHE", "0")
 
 _DEFAULT_TEMPLATE_PATH = (
     Path(__file__).resolve().parents[1] / "tmp" / "alembic_template" / "template.db"
@@ -0,0 +1,111 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from app import db
+from core.plan_repository import PlanRepository
+from scripts import allocate
+from scripts.pipeline_cache import stage_cache_key
+from scripts.plan_pipeline_io import StageError
+
+
+def _write_csv(path: Path, header, rows) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _setup(tmp_path: Path) -> Path:
+    # F0/F1 は SKU "S-shared" を共有し、F9 はミックス未定義（family 名の仮SKU）
+    mix = [["F0", "S-shared", 0.5], ["F1", "S-shared", 0.3]]
+    for f in range(8):
+        mix.extend([[f"F{f}", f"S{f}-{k}", 0.25 + 0.1 * k] for k in range(3)])
+    _write_csv(tmp_path / "mix_share.csv", ["family", "sku", "share"], mix)
+    rows = [
+        {
+            "family": f"F{f}",
+            "period": f"2025-0{m}",
+            "demand": 100 + 17 * f + 3 * m,
+            "supply": 90 + 11 * f,
+            "backlog": 7 * m,
+        }
+        for m in range(1, 4)
+        for f in (*range(8), 9)
+    ]
+    (tmp_path / "aggregate.json").write_text(
+        json.dumps({"schema_version": "agg-1.0", "rows": rows}), encoding="utf-8"
+    )
+    return tmp_path
+
+
+def _args(tmp_path: Path, *extra: str):
+    return allocate.build_parser().parse_args(
+        [
+            "-i",
+            str(tmp_path / "aggregate.json"),
+            "-I",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / "sku_week.json"),
+            *extra,
+        ]
+    )
+
+
+@pytest.mark.parametrize("round_mode", ["int", "dec1"])
+def test_partitioned_run_matches_serial(tmp_path: Path, round_mode):
+    _setup(tmp_path)
+    common = ["--round", round_mode, "--storage", "files"]
+    serial = allocate.run(_args(tmp_path, *common, "--workers", "1"))
+    parallel = allocate.run(_args(tmp_path, *common, "--workers", "3"))
+    assert parallel == serial
+    # 実行方法の指定はキャッシュキーに影響しない
+    assert stage_cache_key(
+        "allocate", _args(tmp_path, *common, "--workers", "3")
+    ) == stage_cache_key("allocate", _args(tmp_path, *common))
+
+
+def test_partitions_keep_shared_skus_together(tmp_path: Path):
+    _setup(tmp_path)
+    agg = json.loads((tmp_path / "aggregate.json").read_text(encoding="utf-8"))
+    mix = allocate._load_mix(str(tmp_path), None)
+    parts = allocate.partition_rows(agg["rows"], mix, 4)
+    assert parts == allocate.partition_rows(agg["rows"], mix, 4)
+    assert sorted(i for part in parts for i, _r in part) == list(
+        range(len(agg["rows"]))
+    )
+    owner = {}
+    for n, part in enumerate(parts):
+        assert [i for i, _r in part] == sorted(i for i, _r in part)
+        for _i, r in part:
+            assert owner.setdefault(r["family"], n) == n
+    assert owner["F0"] == owner["F1"]
+
+
+def test_stream_writes_detail_rows_to_repository(db_setup, tmp_path: Path):
+    _setup(tmp_path)
+    common = ["--round", "int", "--version-id", "v-stream"]
+    expected = allocate.run(_args(tmp_path, *common, "--storage", "both"))
+    repo = PlanRepository(db._conn)
+    full_det = repo.fetch_plan_series("v-stream", "det")
+
+    payload = allocate.run(
+        _args(tmp_path, *common, "--storage", "db", "--stream", "--workers", "2")
+    )
+    assert payload["rows"] == []
+    assert payload["inputs_summary"]["streamed_rows"] == len(expected["rows"])
+
+    def _values(rows):
+        return sorted(
+            (r["time_bucket_key"], r["item_key"], r["demand"], r["supply"])
+            for r in rows
+        )
+
+    assert _values(repo.fetch_plan_series("v-stream", "det")) == _values(full_det)
+    assert repo.fetch_plan_series("v-stream", "aggregate")
+
+    with pytest.raises(StageError):
+        allocate.run(_args(tmp_path, *common, "--storage", "files", "--stream"))
@@ -0,0 +1,67 @@
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from engine.columnar import METRICS, ColumnarResults, as_nested
+from engine.compiled import create_simulator
+from scripts.bench_simulator import build_network
+
+importlib.import_module("app.simulation_api")
+importlib.import_module("app.trace_export_api")
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+def test_columnar_matches_nested(engine):
+    sim_input = build_network(stores=5, items=3, days=20, seed=4, constrained=True)
+    nested = create_simulator(sim_input, engine=engine)
+    nested.run()
+    columnar = create_simulator(sim_input, engine=engine, result_format="columnar")
+    results, _ = columnar.run()
+
+    assert list(results) == nested.daily_results
+    assert results[-1] == nested.daily_results[-1]
+    assert columnar.compute_summary() == nested.compute_summary()
+    cols = columnar.columnar_results
+    assert cols.row_count == sum(
+        len(items) for d in nested.daily_results for items in d["nodes"].values()
+    )
+    assert set(cols.columns) == set(METRICS)
+
+
+def test_columnar_json_round_trip():
+    sim_input = build_network(stores=3, items=2, days=6, seed=1)
+    sim = create_simulator(sim_input, result_format="columnar")
+    sim.run()
+    doc = json.loads(json.dumps(sim.columnar_results.to_dict()))
+    assert doc["format"] == "columnar"
+    assert ColumnarResults.from_dict(doc).to_nested() == list(sim.daily_results)
+    assert list(as_nested(doc)) == list(sim.daily_results)
+    # 従来形式はそのまま返す
+    nested = list(sim.daily_results)
+    assert as_nested(nested) is nested
+    assert ColumnarResults.from_nested(nested).to_nested() == nested
+
+
+def test_unknown_result_format_is_rejected():
+    with pytest.raises(ValueError):
+        create_simulator(build_network(days=2), result_format="parquet")
+
+
+def test_simulation_api_columnar_and_csv_export():
+    client = TestClient(app)
+    payload = build_network(stores=2, items=2, days=3).model_dump()
+    r = client.post("/simulation?result_format=columnar", json=payload)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["result_format"] == "columnar"
+    assert body["results"]["format"] == "columnar"
+    csv_resp = client.get(f"/runs/{body['run_id']}/results.csv")
+    assert csv_resp.status_code == 200
+    lines = csv_resp.text.strip().splitlines()
+    assert len(lines) == 1 + len(body["results"]["days"])
+
+    r = client.post("/simulation?result_format=xml", json=payload)
+    assert r.status_code == 400
@@ -0,0 +1,135 @@
+import csv
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from engine.compiled import create_simulator
+from engine.cost_trace import CostTrace, CsvTraceSink, trace_records
+from scripts.bench_simulator import build_network
+
+importlib.import_module("app.simulation_api")
+importlib.import_module("app.trace_export_api")
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+def test_streamed_trace_matches_retained(tmp_path, engine):
+    sim_input = build_network(stores=4, items=3, days=15, seed=2, constrained=True)
+    retained = create_simulator(sim_input, engine=engine)
+    retained.run()
+    trace = retained.cost_trace
+    assert isinstance(trace, CostTrace) and len(trace) > 0
+    assert list(trace[0]) == [
+        "day",
+        "node",
+        "item",
+        "event",
+        "qty",
+        "unit_cost",
+        "amount",
+        "account",
+    ]
+    assert trace[-1] == trace.to_records()[-1]
+    assert trace_records(trace) == json.loads(json.dumps(trace.to_records()))
+    retained.assert_pl_equals_trace_totals()
+
+    # 小さいチャンクで sink へ書き出すとバッファには何も残らない
+    sink = CsvTraceSink(tmp_path / "trace.csv", run_id="r1")
+    streamed = create_simulator(sim_input, engine=engine, trace_sink=sink)
+    streamed.cost_trace = CostTrace(sink, chunk_rows=7)
+    streamed.run()
+    assert len(streamed.cost_trace) == 0
+    assert streamed.cost_trace.total_rows == len(trace)
+    assert streamed.recompute_pl_from_trace() == retained.recompute_pl_from_trace()
+    rows = _read_csv(tmp_path / "trace.csv")
+    assert len(rows) == len(trace)
+    assert rows[0]["run_id"] == "r1"
+    assert [(r["node"], r["event"], float(r["amount"])) for r in rows] == [
+        (r["node"], r["event"], r["amount"]) for r in trace
+    ]
+
+
+def test_cost_trace_widens_codes_past_int16():
+    trace = CostTrace()
+    for i in range(40000):
+        trace.append(1, "N", f"I{i}", "e", 1.0, 2.0, 2.0, "material")
+    assert trace.item_idx.typecode == "i"
+    assert trace[-1]["item"] == "I39999"
+    assert trace.account_totals() == {(1, "material"): 80000.0}
+
+
+def test_simulation_spools_trace_csv(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCPLN_SKIP_SIMULATION_API", "0")
+    monkeypatch.setenv("SCPLN_TRACE_DIR", str(tmp_path))
+    client = TestClient(app)
+    payload = build_network(stores=2, items=2, days=5).model_dump()
+    run_id = client.post("/simulation", json=payload).json()["run_id"]
+    spooled = _read_csv(tmp_path / f"{run_id}.csv")
+    assert spooled
+
+    resp = client.get(f"/runs/{run_id}/trace.csv")
+    assert resp.status_code == 200
+    assert list(csv.DictReader(resp.text.splitlines())) == spooled
+
+    # include_trace=true は従来どおり応答と RunRegistry に明細を持つ
+    body = client.post("/simulation?include_trace=true", json=payload).json()
+    assert len(body["cost_trace"]) == len(spooled)
+    assert not (tmp_path / f"{body['run_id']}.csv").exists()
+
+
+def test_registry_keeps_typed_trace(monkeypatch, db_setup):
+    import app.run_registry as run_registry
+
+    importlib.import_module("app.run_compare_api")
+    registry = run_registry.RunRegistry(capacity=10)
+    monkeypatch.setenv("SCPLN_SKIP_SIMULATION_API", "0")
+    monkeypatch.setattr(run_registry, "REGISTRY", registry)
+    monkeypatch.setattr(run_registry, "_BACKEND", "memory")
+    client = TestClient(app)
+    payload = build_network(stores=2, items=2, days=5).model_dump()
+    body = client.post("/simulation?include_trace=true", json=payload).json()
+    # Registry には dict の列に戻さず型付きバッファのまま保存する
+    stored = registry.get(body["run_id"])["cost_trace"]
+    assert isinstance(stored, CostTrace) and len(stored) == len(body["cost_trace"])
+
+    detail = client.get(f"/runs/{body['run_id']}?detail=true").json()
+    assert detail["cost_trace"] == body["cost_trace"]
+    listed = client.get("/runs?detail=true").json()["runs"]
+    assert listed[0]["cost_trace"] == body["cost_trace"]
+    rows = list(
+        csv.DictReader(
+            client.get(f"/runs/{body['run_id']}/trace.csv").text.splitlines()
+        )
+    )
+    assert len(rows) == len(body["cost_trace"])
+
+    # 集計ジョブの trace データセットも型付きバッファから行を読む
+    import app.jobs as jobs
+    from app import db
+
+    monkeypatch.setattr(jobs, "REGISTRY", registry)
+    db.create_job(
+        "agg-trace",
+        "aggregate",
+        "queued",
+        0,
+        json.dumps(
+            {
+                "run_id": body["run_id"],
+                "dataset": "trace",
+                "group_keys": ["account"],
+                "sum_fields": ["amount"],
+            }
+        ),
+    )
+    jobs.JOB_MANAGER._run_aggregate("agg-trace")
+    job = db.get_job("agg-trace")
+    assert job["status"] == "succeeded", job.get("error")
+    assert json.loads(job["result_json"])
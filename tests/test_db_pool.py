@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app import db as appdb
+from app.metrics import DB_POOL_ACQUIRE_TOTAL
+
+
+def _hits():
+    return DB_POOL_ACQUIRE_TOTAL.labels(result="hit")._value.get()
+
+
+def test_pooled_connection_is_reused_per_thread(db_setup):
+    conn = appdb._conn()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    raw = conn._raw
+    conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+    before = _hits()
+    with appdb._conn() as c:
+        assert c._raw is raw
+        # 入れ子の取得は別接続（トランザクションを共有しない）
+        inner = appdb._conn()
+        assert inner._raw is not raw
+        del inner
+    assert _hits() == before + 1
+
+    seen = []
+
+    def worker():
+        c = appdb._conn()
+        seen.append(c._raw)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert seen and seen[0] is not raw
+
+
+def test_released_connection_rolls_back_and_resets(db_setup):
+    with appdb._conn() as c:
+        c.execute("CREATE TABLE pool_t(x INTEGER)")
+    c = appdb._conn()
+    c.execute("INSERT INTO pool_t VALUES (1)")
+    c.row_factory = None
+    del c  # 未コミットのまま参照が切れたら従来同様に破棄される
+    c = appdb._conn()
+    assert c.execute("SELECT COUNT(*) AS n FROM pool_t").fetchone()["n"] == 0
+
+
+def test_pool_discards_connections_to_replaced_files(db_setup, tmp_path):
+    c = appdb._conn()
+    c.execute("CREATE TABLE marker(x)")
+    c.commit()
+    del c
+    other = tmp_path / "other.db"
+    appdb.set_db_path(str(other))
+    try:
+        c = appdb._conn()
+        names = [r[0] for r in c.execute("SELECT name FROM sqlite_master")]
+        assert "marker" not in names
+    finally:
+        appdb.set_db_path(db_setup)
+
+
+def test_pool_can_be_disabled(db_setup, monkeypatch):
+    monkeypatch.setenv("SCPLN_DB_POOL", "0")
+    conn = appdb._conn()
+    assert isinstance(conn, sqlite3.Connection)
+    conn.close()
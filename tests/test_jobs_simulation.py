@@ -52,3 +52,22 @@ def test_jobs_simulation_end_to_end(db_setup):
         time.sleep(0.05)
     assert status == "succeeded"
     assert body.get("run_id")
+
+
+def test_jobs_simulation_summary_detail_level(db_setup):
+    from app.jobs import JOB_MANAGER
+
+    JOB_MANAGER.stop()
+    JOB_MANAGER.db_path = db_setup
+    client = TestClient(app)
+    body = {**_payload().model_dump(), "detail_level": "summary"}
+    job_id = client.post("/jobs/simulation", json=body).json()["job_id"]
+    for _ in range(50):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "succeeded"
+    run = client.get(f"/runs/{job['run_id']}?detail=true").json()
+    assert run["summary"]
+    assert run["results"] == [] and run["daily_profit_loss"] == []
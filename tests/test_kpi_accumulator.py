@@ -0,0 +1,86 @@
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from engine.compiled import create_simulator
+from engine.kpi import KpiAccumulator
+from scripts.bench_simulator import build_network
+
+importlib.import_module("app.simulation_api")
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+@pytest.mark.parametrize("result_format", ["nested", "columnar"])
+def test_online_summary_matches_recorded_results(engine, result_format):
+    sim_input = build_network(stores=5, items=4, days=30, seed=3, constrained=True)
+    sim = create_simulator(sim_input, engine=engine, result_format=result_format)
+    sim.run()
+    summary = sim.compute_summary()
+    assert summary["planning_days"] == 30
+    assert summary["customer_shortage_total"] > 0
+    # 記録済み結果を後から走査する従来の集計と、丸めも含めて一致する
+    replay = KpiAccumulator.from_results(
+        sim.kpi.node_types, sim.daily_results, sim.daily_profit_loss
+    ).summary()
+    assert json.dumps(summary, sort_keys=True) == json.dumps(replay, sort_keys=True)
+
+    pl_only = create_simulator(sim_input, engine=engine, detail_level="pl")
+    pl_only.run()
+    assert pl_only.daily_results == []
+    assert len(pl_only.cost_trace) == 0 and not pl_only.order_history
+    assert pl_only.daily_profit_loss == sim.daily_profit_loss
+    assert pl_only.compute_summary() == summary
+
+    summary_only = create_simulator(sim_input, engine=engine, detail_level="summary")
+    summary_only.run()
+    assert summary_only.daily_profit_loss == []
+    assert summary_only.compute_summary() == summary
+
+
+def test_kpi_accumulator_peak_and_top_shortage_ties():
+    acc = KpiAccumulator({"S1": "store", "W1": "warehouse"}, top_k=2)
+    assert acc.summary()["backorder_peak"] == 0
+    assert acc.summary()["backorder_peak_day"] == 0
+    for bo in (1.0, 3.0, 3.0):
+        acc.add_row("store", "B", 2.0, 1.0, 1.0, 0.0, bo)
+        acc.add_row("store", "A", 2.0, 1.0, 1.0, 0.0, 0.0)
+        acc.add_row("warehouse", "A", 4.0, 4.0, 0.0, 10.0, 0.0)
+        acc.end_day()
+    acc.add_profit_loss(
+        {"revenue": 100, "material_cost": 10, "penalty_costs": {"stockout": 5}}
+    )
+    s = acc.summary()
+    assert s["backorder_peak"] == 3.0
+    assert s["backorder_peak_day"] == 2  # 同値は先の日
+    assert s["top_shortage_items"] == [
+        {"item": "B", "shortage": 3.0},
+        {"item": "A", "shortage": 3.0},
+    ]
+    assert s["fill_rate"] == 0.5
+    assert s["avg_on_hand_by_type"]["warehouse"] == 10.0
+    assert s["profit_total"] == 85
+
+
+def test_simulation_api_detail_level(monkeypatch):
+    monkeypatch.setenv("SCPLN_SKIP_SIMULATION_API", "0")
+    client = TestClient(app)
+    payload = build_network(stores=2, items=2, days=5).model_dump()
+    full = client.post("/simulation", json=payload).json()
+    assert "detail_level" not in full and full["results"]
+
+    for level in ("pl", "summary"):
+        body = client.post(
+            f"/simulation?detail_level={level}&include_trace=true", json=payload
+        ).json()
+        assert body["detail_level"] == level
+        assert body["results"] == [] and body["cost_trace"] == []
+        assert body["summary"] == full["summary"]
+        assert bool(body["daily_profit_loss"]) == (level == "pl")
+        stored = client.get(f"/runs/{body['run_id']}?detail=true").json()
+        assert stored["results"] == []
+
+    resp = client.post("/simulation?detail_level=daily", json=payload)
+    assert resp.status_code == 400
@@ -0,0 +1,112 @@
+import importlib
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from engine.montecarlo import (
+    MonteCarloAccumulator,
+    iter_replications,
+    percentile,
+    run_montecarlo,
+)
+from scripts.bench_simulator import build_network
+
+importlib.import_module("app.jobs_api")
+importlib.import_module("app.simulation_api")
+
+
+def _small_input(seed=3):
+    return build_network(stores=3, warehouses=1, items=2, days=10, seed=seed)
+
+
+def test_percentile_matches_linear_interpolation():
+    vals = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(vals, 50) == 3.0
+    assert percentile(vals, 5) == pytest.approx(1.2)
+    assert percentile(vals, 95) == pytest.approx(4.8)
+    assert percentile([], 50) == 0.0
+
+
+def test_accumulator_bands():
+    acc = MonteCarloAccumulator()
+    for i in range(11):
+        acc.add({"fill_rate": i / 10, "profit_total": i, "backorder_peak": 0})
+    bands = acc.bands()
+    assert acc.count == 11
+    assert bands["fill_rate"]["p50"] == pytest.approx(0.5)
+    assert bands["profit_total"]["min"] == 0
+    assert bands["profit_total"]["max"] == 10
+    assert bands["backorder_peak"]["p95"] == 0
+
+
+def test_pool_matches_serial_replications():
+    sim_input = _small_input()
+    serial = dict(iter_replications(sim_input, 4, base_seed=10, workers=1))
+    pooled = dict(iter_replications(sim_input, 4, base_seed=10, workers=2))
+    assert sorted(serial) == [10, 11, 12, 13]
+    assert pooled == serial
+
+
+def test_run_montecarlo_reports_bands_and_samples():
+    sim_input = _small_input()
+    seen = []
+    result = run_montecarlo(
+        sim_input,
+        5,
+        workers=1,
+        include_samples=True,
+        on_result=lambda seed, _summary: seen.append(seed),
+    )
+    assert result["replications"] == 5
+    assert result["base_seed"] == 3
+    assert sorted(seen) == [3, 4, 5, 6, 7]
+    assert [s["seed"] for s in result["samples"]] == [3, 4, 5, 6, 7]
+    fill = result["metrics"]["fill_rate"]
+    assert fill["p5"] <= fill["p50"] <= fill["p95"]
+    with pytest.raises(ValueError):
+        run_montecarlo(sim_input, 0)
+
+
+def test_montecarlo_endpoint():
+    client = TestClient(app)
+    r = client.post(
+        "/simulation/montecarlo?replications=3&workers=1&base_seed=1",
+        json=_small_input().model_dump(),
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert body["replications"] == 3
+    assert set(body["metrics"]) == {"fill_rate", "profit_total", "backorder_peak"}
+    r = client.post(
+        "/simulation/montecarlo?engine=unknown", json=_small_input().model_dump()
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.slow
+def test_jobs_montecarlo_end_to_end(db_setup):
+    from app.jobs import JOB_MANAGER
+
+    JOB_MANAGER.stop()
+    JOB_MANAGER.db_path = db_setup
+    client = TestClient(app)
+    body = _small_input().model_dump()
+    body.update({"replications": 2, "workers": 1})
+    r = client.post("/jobs/montecarlo", json=body)
+    assert r.status_code == 200
+    job_id = r.json()["job_id"]
+    status = None
+    for _ in range(100):
+        status = client.get(f"/jobs/{job_id}").json()["status"]
+        if status in ("succeeded", "failed"):
+            break
+        time.sleep(0.05)
+    assert status == "succeeded"
+    rows = client.get(f"/jobs/{job_id}/result.json").json()["rows"]
+    assert [row["metric"] for row in rows] == [
+        "fill_rate",
+        "profit_total",
+        "backorder_peak",
+    ]
@@ -0,0 +1,108 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from scripts import mrp
+from scripts.plan_pipeline_io import StageError
+
+WEEKS = ["2025-01-Wk1", "2025-01-Wk2", "2025-01-Wk3", "2025-01-Wk4"]
+
+
+def _write_csv(path: Path, header, rows) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _setup(tmp_path: Path) -> Path:
+    # FG(LT1週) → SUB ×2（LT2週） → RAW ×3（LT0）
+    alloc = {
+        "rows": [
+            {"sku": "FG", "week": "2025-01-Wk3", "demand": 10},
+            {"sku": "FG", "week": "2025-01-Wk4", "demand": 5},
+            {"sku": "FG", "week": "2025-01-Wk1", "demand": 0},
+            {"sku": "FG", "week": "2025-01-Wk2", "demand": 0},
+        ]
+    }
+    (tmp_path / "sku_week.json").write_text(json.dumps(alloc), encoding="utf-8")
+    _write_csv(
+        tmp_path / "item.csv",
+        ["item", "lt", "lot", "moq"],
+        [["FG", 7, 1, 0], ["SUB", 14, 1, 0], ["RAW", 0, 1, 0]],
+    )
+    _write_csv(tmp_path / "inventory.csv", ["item", "loc", "qty"], [["SUB", "X", 5]])
+    _write_csv(tmp_path / "open_po.csv", ["item", "due", "qty"], [])
+    _write_csv(
+        tmp_path / "bom.csv",
+        ["parent", "child", "qty"],
+        [["SUB", "RAW", 3], ["FG", "SUB", 2]],
+    )
+    return tmp_path
+
+
+def _run(tmp_path: Path, mode: str):
+    args = mrp.build_parser().parse_args(
+        [
+            "-i",
+            str(tmp_path / "sku_week.json"),
+            "-I",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / f"mrp_{mode}.json"),
+            "--storage",
+            "files",
+            "--bom-mode",
+            mode,
+        ]
+    )
+    payload = mrp.run(args)
+    series = {}
+    for row in payload["rows"]:
+        series.setdefault(row["item"], []).append(row)
+    return payload, series
+
+
+def _col(rows, key):
+    return [r[key] for r in rows]
+
+
+def test_multi_level_explodes_planned_releases(tmp_path: Path):
+    payload, series = _run(_setup(tmp_path), "multi")
+    assert payload["inputs_summary"]["bom_levels"] == 3
+    assert [r["week"] for r in series["FG"]] == WEEKS
+
+    # FG の計画受入は LT1週前に解放され、その週が SUB の所要週になる
+    assert _col(series["FG"], "planned_order_release") == [0, 10, 5, 0]
+    assert _col(series["SUB"], "gross_req") == [0, 20, 10, 0]
+    # SUB は在庫5を充当し、LT2週（境界は第1週）で解放
+    assert _col(series["SUB"], "planned_order_receipt") == [0, 15, 10, 0]
+    assert _col(series["SUB"], "planned_order_release") == [25, 0, 0, 0]
+    assert _col(series["RAW"], "gross_req") == [75, 0, 0, 0]
+    assert _col(series["RAW"], "planned_order_release") == [75, 0, 0, 0]
+    assert set(payload["rows"][0]) == set(
+        json.loads((tmp_path / "mrp_multi.json").read_text(encoding="utf-8"))["rows"][0]
+    )
+
+
+def test_single_level_mode_keeps_parent_gross_propagation(tmp_path: Path):
+    payload, series = _run(_setup(tmp_path), "single")
+    assert payload["inputs_summary"]["bom_mode"] == "single"
+    # 親の gross を同じ週にそのまま展開する従来動作（1階層のみ、孫の RAW には届かない）
+    assert _col(series["SUB"], "gross_req") == [0, 0, 20, 10]
+    assert "RAW" not in series
+
+
+def test_low_level_codes_use_deepest_path():
+    bom = [("A", "B", 1), ("B", "C", 1), ("A", "C", 1), ("D", "B", 1)]
+    assert mrp.low_level_codes(bom, ["E"]) == {
+        "A": 0,
+        "B": 1,
+        "C": 2,
+        "D": 0,
+        "E": 0,
+    }
+    with pytest.raises(StageError):
+        mrp.low_level_codes([("A", "B", 1), ("B", "A", 1)])
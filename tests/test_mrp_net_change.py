@@ -0,0 +1,230 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from app import db
+from core.plan_repository import PlanRepository
+from scripts import mrp
+from scripts.pipeline_cache import stage_cache_key
+from scripts.plan_pipeline_io import PayloadStore, StageError
+
+WEEKS = ["2025-01-Wk1", "2025-01-Wk2", "2025-01-Wk3", "2025-01-Wk4"]
+
+
+def _write_csv(path: Path, header, rows) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _setup(tmp_path: Path) -> Path:
+    # FG1/FG2 → SUB ×2 → RAW ×3、FG3 は BOM なし
+    _write_csv(
+        tmp_path / "item.csv",
+        ["item", "lt", "lot", "moq"],
+        [
+            ["FG1", 7, 1, 0],
+            ["FG2", 0, 5, 0],
+            ["FG3", 7, 1, 0],
+            ["SUB", 7, 1, 0],
+            ["RAW", 0, 10, 0],
+        ],
+    )
+    _write_csv(tmp_path / "inventory.csv", ["item", "loc", "qty"], [["SUB", "X", 5]])
+    _write_csv(tmp_path / "open_po.csv", ["item", "due", "qty"], [])
+    _write_csv(
+        tmp_path / "bom.csv",
+        ["parent", "child", "qty"],
+        [["SUB", "RAW", 3], ["FG1", "SUB", 2], ["FG2", "SUB", 1]],
+    )
+    _write_alloc(tmp_path, {"FG1": 10, "FG2": 4, "FG3": 7})
+    return tmp_path
+
+
+def _write_alloc(tmp_path: Path, demand: dict) -> None:
+    rows = [
+        {"sku": sku, "week": w, "demand": qty if wi >= 2 else 0}
+        for sku, qty in demand.items()
+        for wi, w in enumerate(WEEKS)
+    ]
+    (tmp_path / "sku_week.json").write_text(
+        json.dumps({"rows": rows}), encoding="utf-8"
+    )
+
+
+def _run(tmp_path: Path, name: str, mode: str, *extra: str):
+    args = mrp.build_parser().parse_args(
+        [
+            "-i",
+            str(tmp_path / "sku_week.json"),
+            "-I",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / f"{name}.json"),
+            "--bom-mode",
+            mode,
+            *extra,
+        ]
+    )
+    return mrp.run(args)
+
+
+def _by_item(payload):
+    series = {}
+    for row in payload["rows"]:
+        series.setdefault(row["item"], []).append(row)
+    return series
+
+
+def _changes(tmp_path: Path, keys) -> str:
+    path = tmp_path / "changes.json"
+    path.write_text(json.dumps(keys), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "mode, expected_items",
+    [("multi", ["FG1", "RAW", "SUB"]), ("single", ["FG1", "RAW", "SUB"])],
+)
+def test_net_change_matches_full_run(tmp_path: Path, mode, expected_items):
+    _setup(tmp_path)
+    base = _run(tmp_path, "base", mode, "--storage", "files")
+
+    _write_alloc(tmp_path, {"FG1": 16, "FG2": 4, "FG3": 7})
+    full_payload = _run(tmp_path, "full", mode, "--storage", "files")
+    full = _by_item(full_payload)
+    delta = _run(
+        tmp_path,
+        "delta",
+        mode,
+        "--storage",
+        "files",
+        "--net-change",
+        _changes(tmp_path, [{"sku": "FG1", "week": "2025-01-Wk3"}]),
+        "--base",
+        str(tmp_path / "base.json"),
+    )
+
+    summary = delta["inputs_summary"]["net_change"]
+    assert summary["changed"] == ["FG1"]
+    assert summary["items"] == expected_items
+    series = _by_item(delta)
+    assert sorted(series) == [it for it in expected_items if it in full]
+    for item, rows in series.items():
+        assert rows == full[item], item
+    assert mrp.merge_net_change(base, delta)["rows"] == full_payload["rows"]
+
+
+@pytest.mark.parametrize(
+    "mode, expected_needed",
+    # single は SUB の親 FG2 の gross も子へ伝播するため、その需要も要る
+    [("multi", {"FG1", "SUB", "RAW"}), ("single", {"FG1", "FG2", "SUB", "RAW"})],
+)
+def test_net_change_with_scoped_rows_from_store(tmp_path: Path, mode, expected_needed):
+    _setup(tmp_path)
+    base = _run(tmp_path, "base", mode, "--storage", "files")
+    _write_alloc(tmp_path, {"FG1": 16, "FG2": 4, "FG3": 7})
+    full_payload = _run(tmp_path, "full", mode, "--storage", "files")
+
+    # 入力は需要が要る品目の行だけ（週の並びは net-change の weeks で渡す）
+    needed = mrp.net_change_demand_items(
+        str(tmp_path / "bom.csv"), ["FG1"], bom_mode=mode
+    )
+    assert needed == expected_needed
+    rows = json.loads((tmp_path / "sku_week.json").read_text(encoding="utf-8"))["rows"]
+    store = PayloadStore()
+    store.put(
+        tmp_path / "scoped.json",
+        {"rows": [r for r in rows if r["sku"] in needed and r["demand"]]},
+    )
+    store.put(
+        tmp_path / "changes.json",
+        {"keys": [{"sku": "FG1", "week": "2025-01-Wk3"}], "weeks": WEEKS},
+    )
+    store.put(tmp_path / "base.json", base)
+    args = mrp.build_parser().parse_args(
+        [
+            "-i",
+            str(tmp_path / "scoped.json"),
+            "-I",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / "delta.json"),
+            "--storage",
+            "files",
+            "--bom-mode",
+            mode,
+            "--net-change",
+            str(tmp_path / "changes.json"),
+            "--base",
+            str(tmp_path / "base.json"),
+        ]
+    )
+    delta = mrp.run(args, store=store)
+    assert mrp.merge_net_change(base, delta)["rows"] == full_payload["rows"]
+
+
+def test_net_change_updates_only_affected_plan_series(db_setup, tmp_path: Path):
+    _setup(tmp_path)
+    common = ["--storage", "db", "--version-id", "v-net"]
+    _run(tmp_path, "base", "multi", *common)
+    repo = PlanRepository(db._conn)
+    before = {
+        (r["item_key"], r["time_bucket_key"]): r
+        for r in repo.fetch_plan_series("v-net", "mrp")
+    }
+
+    _write_alloc(tmp_path, {"FG1": 10, "FG2": 9, "FG3": 7})
+    full = _by_item(_run(tmp_path, "full", "multi", "--storage", "files"))
+    # --base なしでは範囲外の親（FG1）の計画解放を PlanRepository から読む
+    delta = _run(
+        tmp_path,
+        "delta",
+        "multi",
+        *common,
+        "--net-change",
+        _changes(tmp_path, [["FG2", "2025-01-Wk3"]]),
+    )
+    assert delta["inputs_summary"]["net_change"]["base"] == "plan_repository"
+
+    after = repo.fetch_plan_series("v-net", "mrp")
+    assert len(after) == len(before)
+    for row in after:
+        key = (row["item_key"], row["time_bucket_key"])
+        if row["item_key"] in ("FG1", "FG3"):
+            assert row["updated_at"] == before[key]["updated_at"]
+        else:
+            assert (
+                row["demand"] == full[row["item_key"]][WEEKS.index(key[1])]["gross_req"]
+            )
+    assert [
+        r["item_key"] for r in repo.fetch_plan_series("v-net", "mrp", item_keys=["SUB"])
+    ] == ["SUB"] * len(WEEKS)
+
+
+def test_net_change_requires_base_for_external_parents(tmp_path: Path):
+    _setup(tmp_path)
+    args = mrp.build_parser().parse_args(
+        [
+            "-i",
+            str(tmp_path / "sku_week.json"),
+            "-I",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / "delta.json"),
+            "--storage",
+            "files",
+            "--bom-mode",
+            "multi",
+            "--net-change",
+            _changes(tmp_path, ["SUB"]),
+        ]
+    )
+    # SUB の親 FG1/FG2 は範囲外のため基準の MRP が要る
+    with pytest.raises(StageError):
+        mrp.run(args)
+    # 正味変更の実行はステージキャッシュの対象外
+    assert stage_cache_key("mrp", args) is None
@@ -0,0 +1,167 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from scripts.pipeline_runner import (
+    PipelineStageError,
+    PlanningPipeline,
+    stage_name,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLES = ROOT / "samples" / "planning"
+
+
+def _run_core(pipeline: PlanningPipeline, out: Path, storage: str = "files") -> None:
+    common = ["--storage", storage]
+    pipeline.run_script(
+        [
+            "scripts/plan_aggregate.py",
+            "-i",
+            str(SAMPLES),
+            "-o",
+            str(out / "aggregate.json"),
+            *common,
+        ]
+    )
+    pipeline.run_script(
+        [
+            "scripts/allocate.py",
+            "-i",
+            str(out / "aggregate.json"),
+            "-I",
+            str(SAMPLES),
+            "-o",
+            str(out / "sku_week.json"),
+            "--round",
+            "int",
+            *common,
+        ]
+    )
+    pipeline.run_script(
+        [
+            "scripts/mrp.py",
+            "-i",
+            str(out / "sku_week.json"),
+            "-I",
+            str(SAMPLES),
+            "-o",
+            str(out / "mrp.json"),
+            *common,
+        ]
+    )
+    pipeline.run_script(
+        [
+            "scripts/reconcile.py",
+            "-i",
+            str(out / "sku_week.json"),
+            str(out / "mrp.json"),
+            "-I",
+            str(SAMPLES),
+            "-o",
+            str(out / "plan_final.json"),
+            *common,
+        ]
+    )
+    pipeline.run_script(
+        [
+            "scripts/report.py",
+            "-i",
+            str(out / "plan_final.json"),
+            "-I",
+            str(SAMPLES),
+            "-o",
+            str(out / "report.csv"),
+            *common,
+        ]
+    )
+
+
+@pytest.mark.slow
+def test_in_process_matches_subprocess(tmp_path: Path):
+    a, b = tmp_path / "inproc", tmp_path / "subproc"
+    a.mkdir()
+    b.mkdir()
+    _run_core(PlanningPipeline(in_process=True), a)
+    _run_core(PlanningPipeline(in_process=False), b)
+    for name in ("aggregate.json", "sku_week.json", "mrp.json", "plan_final.json"):
+        assert json.loads((a / name).read_text(encoding="utf-8")) == json.loads(
+            (b / name).read_text(encoding="utf-8")
+        ), name
+    assert (a / "report.csv").read_text(encoding="utf-8") == (
+        b / "report.csv"
+    ).read_text(encoding="utf-8")
+
+
+def test_payloads_flow_through_store(tmp_path: Path):
+    # 各ステージの出力は store に残り、後続ステージはそこから受け取る
+    pipeline = PlanningPipeline(in_process=True)
+    _run_core(pipeline, tmp_path)
+    final = pipeline.payload(tmp_path / "plan_final.json")
+    assert final["rows"]
+    assert json.loads((tmp_path / "plan_final.json").read_text(encoding="utf-8")) == (
+        final
+    )
+    assert [stage for stage, _ in pipeline.timings] == [
+        "plan_aggregate",
+        "allocate",
+        "mrp",
+        "reconcile",
+        "report",
+    ]
+
+    # ファイルを消しても store から読める（ステージ間でファイルを読み直さない）
+    for name in ("aggregate.json", "sku_week.json"):
+        (tmp_path / name).unlink()
+    detail = pipeline.run_script(
+        [
+            "scripts/reconcile_levels.py",
+            "-i",
+            str(tmp_path / "aggregate.json"),
+            str(tmp_path / "sku_week.json"),
+            "-o",
+            str(tmp_path / "reconciliation_log.json"),
+            "--storage",
+            "files",
+        ]
+    )
+    assert detail["deltas"]
+    assert pipeline.load_json(tmp_path / "reconciliation_log.json") is detail
+    assert pipeline.load_json(tmp_path / "missing.json") is None
+
+
+def test_stage_errors_are_reported_as_called_process_errors(tmp_path: Path):
+    pipeline = PlanningPipeline(in_process=True)
+    with pytest.raises(PipelineStageError) as exc_info:
+        pipeline.run_script(
+            [
+                "scripts/allocate.py",
+                "-i",
+                str(tmp_path / "nope.json"),
+                "-o",
+                str(tmp_path / "out.json"),
+            ]
+        )
+    err = exc_info.value
+    assert err.stage == "allocate"
+    assert err.returncode == 1
+    assert "FileNotFoundError" in err.stderr
+
+    with pytest.raises(PipelineStageError) as exc_info:
+        pipeline.run_stage("mrp", ["--bogus"])
+    assert exc_info.value.returncode == 2
+
+    with pytest.raises(ValueError):
+        stage_name("scripts/not_a_stage.py")
+
+
+def test_env_and_cwd_require_subprocess(tmp_path: Path):
+    # プロセス内実行では env/cwd を反映できないため、黙って無視せず拒否する
+    with pytest.raises(ValueError):
+        PlanningPipeline(in_process=True, env={"PLAN_STORAGE_MODE": "files"})
+    with pytest.raises(ValueError):
+        PlanningPipeline(in_process=True, cwd=tmp_path)
+    assert PlanningPipeline(env=dict(os.environ)).in_process is False
+    assert PlanningPipeline(cwd=tmp_path, in_process=False).in_process is False
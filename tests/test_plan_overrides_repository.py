@@ -7,8 +7,8 @@ from app.plans_api import (
     _get_weights,
     _psi_overlay_key_agg,
     _save_weights,
-    _save_locks,
-    _save_overlay,
+    _PsiOverlayStore,
+    _overlay_entry_key,
     get_plan_psi_events,
     get_plan_psi_weights,
     get_plan_psi_audit,
@@ -24,6 +24,18 @@ from app.metrics import (
 from core.plan_repository_views import fetch_override_events
 
 
+def _seed_overlay(version_id, data, *, actor, note=None, locks=()):
+    """PATCH /psi と同じ経路（_PsiOverlayStore）でオーバレイ・ロックを保存する。"""
+    store = _PsiOverlayStore(version_id)
+    for level in ("aggregate", "det"):
+        for entry in data.get(level) or []:
+            store.set_payload(level, _overlay_entry_key(level, entry), dict(entry))
+    for key_hash in locks:
+        store.set_locked(key_hash, True)
+    store.flush(actor=actor, note=note)
+    store.write_mirror()
+
+
 def test_overlay_and_lock_persisted_via_repository(db_setup):
     version_id = "plan-overrides-001"
     db.create_plan_version(version_id, status="active")
@@ -43,7 +55,7 @@ def test_overlay_and_lock_persisted_via_repository(db_setup):
 
     actor = "test_user"
     note = "manual adjustment"
-    _save_overlay(version_id, overlay_data, actor=actor, note=note)
+    _seed_overlay(version_id, overlay_data, actor=actor, note=note)
 
     repo = PlanRepository(
         db._conn,
@@ -69,7 +81,7 @@ def test_overlay_and_lock_persisted_via_repository(db_setup):
     assert overlay["aggregate"][0]["period"] == "2025-01"
 
     lock_key = _psi_overlay_key_agg("2025-01", "F1")
-    _save_locks(version_id, {lock_key}, actor=actor, note=note)
+    _seed_overlay(version_id, {}, actor=actor, note=note, locks=[lock_key])
     locks = _get_locks(version_id)
     assert lock_key in locks
 
@@ -180,3 +192,75 @@ def test_weights_persisted_via_repository(db_setup):
         conn.commit()
     finally:
         conn.close()
+
+
+def test_patch_psi_writes_only_edited_overrides(db_setup, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    version_id = "plan-overrides-patch"
+    db.create_plan_version(version_id, status="active")
+    det_rows = [
+        {"week": f"2025-W0{w}", "sku": f"S{s}", "family": "F1", "demand": 10.0}
+        for s in range(3)
+        for w in range(1, 5)
+    ]
+    db.upsert_plan_artifact(version_id, "sku_week.json", json.dumps({"rows": det_rows}))
+    db.upsert_plan_artifact(
+        version_id,
+        "aggregate.json",
+        json.dumps({"rows": [{"period": "2025-01", "family": "F1", "demand": 120.0}]}),
+    )
+    _seed_overlay(
+        version_id,
+        {"aggregate": [], "det": [{**r, "demand": 11.0} for r in det_rows[1:]]},
+        actor="seed",
+    )
+    repo = PlanRepository(db._conn)
+    before = {r["key_hash"]: r for r in repo.fetch_plan_overrides(version_id)}
+    events_before = len(repo.fetch_plan_override_events(version_id))
+
+    reads = []
+    original = PlanRepository.fetch_plan_overrides
+
+    def _spy(self, *args, **kwargs):
+        reads.append(bool(kwargs.get("key_hashes") or kwargs.get("locked")))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PlanRepository, "fetch_plan_overrides", _spy)
+    client = TestClient(app)
+    resp = client.patch(
+        f"/plans/{version_id}/psi",
+        json={
+            "level": "det",
+            "edits": [
+                {"key": {"week": "2025-W01", "sku": "S0"}, "fields": {"demand": 30.0}}
+            ],
+            "lock": "lock",
+        },
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["locked"] == ["det:week=2025-W01,sku=S0"]
+    # 処理中はロック行と編集に関わるキーだけを読み、全件はミラーの書込みで読む
+    assert reads[-2:] == [False, False]
+    assert all(reads[:-2])
+
+    after = {r["key_hash"]: r for r in repo.fetch_plan_overrides(version_id)}
+    changed = {k for k, r in after.items() if before.get(k) != r}
+    assert changed == {"det:week=2025-W01,sku=S0", "agg:period=2025-01,family=F1"}
+    events = repo.fetch_plan_override_events(version_id)
+    assert sorted(e["event_type"] for e in events[: len(events) - events_before]) == [
+        "edit",
+        "edit",
+        "lock",
+    ]
+    agg = json.loads(after["agg:period=2025-01,family=F1"]["payload_json"])
+    assert agg["demand"] == 30.0 + 11 * 11.0
+
+    # 成果物のミラーはレスポンス後に書かれる
+    mirror = db.get_plan_artifact(version_id, "psi_overrides.json")
+    assert {"week": "2025-W01", "sku": "S0", "demand": 30.0} in mirror["det"]
+    assert db.get_plan_artifact(version_id, "psi_locks.json") == {
+        "locks": ["det:week=2025-W01,sku=S0"]
+    }
@@ -0,0 +1,116 @@
+import json
+
+from app import db
+from app.plans_api import (
+    _PsiOverlayStore,
+    _apply_overlay,
+    _get_overlay,
+    _overlay_entry_key,
+    get_plan_psi,
+)
+from core.plan_repository import PlanRepository
+from core.plan_repository_views import fetch_detail_rows
+
+
+def _series(version_id: str):
+    for sku in range(12):
+        for week in range(1, 5):
+            key = f"2025-W{week:02d}"
+            yield {
+                "level": "det",
+                "time_bucket_type": "week",
+                "time_bucket_key": key,
+                "item_key": f"SKU{sku:02d}",
+                "location_key": "global",
+                "demand": float(sku * 10 + week),
+                "supply": 5.0,
+                "extra_json": json.dumps(
+                    {"family": f"F{sku % 3}", "period": "2025-01"}
+                ),
+            }
+            if sku % 4 == 0:
+                yield {
+                    "level": "mrp_final",
+                    "time_bucket_type": "week",
+                    "time_bucket_key": key,
+                    "item_key": f"SKU{sku:02d}",
+                    "location_key": "global",
+                    "demand": float(sku * 10 + week),
+                    "supply": 7.0,
+                    "inventory_open": 1.0,
+                    "inventory_close": 2.0,
+                }
+
+
+def _psi(version_id, *, q=None, limit=200, offset=0, item=None, bucket=None):
+    return get_plan_psi(version_id, "det", q, limit, offset, item, bucket)
+
+
+def test_psi_pages_filters_and_overlays_in_repository(db_setup):
+    version_id = "psi-page-001"
+    db.create_plan_version(version_id, status="active")
+    repo = PlanRepository(db._conn)
+    repo.write_plan(version_id, series=_series(version_id))
+    store = _PsiOverlayStore(version_id)
+    for entry in (
+        {"week": "2025-W02", "sku": "SKU04", "demand": 999.0},
+        {"week": "2025-W04", "sku": "SKU11", "demand": 111.0},
+    ):
+        store.set_payload("det", _overlay_entry_key("det", entry), entry)
+    store.flush(actor="tester")
+
+    # 従来の経路（全行にオーバレイを重ねてから切り出す）と同じページを返す
+    full = _apply_overlay(
+        "det", fetch_detail_rows(repo, version_id), _get_overlay(version_id)["det"]
+    )
+    full.sort(key=lambda r: (r["week"], r["sku"]))
+    for offset in (0, 10, 40):
+        page = _psi(version_id, limit=10, offset=offset)
+        assert page["total"] == 48
+        assert page["rows"] == full[offset : offset + 10]
+    assert _psi(version_id, offset=100)["rows"] == []
+
+    filtered = _psi(version_id, item=["SKU04", "SKU11"], bucket=["2025-W02"])
+    assert filtered["total"] == 2
+    assert [(r["sku"], r["demand"], r["supply_plan"]) for r in filtered["rows"]] == [
+        ("SKU04", 999.0, 7.0),
+        ("SKU11", 112.0, 5.0),
+    ]
+    # 検索は extra_json（family）にも当たり、大文字小文字を区別しない
+    searched = _psi(version_id, q="f1", limit=5)
+    assert searched["total"] == 16
+    assert {r["family"] for r in searched["rows"]} == {"F1"}
+    assert _psi(version_id, q="sku07")["total"] == 4
+    assert _psi(version_id, q="%")["total"] == 0
+    # オーバーライドした値にも当たるが、基準行の数量（SKU04/W03 の 43.0）には当たらない
+    searched = _psi(version_id, q="999")
+    assert [(r["sku"], r["week"], r["demand"]) for r in searched["rows"]] == [
+        ("SKU04", "2025-W02", 999.0)
+    ]
+    assert _psi(version_id, q="999", item=["SKU05"])["total"] == 0
+    assert _psi(version_id, q="43")["total"] == 0
+
+    # plan_series に該当行はあるが絞込みで0件のときは成果物へフォールバックしない
+    db.upsert_plan_artifact(
+        version_id,
+        "sku_week.json",
+        json.dumps({"rows": [{"week": "2025-W01", "sku": "ZZZ"}]}),
+    )
+    assert _psi(version_id, q="zzz")["total"] == 0
+
+
+def test_psi_falls_back_to_artifacts_without_series(db_setup):
+    version_id = "psi-page-002"
+    db.create_plan_version(version_id, status="active")
+    rows = [
+        {"week": f"2025-W0{w}", "sku": f"S{s}", "demand": s * w}
+        for s in range(3)
+        for w in range(1, 3)
+    ]
+    db.upsert_plan_artifact(version_id, "sku_week.json", json.dumps({"rows": rows}))
+    page = _psi(version_id, limit=2, offset=1, item=["S1", "S2"])
+    assert page["total"] == 4
+    assert [(r["sku"], r["week"]) for r in page["rows"]] == [
+        ("S1", "2025-W02"),
+        ("S2", "2025-W01"),
+    ]
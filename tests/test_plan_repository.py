@@ -4,6 +4,7 @@ import time
 
 import logging
 
+import pytest
 
 from app import db
 from core.plan_repository import PlanRepository
@@ -313,3 +314,147 @@ def test_plan_repository_capacity_guard_alert(monkeypatch, db_setup, caplog):
         and "plan_repository_capacity_trim_alert" in r.getMessage()
         for r in caplog.records
     )
+
+
+class _DummyLabeledGauge:
+    def __init__(self) -> None:
+        self.values: dict[str, float] = {}
+
+    def labels(self, **labels):
+        gauge = self
+
+        class _Handle:
+            def set(self, value: float):
+                gauge.values[labels["storage_mode"]] = value
+
+        return _Handle()
+
+
+def _series_indexes() -> list[str]:
+    with db._conn() as conn:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND tbl_name='plan_series' AND sql IS NOT NULL ORDER BY name"
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _det_rows(version_id: str, n: int, *, fail_at: int | None = None):
+    for i in range(n):
+        if fail_at is not None and i == fail_at:
+            raise RuntimeError("generator failed")
+        yield {
+            "version_id": version_id,
+            "level": "det",
+            "time_bucket_type": "week",
+            "time_bucket_key": f"2025-W{i % 4 + 1:02d}",
+            "item_key": f"SKU{i // 4:03d}",
+            "location_key": "global",
+            "demand": float(i),
+        }
+
+
+def test_bulk_write_streams_chunks_and_rebuilds_indexes(db_setup, monkeypatch, caplog):
+    monkeypatch.setattr("core.plan_repository._SERIES_INSERT_CHUNK", 7)
+    monkeypatch.setenv("PLANS_DB_BULK_INDEX_ROWS", "10")
+    throughput = _DummyLabeledGauge()
+    repo = PlanRepository(db._conn, plan_db_write_rows_per_second=throughput)
+    indexes = _series_indexes()
+    assert indexes
+    db.create_plan_version("bulk-1", status="active")
+    caplog.set_level(logging.INFO)
+
+    repo.write_plan("bulk-1", series=_det_rows("bulk-1", 50), storage_mode="db")
+    rows = repo.fetch_plan_series("bulk-1", "det")
+    assert len(rows) == 50
+    assert sum(r["demand"] for r in rows) == sum(range(50))
+    assert _series_indexes() == indexes
+    assert throughput.values["db"] > 0
+    assert any("plan_repository_bulk_load" in r.getMessage() for r in caplog.records)
+
+    # 失敗時はロールバックで行もインデックスも元に戻る
+    with pytest.raises(RuntimeError):
+        repo.write_plan("bulk-1", series=_det_rows("bulk-1", 50, fail_at=30))
+    assert len(repo.fetch_plan_series("bulk-1", "det")) == 50
+    assert _series_indexes() == indexes
+
+    # replace_plan_series_level も同じ経路（level 未指定の行は補う）
+    repo.replace_plan_series_level(
+        "bulk-1",
+        "mrp",
+        ({**r, "level": None} for r in _det_rows("bulk-1", 20)),
+    )
+    assert len(repo.fetch_plan_series("bulk-1", "mrp")) == 20
+    assert len(repo.fetch_plan_series("bulk-1", "det")) == 50
+    assert _series_indexes() == indexes
+
+
+def test_bulk_write_keeps_indexes_when_table_is_much_larger(db_setup, monkeypatch):
+    monkeypatch.setattr("core.plan_repository._SERIES_INSERT_CHUNK", 5)
+    repo = PlanRepository(db._conn)
+    db.create_plan_version("big", status="active")
+    db.create_plan_version("small", status="active")
+    repo.write_plan("big", series=_det_rows("big", 200))
+
+    monkeypatch.setenv("PLANS_DB_BULK_INDEX_ROWS", "5")
+    dropped = []
+    original = PlanRepository._drop_series_indexes
+
+    def _spy(self, conn, loading):
+        result = original(self, conn, loading)
+        dropped.append(result)
+        return result
+
+    monkeypatch.setattr(PlanRepository, "_drop_series_indexes", _spy)
+    repo.write_plan("small", series=_det_rows("small", 20))
+    assert dropped == [[]]
+    assert len(repo.fetch_plan_series("small", "det")) == 20
+
+
+def test_replace_level_writes_only_changed_rows(db_setup, monkeypatch):
+    monkeypatch.setattr("core.plan_repository._SERIES_INSERT_CHUNK", 3)
+    repo = PlanRepository(db._conn)
+    db.create_plan_version("delta-1", status="active")
+    base = list(_det_rows("delta-1", 8))
+    assert repo.replace_plan_series_level("delta-1", "det", base) == {
+        "inserted": 8,
+        "updated": 0,
+        "deleted": 0,
+        "unchanged": 0,
+    }
+    before = {
+        (r["item_key"], r["time_bucket_key"]): r
+        for r in repo.fetch_plan_series("delta-1", "det")
+    }
+    assert all("content_hash" not in r for r in before.values())
+
+    # 1行変更・1行削除・1行追加、updated_at だけが違う行は変更なしとみなす
+    rows = [{**r, "updated_at": 1} for r in base[:6]]
+    rows[2] = {**rows[2], "demand": 99.0}
+    rows.append({**base[7], "time_bucket_key": "2025-W05"})
+    rows.append(base[6])
+    diff = repo.replace_plan_series_level("delta-1", "det", rows)
+    assert diff == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 6}
+
+    after = {
+        (r["item_key"], r["time_bucket_key"]): r
+        for r in repo.fetch_plan_series("delta-1", "det")
+    }
+    assert len(after) == 8
+    assert ("SKU001", "2025-W04") not in after
+    assert after[("SKU001", "2025-W05")]["demand"] == 7.0
+    assert after[("SKU000", "2025-W03")]["demand"] == 99.0
+    assert (
+        after[("SKU000", "2025-W03")]["created_at"]
+        == before[("SKU000", "2025-W03")]["created_at"]
+    )
+    assert after[("SKU000", "2025-W01")] == before[("SKU000", "2025-W01")]
+
+    # 移行前の行（content_hash が NULL）は変更ありとして書き換える
+    with db._conn() as conn:
+        conn.execute("UPDATE plan_series SET content_hash=NULL WHERE item_key='SKU000'")
+    diff = repo.replace_plan_series_level(
+        "delta-1", "det", rows[:4], item_keys=["SKU000"]
+    )
+    assert diff == {"inserted": 0, "updated": 4, "deleted": 0, "unchanged": 0}
+    assert len(repo.fetch_plan_series("delta-1", "det")) == 8
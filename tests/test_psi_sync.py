@@ -190,3 +190,92 @@ def test_aggregate_edit_distributes_to_detail(plan_client):
     assert sum_supply == pytest.approx(new_supply, rel=1e-6, abs=1e-6)
     assert sum_backlog == pytest.approx(new_backlog, rel=1e-6, abs=1e-6)
     assert overlay.get("det") or [], "detail overlay should be populated"
+
+
+def test_detail_edit_recalculates_mrp_for_changed_items(
+    plan_client, tmp_path, monkeypatch
+):
+    client, version, db_mod, plans_api_mod = plan_client
+    version = f"{version}-mrp"
+    res = client.post(
+        "/plans/create_and_execute",
+        json={
+            "version_id": version,
+            "config_version_id": 100,
+            "weeks": 4,
+            "round_mode": "int",
+            "lt_unit": "day",
+            "lightweight": False,
+            "out_dir": str(tmp_path / "plan"),
+        },
+        timeout=120,
+    )
+    assert res.status_code == 200, res.text
+    det_rows = _load_rows(db_mod, version, "sku_week.json")
+    target = next(r for r in det_rows if r.get("sku") and r.get("week"))
+    before = _load_rows(db_mod, version, "mrp.json")
+
+    resp = client.patch(
+        f"/plans/{version}/psi",
+        json={
+            "level": "det",
+            "recalc_mrp": True,
+            # 再計算は基準の MRP を作った設定（lt_unit=day）に揃い、これは無視される
+            "lt_unit": "week",
+            "edits": [
+                {
+                    "key": {"week": target["week"], "sku": target["sku"]},
+                    "fields": {"demand": float(target.get("demand") or 0.0) + 11.0},
+                }
+            ],
+        },
+    )
+    assert resp.status_code == 200, resp.text
+    mrp = resp.json()["mrp"]
+    assert mrp["changed"] == [str(target["sku"])]
+    assert str(target["sku"]) in mrp["items"]
+
+    # 再計算した品目の行だけが mrp.json 成果物で置き換わる
+    after = _load_rows(db_mod, version, "mrp.json")
+    assert len(after) == len(before)
+    assert [r for r in after if r["item"] not in mrp["items"]] == [
+        r for r in before if r["item"] not in mrp["items"]
+    ]
+    row = next(
+        r
+        for r in after
+        if r["item"] == str(target["sku"]) and r["week"] == str(target["week"])
+    )
+    assert row["gross_req"] >= float(target.get("demand") or 0.0) + 11.0
+    assert row["lt_weeks"] == next(
+        r["lt_weeks"] for r in before if r["item"] == str(target["sku"])
+    )
+
+    # 再計算が失敗しても編集は保存済みなので 200 で返し、失敗は mrp.error で伝える
+    from scripts import mrp as mrp_stage
+    from scripts.plan_pipeline_io import StageError
+
+    def _fail(*_args, **_kwargs):
+        raise StageError("boom")
+
+    monkeypatch.setattr(mrp_stage, "run", _fail)
+    resp = client.patch(
+        f"/plans/{version}/psi",
+        json={
+            "level": "det",
+            "recalc_mrp": True,
+            "edits": [
+                {
+                    "key": {"week": target["week"], "sku": target["sku"]},
+                    "fields": {"demand": 3.0},
+                }
+            ],
+        },
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["updated"] == 1
+    assert "boom" in resp.json()["mrp"]["stderr"]
+    key = plans_api_mod._psi_overlay_key_det(target["week"], target["sku"])
+    saved = plans_api_mod._PsiOverlayStore(version).payloads("det", key_hashes=[key])
+    assert saved and saved[0]["demand"] == 3.0
+    assert _load_rows(db_mod, version, "mrp.json") == after
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app import db as appdb
+from app.run_payload_codec import blob_codec, decode_field, encode_field
+from app.run_registry_db import RunRegistryDB
+from engine.compiled import create_simulator
+from engine.cost_trace import trace_records
+from scripts.backfill_run_payloads import run_backfill
+from scripts.bench_simulator import build_network
+
+
+def _sim_payload():
+    sim = create_simulator(build_network(stores=3, items=2, days=8, seed=2))
+    results, daily_pl = sim.run()
+    return {
+        "summary": sim.compute_summary(),
+        "results": results,
+        "daily_profit_loss": daily_pl,
+        "cost_trace": sim.cost_trace,
+    }
+
+
+@pytest.mark.parametrize("codec", ["json", "zjson", "columnar"])
+def test_codec_round_trip(codec):
+    payload = _sim_payload()
+    for field in ("results", "daily_profit_loss", "cost_trace"):
+        raw = encode_field(field, payload[field], codec)
+        assert blob_codec(raw) == codec
+        assert decode_field(raw) == payload[field]
+    if codec != "json":
+        raw_json = encode_field("results", payload["results"], "json")
+        assert len(encode_field("results", payload["results"], codec)) < len(raw_json)
+
+
+def test_columnar_codec_falls_back_for_irregular_rows():
+    rows = [{"a": 1}, {"b": 2, "a": None}]
+    assert decode_field(encode_field("cost_trace", rows, "columnar")) == rows
+    cols = {"format": "columnar", "columns": {"day": [0]}}
+    assert decode_field(encode_field("results", cols, "columnar")) == cols
+    # 未知の codec は拒否し、旧来の TEXT はそのまま読める
+    with pytest.raises(ValueError):
+        encode_field("results", [], "parquet")
+    assert decode_field('[{"day": 0}]') == [{"day": 0}]
+    assert decode_field(None, []) == []
+
+
+def test_registry_db_stores_blobs_and_backfills(db_setup, monkeypatch):
+    payload = _sim_payload()
+    reg = RunRegistryDB()
+    reg.put("r-col", {**payload, "payload_codec": "columnar"})
+    monkeypatch.setenv("RUNS_PAYLOAD_CODEC", "zjson")
+    reg.put("r-z", payload)
+    # 旧形式（JSON TEXT, payload_format NULL）の行
+    with appdb._conn() as c:
+        c.execute(
+            "INSERT INTO runs(run_id, started_at, duration_ms, schema_version, summary,"
+            " results, daily_profit_loss, cost_trace, created_at, updated_at)"
+            " VALUES(?,?,?,?,?,?,?,?,?,?)",
+            (
+                "r-legacy",
+                1,
+                0,
+                "1.0",
+                json.dumps(payload["summary"]),
+                json.dumps(payload["results"]),
+                json.dumps(payload["daily_profit_loss"]),
+                json.dumps(trace_records(payload["cost_trace"])),
+                1,
+                1,
+            ),
+        )
+    for run_id in ("r-col", "r-z", "r-legacy"):
+        rec = reg.get(run_id)
+        assert rec["results"] == payload["results"]
+        assert rec["cost_trace"] == payload["cost_trace"]
+
+    from app.trace_export_api import _get_rec
+
+    assert _get_rec("r-col")["daily_profit_loss"] == payload["daily_profit_loss"]
+
+    counts = run_backfill("zjson", batch_size=1, dry_run=True)
+    assert counts.converted == 1
+    counts = run_backfill("zjson", batch_size=1)
+    assert counts.converted == 1 and counts.bytes_after < counts.bytes_before
+    with appdb._conn() as c:
+        formats = dict(c.execute("SELECT run_id, payload_format FROM runs").fetchall())
+    assert formats == {"r-col": "columnar", "r-z": "zjson", "r-legacy": "zjson"}
+    assert reg.get("r-legacy")["results"] == payload["results"]
+    assert run_backfill("zjson", include_all=True).converted == 1
@@ -0,0 +1,67 @@
+import importlib
+
+from fastapi.testclient import TestClient
+
+from app import db as appdb
+from app import run_registry as run_registry_module
+from app.api import app
+from app.run_registry import RUN_META_FIELDS, RunRegistry
+from app.run_registry_db import RunRegistryDB
+
+importlib.import_module("app.run_compare_api")
+importlib.import_module("app.ui_compare")
+
+
+def _payload(run_id, fill_rate, scenario_id=1):
+    return {
+        "run_id": run_id,
+        "started_at": 1000 + int(fill_rate * 100),
+        "duration_ms": 5,
+        "summary": {"fill_rate": fill_rate, "profit_total": 10.0},
+        "results": [{"day": 0, "nodes": {}}],
+        "daily_profit_loss": [{"day": 1}],
+        "cost_trace": [{"day": 1, "event": "x"}],
+        "scenario_id": scenario_id,
+    }
+
+
+def test_memory_registry_projection():
+    reg = RunRegistry()
+    reg.put("a", _payload("a", 0.5))
+    assert reg.get("a", fields=("summary",)) == {
+        "run_id": "a",
+        "summary": {"fill_rate": 0.5, "profit_total": 10.0},
+    }
+    assert reg.get("missing", fields=("summary",)) == {}
+    rows = reg.list(fields=RUN_META_FIELDS)
+    assert "results" not in rows[0] and rows[0]["scenario_id"] == 1
+    assert reg.get("a")["cost_trace"] == [{"day": 1, "event": "x"}]
+
+
+def test_db_projection_skips_payload_columns(db_setup, monkeypatch):
+    reg = RunRegistryDB()
+    reg.put("a", _payload("a", 0.5))
+    reg.put("b", _payload("b", 0.8, scenario_id=2))
+    # 日次データ列を壊しても、summary だけの射影・比較は読める
+    with appdb._conn() as c:
+        c.execute("UPDATE runs SET results=?, cost_trace=?", (b"SCRP\x01\x01bad", "{"))
+    assert reg.get("a", fields=("summary", "scenario_id")) == {
+        "run_id": "a",
+        "summary": {"fill_rate": 0.5, "profit_total": 10.0},
+        "scenario_id": 1,
+    }
+    assert reg.get("zzz", fields=("summary",)) == {}
+    assert [r["run_id"] for r in reg.list(fields=RUN_META_FIELDS)] == ["b", "a"]
+
+    monkeypatch.setattr(run_registry_module, "REGISTRY", reg)
+    monkeypatch.setattr(run_registry_module, "_BACKEND", "db")
+    client = TestClient(app)
+    r = client.post("/compare", json={"run_ids": ["a", "b"]})
+    assert r.status_code == 200
+    assert r.json()["diffs"][0]["fill_rate"]["abs"] == 0.8 - 0.5
+    r = client.get("/runs", params={"scenario_id": 2})
+    assert [x["run_id"] for x in r.json()["runs"]] == ["b"]
+    assert client.get("/runs/a").json()["summary"]["fill_rate"] == 0.5
+    r = client.get("/ui/compare/metrics.csv", params={"run_ids": "a,b"})
+    assert r.status_code == 200
+    assert client.post("/compare", json={"run_ids": ["a", "nope"]}).status_code == 404
@@ -0,0 +1,113 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db as appdb
+from app import run_registry as run_registry_module
+from app.api import app
+from app.run_registry_db import RunRegistryDB, decode_cursor, encode_cursor
+
+importlib.import_module("app.run_compare_api")
+
+
+class _NoGetRegistry(RunRegistryDB):
+    def get(self, run_id, fields=None):  # 一覧はページ取得だけで完結すること
+        raise AssertionError("list_runs must not fetch runs one by one")
+
+
+@pytest.fixture
+def client(db_setup, monkeypatch):
+    reg = _NoGetRegistry()
+    for i in range(12):
+        summary = {"fill_rate": i / 10}
+        if i == 3:
+            summary["_input_set_label"] = "from-summary"
+        reg.put(
+            f"run-{i:02d}",
+            {
+                "started_at": 1000 + i * 10 - (i % 2),
+                "summary": summary,
+                "config_id": 7 if i % 3 == 0 else 8,
+                "config_version_id": 70 + i % 2,
+                "scenario_id": i % 4,
+                "plan_version_id": "pv-a" if i < 6 else "pv-b",
+                "input_set_label": "set-x" if i in (1, 5) else None,
+            },
+        )
+    monkeypatch.setattr(run_registry_module, "REGISTRY", reg)
+    monkeypatch.setattr(run_registry_module, "_BACKEND", "db")
+    return TestClient(app)
+
+
+def _ids(resp):
+    return [r["run_id"] for r in resp.json()["runs"]]
+
+
+def test_filters_are_pushed_down(client):
+    r = client.get("/runs", params={"scenario_id": 1, "config_id": 8})
+    assert _ids(r) == ["run-05", "run-01"]
+    assert r.json()["total"] == 2
+    r = client.get("/runs", params={"plan_version_id": "pv-b", "config_version_id": 71})
+    assert _ids(r) == ["run-11", "run-09", "run-07"]
+    r = client.get("/runs", params={"input_set_label": "set-x"})
+    assert _ids(r) == ["run-05", "run-01"]
+    r = client.get("/runs", params={"input_set_label": "from-summary"})
+    assert _ids(r) == ["run-03"]
+    assert r.json()["runs"][0]["input_set_label"] == "from-summary"
+    r = client.get("/runs", params={"detail": True, "scenario_id": 2, "limit": 1})
+    assert _ids(r) == ["run-10"] and r.json()["total"] == 3
+    assert "results" in r.json()["runs"][0]
+
+
+def test_empty_pages_keep_response_shape(client):
+    keys = {"runs", "total", "offset", "limit", "next_cursor"}
+    r = client.get("/runs", params={"scenario_name": "no-such-scenario"})
+    assert set(r.json()) == keys and r.json()["next_cursor"] is None
+    page = run_registry_module.REGISTRY.list_page(0, 10, scenario_ids=[])
+    assert set(page) == keys and page["next_cursor"] is None
+
+
+def test_cursor_pagination_walks_all_runs(client):
+    seen = []
+    cursor = None
+    for _ in range(10):
+        params = {"limit": 5, "order": "asc", "config_id": 8}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/runs", params=params).json()
+        assert body["total"] == 8
+        seen.extend(r["run_id"] for r in body["runs"])
+        cursor = body.get("next_cursor")
+        if not cursor:
+            break
+    expected = client.get("/runs", params={"order": "asc", "config_id": 8})
+    assert seen == _ids(expected)
+    assert len(seen) == 8
+    assert client.get("/runs", params={"cursor": "!!"}).status_code == 400
+
+
+def test_cursor_round_trip_and_index_usage(db_setup):
+    assert decode_cursor(encode_cursor(123, "r1")) == (123, "r1")
+    assert decode_cursor(encode_cursor("1.0", "r1"), "schema_version") == ("1.0", "r1")
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("x", "r1"), "started_at")
+    with appdb._conn() as c:
+        plan = c.execute(
+            "EXPLAIN QUERY PLAN SELECT run_id FROM runs WHERE scenario_id = ?"
+            " AND (started_at, run_id) < (?, ?) ORDER BY started_at DESC, run_id DESC"
+            " LIMIT 10",
+            (1, 0, ""),
+        ).fetchall()
+    detail = " ".join(str(row["detail"]) for row in plan)
+    assert "ix_runs_scenario_started" in detail
+    assert "TEMP B-TREE" not in detail
+    with appdb._conn() as c:
+        plan = c.execute(
+            "EXPLAIN QUERY PLAN SELECT run_id FROM runs WHERE input_set_label = ?"
+            " ORDER BY started_at DESC, run_id DESC LIMIT 10",
+            ("set-x",),
+        ).fetchall()
+    detail = " ".join(str(row["detail"]) for row in plan)
+    assert "ix_runs_input_set_label_started" in detail
+    assert "TEMP B-TREE" not in detail
@@ -60,3 +60,28 @@ def test_store_sales_record_sgna_cost():
     assert total_sgna_cost == pytest.approx(4 * 10.0 * 12.5)
 
     assert any(evt.get("account") == "sgna" for evt in sim.cost_trace)
+
+
+def test_daily_pl_uses_precomputed_cost_model():
+    from engine.simulator import _parse_event_key
+    from scripts.bench_simulator import build_network
+
+    assert _parse_event_key("S1_P_1") == ("pair", "S1", "P_1")
+    assert _parse_event_key("transport:W1->S1:P1") == ("transport", "W1", "S1", "P1")
+    assert _parse_event_key("transport_overage:W1->S1") == (
+        "transport_overage",
+        "W1",
+        "S1",
+    )
+    assert _parse_event_key("storage_overage:W1") == ("storage_overage", "W1")
+    assert _parse_event_key("transport:W1") == ("",)
+    assert _parse_event_key("nounderscore") == ("",)
+
+    sim = SupplyChainSimulator(build_network(stores=3, items=2, days=10, seed=1))
+    ttypes = {entry[0] for entry in sim._link_costs.values()}
+    assert ttypes == {"material_transport", "warehouse_transport", "store_transport"}
+    sim.run()
+    # キーの分解は初出時だけ（日をまたいでキャッシュを使う）
+    assert sim._event_keys
+    assert all(isinstance(v, tuple) for v in sim._event_keys.values())
+    sim.assert_pl_equals_trace_totals()
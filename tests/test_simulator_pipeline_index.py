@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+import pytest
+
+from engine.compiled import create_simulator
+from scripts.bench_simulator import build_network
+
+
+def _scan_production(sim, after_day):
+    totals = defaultdict(float)
+    for d, orders in sim.production_orders.items():
+        if d > after_day:
+            for item, qty, factory in orders:
+                totals[(factory, item)] += qty
+    return totals
+
+
+def _scan_backorders(sim, after_day):
+    totals = defaultdict(float)
+    for d, recs in sim.pending_shipments.items():
+        if d > after_day:
+            for item, qty, supplier, _dest, is_bo in recs:
+                if is_bo:
+                    totals[(supplier, item)] += qty
+    return totals
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+def test_incremental_indexes_match_full_scan(engine):
+    sim_input = build_network(
+        stores=6, warehouses=2, factories=2, items=4, days=40, constrained=True
+    )
+    sim = create_simulator(sim_input, engine=engine)
+    sim.run()
+    last_day = sim_input.planning_horizon - 1
+
+    production = _scan_production(sim, last_day)
+    for key in set(production) | set(sim._production_by_factory_item):
+        assert sim._production_by_factory_item[key] == pytest.approx(production[key])
+
+    backorders = _scan_backorders(sim, last_day)
+    indexed = defaultdict(float)
+    for d, balances in sim._backorders_by_ship_day.items():
+        if d > last_day:
+            for key, qty in balances.items():
+                indexed[key] += qty
+    assert dict(indexed) == pytest.approx(dict(backorders))
@@ -0,0 +1,37 @@
+from engine.simulator import ReplenishmentPolicy, SupplyChainSimulator
+from scripts.bench_simulator import build_network
+
+
+def test_topology_index_matches_network_links():
+    sim = SupplyChainSimulator(build_network(stores=4, warehouses=2, days=5))
+    for link in sim.input.network:
+        assert link.to_node in sim._children_by_parent[link.from_node]
+    assert sim._parent_by_child["ST000"] == "DC00"
+    assert sim._parent_by_child["ST001"] == "DC01"
+    # 材料ノードが扱う部材ごとに工場の調達先を引ける
+    assert sim._material_supplier_by_factory_item[("FAC00", "RM000")] == "MAT00"
+
+
+def test_policy_cache_resolves_lot_rules_once():
+    sim = SupplyChainSimulator(build_network(stores=2, warehouses=1, days=5))
+    policy = sim._policy_cache[("ST000", "FG000")]
+    assert policy.supplier == "DC00"
+    assert policy.lead_time == 2
+    # ノード倍数 5 とリンク倍数 10 の最小公倍数、MOQ は max(10, 10)
+    assert policy.order_multiple == 10
+    assert policy.moq == 10
+    assert policy.round_quantity(3) == 10
+    assert policy.round_quantity(11) == 20
+    # 需要の無い品目（店舗在庫のみ）は対象外
+    assert ("DC00", "FG999") not in sim._policy_cache
+    production = sim._production_policy_cache[("FAC00", "FG000")]
+    assert production.supplier == "FAC00"
+    assert production.lead_time == 3
+
+
+def test_round_quantity_applies_multiples_in_order():
+    policy = ReplenishmentPolicy(
+        supplier="S", z=0.0, lead_time=0, review_period=0, multiples=(4, 2.5)
+    )
+    # 非整数倍数を含む場合は個別に順次切り上げる
+    assert policy.round_quantity(3) == 5
@@ -0,0 +1,57 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine.compiled import create_simulator
+from engine.simulator import SupplyChainSimulator, _standard_normals
+from scripts.bench_simulator import build_network
+
+
+def _run(sim_input, engine="legacy"):
+    sim = create_simulator(sim_input, engine=engine)
+    sim.run()
+    return sim.daily_results, sim.daily_profit_loss
+
+
+def test_standard_normals_match_gauss_sequence():
+    for count in (0, 1, 4, 7):
+        a, b = random.Random(5), random.Random(5)
+        assert _standard_normals(b, count) == [a.gauss() for _ in range(count)]
+        # 余りの1値も引き継がれ、以降の系列も一致する
+        assert a.gauss() == b.gauss()
+
+
+def test_demand_matrix_applies_start_end_mask():
+    sim_input = build_network(stores=6, items=3, days=30, seed=2, constrained=True)
+    sim = SupplyChainSimulator(sim_input)
+    matrix = sim._draw_demand_matrix(sim._new_rng())
+    n_rows = len(sim_input.customer_demand)
+    assert len(matrix) == sim_input.planning_horizon * n_rows
+    windowed = [
+        (r, cd)
+        for r, cd in enumerate(sim_input.customer_demand)
+        if cd.start_day is not None
+    ]
+    assert windowed
+    for r, cd in windowed:
+        for day in range(sim_input.planning_horizon):
+            if day < cd.start_day or (cd.end_day is not None and day > cd.end_day):
+                assert matrix[day * n_rows + r] == 0
+
+
+def test_simulation_does_not_touch_global_random_state():
+    random.seed(123)
+    expected = random.random()
+    random.seed(123)
+    _run(build_network(stores=2, items=2, days=5, seed=1))
+    assert random.random() == expected
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+def test_concurrent_runs_are_deterministic_per_seed(engine):
+    inputs = [build_network(stores=4, items=3, days=20, seed=s) for s in range(4)]
+    serial = [_run(si, engine) for si in inputs]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        concurrent = list(pool.map(lambda si: _run(si, engine), inputs * 2))
+    assert concurrent == serial * 2
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from app.metrics import PLANNING_STAGE_CACHE_TOTAL
+from scripts import allocate, pipeline_cache
+from scripts.pipeline_cache import StageCache, stage_cache_key
+from scripts.pipeline_runner import PlanningPipeline
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLES = ROOT / "samples" / "planning"
+
+
+def _counter(stage: str, result: str) -> float:
+    return PLANNING_STAGE_CACHE_TOTAL.labels(stage=stage, result=result)._value.get()
+
+
+def _run_upstream(pipeline: PlanningPipeline, inputs: Path, out: Path) -> None:
+    pipeline.run_script(
+        [
+            "scripts/plan_aggregate.py",
+            "-i",
+            str(inputs),
+            "-o",
+            str(out / "aggregate.json"),
+            "--storage",
+            "files",
+        ]
+    )
+    pipeline.run_script(
+        [
+            "scripts/allocate.py",
+            "-i",
+            str(out / "aggregate.json"),
+            "-I",
+            str(inputs),
+            "-o",
+            str(out / "sku_week.json"),
+            "--round",
+            "int",
+            "--storage",
+            "files",
+        ]
+    )
+
+
+def test_unchanged_stages_are_reused(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache")
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    _run_upstream(PlanningPipeline(in_process=True, cache=cache), SAMPLES, first)
+    hits = _counter("allocate", "hit")
+
+    # 出力先が変わっても、引数と入力が同じなら計算せずに再利用して書き出す
+    pipeline = PlanningPipeline(in_process=True, cache=cache)
+    _run_upstream(pipeline, SAMPLES, second)
+    assert pipeline.cache_hits == ["plan_aggregate", "allocate"]
+    assert _counter("allocate", "hit") == hits + 1
+    for name in ("aggregate.json", "sku_week.json"):
+        assert json.loads((second / name).read_text(encoding="utf-8")) == json.loads(
+            (first / name).read_text(encoding="utf-8")
+        )
+
+    # パラメータが変わったステージだけ再計算される
+    pipeline = PlanningPipeline(in_process=True, cache=cache)
+    pipeline.run_script(
+        [
+            "scripts/plan_aggregate.py",
+            "-i",
+            str(SAMPLES),
+            "-o",
+            str(second / "aggregate.json"),
+            "--round",
+            "dec1",
+            "--storage",
+            "files",
+        ]
+    )
+    assert pipeline.cache_hits == []
+
+    # キャッシュ無効時は常に計算する
+    pipeline = PlanningPipeline(in_process=True, use_cache=False)
+    _run_upstream(pipeline, SAMPLES, second)
+    assert pipeline.cache is None and pipeline.cache_hits == []
+
+
+def test_key_tracks_input_files(tmp_path: Path):
+    inputs = tmp_path / "inputs"
+    shutil.copytree(SAMPLES, inputs)
+    pipeline = PlanningPipeline(in_process=True, use_cache=False)
+    _run_upstream(pipeline, inputs, tmp_path)
+    args = allocate.build_parser().parse_args(
+        ["-i", str(tmp_path / "aggregate.json"), "-I", str(inputs), "-o", "x"]
+    )
+    key = stage_cache_key("allocate", args, pipeline.store)
+    # ファイルから読んだ上流出力も store 上の payload と同じキーになる
+    assert stage_cache_key("allocate", args) == key
+
+    with open(inputs / "mix_share.csv", "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert stage_cache_key("allocate", args, pipeline.store) != key
+    assert stage_cache_key("export_reconcile_csv", args) is None
+
+
+def test_key_tracks_imported_helpers(tmp_path: Path, monkeypatch):
+    root = tmp_path / "repo"
+    shutil.copytree(
+        ROOT / "scripts", root / "scripts", ignore=shutil.ignore_patterns("__pycache__")
+    )
+    monkeypatch.setattr(pipeline_cache, "REPO_ROOT", root)
+    # allocate → plan_pipeline_io → plan_storage のように推移的な import も辿る
+    modules = pipeline_cache._code_modules("allocate")
+    for rel in (
+        "scripts/plan_interchange.py",
+        "scripts/plan_pipeline_io.py",
+        "scripts/plan_storage.py",
+    ):
+        assert rel in modules
+    (tmp_path / "aggregate.json").write_text('{"rows": []}', encoding="utf-8")
+    args = allocate.build_parser().parse_args(
+        ["-i", str(tmp_path / "aggregate.json"), "-I", str(SAMPLES), "-o", "x"]
+    )
+    key = stage_cache_key("allocate", args)
+    assert key is not None
+    with open(root / "scripts" / "plan_storage.py", "a", encoding="utf-8") as f:
+        f.write("\n# changed\n")
+    assert stage_cache_key("allocate", args) != key
+
+
+def test_lru_eviction(tmp_path: Path):
+    cache = StageCache(tmp_path, max_entries=2)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put("mrp", key, {"rows": [i]})
+        os.utime(tmp_path / f"{key}.json.z", ns=(i * 10**9, i * 10**9))
+        cache.evict()
+    assert cache.get("mrp", "a") is None
+    assert cache.get("mrp", "b")[0] == {"rows": [1]}
+    # 参照された b は c より新しくなり、次の追加では c が追い出される
+    cache.put("mrp", "d", {"rows": [3]})
+    assert cache.get("mrp", "c") is None
+    assert cache.get("mrp", "b") is not None
+    # 壊れたエントリは miss として扱い削除する
+    (tmp_path / "d.json.z").write_bytes(b"broken")
+    assert cache.get("mrp", "d") is None
+    assert not (tmp_path / "d.json.z").exists()
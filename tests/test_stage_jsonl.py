@@ -0,0 +1,151 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app import db
+from core.plan_repository import PlanRepository
+from scripts import allocate
+from scripts.pipeline_runner import PlanningPipeline
+from scripts.plan_pipeline_io import (
+    PlanStorageConfig,
+    iter_stage_rows,
+    load_stage_input,
+    open_stage_stream,
+    stream_allocate_payload,
+    write_stage_rows,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLES = ROOT / "samples" / "planning"
+
+
+def test_jsonl_round_trip_streams_rows(tmp_path: Path):
+    path = tmp_path / "sku_week.jsonl"
+    meta = {"schema_version": "agg-1.0", "inputs_summary": {"weeks": 4}}
+
+    def rows():
+        for i in range(5):
+            yield {"sku": f"S{i}", "week": "2025-01-Wk1", "demand": i * 1.5}
+
+    assert write_stage_rows(path, meta, rows()) == 5
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["meta"] == meta
+    assert len(lines) == 6
+
+    header, it = open_stage_stream(path)
+    assert header == meta
+    assert next(it) == {"sku": "S0", "week": "2025-01-Wk1", "demand": 0.0}
+    assert load_stage_input(path) == {
+        **meta,
+        "rows": [
+            {"sku": f"S{i}", "week": "2025-01-Wk1", "demand": i * 1.5} for i in range(5)
+        ],
+    }
+
+    # 書き込み途中の失敗では既存ファイルを残す
+    def broken():
+        yield {"sku": "X"}
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        write_stage_rows(path, meta, broken())
+    assert len(load_stage_input(path)["rows"]) == 5
+    assert not list(tmp_path.glob(".*.tmp"))
+
+    (tmp_path / "bad.jsonl").write_text('{"sku": "S0"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_stage_input(tmp_path / "bad.jsonl")
+
+
+def _run_stages(out: Path, ext: str) -> None:
+    pipeline = PlanningPipeline(in_process=True, use_cache=False)
+    common = ["--storage", "files"]
+    pipeline.run_stage(
+        "plan_aggregate", ["-i", SAMPLES, "-o", out / f"aggregate{ext}", *common]
+    )
+    pipeline.run_stage(
+        "allocate",
+        ["-i", out / f"aggregate{ext}", "-I", SAMPLES, "-o", out / f"sku_week{ext}"]
+        + ["--round", "int", *common],
+    )
+    pipeline.run_stage(
+        "mrp",
+        ["-i", out / f"sku_week{ext}", "-I", SAMPLES, "-o", out / f"mrp{ext}", *common],
+    )
+    pipeline.run_stage(
+        "reconcile",
+        ["-i", out / f"sku_week{ext}", out / f"mrp{ext}", "-I", SAMPLES]
+        + ["-o", out / f"plan_final{ext}", *common],
+    )
+    pipeline.run_stage(
+        "report",
+        ["-i", out / f"plan_final{ext}", "-I", SAMPLES, "-o", out / "report.csv"]
+        + common,
+    )
+
+
+@pytest.mark.parametrize("use_store", [True, False])
+def test_stages_accept_jsonl_interchange(tmp_path: Path, monkeypatch, use_store):
+    if not use_store:
+        # 各ステージが前段の出力をファイルから読む（store には何も残さない）
+        monkeypatch.setattr(
+            "scripts.plan_pipeline_io.PayloadStore.get", lambda self, path: None
+        )
+    a, b = tmp_path / "json", tmp_path / "jsonl"
+    a.mkdir()
+    b.mkdir()
+    _run_stages(a, ".json")
+    _run_stages(b, ".jsonl")
+    for name in ("aggregate", "sku_week", "mrp", "plan_final"):
+        assert load_stage_input(a / f"{name}.json") == load_stage_input(
+            b / f"{name}.jsonl"
+        ), name
+    assert (a / "report.csv").read_text(encoding="utf-8") == (
+        b / "report.csv"
+    ).read_text(encoding="utf-8")
+
+
+def _values(rows):
+    return sorted(
+        (r["time_bucket_key"], r["item_key"], r["demand"], r["supply"]) for r in rows
+    )
+
+
+def test_stream_allocate_to_jsonl_and_bulk_load(db_setup, tmp_path: Path):
+    out = tmp_path / "out"
+    PlanningPipeline(in_process=True, use_cache=False).run_stage(
+        "plan_aggregate",
+        ["-i", SAMPLES, "-o", out / "aggregate.json", "--storage", "files"],
+    )
+
+    def _allocate(output: Path, *extra: str):
+        args = allocate.build_parser().parse_args(
+            ["-i", str(out / "aggregate.json"), "-I", str(SAMPLES)]
+            + ["-o", str(output), "--round", "int", *extra]
+        )
+        return allocate.run(args)
+
+    expected = _allocate(out / "sku_week.json", "--storage", "files")
+    payload = _allocate(
+        out / "sku_week.jsonl",
+        *("--storage", "both", "--version-id", "v-jsonl", "--stream"),
+    )
+    assert payload["rows"] == []
+    streamed = load_stage_input(out / "sku_week.jsonl")
+    assert payload["inputs_summary"]["streamed_rows"] == len(expected["rows"])
+    assert sorted(streamed["rows"], key=json.dumps) == sorted(
+        expected["rows"], key=json.dumps
+    )
+    assert streamed["inputs_summary"]["round_mode"] == "int"
+
+    # 保存済みの .jsonl を行のリストにせず PlanRepository へ読み込む
+    repo = PlanRepository(db._conn)
+    stream_allocate_payload(
+        PlanStorageConfig(storage_mode="db", version_id="v-bulk"),
+        aggregate_data=None,
+        batches=[iter_stage_rows(out / "sku_week.jsonl")],
+    )
+    assert _values(repo.fetch_plan_series("v-bulk", "det")) == _values(
+        repo.fetch_plan_series("v-jsonl", "det")
+    )
@@ -0,0 +1,179 @@
+import importlib
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from engine.compiled import create_simulator
+from engine.cost_trace import CostTrace
+from engine.sweep import (
+    apply_patch,
+    expand_grid,
+    iter_sweep,
+    normalize_variants,
+    run_sweep,
+    shares_preparation,
+)
+from scripts.bench_simulator import build_network
+
+importlib.import_module("app.jobs_api")
+importlib.import_module("app.simulation_api")
+
+GRID = {"nodes.*.service_level": [0.9, 0.99], "network.*.lead_time": [1, 3]}
+
+
+@pytest.fixture
+def memory_registry(monkeypatch):
+    """他テストが残した REGISTRY_BACKEND / RUNS_DB_MAX_ROWS の影響を受けない Registry。"""
+    import app.run_registry as run_registry
+
+    registry = run_registry.RunRegistry(capacity=50)
+    monkeypatch.delenv("RUNS_DB_MAX_ROWS", raising=False)
+    monkeypatch.setenv("REGISTRY_BACKEND", "memory")
+    monkeypatch.setattr(run_registry, "REGISTRY", registry)
+    monkeypatch.setattr(run_registry, "_BACKEND", "memory")
+    monkeypatch.setattr(run_registry, "_DB_MAX_ROWS", 0)
+    return registry
+
+
+def _small_input():
+    return build_network(stores=3, warehouses=1, items=2, days=15, seed=4)
+
+
+def test_expand_grid_and_apply_patch():
+    variants = expand_grid(GRID)
+    assert variants[0] == {"nodes.*.service_level": 0.9, "network.*.lead_time": 1}
+    assert variants[-1] == {"nodes.*.service_level": 0.99, "network.*.lead_time": 3}
+    assert len(variants) == 4
+
+    base = _small_input()
+    store = next(n for n in base.nodes if n.node_type == "store")
+    store_moq = dict(store.moq)
+    patched = apply_patch(
+        base,
+        {
+            "nodes.*.service_level": 0.5,
+            f"nodes.{store.name}.moq.*": 7,
+            "planning_horizon": 5,
+        },
+    )
+    # サービス水準を持たないノード（原材料）は対象外、基準入力は変わらない
+    assert {getattr(n, "service_level", 0.5) for n in patched.nodes} == {0.5}
+    new_store = next(n for n in patched.nodes if n.name == store.name)
+    assert set(new_store.moq) == set(store.initial_stock)
+    assert set(new_store.moq.values()) == {7}
+    assert patched.planning_horizon == 5 and base.planning_horizon == 15
+    assert store.moq == store_moq and store.service_level != 0.5
+    assert patched.products is base.products
+
+    with pytest.raises(ValueError):
+        apply_patch(base, {"nodes.NOPE.service_level": 0.9})
+    with pytest.raises(ValueError):
+        normalize_variants(base, [{"nodes.*.service_level": 2.0}])
+    assert normalize_variants(base, [{"network.*.lead_time": "2"}]) == [
+        {"network.*.lead_time": 2}
+    ]
+    assert shares_preparation(variants[0])
+    assert not shares_preparation({"random_seed": 1})
+    assert not shares_preparation({"customer_demand.*.demand_mean": 3})
+
+
+@pytest.mark.parametrize("engine", ["legacy", "compiled"])
+def test_shared_preparation_matches_fresh_runs(engine):
+    base = build_network(stores=4, items=3, days=20, seed=5, constrained=True)
+    variants = expand_grid({**GRID, "customer_demand.*.demand_mean": [5, 9]})
+    sweep = run_sweep(base, variants=variants, workers=1, engine=engine)
+    assert [v["index"] for v in sweep["variants"]] == list(range(len(variants)))
+    for out, patch in zip(sweep["variants"], variants):
+        fresh = create_simulator(
+            apply_patch(base, patch), engine=engine, detail_level="summary"
+        )
+        fresh.run()
+        assert json.dumps(out["summary"], sort_keys=True) == json.dumps(
+            fresh.compute_summary(), sort_keys=True
+        )
+    assert len({v["summary"]["profit_total"] for v in sweep["variants"]}) > 1
+
+
+def test_pool_matches_serial_sweep():
+    base = _small_input()
+    variants = normalize_variants(base, expand_grid(GRID))
+    serial = dict(iter_sweep(base, variants, workers=1))
+    pooled = dict(iter_sweep(base, variants, workers=2, detail_level="pl"))
+    assert sorted(pooled) == [0, 1, 2, 3]
+    for i, out in serial.items():
+        assert pooled[i]["summary"] == out["summary"]
+        assert pooled[i]["daily_profit_loss"] and "daily_profit_loss" not in out
+    full = dict(iter_sweep(base, variants[:1], workers=1, detail_level="full"))
+    assert isinstance(full[0]["cost_trace"], CostTrace) and full[0]["cost_trace"]
+
+
+def test_simulation_sweep_endpoint(seed_canonical_data, memory_registry):
+    client = TestClient(app)
+    r = client.post(
+        "/simulation/sweep",
+        json={"config_version_id": 100, "grid": GRID, "workers": 1},
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert body["scenario_id"] and len(body["variants"]) == 4
+    assert body["variants"][3]["params"] == {
+        "nodes.*.service_level": 0.99,
+        "network.*.lead_time": 3,
+    }
+    for v in body["variants"]:
+        rec = memory_registry.get(v["run_id"])
+        assert rec["scenario_id"] == body["scenario_id"]
+        assert rec["config_version_id"] == 100
+        assert rec["summary"]["_sweep_index"] == v["index"]
+        assert rec["results"] == []
+
+    r = client.post(
+        "/simulation/sweep",
+        json={"config_version_id": 100, "grid": {"nodes.*.bogus": [1]}},
+    )
+    assert r.status_code == 400
+    r = client.post("/simulation/sweep", json={"config_version_id": 100})
+    assert r.status_code == 400
+
+    # 保持上限を超えるスイープは保存直後に自分の Run が消えるため受け付けない
+    memory_registry.capacity = 3
+    r = client.post(
+        "/simulation/sweep",
+        json={"config_version_id": 100, "grid": GRID, "workers": 1},
+    )
+    assert r.status_code == 400 and "keeps only 3 runs" in r.json()["detail"]
+    assert len(memory_registry.list_ids()) == 4
+
+
+@pytest.mark.slow
+def test_jobs_sweep_end_to_end(seed_canonical_data, memory_registry):
+    from app.jobs import JOB_MANAGER
+
+    JOB_MANAGER.stop()
+    JOB_MANAGER.db_path = seed_canonical_data
+    client = TestClient(app)
+    r = client.post(
+        "/jobs/sweep",
+        json={
+            "config_version_id": 100,
+            "grid": {"network.*.lead_time": [1, 2, 3]},
+            "workers": 1,
+        },
+    )
+    assert r.status_code == 200
+    job_id = r.json()["job_id"]
+    status = None
+    for _ in range(200):
+        status = client.get(f"/jobs/{job_id}").json()["status"]
+        if status in ("succeeded", "failed"):
+            break
+        time.sleep(0.05)
+    assert status == "succeeded"
+    rows = client.get(f"/jobs/{job_id}/result.json").json()["rows"]
+    assert [row["network.*.lead_time"] for row in rows] == [1, 2, 3]
+    assert len({row["scenario_id"] for row in rows}) == 1
+    assert all(row["run_id"] and "fill_rate" in row for row in rows)
+    assert all(memory_registry.get(row["run_id"]) for row in rows)